@@ -14,6 +14,7 @@ Calculates 8 skill badges based on game analysis:
 Each badge is rated 1-5 stars with trend tracking.
 NEW: Each badge now tracks relevant moves for drill-down.
 NEW: Uses position_analyzer for real tactical pattern detection.
+Tactical motifs come from the analysis's stored motif_scan when present.
 """
 
 import logging
@@ -21,15 +22,54 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 import statistics
 
+import numpy as np
+
+from game_record_service import get_game_records
+from rating_service import user_clock_arrays, TIME_TROUBLE_SECONDS
+
 # Import position analyzer for real tactical explanations
 try:
-    from position_analyzer import analyze_position_tactics, explain_move_difference
+    from position_analyzer import (
+        analyze_position_tactics, explain_move_difference, motifs_for_move, describe_motifs
+    )
     HAS_POSITION_ANALYZER = True
 except ImportError:
     HAS_POSITION_ANALYZER = False
 
 logger = logging.getLogger(__name__)
 
+
+
+def _move_motifs(analysis: Dict, move: Dict) -> Dict[str, List[str]]:
+    """Precomputed tactical motifs the user move created ({} for analyses without a scan)"""
+    if not HAS_POSITION_ANALYZER:
+        return {}
+    return motifs_for_move(analysis.get("motif_scan"), move.get("move_number", 0))
+
+
+# A blunder played faster than this counts as a "fast blunder"
+FAST_MOVE_SECONDS = 5
+
+# Move-number windows for moves without a stored phase label (older analyses)
+PHASE_MOVE_WINDOWS = {
+    "opening": (0, 10),
+    "middlegame": (15, 35),
+    "endgame": (36, 10_000)
+}
+
+
+def _in_phase(move: Dict, phase: str) -> bool:
+    """Whether a move belongs to a phase, by its stored label or the move-number window"""
+    if move.get("phase"):
+        return move["phase"] == phase
+    low, high = PHASE_MOVE_WINDOWS[phase]
+    return low <= move.get("move_number", 0) <= high
+
+
+def _phase_moves(move_evals: List[Dict], phase: str) -> List[Dict]:
+    return [m for m in move_evals if _in_phase(m, phase)]
+
+
 # Badge definitions
 BADGES = {
     "opening": {
@@ -113,10 +153,10 @@ def calculate_opening_badge(analyses: List[Dict], games: List[Dict]) -> Dict:
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
         
-        # Get accuracy for first 10 moves
-        opening_moves = [m for m in move_evals if m.get("move_number", 0) <= 10]
+        # Get accuracy for opening moves
+        opening_moves = _phase_moves(move_evals, "opening")
         if opening_moves:
-            good_moves = sum(1 for m in opening_moves if m.get("evaluation") in ["good", "solid", "excellent", "best"])
+            good_moves = sum(1 for m in opening_moves if m.get("evaluation") in ["good", "solid", "excellent", "best", "great", "brilliant"])
             opening_accuracies.append(good_moves / len(opening_moves) * 100)
         
         # Count early blunders (before move 15)
@@ -161,20 +201,26 @@ def calculate_tactical_badge(analyses: List[Dict]) -> Dict:
     tactics_found = 0
     tactics_missed = 0
     total_tactical_moments = 0
+    missed_motifs = {}
     
     for analysis in analyses:
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
         
         for m in move_evals:
-            # A tactical moment is when there's a significant eval swing possible
+            # A tactical moment is when there's a significant eval swing possible,
+            # or a mistake that created a stored tactical motif
             eval_diff = abs(m.get("eval_before", 0) - m.get("eval_after", 0))
-            if eval_diff > 150:  # Significant tactical moment
+            is_error = m.get("evaluation") in ["blunder", "mistake"]
+            motifs = _move_motifs(analysis, m) if is_error else {}
+            if eval_diff > 150 or motifs:  # Significant tactical moment
                 total_tactical_moments += 1
-                if m.get("evaluation") in ["good", "excellent", "best"]:
+                if m.get("evaluation") in ["good", "excellent", "best", "great", "brilliant"]:
                     tactics_found += 1
-                elif m.get("evaluation") in ["blunder", "mistake"]:
+                elif is_error:
                     tactics_missed += 1
+                    for motif in motifs:
+                        missed_motifs[motif] = missed_motifs.get(motif, 0) + 1
     
     # Calculate tactical accuracy
     if total_tactical_moments > 0:
@@ -189,7 +235,8 @@ def calculate_tactical_badge(analyses: List[Dict]) -> Dict:
         "metrics": {
             "tactics_found": tactics_found,
             "tactics_missed": tactics_missed,
-            "tactical_accuracy": round(tactical_accuracy, 1)
+            "tactical_accuracy": round(tactical_accuracy, 1),
+            "missed_motifs": missed_motifs
         },
         "insight": _get_tactical_insight(tactics_found, tactics_missed, tactical_accuracy)
     }
@@ -214,10 +261,10 @@ def calculate_positional_badge(analyses: List[Dict]) -> Dict:
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
         
-        # Middlegame = moves 15-35
-        mg_moves = [m for m in move_evals if 15 <= m.get("move_number", 0) <= 35]
+        # Middlegame moves (stored phase, else moves 15-35)
+        mg_moves = _phase_moves(move_evals, "middlegame")
         if mg_moves:
-            good_moves = sum(1 for m in mg_moves if m.get("evaluation") in ["good", "solid", "excellent", "best"])
+            good_moves = sum(1 for m in mg_moves if m.get("evaluation") in ["good", "solid", "excellent", "best", "great", "brilliant"])
             middlegame_accuracies.append(good_moves / len(mg_moves) * 100)
         
         # Count positional mistakes from commentary
@@ -259,11 +306,11 @@ def calculate_endgame_badge(analyses: List[Dict]) -> Dict:
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
         
-        # Endgame = moves after 35 or when few pieces remain
-        eg_moves = [m for m in move_evals if m.get("move_number", 0) > 35]
+        # Endgame moves (stored phase, else moves after 35)
+        eg_moves = _phase_moves(move_evals, "endgame")
         if eg_moves:
             total_endgames += 1
-            good_moves = sum(1 for m in eg_moves if m.get("evaluation") in ["good", "solid", "excellent", "best"])
+            good_moves = sum(1 for m in eg_moves if m.get("evaluation") in ["good", "solid", "excellent", "best", "great", "brilliant"])
             endgame_accuracies.append(good_moves / len(eg_moves) * 100)
             
             # Check if was winning and converted
@@ -328,7 +375,7 @@ def calculate_defense_badge(analyses: List[Dict]) -> Dict:
                 total_losing_positions += 1
         
         if defensive_moves:
-            good_defense = sum(1 for m in defensive_moves if m.get("evaluation") in ["good", "solid", "excellent", "best"])
+            good_defense = sum(1 for m in defensive_moves if m.get("evaluation") in ["good", "solid", "excellent", "best", "great", "brilliant"])
             defensive_accuracies.append(good_defense / len(defensive_moves) * 100)
         
         # Check if game was saved from losing position
@@ -394,7 +441,7 @@ def calculate_converting_badge(analyses: List[Dict]) -> Dict:
                 was_significantly_winning = True
         
         if winning_moves:
-            good_moves = sum(1 for m in winning_moves if m.get("evaluation") in ["good", "solid", "excellent", "best"])
+            good_moves = sum(1 for m in winning_moves if m.get("evaluation") in ["good", "solid", "excellent", "best", "great", "brilliant"])
             winning_position_accuracies.append(good_moves / len(winning_moves) * 100)
         
         # Check conversion
@@ -461,7 +508,7 @@ def calculate_focus_badge(analyses: List[Dict]) -> Dict:
                     simple_misses += 1
             
             # Track best finds
-            if m.get("evaluation") in ["excellent", "best"]:
+            if m.get("evaluation") in ["excellent", "best", "great", "brilliant"]:
                 eval_gain = abs(m.get("eval_after", 0) - m.get("eval_before", 0))
                 best_tactical_complexity = max(best_tactical_complexity, eval_gain)
     
@@ -484,7 +531,8 @@ def calculate_focus_badge(analyses: List[Dict]) -> Dict:
     }
 
 
-def calculate_time_badge(analyses: List[Dict], games: List[Dict]) -> Dict:
+def calculate_time_badge(analyses: List[Dict], games: List[Dict],
+                         records: Optional[Dict[str, Dict]] = None) -> Dict:
     """
     Calculate Time Management badge.
     
@@ -492,22 +540,42 @@ def calculate_time_badge(analyses: List[Dict], games: List[Dict]) -> Dict:
     - Average move time
     - Time trouble frequency
     - Fast moves before blunders
+    
+    Games whose record has clock data use the stored per-ply clock and
+    think-time arrays; the rest fall back to counting late-game blunders.
     """
     if not analyses:
         return {"score": 2.5, "metrics": {}, "insight": "Not enough games analyzed"}
     
-    # For now, estimate based on game time controls and blunder timing
-    # In future, can parse actual clock times from PGN if available
+    records = records or {}
+    colors = {g.get("game_id"): g.get("user_color") for g in games}
     
     time_trouble_games = 0
     fast_blunders = 0  # Blunders that happened quickly
+    clocked_games = 0
+    think_chunks = []
     total_games = len(analyses)
     
     for analysis in analyses:
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
+        game_id = analysis.get("game_id")
         
-        # Check for late-game blunders (likely time trouble)
+        record = records.get(game_id)
+        if record:
+            user_color = colors.get(game_id) or (analysis.get("motif_scan") or {}).get("user_color", "white")
+            move_numbers, think, remaining = user_clock_arrays(record, user_color)
+            if remaining.size:
+                clocked_games += 1
+                think_chunks.append(think)
+                if np.any(remaining < TIME_TROUBLE_SECONDS):
+                    time_trouble_games += 1
+                blunder_moves = [m.get("move_number", 0) for m in move_evals if m.get("evaluation") == "blunder"]
+                fast = think < FAST_MOVE_SECONDS
+                fast_blunders += int(np.count_nonzero(np.isin(move_numbers[fast], blunder_moves)))
+                continue
+        
+        # No clock data: late-game blunders are likely time trouble
         late_blunders = sum(1 for m in move_evals 
                           if m.get("move_number", 0) > 35 and m.get("evaluation") == "blunder")
         if late_blunders >= 2:
@@ -518,11 +586,15 @@ def calculate_time_badge(analyses: List[Dict], games: List[Dict]) -> Dict:
     
     score = calculate_badge_score(time_score, [40, 55, 70, 85, 95])
     
+    think = np.concatenate(think_chunks) if think_chunks else np.empty(0)
     return {
         "score": round(score, 1),
         "metrics": {
             "time_trouble_games": time_trouble_games,
-            "time_trouble_rate": round(time_trouble_rate, 1)
+            "time_trouble_rate": round(time_trouble_rate, 1),
+            "fast_blunders": fast_blunders,
+            "clocked_games": clocked_games,
+            "avg_think_time": round(float(think.mean()), 1) if think.size else None
         },
         "insight": _get_time_insight(time_trouble_rate)
     }
@@ -629,6 +701,12 @@ async def calculate_all_badges(db, user_id: str) -> Dict:
             "games_analyzed": 0
         }
     
+    # Per-ply clock arrays stored with each game's record (for the time badge)
+    records = await get_game_records(
+        db, [{"game_id": a["game_id"]} for a in analyses if a.get("game_id")],
+        fields=["clocks", "think", "start_fen"]
+    )
+    
     # Calculate each badge
     badges = {
         "opening": calculate_opening_badge(analyses, games),
@@ -638,7 +716,7 @@ async def calculate_all_badges(db, user_id: str) -> Dict:
         "defense": calculate_defense_badge(analyses),
         "converting": calculate_converting_badge(analyses),
         "focus": calculate_focus_badge(analyses),
-        "time": calculate_time_badge(analyses, games)
+        "time": calculate_time_badge(analyses, games, records)
     }
     
     # Add metadata to each badge
@@ -786,8 +864,8 @@ def _get_opening_badge_details(analyses: List[Dict], games_map: Dict, user_ratin
         sf = analysis.get("stockfish_analysis", {})
         move_evals = sf.get("move_evaluations", [])
         
-        # Get moves in opening phase (first 10 moves)
-        opening_moves = [m for m in move_evals if m.get("move_number", 0) <= 10]
+        # Get moves in opening phase (stored phase, else first 10 moves)
+        opening_moves = _phase_moves(move_evals, "opening")
         
         game_opening_data = {
             "game_id": game_id,
@@ -829,7 +907,7 @@ def _get_opening_badge_details(analyses: List[Dict], games_map: Dict, user_ratin
                 relevant_moves.append({**move_data, "game_id": game_id})
             
             # Track excellent opening moves
-            elif evaluation in ["best", "excellent"]:
+            elif evaluation in ["brilliant", "great", "best", "excellent"]:
                 move_data = {
                     "move_number": m.get("move_number"),
                     "move_played": m.get("move"),
@@ -892,11 +970,12 @@ def _get_tactical_badge_details(analyses: List[Dict], games_map: Dict, user_rati
         for m in move_evals:
             eval_diff = abs(m.get("eval_before", 0) - m.get("eval_after", 0))
             evaluation = m.get("evaluation", "")
+            is_missed = evaluation in ["blunder", "mistake"]
+            motifs = _move_motifs(analysis, m) if is_missed else {}
             
-            # Tactical moment: significant eval swing (>150 cp)
-            if eval_diff > 150:
-                is_missed = evaluation in ["blunder", "mistake"]
-                is_found = evaluation in ["best", "excellent"]
+            # Tactical moment: significant eval swing (>150 cp) or a motif the mistake created
+            if eval_diff > 150 or motifs:
+                is_found = evaluation in ["brilliant", "great", "best", "excellent"]
                 
                 if is_missed or is_found:
                     move_data = {
@@ -911,7 +990,8 @@ def _get_tactical_badge_details(analyses: List[Dict], games_map: Dict, user_rati
                         "type": "missed" if is_missed else "found",
                         "threat": m.get("threat"),
                         "pv_after_best": m.get("pv_after_best", []),
-                        "explanation": _generate_tactical_explanation(m, is_missed, eval_diff, user_rating)
+                        "motifs": motifs,
+                        "explanation": _generate_tactical_explanation(m, is_missed, eval_diff, user_rating, motifs)
                     }
                     game_tactical_data["moves"].append(move_data)
                     relevant_moves.append({**move_data, "game_id": game_id})
@@ -972,8 +1052,8 @@ def _get_positional_badge_details(analyses: List[Dict], games_map: Dict, user_ra
             "moves": []
         }
         
-        # Middlegame = moves 15-35
-        mg_moves = [m for m in move_evals if 15 <= m.get("move_number", 0) <= 35]
+        # Middlegame moves (stored phase, else moves 15-35)
+        mg_moves = _phase_moves(move_evals, "middlegame")
         
         for m in mg_moves:
             evaluation = m.get("evaluation", "")
@@ -998,7 +1078,7 @@ def _get_positional_badge_details(analyses: List[Dict], games_map: Dict, user_ra
                 relevant_moves.append({**move_data, "game_id": game_id})
             
             # Track excellent positional play
-            elif evaluation in ["best", "excellent"] and cp_loss <= 10:
+            elif evaluation in ["brilliant", "great", "best", "excellent"] and cp_loss <= 10:
                 move_data = {
                     "move_number": m.get("move_number"),
                     "move_played": m.get("move"),
@@ -1052,8 +1132,8 @@ def _get_endgame_badge_details(analyses: List[Dict], games_map: Dict, user_ratin
             "moves": []
         }
         
-        # Endgame = moves after 35
-        eg_moves = [m for m in move_evals if m.get("move_number", 0) > 35]
+        # Endgame moves (stored phase, else moves after 35)
+        eg_moves = _phase_moves(move_evals, "endgame")
         
         if not eg_moves:
             continue
@@ -1156,7 +1236,7 @@ def _get_defense_badge_details(analyses: List[Dict], games_map: Dict, user_ratin
                     game_def_data["moves"].append(move_data)
                     relevant_moves.append({**move_data, "game_id": game_id})
                 
-                elif evaluation in ["best", "excellent"]:
+                elif evaluation in ["brilliant", "great", "best", "excellent"]:
                     move_data = {
                         "move_number": m.get("move_number"),
                         "move_played": m.get("move"),
@@ -1309,7 +1389,7 @@ def _get_focus_badge_details(analyses: List[Dict], games_map: Dict, user_rating:
             eval_drop = abs(m.get("eval_before", 0) - m.get("eval_after", 0))
             
             # Track best finds for capability detection
-            if evaluation in ["excellent", "best"]:
+            if evaluation in ["excellent", "best", "great", "brilliant"]:
                 eval_gain = abs(m.get("eval_after", 0) - m.get("eval_before", 0))
                 best_tactical_complexity = max(best_tactical_complexity, eval_gain)
             
@@ -1464,14 +1544,21 @@ def _generate_opening_explanation(move: Dict, evaluation: str, rating: int = 120
             return f"Minor inaccuracy. {best} was more precise."
 
 
-def _generate_tactical_explanation(move: Dict, is_missed: bool, eval_swing: int, rating: int = 1200) -> str:
-    """Generate tactical explanation using position analysis when available."""
+def _generate_tactical_explanation(move: Dict, is_missed: bool, eval_swing: int, rating: int = 1200,
+                                   motifs: Optional[Dict] = None) -> str:
+    """Generate tactical explanation from stored motifs, else live position analysis."""
     best = move.get("best_move", "")
     threat = move.get("threat", "")
     played = move.get("move_played", move.get("move", ""))
     fen_before = move.get("fen_before", "")
     level = _get_rating_level(rating)
     
+    # Motifs precomputed at analysis time - no board work needed
+    if motifs:
+        explanation = describe_motifs(motifs, played)
+        if explanation:
+            return f"{explanation} {best} was better." if best and best != played else explanation
+    
     # Try to get real explanation from position analyzer
     if HAS_POSITION_ANALYZER and fen_before:
         try:
@@ -1637,7 +1724,7 @@ def _calculate_opening_score_simple(analyses: List[Dict]) -> float:
     for a in analyses:
         sf = a.get("stockfish_analysis", {})
         for m in sf.get("move_evaluations", []):
-            if m.get("move_number", 0) <= 10 and m.get("evaluation") in ["blunder", "mistake"]:
+            if _in_phase(m, "opening") and m.get("evaluation") in ["blunder", "mistake"]:
                 errors += 1
     rate = errors / len(analyses) if analyses else 1
     return max(1.0, min(5.0, 5.0 - rate * 1.5))
@@ -1652,7 +1739,7 @@ def _calculate_tactical_score_simple(analyses: List[Dict]) -> float:
         for m in sf.get("move_evaluations", []):
             swing = abs(m.get("eval_before", 0) - m.get("eval_after", 0))
             if swing > 150:
-                if m.get("evaluation") in ["best", "excellent"]:
+                if m.get("evaluation") in ["brilliant", "great", "best", "excellent"]:
                     found += 1
                 elif m.get("evaluation") in ["blunder", "mistake"]:
                     missed += 1
@@ -1669,7 +1756,7 @@ def _calculate_positional_score_simple(analyses: List[Dict]) -> float:
     for a in analyses:
         sf = a.get("stockfish_analysis", {})
         for m in sf.get("move_evaluations", []):
-            if 15 <= m.get("move_number", 0) <= 35:
+            if _in_phase(m, "middlegame"):
                 if m.get("evaluation") in ["mistake", "inaccuracy"]:
                     errors += 1
     rate = errors / len(analyses) if analyses else 1
@@ -1683,7 +1770,7 @@ def _calculate_endgame_score_simple(analyses: List[Dict]) -> float:
     for a in analyses:
         sf = a.get("stockfish_analysis", {})
         for m in sf.get("move_evaluations", []):
-            if m.get("move_number", 0) > 35 and m.get("evaluation") in ["blunder", "mistake"]:
+            if _in_phase(m, "endgame") and m.get("evaluation") in ["blunder", "mistake"]:
                 errors += 1
     rate = errors / len(analyses) if analyses else 1
     return max(1.0, min(5.0, 4.5 - rate * 0.5))
@@ -0,0 +1,152 @@
+"""
+Benchmark: MongoDB round trips per game import
+
+Compares the legacy per-game import loop (find_one + insert_one + add_xp +
+increment_stat per game) with the batched path (one $in lookup, one
+unordered insert_many, one aggregated gamification update).
+
+Round trips are counted with a pymongo CommandListener, so this needs a
+real MongoDB. It uses a throwaway database and drops it afterwards.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_import_round_trips.py [num_games]
+"""
+
+import os
+import sys
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one command = one round trip)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Listener must be registered before any client is created
+counter = CommandCounter()
+monitoring.register(counter)
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = f"bench_import_{uuid.uuid4().hex[:8]}"
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+import gamification_service  # noqa: E402
+from gamification_service import (  # noqa: E402
+    add_xp, update_streak, record_games_imported, get_user_progress,
+    check_and_award_achievements, user_progress_collection
+)
+from game_import_service import compute_game_fingerprint, filter_new_games, insert_games_unordered  # noqa: E402
+
+
+def make_game_docs(user_id: str, num_games: int):
+    """Build synthetic game documents with distinct PGNs"""
+    docs = []
+    for i in range(num_games):
+        pgn = (
+            f'[White "bench_user"]\n[Black "opponent_{i}"]\n[Date "2024.01.{i % 28 + 1:02d}"]\n'
+            f'[Result "1-0"]\n\n1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 {i + 4}. Ba4 Nf6 1-0'
+        )
+        docs.append({
+            "game_id": f"game_{uuid.uuid4().hex[:12]}",
+            "user_id": user_id,
+            "platform": "lichess",
+            "pgn": pgn,
+            "user_color": "white",
+            "fingerprint": compute_game_fingerprint(pgn),
+            "imported_at": datetime.now(timezone.utc).isoformat(),
+            "is_analyzed": False
+        })
+    return docs
+
+
+async def legacy_increment_stat(user_id: str, stat: str, value: int = 1):
+    """increment_stat as it was before the import batching: update, then re-read the progress"""
+    await user_progress_collection.update_one(
+        {"user_id": user_id},
+        {"$inc": {stat: value}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    progress = await get_user_progress(user_id)
+    await check_and_award_achievements(user_id, stat, progress.get(stat, 0))
+
+
+async def legacy_import(db, user_id: str, docs):
+    """The original per-game loop from /api/import-games"""
+    imported = 0
+    for doc in docs:
+        existing = await db.games.find_one({"user_id": user_id, "pgn": doc["pgn"]})
+        if existing:
+            continue
+        await db.games.insert_one(dict(doc))
+        imported += 1
+    for _ in range(imported):
+        await add_xp(user_id, "game_imported")
+        await legacy_increment_stat(user_id, "games_imported")
+    await update_streak(user_id)
+    return imported
+
+
+async def batched_import(db, user_id: str, docs):
+    """The batched import path"""
+    new_docs = await filter_new_games(db, user_id, docs)
+    imported = await insert_games_unordered(db, new_docs)
+    await record_games_imported(user_id, imported)
+    return imported
+
+
+async def measure(label: str, db, importer, num_games: int):
+    user_id = f"bench_{uuid.uuid4().hex[:8]}"
+    docs = make_game_docs(user_id, num_games)
+
+    counter.count = 0
+    start = time.perf_counter()
+    imported = await importer(db, user_id, docs)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{label:<10} imported={imported:<4} round_trips={counter.count:<5} "
+          f"per_game={counter.count / max(imported, 1):.2f}  time={elapsed_ms:.1f}ms")
+    return counter.count
+
+
+async def main():
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    try:
+        await db.games.create_index(
+            [("user_id", 1), ("fingerprint", 1)],
+            unique=True,
+            partialFilterExpression={"fingerprint": {"$type": "string"}}
+        )
+        print(f"Importing {num_games} games into {os.environ['DB_NAME']}\n")
+        legacy = await measure("legacy", db, legacy_import, num_games)
+        batched = await measure("batched", db, batched_import, num_games)
+        print(f"\nRound trips reduced {legacy / max(batched, 1):.1f}x")
+    finally:
+        await client.drop_database(os.environ["DB_NAME"])
+        client.close()
+        gamification_service.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Benchmark: multi-game PGN import parsing
+
+Compares the legacy whole-text parser (split everything into lines, rebuild
+each PGN with capitalized header keys) with the streaming reader in
+game_import_service, optionally followed by building the canonical game
+record (full python-chess parse).
+
+Each mode runs in its own subprocess so peak RSS is measured per mode.
+Without a corpus path a synthetic one (~5 MB, clocks + comments) is
+generated in a temp file.
+
+Usage:
+    python benchmarks/bench_pgn_import.py [corpus.pgn] [--games N]
+"""
+
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODES = ["legacy", "stream", "stream+record"]
+
+OPENING_LINES = [
+    "e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7 Re1 b5 Bb3 d6 c3 O-O h3 Nb8 d4 Nbd7",
+    "d4 d5 c4 e6 Nc3 Nf6 Bg5 Be7 e3 O-O Nf3 h6 Bh4 b6 cxd5 Nxd5 Bxe7 Qxe7 Nxd5 exd5",
+    "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6 Be3 e5 Nb3 Be6 f3 Be7 Qd2 O-O O-O-O Nbd7",
+]
+
+
+def write_synthetic_corpus(path: str, num_games: int) -> None:
+    """Chess.com-style archive: clock comments after every move"""
+    with open(path, "w") as f:
+        for i in range(num_games):
+            moves = OPENING_LINES[i % len(OPENING_LINES)].split()
+            f.write(
+                f'[Event "Live Chess"]\n[Site "Chess.com"]\n[Date "2024.01.{i % 28 + 1:02d}"]\n'
+                f'[White "bench_user"]\n[Black "opponent_{i}"]\n[Result "1-0"]\n'
+                f'[WhiteElo "{1200 + i % 300}"]\n[BlackElo "{1250 + i % 200}"]\n'
+                f'[TimeControl "600"]\n[Termination "bench_user won on time"]\n'
+                f'[Link "https://www.chess.com/game/live/{1000000 + i}"]\n\n'
+            )
+            clock = 600
+            tokens = []
+            for ply, move in enumerate(moves):
+                clock -= 3 + (ply * 7 + i) % 11
+                prefix = f"{ply // 2 + 1}. " if ply % 2 == 0 else f"{ply // 2 + 1}... "
+                tokens.append(f"{prefix}{move} {{[%clk 0:{clock // 60:02d}:{clock % 60:02d}]}}")
+            f.write(" ".join(tokens) + " 1-0\n\n")
+
+
+def legacy_parse(pgn_text: str):
+    """The original parse_pgn_games body from server.py"""
+    games = []
+    current_game = {}
+    moves = []
+
+    for line in pgn_text.split('\n'):
+        line = line.strip()
+        if not line:
+            if current_game and moves:
+                current_game['pgn_moves'] = ' '.join(moves)
+                games.append(current_game)
+                current_game = {}
+                moves = []
+            continue
+        if line.startswith('['):
+            match = re.match(r'\[(\w+)\s+"(.*)"\]', line)
+            if match:
+                key, value = match.groups()
+                current_game[key.lower()] = value
+        else:
+            moves.append(line)
+
+    if current_game and moves:
+        current_game['pgn_moves'] = ' '.join(moves)
+        games.append(current_game)
+
+    parsed = []
+    for g in games:
+        full_pgn = ""
+        for key, value in g.items():
+            if key != 'pgn_moves':
+                full_pgn += f'[{key.capitalize()} "{value}"]\n'
+        full_pgn += f'\n{g.get("pgn_moves", "")}'
+        parsed.append(full_pgn)
+    return parsed
+
+
+def run_mode(mode: str, path: str) -> None:
+    """Parse the corpus in one mode and print games, games/sec and peak RSS"""
+    from game_import_service import iter_pgn_texts, pgn_text_to_game_data
+    from game_record_service import build_game_record
+
+    start = time.perf_counter()
+    count = 0
+
+    if mode == "legacy":
+        with open(path) as f:
+            count = len(legacy_parse(f.read()))
+    else:
+        with open(path) as f:
+            for game_pgn in iter_pgn_texts(f):
+                pgn_text_to_game_data(game_pgn, "chess.com", "bench_user")
+                if mode == "stream+record":
+                    build_game_record(game_pgn)
+                count += 1
+
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<14} games={count:<6} games/sec={count / elapsed:>9.0f}  "
+          f"time={elapsed:6.2f}s  peak_rss={peak_mb:6.1f}MB")
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "--mode":
+        run_mode(args[1], args[2])
+        return
+
+    num_games = 8000
+    if "--games" in args:
+        num_games = int(args[args.index("--games") + 1])
+        args = [a for i, a in enumerate(args) if a != "--games" and (i == 0 or args[i - 1] != "--games")]
+
+    cleanup = None
+    if args:
+        path = args[0]
+    else:
+        fd, path = tempfile.mkstemp(suffix=".pgn")
+        os.close(fd)
+        write_synthetic_corpus(path, num_games)
+        cleanup = path
+
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Corpus: {path} ({size_mb:.1f} MB)\n")
+        for mode in MODES:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, path], check=True)
+    finally:
+        if cleanup:
+            os.remove(cleanup)
+
+
+if __name__ == "__main__":
+    main()
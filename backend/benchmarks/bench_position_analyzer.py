@@ -0,0 +1,182 @@
+"""
+Benchmark: tactical motif detectors in position_analyzer
+
+Compares the original square-by-square detectors (piece_at over all 64
+squares, SquareSet lists, chess.ray/between per slider) with the bitboard
+versions, over every position of seeded random games (or the mainlines of
+a PGN file). Also reports the batch scan_fens() throughput.
+
+Usage:
+    python benchmarks/bench_position_analyzer.py [games.pgn] [--games N]
+"""
+
+import os
+import random
+import sys
+import time
+
+import chess
+import chess.pgn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from position_analyzer import (  # noqa: E402
+    PIECE_VALUES,
+    find_hanging_pieces,
+    find_loose_pieces,
+    find_forks,
+    find_pins,
+    scan_fens
+)
+
+
+# ==================== ORIGINAL IMPLEMENTATIONS ====================
+
+def legacy_find_hanging_pieces(board, color):
+    hanging = []
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece and piece.color == color:
+            attackers = board.attackers(not color, square)
+            defenders = board.attackers(color, square)
+            if attackers and not defenders:
+                hanging.append({"square": square, "piece": piece.piece_type, "attackers": len(attackers)})
+    hanging.sort(key=lambda x: PIECE_VALUES[x["piece"]], reverse=True)
+    return hanging
+
+
+def legacy_find_loose_pieces(board, color):
+    loose = []
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece and piece.color == color and piece.piece_type != chess.KING:
+            if not board.attackers(color, square):
+                loose.append({"square": square, "piece": piece.piece_type})
+    return loose
+
+
+def legacy_find_forks(board, attacking_color):
+    forks = []
+    target_color = not attacking_color
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece and piece.color == attacking_color:
+            valuable_targets = []
+            for target_sq in list(board.attacks(square)):
+                target_piece = board.piece_at(target_sq)
+                if target_piece and target_piece.color == target_color:
+                    if PIECE_VALUES[target_piece.piece_type] >= 3:
+                        valuable_targets.append({"square": target_sq, "piece": target_piece.piece_type})
+            if len(valuable_targets) >= 2:
+                forks.append({"attacker_square": square, "attacker_piece": piece.piece_type,
+                              "targets": valuable_targets})
+    return forks
+
+
+def legacy_find_pins(board, pinned_color):
+    pins = []
+    king_sq = board.king(pinned_color)
+    if king_sq is None:
+        return pins
+    for square in chess.SQUARES:
+        attacker = board.piece_at(square)
+        if not attacker or attacker.color == pinned_color:
+            continue
+        if attacker.piece_type not in [chess.BISHOP, chess.ROOK, chess.QUEEN]:
+            continue
+        if not chess.ray(square, king_sq):
+            continue
+        same_line = chess.square_file(square) == chess.square_file(king_sq) or \
+            chess.square_rank(square) == chess.square_rank(king_sq)
+        if attacker.piece_type == chess.BISHOP and same_line:
+            continue
+        if attacker.piece_type == chess.ROOK and not same_line:
+            continue
+        between = []
+        for sq in chess.SquareSet(chess.between(square, king_sq)):
+            piece = board.piece_at(sq)
+            if piece:
+                between.append((sq, piece))
+        if len(between) == 1 and between[0][1].color == pinned_color:
+            pins.append({"pinned_square": between[0][0], "pinned_piece": between[0][1].piece_type,
+                         "behind_piece": chess.KING, "attacker_square": square,
+                         "attacker_piece": attacker.piece_type})
+    return pins
+
+
+LEGACY = [legacy_find_hanging_pieces, legacy_find_loose_pieces, legacy_find_forks, legacy_find_pins]
+BITBOARD = [find_hanging_pieces, find_loose_pieces, find_forks, find_pins]
+
+
+# ==================== CORPUS ====================
+
+def random_game_fens(num_games: int, max_plies: int = 80):
+    rng = random.Random(42)
+    fens = []
+    for _ in range(num_games):
+        board = chess.Board()
+        for _ in range(max_plies):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+            fens.append(board.fen())
+    return fens
+
+
+def pgn_fens(path: str):
+    fens = []
+    with open(path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            board = game.board()
+            for move in game.mainline_moves():
+                board.push(move)
+                fens.append(board.fen())
+    return fens
+
+
+def run_detectors(detectors, boards):
+    for board in boards:
+        for color in (chess.WHITE, chess.BLACK):
+            for detect in detectors:
+                detect(board, color)
+
+
+def main():
+    args = sys.argv[1:]
+    num_games = 100
+    if "--games" in args:
+        num_games = int(args[args.index("--games") + 1])
+    path = next((a for a in args if a.endswith(".pgn")), None)
+
+    fens = pgn_fens(path) if path else random_game_fens(num_games)
+    boards = [chess.Board(fen) for fen in fens]
+    print(f"{len(fens)} positions ({'PGN ' + path if path else f'{num_games} random games'})\n")
+
+    # Sanity check: identical results
+    for board in boards[:2000]:
+        for color in (chess.WHITE, chess.BLACK):
+            for legacy, new in zip(LEGACY, BITBOARD):
+                assert legacy(board, color) == new(board, color), (legacy.__name__, board.fen())
+
+    results = {}
+    for label, detectors in (("legacy", LEGACY), ("bitboard", BITBOARD)):
+        start = time.perf_counter()
+        run_detectors(detectors, boards)
+        elapsed = time.perf_counter() - start
+        results[label] = len(boards) / elapsed
+        print(f"{label:<10} {results[label]:>9.0f} positions/sec (4 detectors x 2 colors)")
+
+    start = time.perf_counter()
+    scan_fens(fens, "white")
+    elapsed = time.perf_counter() - start
+    print(f"{'scan_fens':<10} {len(fens) / elapsed:>9.0f} positions/sec (FEN parse + full motif scan)")
+    print(f"\nSpeedup: {results['bitboard'] / results['legacy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
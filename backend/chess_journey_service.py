@@ -10,10 +10,14 @@ This service provides deep insights into a player's chess journey:
 """
 
 import logging
+import re
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Optional, Any
 from collections import defaultdict
 
+from game_record_service import get_game_records
+from opening_index import get_opening_index
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,6 +48,11 @@ async def get_chess_journey(db, user_id: str) -> Dict[str, Any]:
         {"_id": 0}
     ).sort("imported_at", 1).to_list(500)
     
+    # Opening classification reads position hashes from the game records
+    records = await get_game_records(db, games, fields=["zobrist"])
+    for game in games:
+        game["record"] = records.get(game.get("game_id"))
+    
     # Get player profile
     profile = await db.player_profiles.find_one(
         {"user_id": user_id},
@@ -113,6 +122,15 @@ async def get_rating_progression(db, user_id: str, user: Dict, games: List[Dict]
                 "game_id": game.get("game_id")
             })
     
+    # Prefer the stored platform rating series (refreshed by background sync)
+    # over Elo values scraped from PGN headers of imported games
+    source = "game_headers"
+    games_with_rating = len(rating_data)
+    platform_series = await _get_platform_rating_series(db, user_id)
+    if len(platform_series) >= 2:
+        rating_data = platform_series
+        source = "platform_history"
+    
     # Sort by date
     rating_data.sort(key=lambda x: x["date"])
     
@@ -171,10 +189,47 @@ async def get_rating_progression(db, user_id: str, user: Dict, games: List[Dict]
         "weekly_change": weekly_change,
         "history": rating_history[-12:],  # Last 12 weeks
         "trend": trend,
-        "total_games": len(rating_data)
+        "total_games": games_with_rating,  # Games whose PGN carried the user's rating
+        "history_points": len(rating_data),  # Points the progression was built from
+        "source": source
     }
 
 
+async def _get_platform_rating_series(db, user_id: str) -> List[Dict]:
+    """Stored history points for the user's primary platform rating, as rating_data entries"""
+    from rating_service import select_primary_rating, get_rating_history
+    
+    snapshot = await db.rating_snapshots.find_one({"user_id": user_id}, {"_id": 0, "ratings": 1})
+    primary = select_primary_rating((snapshot or {}).get("ratings", {}))
+    if not primary:
+        return []
+    
+    platform, category, _ = primary
+    history = await get_rating_history(db, user_id, platform, category)
+    return [
+        {
+            "date": datetime.strptime(h["date"], "%Y-%m-%d").replace(tzinfo=timezone.utc),
+            "rating": h["rating"],
+            "game_id": None
+        }
+        for h in history
+    ]
+
+
+def _count_phase_move(phase_stats: Dict, phase_name: str, move: Dict) -> None:
+    """Add one evaluated move to its phase's blunder/mistake/good-move tally"""
+    eval_type = move.get("evaluation", "")
+    if hasattr(eval_type, "value"):
+        eval_type = eval_type.value
+    
+    if eval_type == "blunder":
+        phase_stats[phase_name]["blunders"] += 1
+    elif eval_type == "mistake":
+        phase_stats[phase_name]["mistakes"] += 1
+    elif eval_type in ["good", "excellent", "best", "great", "brilliant"]:
+        phase_stats[phase_name]["good_moves"] += 1
+
+
 def calculate_phase_mastery(analyses: List[Dict]) -> Dict:
     """
     Calculate performance by game phase (Opening, Middlegame, Endgame).
@@ -208,7 +263,13 @@ def calculate_phase_mastery(analyses: List[Dict]) -> Dict:
         # Get stockfish move evaluations for counting mistakes per phase
         sf_moves = analysis.get("stockfish_analysis", {}).get("move_evaluations", [])
         
-        # Count blunders/mistakes by move number ranges
+        # Newer analyses label each move with its phase during the Stockfish replay
+        labelled = any(move.get("phase") for move in sf_moves)
+        if labelled:
+            for move in sf_moves:
+                _count_phase_move(phase_stats, move.get("phase") or "middlegame", move)
+        
+        # Otherwise count blunders/mistakes by move number ranges
         for phase_info in phases:
             phase_name = phase_info.get("phase", "middlegame")
             start_move = phase_info.get("start_move", 1)
@@ -217,19 +278,11 @@ def calculate_phase_mastery(analyses: List[Dict]) -> Dict:
             phase_stats[phase_name]["games"] += 1
             
             # Count mistakes in this phase
-            for move in sf_moves:
-                move_num = move.get("move_number", 0)
-                if start_move <= move_num <= end_move:
-                    eval_type = move.get("evaluation", "")
-                    if hasattr(eval_type, "value"):
-                        eval_type = eval_type.value
-                    
-                    if eval_type == "blunder":
-                        phase_stats[phase_name]["blunders"] += 1
-                    elif eval_type == "mistake":
-                        phase_stats[phase_name]["mistakes"] += 1
-                    elif eval_type in ["good", "excellent", "best"]:
-                        phase_stats[phase_name]["good_moves"] += 1
+            if not labelled:
+                for move in sf_moves:
+                    move_num = move.get("move_number", 0)
+                    if start_move <= move_num <= end_move:
+                        _count_phase_move(phase_stats, phase_name, move)
             
             # Track early vs late for trends
             if i < midpoint:
@@ -465,70 +518,32 @@ def calculate_habit_journey(profile: Dict, cards: List[Dict], analyses: List[Dic
 def calculate_opening_repertoire(games: List[Dict], analyses: List[Dict]) -> Dict:
     """
     Calculate opening repertoire with win rates.
-    Extracts opening names from ECO codes in PGN.
+    Opening names come from the shared opening index (same names as the
+    opening repertoire service).
     """
-    import re
-    import json
-    from pathlib import Path
-    
-    # Load ECO-to-opening mapping from JSON file
-    eco_file = Path(__file__).parent / "data" / "eco_openings.json"
-    try:
-        with open(eco_file, "r") as f:
-            ECO_TO_OPENING = json.load(f)
-            # Remove metadata keys
-            ECO_TO_OPENING = {k: v for k, v in ECO_TO_OPENING.items() if not k.startswith("_")}
-    except Exception as e:
-        logger.warning(f"Could not load ECO openings file: {e}")
-        ECO_TO_OPENING = {}
-    
-    def get_opening_from_eco(eco_code: str) -> str:
-        """Get opening name from ECO code"""
-        if not eco_code:
-            return "Unknown Opening"
-        
-        # Try exact match first
-        if eco_code in ECO_TO_OPENING:
-            return ECO_TO_OPENING[eco_code]
-        
-        # Return generic based on first letter
-        first_letter = eco_code[0] if eco_code else "?"
-        letter_map = {
-            "A": "Flank Opening",
-            "B": "Semi-Open Game",
-            "C": "Open Game",
-            "D": "Closed Game",
-            "E": "Indian Defense"
-        }
-        return letter_map.get(first_letter, "Unknown Opening")
+    index = get_opening_index()
     
     # Group games by opening and color
     white_openings = defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0, "total": 0})
     black_openings = defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0, "total": 0})
     
     for game in games:
-        # Try to get opening from stored field first
-        opening = game.get("opening")
+        # Classify from the game's positions when its record is attached,
+        # otherwise from the stored ECO code / PGN ECO header
+        record = game.get("record")
+        match = index.classify_hashes(record["zobrist"]) if record and record.get("zobrist") else None
+        if match is None:
+            stored = game.get("opening") or ""
+            eco_match = re.search(r'\[ECO "([A-Ea-e]\d{2})"\]', game.get("pgn", ""), re.IGNORECASE)
+            match = index.classify_eco(stored) or index.classify_eco(eco_match.group(1) if eco_match else "")
         
-        # Check if stored opening is just an ECO code (like "C41") - if so, convert it
-        if opening and re.match(r'^[A-E]\d{2}$', opening):
-            opening = get_opening_from_eco(opening)
-        # If not stored or invalid, extract from PGN ECO code (case-insensitive)
-        elif not opening or opening == "?" or opening == "Unknown Opening":
-            pgn = game.get("pgn", "")
-            # Try both uppercase ECO and lowercase Eco
-            eco_match = re.search(r'\[ECO "([A-E]\d{2})"\]', pgn, re.IGNORECASE)
-            if not eco_match:
-                eco_match = re.search(r'\[Eco "([A-E]\d{2})"\]', pgn, re.IGNORECASE)
-            
-            if eco_match:
-                eco_code = eco_match.group(1).upper()  # Normalize to uppercase
-                opening = get_opening_from_eco(eco_code)
-            else:
-                opening = "Unknown Opening"
+        if match is not None:
+            opening = match["family"]
+        elif game.get("opening") and game.get("opening") not in ("?", "Unknown Opening"):
+            opening = game["opening"].split(":")[0].split(",")[0].strip()
+        else:
+            opening = "Unknown Opening"
         
-        # Simplify opening name (take first part)
-        opening = opening.split(":")[0].split(",")[0].strip()
         if len(opening) > 25:
             opening = opening[:25] + "..."
         
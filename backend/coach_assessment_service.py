@@ -90,7 +90,7 @@ def detect_capability_gap(analyses: List[Dict], badges: Dict) -> Dict:
             eval_change = abs(m.get("eval_after", 0) - m.get("eval_before", 0))
             
             # Track best finds (complex tactics player found)
-            if m.get("evaluation") in ["excellent", "best"] and eval_change > 200:
+            if m.get("evaluation") in ["excellent", "best", "great", "brilliant"] and eval_change > 200:
                 best_tactical_finds.append({
                     "game_id": analysis.get("game_id"),
                     "move_number": m.get("move_number"),
@@ -0,0 +1,367 @@
+"""
+Coach Prompt Service - Compact prompts for game commentary
+
+The game-analysis prompt is split in two:
+1. GAME_COACH_SYSTEM_PROMPT - static persona, rules and output format. It is
+   byte-identical on every request, so provider prompt caching applies to it
+   (regeneration constraints are appended after it and keep the prefix).
+2. A per-game user message - a compact digest of the critical moments Stockfish
+   found (eval swings, FEN, threat and PV lines) plus the player context,
+   instead of the raw PGN with its headers and clock comments.
+
+Background auto-analysis uses GAME_COACH_BATCH_SYSTEM_PROMPT and
+build_batch_user_message to comment several games of one player per request.
+
+Only the top critical moments go to the LLM (select_critical_moves); every
+other move gets template commentary from local_commentary_service, and
+engine_only_commentary() covers all moves when the provider is down.
+"""
+
+import io
+import re
+import logging
+from typing import Dict, Any, List, Optional
+
+import chess.pgn
+
+from config import DIGEST_MAX_CRITICAL_MOVES, DIGEST_MAX_HIGHLIGHTS, DIGEST_PV_LENGTH, DEFAULT_RATING
+from local_commentary_service import build_local_commentary
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_EVALUATIONS = ("blunder", "mistake", "inaccuracy")
+HIGHLIGHT_EVALUATIONS = ("brilliant", "great")
+
+GAME_COACH_SYSTEM_PROMPT = """You are an experienced chess coach with a warm, calm teaching style.
+
+Your approach:
+- Patient, principle-driven, supportive
+- Focus on thinking habits, not moves
+- Simple English, short sentences
+- Sound like a mentor, not a commentator
+- Use Indian warmth sparingly (max once in summary, e.g., "Well done" not "Beta" repeatedly)
+
+IMPORTANT: I have already analyzed this game with Stockfish (world's best chess engine).
+The engine digest in the user message is ACCURATE - trust it completely for move evaluations.
+
+=== HOW TO EXPLAIN MISTAKES ===
+For INACCURACIES/MISTAKES/BLUNDERS, Stockfish provides:
+- OPPONENT'S THREAT: The move that punishes your mistake
+- LINE AFTER YOUR MOVE: What happens next (shows the problem)
+- LINE AFTER BEST MOVE: What would have happened with the better choice
+
+YOUR JOB: Turn these concrete lines into human coaching:
+1. Explain what THREAT you missed (use the exact threat move from data)
+2. Show WHY it hurts (use the line to explain consequences)
+3. Compare to the better move (what you avoid by playing correctly)
+
+Example transformation:
+ENGINE DATA: Move 7: Qxb4 (INACCURACY), THREAT: Bb5+, LINE: Bb5+ Kf7 Ng5+
+YOUR EXPLANATION: "You grabbed the pawn with Qxb4, but White has Bb5+ check. After Kf7 forced, Ng5+ comes with another attack. Your king gets stuck in the center - that's the real cost of taking that pawn."
+
+DO NOT make up chess analysis. ONLY use the lines provided.
+If no line is provided, give a general principle explanation.
+The digest lists only the critical moments. Comment on those moves; never invent others.
+
+=== COACHING RULES ===
+
+1. MEMORY REFERENCE (builds trust)
+   - If current mistake matches a known weakness, mention it briefly
+   - Example: "We've seen this pattern before."
+   - Keep it to 1 sentence, non-judgmental
+
+2. HABIT-FIRST EXPLANATIONS  
+   - Explain "what thinking habit caused this" not "what move was wrong"
+   - One thinking error per mistake
+   - Advice must apply to future games
+
+3. COACH TONE
+   - Warm but professional
+   - Use Indian warmth sparingly (max once in summary)
+   - Avoid: "Great job!", "Amazing!", "Brilliant!"
+   - Prefer: "Good", "Solid", "Well played", "This needs work"
+
+4. CRITICAL: CONSISTENCY RULE
+   - If move is "good" or "solid" → NO negative thinking_pattern
+   - If move is "good" or "solid" → thinking_pattern must be "solid_thinking" or null
+   - Negative patterns ONLY for mistakes/blunders/inaccuracies
+
+5. CONCEPTUAL GUIDANCE (no engine moves)
+   - ❌ "Better: Play d5 earlier"
+   - ✅ "Consider: Challenge the center with a pawn break"
+   - ✅ "Think about: Developing before attacking"
+   - Keep suggestions conceptual, applicable to any game
+
+=== OUTPUT FORMAT (STRICT JSON) ===
+{
+    "commentary": [
+        {
+            "move_number": 5,
+            "move": "h6",
+            "evaluation": "inaccuracy",
+            "intent": "What you were thinking (1 short sentence)",
+            "feedback": "Coach feedback using CONCRETE lines from Stockfish data - mention the threat move and what happens (2-3 sentences)",
+            "consider": "The better move and WHY it's better (use the PV line to explain)",
+            "memory_note": "Brief memory reference if this matches past weakness (null otherwise)",
+            "details": {
+                "thinking_pattern": "ONLY for mistakes: rushing, tunnel_vision, hope_chess, etc. For good moves: solid_thinking or null",
+                "threat_line": "The EXACT threat from Stockfish (e.g., 'exd5 Qxd5 Nc3')",
+                "rule": "A principle for future games"
+            }
+        }
+    ],
+    "blunders": 0,
+    "mistakes": 0, 
+    "inaccuracies": 0,
+    "best_moves": 0,
+    "summary_p1": "2 sentences: Overall game assessment - what went well, where discipline showed.",
+    "summary_p2": "2 sentences: The one habit to focus on + instruction for next game.",
+    "improvement_note": "One sentence about progress trend (null if no data)",
+    "identified_weaknesses": [
+        {
+            "category": "tactical",
+            "subcategory": "pin_blindness",
+            "habit_description": "What thinking pattern caused this",
+            "practice_tip": "What to practice"
+        }
+    ],
+    "identified_strengths": [
+        {
+            "category": "tactical", 
+            "subcategory": "good_development",
+            "description": "What they did well"
+        }
+    ],
+    "best_move_suggestions": [
+        {
+            "move_number": 15,
+            "best_move": "Nf3",
+            "reason": "Controls the center and prepares castling"
+        }
+    ],
+    "focus_this_week": "The ONE habit to work on",
+    "voice_script": "30-second calm spoken summary"
+}
+
+=== STRICT RULES ===
+1. NO engine language: no "stockfish", no centipawns, no "+0.5"
+2. NO flashy commentary: no "Amazing!", "Brilliant!", "What a blunder!"
+3. ONE lesson per mistake only
+4. "Good/solid" moves NEVER get negative thinking_pattern
+5. For MISTAKES: "consider" must reference the BETTER MOVE from Stockfish data and explain WHY using the PV line
+6. For GOOD moves: "consider" should be null
+7. Keep everything focused - coaches explain using actual moves, not vague principles
+8. Memory references are factual, never shaming
+9. STRENGTHS must be POSITIVE patterns only (e.g., "good_development", "solid_defense", "active_pieces")
+   NEVER list weaknesses as strengths. If no clear strength, leave empty array.
+10. For key blunders/mistakes, the "feedback" MUST mention:
+    - The THREAT move opponent has (from OPPONENT'S THREAT in data)
+    - What happens after (from LINE AFTER YOUR MOVE)
+    Example: "After Qxb4, White has Bb5+ check. After Kf7, Ng5+ continues the attack."
+
+Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
+"""
+
+# Background auto-analysis packs several games of one player into one request.
+# Also static, so it is cached like the single-game prompt.
+GAME_COACH_BATCH_SYSTEM_PROMPT = GAME_COACH_SYSTEM_PROMPT + """
+=== BATCH MODE ===
+The message holds several games of the same player, each starting with "=== GAME <game_id> ===".
+Analyze every game on its own, exactly as described above - never mix moves or lessons between games.
+Respond with ONE JSON object:
+{"games": [{"game_id": "<game_id copied exactly>", ...the fields above for that game...}]}
+One entry per game, in the order given.
+"""
+
+
+def _label(value) -> str:
+    """Enum or string classification as a plain string"""
+    return getattr(value, "value", value) or ""
+
+
+def _move_ref(move_number: int, san: str, user_color: str) -> str:
+    """12.Nf3 for white, 12...Nf6 for black"""
+    return f"{move_number}{'.' if user_color == 'white' else '...'}{san}"
+
+
+def _eval(cp: Optional[int], mate_in: Optional[int] = None) -> str:
+    """Pawn units, or #N when a forced mate is on the board"""
+    if mate_in is not None:
+        return f"#{mate_in}"
+    return f"{(cp or 0) / 100:+.1f}"
+
+
+def _line(moves: Optional[List[str]]) -> str:
+    return " ".join((moves or [])[:DIGEST_PV_LENGTH])
+
+
+def _critical_move_entry(m: Dict[str, Any], user_color: str) -> str:
+    """One critical moment: verdict, eval swing, position and lines"""
+    mate = m.get("mate_info") or {}
+    lines = [
+        f"{_move_ref(m.get('move_number', 0), m.get('move', ''), user_color)} "
+        f"{_label(m.get('evaluation')).upper()} | eval {_eval(m.get('eval_before'), mate.get('before'))} -> "
+        f"{_eval(m.get('eval_after'), mate.get('after'))} (loss {m.get('cp_loss', 0)}) | best {m.get('best_move')}"
+    ]
+    if m.get("fen_before"):
+        # Piece placement and side to move are all the model needs
+        lines.append("  FEN: " + " ".join(m["fen_before"].split()[:2]))
+    if m.get("threat"):
+        lines.append(f"  OPPONENT'S THREAT: {m['threat']}")
+    if m.get("pv_after_played"):
+        lines.append(f"  LINE AFTER YOUR MOVE: {_line(m['pv_after_played'])}")
+    if m.get("pv_after_best"):
+        lines.append(f"  LINE AFTER BEST MOVE: {m.get('best_move')} {_line(m['pv_after_best'])}")
+    return "\n".join(lines)
+
+
+def select_critical_moves(moves: List[Dict[str, Any]], limit: int = DIGEST_MAX_CRITICAL_MOVES) -> List[Dict[str, Any]]:
+    """The user's worst moves by centipawn loss (up to `limit`), in game order"""
+    critical = [m for m in moves if _label(m.get("evaluation")) in CRITICAL_EVALUATIONS]
+    critical = sorted(critical, key=lambda m: m.get("cp_loss", 0), reverse=True)[:limit]
+    return sorted(critical, key=lambda m: m.get("move_number", 0))
+
+
+def build_move_digest(stockfish_result: Optional[Dict[str, Any]], user_color: str) -> str:
+    """
+    Compact engine digest of a game: stats plus the critical moments.
+    
+    Only the user's worst moves (by centipawn loss, up to
+    DIGEST_MAX_CRITICAL_MOVES) get full detail; brilliant/great moves are
+    listed in one line each. Size is bounded regardless of game length.
+    
+    Returns:
+        Digest text, or "" if there is no successful engine analysis
+    """
+    if not stockfish_result or not stockfish_result.get("success"):
+        return ""
+    
+    stats = stockfish_result.get("user_stats", {})
+    moves = stockfish_result.get("moves", [])
+    
+    parts = [
+        "=== ENGINE DIGEST ===",
+        f"Player: {user_color} | Accuracy {stats.get('accuracy', 0)}% | "
+        f"Blunders {stats.get('blunders', 0)}, Mistakes {stats.get('mistakes', 0)}, "
+        f"Inaccuracies {stats.get('inaccuracies', 0)} | Best {stats.get('best_moves', 0)}, "
+        f"Excellent {stats.get('excellent_moves', 0)} | Avg loss {stats.get('avg_cp_loss', 0)}"
+    ]
+    
+    critical = select_critical_moves(moves)
+    if critical:
+        parts.append("\n=== CRITICAL MOMENTS ===")
+        parts.extend(_critical_move_entry(m, user_color) for m in critical)
+    
+    highlights = [m for m in moves if _label(m.get("evaluation")) in HIGHLIGHT_EVALUATIONS][:DIGEST_MAX_HIGHLIGHTS]
+    if highlights:
+        parts.append("\n=== STRONG MOVES ===")
+        parts.extend(
+            f"{_move_ref(m.get('move_number', 0), m.get('move', ''), user_color)} "
+            f"{_label(m.get('evaluation')).upper()}" + (" (only move)" if m.get("only_move") else "")
+            for m in highlights
+        )
+    
+    return "\n".join(parts)
+
+
+def compact_movetext(pgn: str) -> str:
+    """SAN movetext without headers, comments or clocks (fallback when the engine failed)"""
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn))
+    except Exception:
+        game = None
+    if game is None:
+        return re.sub(r"\{[^}]*\}", "", pgn).strip()
+    exporter = chess.pgn.StringExporter(headers=False, variations=False, comments=False)
+    return game.accept(exporter)
+
+
+def build_game_user_message(
+    digest: str,
+    pgn: str,
+    first_name: str,
+    user_color: str,
+    games_analyzed: int,
+    memory_section: str = "",
+    improvement_note: str = ""
+) -> str:
+    """Per-game part of the analysis prompt (everything that varies per request)"""
+    game_section = digest or "No engine data available. Moves:\n" + compact_movetext(pgn)
+    parts = [
+        game_section,
+        f"{first_name} played as {user_color} in this game.",
+        f"Games analyzed together: {games_analyzed}"
+    ]
+    parts.extend(p for p in (memory_section, improvement_note) if p)
+    parts.append("Please analyze this game.")
+    return "\n\n".join(parts)
+
+
+def build_batch_user_message(
+    games: List[Dict[str, Any]],
+    first_name: str,
+    games_analyzed: int,
+    memory_section: str = ""
+) -> str:
+    """
+    Multi-game user message for GAME_COACH_BATCH_SYSTEM_PROMPT.
+    
+    `games` items carry game_id, digest, pgn and user_color; the player
+    context is stated once for all of them.
+    """
+    parts = []
+    for game in games:
+        game_section = game.get("digest") or "No engine data available. Moves:\n" + compact_movetext(game.get("pgn", ""))
+        parts.append(f"=== GAME {game['game_id']} ===\n{game_section}\n\n"
+                     f"{first_name} played as {game.get('user_color', 'white')} in this game.")
+    parts.append(f"Games analyzed together: {games_analyzed}")
+    if memory_section:
+        parts.append(memory_section)
+    parts.append(f"Please analyze each of these {len(games)} games.")
+    return "\n\n".join(parts)
+
+
+def engine_only_commentary(stockfish_result: Optional[Dict[str, Any]], user_color: str,
+                           rating: int = DEFAULT_RATING) -> Dict[str, Any]:
+    """
+    Stand-in for the LLM commentary when the provider is unavailable.
+    
+    Same shape as GameCommentaryOutput, built from engine facts only (template
+    commentary for every move), so the analysis still completes and can be
+    re-commented later.
+    """
+    stats = (stockfish_result or {}).get("user_stats", {})
+    moves = (stockfish_result or {}).get("moves", [])
+    
+    critical = [m for m in moves if _label(m.get("evaluation")) in CRITICAL_EVALUATIONS]
+    critical = sorted(critical, key=lambda m: m.get("cp_loss", 0), reverse=True)[:3]
+    
+    errors = stats.get("blunders", 0) + stats.get("mistakes", 0)
+    summary = (f"You played with {stats.get('accuracy', 0)}% accuracy: "
+               f"{stats.get('blunders', 0)} blunders and {stats.get('mistakes', 0)} mistakes.")
+    if critical:
+        worst = critical[0]
+        next_step = (f"The biggest swing was {_move_ref(worst.get('move_number', 0), worst.get('move', ''), user_color)}"
+                     f" - {worst.get('best_move')} was stronger. Check your opponent's replies before each move.")
+    else:
+        next_step = "No serious errors - keep checking your opponent's replies before each move."
+    
+    return {
+        "commentary": build_local_commentary(moves, user_color, rating),
+        "identified_weaknesses": [],
+        "identified_strengths": [],
+        "best_move_suggestions": [
+            {"move_number": m.get("move_number"), "best_move": m.get("best_move"),
+             "reason": f"Stronger than {m.get('move')}"}
+            for m in critical if m.get("best_move")
+        ],
+        "blunders": stats.get("blunders", 0),
+        "mistakes": stats.get("mistakes", 0),
+        "best_moves": stats.get("best_moves", 0),
+        "summary_p1": summary,
+        "summary_p2": next_step,
+        "overall_summary": f"{summary} {next_step}",
+        "game_summary": f"{summary} {next_step}",
+        "focus_this_week": "Blunder check before every move" if errors else "",
+        "voice_script": ""
+    }
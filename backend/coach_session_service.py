@@ -6,6 +6,8 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional
 import logging
 
+from response_cache_service import bump_user_generation
+
 # Import centralized config
 from config import PLAY_SESSION_LOOKBACK_HOURS
 
@@ -32,6 +34,7 @@ async def start_play_session(db, user_id: str, platform: str) -> Dict:
         {"$set": session},
         upsert=True
     )
+    await bump_user_generation(db, user_id)
     
     return {"status": "session_started", "message": "Go play. I'll be watching."}
 
@@ -61,6 +64,7 @@ async def end_play_session(db, user_id: str) -> Dict:
         {"user_id": user_id, "active": True},
         {"$set": {"active": False, "ended_at": datetime.now(timezone.utc).isoformat()}}
     )
+    await bump_user_generation(db, user_id)
     
     # Find games imported after session start
     # First, trigger a quick sync to get latest games
@@ -161,6 +165,7 @@ async def end_play_session(db, user_id: str) -> Dict:
         },
         upsert=True
     )
+    await bump_user_generation(db, user_id)
     
     # Trigger analysis in background (non-blocking)
     try:
@@ -282,12 +287,14 @@ async def analyze_priority_game(db, user_id: str, game_id: str):
             {"game_id": game_id},
             {"$set": {"status": "completed"}}
         )
+        await bump_user_generation(db, user_id)
     except Exception as e:
         logger.error(f"Priority analysis failed for {game_id}: {e}")
         await db.analysis_queue.update_one(
             {"game_id": game_id},
             {"$set": {"status": "failed", "error": str(e)}}
         )
+        await bump_user_generation(db, user_id)
 
 
 async def get_active_session(db, user_id: str) -> Optional[Dict]:
@@ -16,6 +16,11 @@ LLM_MODEL = "gpt-4o-mini"
 # LLM_MODEL = "gpt-4o"            # Great quality, moderate cost
 # LLM_MODEL = "gpt-4o-mini"       # Good quality, cheap (RECOMMENDED)
 
+# Game-analysis prompt digest (coach_prompt_service)
+DIGEST_MAX_CRITICAL_MOVES = 3     # Worst user moves sent to the LLM; the rest get local template commentary
+DIGEST_MAX_HIGHLIGHTS = 3         # Brilliant/great moves listed in one line each
+DIGEST_PV_LENGTH = 4              # Half-moves per threat/PV line
+
 # Text-to-Speech model
 TTS_MODEL = "tts-1"
 TTS_VOICE = "alloy"
@@ -30,6 +35,13 @@ STOCKFISH_QUICK_DEPTH = 12        # Quick analysis depth
 STOCKFISH_PV_DEPTH = 12           # Depth for principal variation
 STOCKFISH_PV_LENGTH = 5           # Number of moves in PV line
 STOCKFISH_MAX_RETRIES = 3         # Retry attempts if analysis fails
+STOCKFISH_POOL_SIZE = 2           # Long-lived engines shared by position endpoints
+STOCKFISH_POOL_TIMEOUT = 30       # Seconds to wait for a free pooled engine
+STOCKFISH_EVAL_CACHE_SIZE = 5000  # Cached (position, depth, multipv) evaluations per process
+BATCH_EVAL_MAX_FENS = 200         # Max positions per batch evaluation request
+BATCH_EVAL_MAX_DEPTH = 22         # Depth cap for batch evaluation
+BATCH_EVAL_MAX_MULTIPV = 5        # MultiPV cap for batch evaluation
+ANALYSIS_STREAM_KEEPALIVE_SECONDS = 15  # SSE comment interval while a streamed analysis is busy
 
 # =============================================================================
 # GAME SYNC CONFIGURATION  
@@ -48,6 +60,17 @@ BACKGROUND_SYNC_INTERVAL_SECONDS = 6 * 60 * 60  # Full background sync (6 hours)
 PREFERRED_TIME_CONTROLS = ["rapid", "classical", "blitz"]
 MIN_GAME_MOVES = 10               # Skip very short games
 
+# Auto-analysis commentary queue (phase two: LLM coaching text after the engine pass)
+COMMENTARY_QUEUE_INTERVAL_SECONDS = 5 * 60  # How often the queue is swept for due retries
+COMMENTARY_MAX_ATTEMPTS = 4       # Invalid / failed commentary is retried this many times
+COMMENTARY_RETRY_BASE_SECONDS = 5 * 60      # Backoff before retry n: base * 2^(n-1)
+COMMENTARY_CLAIM_TIMEOUT_SECONDS = 15 * 60  # "processing" older than this is assumed dead
+COMMENTARY_SWEEP_LIMIT = 20       # Analyses commented per sweep
+COMMENTARY_BATCH_SIZE = 4         # One player's games packed into a single LLM request
+
+# Platform rating snapshots (refreshed by background sync)
+RATING_SNAPSHOT_MAX_AGE_SECONDS = 6 * 60 * 60  # Serve stale + refresh in background after this
+
 # =============================================================================
 # ANALYSIS CONFIGURATION
 # =============================================================================
@@ -61,6 +84,11 @@ CP_THRESHOLDS = {
     "excellent": 10,      # <= 10 cp loss
 }
 
+MULTIPV_LINES = 3                 # Engine lines per position in game analysis (stored alternatives)
+ONLY_MOVE_GAP_CP = 150            # Top line beats the 2nd by this much -> "only move"
+BRILLIANT_MAX_EVAL_BEFORE = 500   # No brilliancy when the mover is already this far ahead
+BRILLIANT_MIN_EVAL_AFTER = -50    # A brilliant sacrifice must keep the game at least level
+
 # =============================================================================
 # COACH SETTINGS
 # =============================================================================
@@ -77,6 +105,16 @@ HABIT_CONSECUTIVE_CORRECT = 4     # Correct PDR answers in a row to rotate
 HABIT_TOTAL_CORRECT = 6           # Total correct out of last 8 attempts
 HABIT_MIN_ATTEMPTS = 5            # Minimum attempts before rotation
 
+# =============================================================================
+# MISTAKE CARD ENRICHMENT
+# =============================================================================
+
+CARD_ENRICHMENT_CONCURRENCY = 2   # Cards enriched at once (engine-bound when lines are missing)
+CARD_ENRICHMENT_MAX_ATTEMPTS = 3  # Failed enrichments retried by the background sweep
+CARD_ENRICHMENT_SWEEP_LIMIT = 200 # Cards picked up per background sweep
+CARD_ENRICHMENT_CLAIM_TIMEOUT_SECONDS = 10 * 60  # "processing" older than this is assumed dead
+CARD_ACCEPT_MARGIN_CP = 30        # Stored alternatives this close to the best move also solve a card
+
 # =============================================================================
 # QUALITY CONTROL (CQS) SETTINGS
 # =============================================================================
@@ -86,6 +124,53 @@ CQS_WARNING_THRESHOLD = 70        # Score for warning
 CQS_REJECT_THRESHOLD = 70         # Score to reject (retry)
 CQS_CRITICAL_THRESHOLD = 60       # Absolute minimum acceptable
 CQS_MAX_REGENERATIONS = 2         # Max retry attempts
+CQS_DEFAULT_TIER = "free"         # Tier for users without a "tier" field
+CQS_FIRST_ROUND_CANDIDATES = {    # Commentary candidates requested concurrently up front, per user tier
+    "free": 1,                    # Serial: regenerate only when the first one scores low
+    "pro": 2                      # ~2x LLM cost, worst-case latency of about one round trip
+}
+
+# =============================================================================
+# LLM PROVIDER GATEWAY
+# =============================================================================
+
+LLM_MAX_CONCURRENCY = 8           # Provider calls in flight per process (all callers)
+LLM_DEFAULT_CALLER_CONCURRENCY = 4  # Per-caller limit unless listed below
+LLM_CALLER_CONCURRENCY = {        # Background work gets fewer slots than interactive requests
+    "auto_analysis": 2,
+    "auto_analysis_batch": 2,
+    "analysis_commentary": 4,
+    "ask_about_move": 4
+}
+LLM_QUEUE_TIMEOUT_SECONDS = 30    # Max wait for a free slot before failing fast
+LLM_TIMEOUT_SECONDS = 60          # Per-attempt timeout for chat completions
+LLM_BATCH_TIMEOUT_SECONDS = 180   # Per-attempt timeout for multi-game commentary requests;
+                                  # x (LLM_MAX_RETRIES + 1) stays under COMMENTARY_CLAIM_TIMEOUT_SECONDS
+TTS_TIMEOUT_SECONDS = 30          # Per-attempt timeout for speech generation
+LLM_MAX_RETRIES = 2               # Retries on timeouts / 429 / 5xx
+LLM_RETRY_BASE_DELAY = 0.5        # Seconds; backoff doubles per retry (full jitter)
+LLM_RETRY_MAX_DELAY = 8.0         # Cap on a single backoff
+LLM_BREAKER_FAILURE_THRESHOLD = 5 # Consecutive provider failures that open the circuit
+LLM_BREAKER_RESET_SECONDS = 30    # Open time before a probe call is let through
+
+# =============================================================================
+# LLM METRICS
+# =============================================================================
+
+LLM_METRICS_TTL_DAYS = 30         # llm_metrics records expire after this many days
+LLM_METRICS_FLUSH_BATCH = 50      # Buffered call records written per batch
+LLM_METRICS_BUFFER_MAX = 5000     # Oldest unflushed records dropped beyond this
+
+# USD per 1M tokens (input, output) and per 1M TTS characters - used for cost estimates
+LLM_PRICING_PER_1M_TOKENS = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40)
+}
+TTS_PRICING_PER_1M_CHARS = {
+    "tts-1": 15.00,
+    "tts-1-hd": 30.00
+}
 
 # =============================================================================
 # SESSION & AUTH SETTINGS
@@ -94,6 +179,9 @@ CQS_MAX_REGENERATIONS = 2         # Max retry attempts
 SESSION_EXPIRY_DAYS = 7           # Login session duration
 COOKIE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60  # Cookie expiry (7 days)
 PLAY_SESSION_LOOKBACK_HOURS = 2   # Hours to look back for recent games
+SESSION_CACHE_TTL_SECONDS = 60    # In-process auth cache lifetime per session token
+SESSION_CACHE_MAX_ENTRIES = 10000 # Max cached sessions per process
+SESSION_TOKEN_FORMAT = "opaque"   # "opaque" (DB lookup) or "signed" (HMAC, needs SESSION_SIGNING_SECRET)
 
 # =============================================================================
 # DEFAULT VALUES
@@ -16,8 +16,9 @@ Total: 0-100
 """
 
 import re
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
 
 # Import centralized config
 from config import (
@@ -25,7 +26,9 @@ from config import (
     CQS_WARNING_THRESHOLD as WARNING_THRESHOLD,
     CQS_REJECT_THRESHOLD as REJECT_THRESHOLD,
     CQS_CRITICAL_THRESHOLD as CRITICAL_THRESHOLD,
-    CQS_MAX_REGENERATIONS as MAX_REGENERATIONS
+    CQS_MAX_REGENERATIONS as MAX_REGENERATIONS,
+    CQS_DEFAULT_TIER,
+    CQS_FIRST_ROUND_CANDIDATES
 )
 
 logger = logging.getLogger(__name__)
@@ -512,3 +515,89 @@ def log_cqs_result(
             if data["penalties"]:
                 penalties.extend(data["penalties"][:2])  # First 2 penalties per dimension
         logger.warning(f"{log_msg} Penalties: {penalties[:5]}")
+
+
+def first_round_candidates(tier: Optional[str]) -> int:
+    """
+    Number of commentary candidates to request concurrently for a user tier.
+    
+    Capped at the total attempt budget; unknown tiers get the default tier's count.
+    """
+    count = CQS_FIRST_ROUND_CANDIDATES.get(
+        tier or CQS_DEFAULT_TIER,
+        CQS_FIRST_ROUND_CANDIDATES.get(CQS_DEFAULT_TIER, 1)
+    )
+    return max(1, min(count, MAX_REGENERATIONS + 1))
+
+
+async def generate_best_candidate(
+    generate: Callable[[int], Awaitable[Dict[str, Any]]],
+    score: Callable[[Dict[str, Any]], Dict[str, Any]],
+    game_id: str,
+    first_round: int = 1,
+    on_attempt: Optional[Callable[[int], None]] = None,
+    stop_on: Tuple[type, ...] = ()
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], List[int]]:
+    """
+    Generate commentary candidates and keep the best-scoring one.
+    
+    The first `first_round` attempts run concurrently (attempt i uses the
+    stricter constraints for regeneration i, so candidates differ). If none
+    of them is acceptable, the remaining attempts run one at a time until
+    one is accepted or MAX_REGENERATIONS is exhausted.
+    
+    Args:
+        generate: async fn(attempt) -> analysis data; may raise
+        score: fn(analysis data) -> CQS result (calculate_cqs)
+        game_id: For logging
+        first_round: Candidates requested concurrently up front
+        on_attempt: Called with the 1-based attempt number when it starts
+        stop_on: Error types that end generation at once (e.g. provider down)
+    
+    Returns:
+        (best analysis data, its CQS result, all scores in attempt order)
+    
+    Raises:
+        The last generation error if no attempt produced a candidate;
+        a stop_on error as soon as it occurs
+    """
+    total_attempts = MAX_REGENERATIONS + 1
+    best_data, best_result = None, None
+    scores: List[int] = []
+    last_error: Optional[BaseException] = None
+    
+    async def run(attempt: int):
+        if on_attempt:
+            on_attempt(attempt + 1)
+        return await generate(attempt)
+    
+    attempt = 0
+    while attempt < total_attempts:
+        batch = range(attempt, min(total_attempts, attempt + (first_round if attempt == 0 else 1)))
+        outcomes = await asyncio.gather(*(run(a) for a in batch), return_exceptions=True)
+        
+        accepted = False
+        for a, outcome in zip(batch, outcomes):
+            if isinstance(outcome, BaseException):
+                if not isinstance(outcome, Exception) or isinstance(outcome, stop_on):
+                    raise outcome
+                logger.error(f"CQS [{game_id}] Attempt {a + 1} failed: {outcome}")
+                last_error = outcome
+                continue
+            
+            cqs_result = score(outcome)
+            scores.append(cqs_result["total_score"])
+            log_cqs_result(game_id, cqs_result, a + 1, not cqs_result["should_regenerate"])
+            
+            if best_result is None or cqs_result["total_score"] > best_result["total_score"]:
+                best_data, best_result = outcome, cqs_result
+            if not cqs_result["should_regenerate"]:
+                accepted = True
+        
+        if accepted:
+            break
+        attempt = batch.stop
+    
+    if best_data is None and last_error is not None:
+        raise last_error
+    return best_data, best_result, scores
@@ -0,0 +1,323 @@
+"""
+Game Import Service
+
+Handles:
+1. Normalized game fingerprints (platform game id, or a hash of headers + moves)
+2. Batch duplicate detection with a single indexed $in lookup
+3. Unordered bulk inserts that tolerate duplicate-key races
+4. Streaming split of multi-game PGN downloads (one game in memory at a time)
+
+The fingerprint is stored on every game document and backed by a unique
+(user_id, fingerprint) index, so dedupe no longer compares full PGN strings.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Dict, Any, List, Optional, Iterable, Iterator, AsyncIterator, Set
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# MongoDB duplicate key error code
+DUPLICATE_KEY_ERROR = 11000
+
+# Headers that identify a game when no platform id is available
+FINGERPRINT_HEADERS = ["white", "black", "date", "utcdate", "utctime", "starttime", "result"]
+
+_HEADER_RE = re.compile(r'^\s*\[(\w+)\s+"(.*)"\]\s*$', re.MULTILINE)
+_CHESSCOM_ID_RE = re.compile(r'chess\.com/(?:game/)?(live|daily)/(?:game/)?(\d+)', re.IGNORECASE)
+_LICHESS_ID_RE = re.compile(r'lichess\.org/([A-Za-z0-9]{8})(?:[A-Za-z0-9]{4})?(?![A-Za-z0-9])')
+_COMMENT_RE = re.compile(r'\{[^}]*\}|;[^\n]*')
+_VARIATION_RE = re.compile(r'\([^()]*\)')
+_NAG_RE = re.compile(r'\$\d+')
+_MOVE_NUMBER_RE = re.compile(r'\d+\.(?:\.\.)?')
+_RESULT_TOKENS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+
+def parse_pgn_headers(pgn: str) -> Dict[str, str]:
+    """Extract PGN tag pairs with lower-cased keys"""
+    return {key.lower(): value for key, value in _HEADER_RE.findall(pgn or "")}
+
+
+def extract_movetext(pgn: str) -> str:
+    """Return the movetext section of a PGN (everything that is not a tag pair)"""
+    return _HEADER_RE.sub("", pgn or "").strip()
+
+
+def normalize_move_list(movetext: str) -> List[str]:
+    """
+    Reduce PGN movetext to its bare SAN tokens.
+
+    Strips comments (including %clk annotations), variations, NAGs,
+    move numbers, annotation glyphs and the result token.
+    """
+    text = _COMMENT_RE.sub(" ", movetext)
+    # Remove nested variations innermost-first
+    previous = None
+    while previous != text:
+        previous = text
+        text = _VARIATION_RE.sub(" ", text)
+    text = _NAG_RE.sub(" ", text)
+    text = _MOVE_NUMBER_RE.sub(" ", text)
+
+    moves = []
+    for token in text.split():
+        if token in _RESULT_TOKENS:
+            continue
+        token = token.rstrip("!?")
+        if token:
+            moves.append(token)
+    return moves
+
+
+def extract_platform_game_id(pgn: str = "", url: Optional[str] = None) -> Optional[str]:
+    """
+    Get a stable platform game id (e.g. "chess.com:live:123", "lichess:AbCd1234").
+
+    Looks at the explicit URL first, then the Link/Site headers of the PGN.
+    """
+    headers = parse_pgn_headers(pgn) if pgn else {}
+    candidates = [url, headers.get("link"), headers.get("site")]
+
+    for candidate in candidates:
+        if not candidate:
+            continue
+        match = _CHESSCOM_ID_RE.search(candidate)
+        if match:
+            return f"chess.com:{match.group(1).lower()}:{match.group(2)}"
+        match = _LICHESS_ID_RE.search(candidate)
+        if match:
+            return f"lichess:{match.group(1)}"
+
+    return None
+
+
+def compute_game_fingerprint(pgn: str, url: Optional[str] = None) -> str:
+    """
+    Compute the normalized fingerprint for a game.
+
+    Uses the platform game id when available, otherwise a SHA-1 of the
+    identifying headers and the normalized move list. Header keys are matched
+    case-insensitively so legacy PGNs with re-capitalized tags hash the same.
+    """
+    platform_id = extract_platform_game_id(pgn, url)
+    if platform_id:
+        return platform_id
+
+    headers = parse_pgn_headers(pgn)
+    header_part = "|".join(f"{key}={headers.get(key, '')}" for key in FINGERPRINT_HEADERS)
+    moves_part = " ".join(normalize_move_list(extract_movetext(pgn)))
+    digest = hashlib.sha1(f"{header_part}\n{moves_part}".encode("utf-8")).hexdigest()
+    return f"sha1:{digest}"
+
+
+# ==================== STREAMING PGN READER ====================
+
+class PgnSplitter:
+    """
+    Incremental splitter for multi-game PGN text.
+
+    Feed it lines; it returns each game's PGN text as soon as the next
+    game's tag section starts. Game text is kept exactly as received
+    (header case, comments, clock annotations). Blank lines and lines
+    starting with "[" inside {...} comments do not split games.
+    """
+
+    def __init__(self):
+        self._lines: List[str] = []
+        self._in_movetext = False
+        self._comment_depth = 0
+
+    def feed(self, line: str) -> Optional[str]:
+        """Add one line; returns the previous game's text when a new game starts"""
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+        finished = None
+
+        if self._comment_depth == 0 and stripped.startswith("[") and _HEADER_RE.match(stripped):
+            if self._in_movetext:
+                finished = self._take()
+            self._lines.append(stripped)
+            return finished
+
+        if stripped or self._lines:
+            self._lines.append(line)
+        if stripped and not stripped.startswith("%"):
+            self._in_movetext = True
+            self._comment_depth = _update_comment_depth(stripped, self._comment_depth)
+        return finished
+
+    def flush(self) -> Optional[str]:
+        """Return the last buffered game, if any"""
+        return self._take() if self._in_movetext else None
+
+    def _take(self) -> str:
+        text = "\n".join(self._lines).strip()
+        self._lines = []
+        self._in_movetext = False
+        self._comment_depth = 0
+        return text
+
+
+def _update_comment_depth(line: str, depth: int) -> int:
+    """Track whether a line ends inside an unclosed {...} comment"""
+    if ";" not in line:
+        # PGN comments don't nest, so counting braces is enough
+        return max(0, depth + line.count("{") - line.count("}"))
+    for char in line:
+        if char == "{":
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+        elif char == ";" and depth == 0:
+            break  # rest-of-line comment
+    return depth
+
+
+def iter_pgn_texts(lines: Iterable[str]) -> Iterator[str]:
+    """Yield each game's PGN text from an iterable of lines (file, list, ...)"""
+    splitter = PgnSplitter()
+    for line in lines:
+        game_text = splitter.feed(line)
+        if game_text:
+            yield game_text
+    last = splitter.flush()
+    if last:
+        yield last
+
+
+async def aiter_pgn_texts(response) -> AsyncIterator[str]:
+    """
+    Yield games from a streamed httpx response (client.stream(...)).
+
+    Only the current game's lines are buffered, so memory stays bounded
+    regardless of archive size.
+    """
+    splitter = PgnSplitter()
+    async for line in response.aiter_lines():
+        game_text = splitter.feed(line)
+        if game_text:
+            yield game_text
+    last = splitter.flush()
+    if last:
+        yield last
+
+
+def pgn_text_to_game_data(pgn: str, platform: str, user_username: str) -> Dict[str, Any]:
+    """Build the import fields for one game, keeping the PGN text unchanged"""
+    # Tags precede the first blank line; skip scanning the movetext
+    headers = parse_pgn_headers(pgn.split("\n\n", 1)[0])
+    white = headers.get("white", "Unknown")
+    black = headers.get("black", "Unknown")
+    user_color = "white" if white.lower() == user_username.lower() else "black"
+
+    return {
+        "platform": platform,
+        "pgn": pgn,
+        "white_player": white,
+        "black_player": black,
+        "result": headers.get("result", "*"),
+        "time_control": headers.get("timecontrol", headers.get("event", "")),
+        "date_played": headers.get("date", headers.get("utcdate", "")),
+        "opening": headers.get("opening", headers.get("eco", "")),
+        "user_color": user_color
+    }
+
+
+# ==================== DATABASE HELPERS ====================
+
+async def find_existing_fingerprints(db, user_id: str, fingerprints: Iterable[str]) -> Set[str]:
+    """Return the subset of fingerprints already stored for a user (one query)"""
+    fingerprints = list({fp for fp in fingerprints if fp})
+    if not fingerprints:
+        return set()
+
+    existing = await db.games.find(
+        {"user_id": user_id, "fingerprint": {"$in": fingerprints}},
+        {"_id": 0, "fingerprint": 1}
+    ).to_list(len(fingerprints))
+    return {doc["fingerprint"] for doc in existing}
+
+
+async def filter_new_games(db, user_id: str, game_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop games that are already stored or repeated within the batch.
+
+    Each doc must carry a "fingerprint" field.
+    """
+    existing = await find_existing_fingerprints(db, user_id, (g.get("fingerprint") for g in game_docs))
+
+    new_games = []
+    seen = set(existing)
+    for doc in game_docs:
+        fingerprint = doc.get("fingerprint")
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        new_games.append(doc)
+    return new_games
+
+
+async def insert_games_unordered(db, game_docs: List[Dict[str, Any]]) -> int:
+    """
+    Insert games with a single unordered insert_many.
+
+    Duplicate-key errors (a concurrent import or sync stored the same
+    fingerprint first) are tolerated; any other write error is re-raised.
+    Returns the number of games actually inserted.
+    """
+    if not game_docs:
+        return 0
+
+    try:
+        result = await db.games.insert_many(game_docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        details = e.details or {}
+        other_errors = [
+            err for err in details.get("writeErrors", [])
+            if err.get("code") != DUPLICATE_KEY_ERROR
+        ]
+        if other_errors:
+            raise
+        skipped = len(details.get("writeErrors", []))
+        logger.info(f"Skipped {skipped} duplicate games during bulk insert")
+        return details.get("nInserted", 0)
+
+
+async def insert_game_if_new(db, game_doc: Dict[str, Any]) -> bool:
+    """Insert a single game, returning False if its fingerprint already exists"""
+    try:
+        await db.games.insert_one(game_doc)
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def backfill_game_fingerprints(db, batch_size: int = 500) -> int:
+    """
+    Compute fingerprints for games stored before fingerprinting existed.
+
+    Games whose fingerprint collides with an already-fingerprinted game are
+    legacy duplicates; they are left without a fingerprint and logged.
+    """
+    updated = 0
+    cursor = db.games.find(
+        {"fingerprint": {"$exists": False}},
+        {"_id": 0, "game_id": 1, "pgn": 1, "url": 1}
+    ).batch_size(batch_size)
+
+    async for game in cursor:
+        fingerprint = compute_game_fingerprint(game.get("pgn", ""), game.get("url"))
+        try:
+            await db.games.update_one(
+                {"game_id": game["game_id"]},
+                {"$set": {"fingerprint": fingerprint}}
+            )
+            updated += 1
+        except DuplicateKeyError:
+            logger.warning(f"Game {game['game_id']} duplicates an existing game ({fingerprint})")
+
+    return updated
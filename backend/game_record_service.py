@@ -0,0 +1,255 @@
+"""
+Game Record Service
+
+Parses each game's PGN once into a compact canonical record stored in the
+game_records collection (one document per game_id):
+- headers: PGN tag pairs exactly as written
+- san / uci: mainline moves
+- clocks: remaining clock seconds after each ply (None where not recorded)
+- think: seconds spent on each ply, from the clocks and the TimeControl
+  increment (None where unknown)
+- fens / zobrist: position before each ply plus the final position
+  (len == ply_count + 1, index 0 is the start position)
+
+Analysis, opening, phase, RAG and time-management code consume the record
+instead of re-parsing the PGN. Records are written at import time; games
+imported before records existed get one built lazily on first read.
+"""
+
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+import chess
+import chess.pgn
+import chess.polyglot
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Bump when the record layout changes; stale records are rebuilt on read
+GAME_RECORD_VERSION = 2
+
+# MongoDB duplicate key error code
+DUPLICATE_KEY_ERROR = 11000
+
+
+def zobrist_key(board: chess.Board) -> str:
+    """Polyglot zobrist hash of a position as 16 hex chars"""
+    return f"{chess.polyglot.zobrist_hash(board):016x}"
+
+
+def parse_time_control(time_control: str) -> Tuple[Optional[int], int]:
+    """
+    (base seconds, increment seconds) from a PGN TimeControl tag.
+    "600+5" -> (600, 5), "180" -> (180, 0); daily ("1/86400") and
+    untimed ("-") games have no base.
+    """
+    base, _, increment = (time_control or "").partition("+")
+    try:
+        return int(base), int(increment or 0)
+    except ValueError:
+        return None, 0
+
+
+def think_times(clocks: List[Optional[float]], time_control: str = "") -> List[Optional[float]]:
+    """
+    Seconds spent on each ply: the mover's previous clock (the base time for
+    their first move) minus the clock after the move, plus the increment.
+    """
+    base, increment = parse_time_control(time_control)
+    think = []
+    for ply, clock in enumerate(clocks):
+        previous = clocks[ply - 2] if ply >= 2 else base
+        if clock is None or previous is None:
+            think.append(None)
+        else:
+            think.append(round(max(previous - clock + increment, 0.0), 1))
+    return think
+
+
+def record_from_game(game: chess.pgn.Game) -> Dict[str, Any]:
+    """Build a canonical record from an already parsed python-chess game"""
+    board = game.board()
+    start_fen = board.fen()
+
+    san, uci, clocks = [], [], []
+    fens, zobrist = [start_fen], [zobrist_key(board)]
+
+    for node in game.mainline():
+        move = node.move
+        san.append(board.san(move))
+        uci.append(move.uci())
+        clocks.append(node.clock())
+        board.push(move)
+        fens.append(board.fen())
+        zobrist.append(zobrist_key(board))
+
+    return {
+        "version": GAME_RECORD_VERSION,
+        "headers": dict(game.headers),
+        "start_fen": start_fen,
+        "san": san,
+        "uci": uci,
+        "clocks": clocks,
+        "think": think_times(clocks, game.headers.get("TimeControl", "")),
+        "fens": fens,
+        "zobrist": zobrist,
+        "ply_count": len(uci)
+    }
+
+
+def build_game_record(pgn: str) -> Optional[Dict[str, Any]]:
+    """Parse a PGN into a canonical record, or None if it cannot be parsed"""
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn or ""))
+    except Exception as e:
+        logger.warning(f"Could not parse PGN for game record: {e}")
+        return None
+
+    if game is None:
+        return None
+    if game.errors:
+        # python-chess stops the mainline at the first illegal move, as before
+        logger.warning(f"PGN parse errors: {game.errors[0]}")
+
+    return record_from_game(game)
+
+
+def record_board_and_moves(record: Dict[str, Any]) -> Tuple[chess.Board, List[chess.Move]]:
+    """Starting board and mainline moves for replaying a record"""
+    board = chess.Board(record.get("start_fen") or chess.STARTING_FEN)
+    return board, [chess.Move.from_uci(u) for u in record.get("uci", [])]
+
+
+def get_record_header(record: Dict[str, Any], name: str, default: str = "") -> str:
+    """Case-insensitive header lookup"""
+    headers = record.get("headers", {})
+    if name in headers:
+        return headers[name]
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return default
+
+
+def _is_current(record: Optional[Dict[str, Any]]) -> bool:
+    return bool(record) and record.get("version") == GAME_RECORD_VERSION
+
+
+def _record_doc(game: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **record,
+        "game_id": game["game_id"],
+        "user_id": game.get("user_id"),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def save_game_records(db, games: List[Dict[str, Any]]) -> int:
+    """
+    Build and store records for newly imported games (one insert_many).
+
+    Games whose PGN doesn't parse are skipped; duplicate game_ids (a record
+    already written by a concurrent import) are tolerated.
+    """
+    docs = []
+    for game in games:
+        record = build_game_record(game.get("pgn", ""))
+        if record is not None:
+            docs.append(_record_doc(game, record))
+
+    if not docs:
+        return 0
+
+    try:
+        result = await db.game_records.insert_many(docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        details = e.details or {}
+        if any(err.get("code") != DUPLICATE_KEY_ERROR for err in details.get("writeErrors", [])):
+            raise
+        return details.get("nInserted", 0)
+
+
+async def get_game_records(
+    db,
+    games: List[Dict[str, Any]],
+    fields: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Records for a batch of games, keyed by game_id.
+
+    One $in query; games without a current record are parsed from their
+    "pgn" field (if the caller fetched it) and the record is persisted.
+
+    Args:
+        fields: Only load these record fields (e.g. ["san"]) - the per-ply
+                FEN/zobrist arrays are the bulk of each document
+    """
+    game_ids = [g["game_id"] for g in games if g.get("game_id")]
+    if not game_ids:
+        return {}
+
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields})
+        projection.update({"game_id": 1, "version": 1})
+
+    records = {}
+    async for doc in db.game_records.find({"game_id": {"$in": game_ids}}, projection):
+        if _is_current(doc):
+            records[doc["game_id"]] = doc
+
+    for game in games:
+        game_id = game.get("game_id")
+        if not game_id or game_id in records or not game.get("pgn"):
+            continue
+        record = build_game_record(game["pgn"])
+        if record is None:
+            continue
+        doc = _record_doc(game, record)
+        await db.game_records.replace_one({"game_id": game_id}, doc, upsert=True)
+        records[game_id] = doc
+
+    return records
+
+
+async def get_game_record(db, game: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Record for a single game (see get_game_records)"""
+    records = await get_game_records(db, [game])
+    return records.get(game.get("game_id"))
+
+
+async def backfill_game_records(db, batch_size: int = 200) -> int:
+    """Build records for every game that doesn't have a current one"""
+    created = 0
+    batch = []
+    cursor = db.games.find({}, {"_id": 0, "game_id": 1, "user_id": 1, "pgn": 1}).batch_size(batch_size)
+
+    async for game in cursor:
+        batch.append(game)
+        if len(batch) >= batch_size:
+            created += await _backfill_batch(db, batch)
+            batch = []
+
+    if batch:
+        created += await _backfill_batch(db, batch)
+
+    return created
+
+
+async def _backfill_batch(db, games: List[Dict[str, Any]]) -> int:
+    present = set()
+    async for doc in db.game_records.find(
+        {"game_id": {"$in": [g["game_id"] for g in games]}, "version": GAME_RECORD_VERSION},
+        {"_id": 0, "game_id": 1}
+    ):
+        present.add(doc["game_id"])
+
+    missing = [g for g in games if g["game_id"] not in present]
+    if not missing:
+        return 0
+    return len(await get_game_records(db, missing))
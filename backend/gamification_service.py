@@ -6,6 +6,7 @@ Makes the chess coaching app addictive and engaging
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any
 from bson import ObjectId
+from pymongo import ReturnDocument
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 
@@ -415,10 +416,15 @@ async def get_user_progress(user_id: str) -> dict:
     
     return progress
 
-async def add_xp(user_id: str, action: str, bonus_multiplier: float = 1.0) -> dict:
-    """Add XP for an action and check for level up"""
+async def add_xp(user_id: str, action: str, bonus_multiplier: float = 1.0, count: int = 1) -> dict:
+    """
+    Add XP for an action and check for level up.
+    
+    count awards the action several times in a single update (e.g. one
+    call for a whole batch of imported games instead of one per game).
+    """
     base_xp = XP_REWARDS.get(action, 0)
-    xp_earned = int(base_xp * bonus_multiplier)
+    xp_earned = int(base_xp * bonus_multiplier) * max(count, 0)
     
     if xp_earned <= 0:
         return {"xp_earned": 0, "leveled_up": False}
@@ -533,18 +539,18 @@ async def update_streak(user_id: str) -> dict:
 
 async def increment_stat(user_id: str, stat: str, value: int = 1) -> dict:
     """Increment a user stat and check achievements"""
-    await user_progress_collection.update_one(
+    # Increment and read back the new value in one round trip
+    progress = await user_progress_collection.find_one_and_update(
         {"user_id": user_id},
         {
             "$inc": {stat: value},
             "$set": {"updated_at": datetime.now(timezone.utc)}
         },
-        upsert=True
+        projection={"_id": 0, stat: 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Get updated value
-    progress = await get_user_progress(user_id)
-    new_value = progress.get(stat, 0)
+    new_value = (progress or {}).get(stat, 0)
     
     # Check related achievements
     achievement_type_map = {
@@ -560,6 +566,26 @@ async def increment_stat(user_id: str, stat: str, value: int = 1) -> dict:
     
     return {"stat": stat, "new_value": new_value}
 
+async def record_games_imported(user_id: str, count: int) -> dict:
+    """
+    Apply gamification for a batch of imported games in one pass.
+    
+    One aggregated XP update, one stat increment (which runs the single
+    achievement evaluation for the new total) and one streak update,
+    regardless of how many games were imported.
+    """
+    if count <= 0:
+        return {"xp_earned": 0, "games_imported": None}
+    
+    xp_result = await add_xp(user_id, "game_imported", count=count)
+    stat_result = await increment_stat(user_id, "games_imported", count)
+    await update_streak(user_id)
+    
+    return {
+        "xp_earned": xp_result.get("xp_earned", 0),
+        "games_imported": stat_result["new_value"]
+    }
+
 async def update_best_accuracy(user_id: str, accuracy: float) -> dict:
     """Update best accuracy and check achievements"""
     progress = await get_user_progress(user_id)
@@ -11,6 +11,8 @@ import logging
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Optional, Any
 
+from response_cache_service import bump_user_generation
+
 # Import centralized config
 from config import (
     HABIT_CONSECUTIVE_CORRECT as CONSECUTIVE_CORRECT_THRESHOLD,
@@ -191,6 +193,7 @@ async def check_and_rotate_habit(db, user_id: str) -> Dict[str, Any]:
         update_data,
         upsert=False
     )
+    await bump_user_generation(db, user_id)
     
     new_habit_name = new_habit.get("subcategory", "") if isinstance(new_habit, dict) else str(new_habit) if new_habit else "None"
     
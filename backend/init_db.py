@@ -45,7 +45,12 @@ async def init_database():
         "pattern_embeddings",
         "analysis_queue",
         "notifications",
-        "reflection_results"
+        "reflection_results",
+        "rating_snapshots",
+        "rating_history",
+        "data_generations",
+        "game_records",
+        "llm_metrics"
     ]
     
     existing = await db.list_collection_names()
@@ -77,12 +82,21 @@ async def init_database():
     await db.games.create_index("user_id")
     await db.games.create_index([("user_id", 1), ("platform", 1)])
     await db.games.create_index([("user_id", 1), ("is_analyzed", 1)])
+    await db.games.create_index(
+        [("user_id", 1), ("fingerprint", 1)],
+        unique=True,
+        partialFilterExpression={"fingerprint": {"$type": "string"}}
+    )
     print("  ✓ games indexes")
     
     # Game analyses indexes
     await db.game_analyses.create_index("analysis_id", unique=True)
     await db.game_analyses.create_index("game_id", unique=True)
     await db.game_analyses.create_index("user_id")
+    await db.game_analyses.create_index(
+        [("commentary_status", 1), ("commentary_next_attempt_at", 1)],
+        partialFilterExpression={"auto_analyzed": True}
+    )
     print("  ✓ game_analyses indexes")
     
     # Mistake patterns indexes
@@ -129,6 +143,29 @@ async def init_database():
     await db.reflection_results.create_index("game_id")
     print("  ✓ reflection_results indexes")
     
+    # Rating snapshot + history indexes
+    await db.rating_snapshots.create_index("user_id", unique=True)
+    await db.rating_history.create_index(
+        [("user_id", 1), ("platform", 1), ("category", 1), ("date", 1)],
+        unique=True
+    )
+    print("  ✓ rating_snapshots / rating_history indexes")
+    
+    # Per-user data generation (response cache invalidation)
+    await db.data_generations.create_index("user_id", unique=True)
+    print("  ✓ data_generations indexes")
+    
+    # Canonical parsed game records
+    await db.game_records.create_index("game_id", unique=True)
+    await db.game_records.create_index("user_id")
+    print("  ✓ game_records indexes")
+    
+    # LLM / TTS call metrics (expire after LLM_METRICS_TTL_DAYS)
+    from config import LLM_METRICS_TTL_DAYS
+    await db.llm_metrics.create_index("created_at", expireAfterSeconds=LLM_METRICS_TTL_DAYS * 24 * 60 * 60)
+    await db.llm_metrics.create_index([("caller", 1), ("created_at", -1)])
+    print("  ✓ llm_metrics indexes")
+    
     # Embedding collections indexes (for RAG)
     await db.game_embeddings.create_index("embedding_id", unique=True)
     await db.game_embeddings.create_index("user_id")
@@ -160,7 +197,9 @@ async def init_database():
             "created_at": "datetime",
             "chess_com_username": "str | null - Linked Chess.com username",
             "lichess_username": "str | null - Linked Lichess username",
+            "tier": "str | null - Billing tier ('free', 'pro'); null = CQS_DEFAULT_TIER",
             "last_game_sync": "str | null - ISO timestamp of last sync",
+            "session_epoch": "int - Bumped on logout/login to revoke signed session tokens",
             "email_notifications": "dict - {game_analyzed: bool, weekly_summary: bool, weakness_alert: bool}"
         },
         "user_sessions": {
@@ -181,6 +220,7 @@ async def init_database():
             "date_played": "str - ISO date",
             "opening": "str - Opening name",
             "user_color": "str - 'white' or 'black'",
+            "fingerprint": "str (unique per user) - Platform game id or hash of headers + moves",
             "imported_at": "str - ISO timestamp",
             "is_analyzed": "bool - Whether AI analysis exists",
             "auto_synced": "bool - Whether auto-imported"
@@ -205,11 +245,18 @@ async def init_database():
             "focus_this_week": "str",
             "key_lesson": "str - Legacy field",
             "voice_script_summary": "str - Text for TTS",
+            "phase_analysis": "dict - {phases, final_phase, phase_transitions, total_moves, ply_phases ('o'/'m'/'e' per ply)}",
+            "motif_scan": "dict - Per-ply tactical motif flags {user_color, start_ply, flags, details, counts}",
             "summary_p1": "str",
             "summary_p2": "str",
             "improvement_note": "str",
             "created_at": "str - ISO timestamp",
             "auto_analyzed": "bool - Whether auto-analyzed",
+            "stockfish_failed": "bool - Engine pass failed (stats are zero)",
+            "commentary_status": "str - 'pending' | 'processing' | 'complete' | 'failed' (auto-analysis), 'complete' | 'engine_only' (manual)",
+            "commentary_attempts": "int - Failed auto-analysis commentary attempts",
+            "commentary_next_attempt_at": "str - ISO timestamp the commentary queue retries at",
+            "commentary_claimed_at": "str - ISO timestamp a worker claimed the commentary",
             "_cqs_internal": "dict - Internal quality score (excluded from API)"
         },
         "mistake_patterns": {
@@ -300,6 +347,57 @@ async def init_database():
             "score": "int | null - Score if applicable",
             "created_at": "str - ISO timestamp"
         },
+        "rating_snapshots": {
+            "user_id": "str (unique)",
+            "ratings": "dict - {chess_com: {rapid, blitz, bullet}, lichess: {rapid, blitz, bullet, classical}}",
+            "chess_com_username": "str | null",
+            "lichess_username": "str | null",
+            "fetched_at": "str - ISO timestamp of last successful fetch"
+        },
+        "rating_history": {
+            "user_id": "str",
+            "platform": "str - 'chess_com' or 'lichess'",
+            "category": "str - 'rapid', 'blitz', 'bullet', 'classical'",
+            "date": "str - YYYY-MM-DD (one point per day)",
+            "rating": "int",
+            "recorded_at": "str - ISO timestamp"
+        },
+        "data_generations": {
+            "user_id": "str (unique)",
+            "generation": "int - bumped whenever dashboard inputs change (ETag source)"
+        },
+        "game_records": {
+            "game_id": "str (unique)",
+            "user_id": "str",
+            "version": "int - record layout version",
+            "headers": "dict - PGN tag pairs as written",
+            "start_fen": "str",
+            "san": "list[str] - mainline moves",
+            "uci": "list[str]",
+            "clocks": "list[float | null] - remaining seconds after each ply",
+            "think": "list[float | null] - seconds spent on each ply (clock delta + increment)",
+            "fens": "list[str] - position before each ply + final (ply_count + 1)",
+            "zobrist": "list[str] - polyglot hashes (hex) aligned with fens",
+            "ply_count": "int",
+            "created_at": "str - ISO timestamp"
+        },
+        "llm_metrics": {
+            "kind": "str - 'chat' or 'tts'",
+            "caller": "str - call site tag (e.g. 'analysis_commentary')",
+            "provider": "str - 'openai' or 'emergent'",
+            "model": "str",
+            "latency_ms": "float",
+            "prompt_tokens": "int",
+            "completion_tokens": "int",
+            "total_tokens": "int",
+            "tokens_estimated": "bool - provider reported no usage",
+            "characters": "int - TTS input length",
+            "cost_usd": "float - estimate from config price tables",
+            "retries": "int",
+            "outcome": "str - 'ok', 'invalid_output', 'unavailable', 'error' or 'cancelled'",
+            "error": "str | null",
+            "created_at": "datetime - TTL indexed"
+        },
         "game_embeddings": {
             "embedding_id": "str (unique)",
             "user_id": "str",
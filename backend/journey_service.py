@@ -4,7 +4,9 @@ Automatic Game Sync & Analysis Service
 Handles:
 1. Background polling for new games from Chess.com/Lichess
 2. Smart game selection (prefer rapid/classical, skip bullet)
-3. Silent auto-analysis (max 3 games/user/day, 15 on first join)
+3. Silent auto-analysis (max 3 games/user/day, 15 on first join):
+   engine analysis saved at once, coaching commentary added from a retry queue
+   (several games of one player per LLM request)
 4. Journey Dashboard data generation
 5. Notifications when new analysis is ready
 6. Initial player report on first sync
@@ -13,14 +15,19 @@ Handles:
 import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import httpx
 
+from response_cache_service import bump_user_generation
+from llm_service import call_llm_json, GameCommentaryOutput, BatchCommentaryOutput, LLMUnavailableError
+
 # Import centralized config
 from config import (
-    LLM_PROVIDER, LLM_MODEL,
+    LLM_MODEL, LLM_BATCH_TIMEOUT_SECONDS,
     FIRST_SYNC_MAX_GAMES, DAILY_SYNC_MAX_GAMES, 
-    SYNC_INTERVAL_HOURS, MIN_GAME_MOVES, FIRST_SYNC_MONTHS
+    SYNC_INTERVAL_HOURS, MIN_GAME_MOVES, FIRST_SYNC_MONTHS,
+    COMMENTARY_MAX_ATTEMPTS, COMMENTARY_RETRY_BASE_SECONDS,
+    COMMENTARY_CLAIM_TIMEOUT_SECONDS, COMMENTARY_SWEEP_LIMIT, COMMENTARY_BATCH_SIZE, DEFAULT_RATING
 )
 
 logger = logging.getLogger(__name__)
@@ -422,22 +429,30 @@ async def generate_journey_dashboard_data(
 
 # ==================== AUTO-ANALYSIS ====================
 
-async def auto_analyze_game(db, user_id: str, game_doc: Dict) -> Optional[Dict]:
+_commentary_tasks: set = set()
+
+
+async def auto_analyze_game(db, user_id: str, game_doc: Dict, schedule_commentary: bool = True) -> Optional[Dict]:
     """
-    Automatically analyze a game with Stockfish for accuracy + AI coaching.
+    Automatically analyze a game - phase one: Stockfish only.
+    
+    The engine analysis (stats, move evaluations, critical moments, motif
+    and phase data) is saved right away so stats, badges and cards work,
+    with template commentary for every move and commentary_status "pending".
+    Coaching for the critical moments and the summary is added by
+    add_game_commentary from the commentary queue; a commentary failure
+    never re-runs the engine. With schedule_commentary=False the caller
+    schedules it (sync batches several games per LLM request).
+    
     Returns the analysis document or None if analysis fails/skipped.
     """
-    import os
-    import json
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
     from player_profile_service import get_or_create_profile, update_profile_after_analysis
-    from rag_service import build_rag_context
     from stockfish_service import analyze_game_with_stockfish, QUICK_DEPTH
-    
-    EMERGENT_LLM_KEY = os.environ.get("EMERGENT_LLM_KEY", "")
-    if not EMERGENT_LLM_KEY:
-        logger.error("EMERGENT_LLM_KEY not configured - skipping auto-analysis")
-        return None
+    from game_record_service import get_game_record
+    from position_analyzer import scan_game_motifs, motifs_for_move
+    from phase_theory_service import analyze_game_phases
+    from coach_prompt_service import engine_only_commentary
+    from local_commentary_service import build_local_commentary
     
     game_id = game_doc.get("game_id")
     pgn = game_doc.get("pgn", "")
@@ -456,11 +471,15 @@ async def auto_analyze_game(db, user_id: str, game_doc: Dict) -> Optional[Dict]:
     try:
         # STEP 1: Run Stockfish analysis for accurate move evaluation
         logger.info(f"Running Stockfish analysis for game {game_id}...")
-        sf_result = analyze_game_with_stockfish(pgn, user_color, depth=QUICK_DEPTH)
+        game_record = await get_game_record(db, game_doc)
+        # Runs in a worker thread so the event loop keeps serving requests meanwhile
+        sf_result = await asyncio.to_thread(
+            analyze_game_with_stockfish, pgn, user_color, depth=QUICK_DEPTH, record=game_record
+        )
         
         if not sf_result.get("success"):
             logger.warning(f"Stockfish analysis failed for game {game_id}: {sf_result.get('error')}")
-            # Continue with GPT-only analysis if Stockfish fails
+            # Continue - the commentary phase still coaches from the PGN
             sf_stats = {"blunders": 0, "mistakes": 0, "inaccuracies": 0, "best_moves": 0, "accuracy": 0}
             sf_moves = []
         else:
@@ -471,118 +490,26 @@ async def auto_analyze_game(db, user_id: str, game_doc: Dict) -> Optional[Dict]:
         # STEP 2: Get user info and profile
         user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0, "name": 1})
         user_name = user_doc.get("name", "Player") if user_doc else "Player"
-        first_name = user_name.split()[0] if user_name else "friend"
-        
         profile = await get_or_create_profile(db, user_id, user_name)
+        rating = profile.get("current_rating") or DEFAULT_RATING
         
-        # Build memory context
-        top_weaknesses = profile.get("top_weaknesses", [])[:3]
-        games_analyzed = profile.get("games_analyzed_count", 0)
-        
-        memory_callouts = []
-        for w in top_weaknesses:
-            subcat = w.get("subcategory", "").replace("_", " ")
-            count = w.get("occurrence_count", 0)
-            if count >= 2:
-                memory_callouts.append(f"- {subcat}: seen {count} times before")
-        
-        memory_section = ""
-        if memory_callouts:
-            memory_section = "COACH MEMORY:\n" + "\n".join(memory_callouts)
-        
-        # Simplified system prompt for auto-analysis
-        system_prompt = f"""You are an experienced chess coach analyzing a game.
-
-{first_name} played as {user_color}. Games analyzed: {games_analyzed}
-
-{memory_section}
-
-Respond with ONLY valid JSON:
-{{
-    "game_summary": "2-3 sentence summary",
-    "blunders": <number>,
-    "mistakes": <number>,
-    "best_moves": <number>,
-    "move_by_move": [
-        {{
-            "move_number": 1,
-            "move": "e4",
-            "evaluation": "good|solid|neutral|inaccuracy|mistake|blunder",
-            "thinking_pattern": "What was the thinking here",
-            "lesson": "Brief lesson if mistake",
-            "consider": "What to consider instead"
-        }}
-    ],
-    "identified_weaknesses": [
-        {{"category": "tactical", "subcategory": "fork_blindness", "habit_description": "Description"}}
-    ],
-    "identified_strengths": [
-        {{"category": "positional", "subcategory": "good_development", "description": "What they did well"}}
-    ],
-    "best_move_suggestions": [
-        {{"move_number": 10, "best_move": "Nf3", "reason": "Why this was better"}}
-    ],
-    "focus_this_week": "One thing to work on",
-    "voice_script": "30-second spoken summary"
-}}
-
-RULES:
-- NO engine language (stockfish, centipawns, +0.5)
-- Keep explanations SHORT
-- Strengths must be POSITIVE (good_development, solid_defense) - NEVER list weaknesses as strengths
-- For blunders, suggest the best_move
-"""
-        
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"auto_analysis_{game_id}",
-            system_message=system_prompt
-        ).with_model(LLM_PROVIDER, LLM_MODEL)
-        
-        user_message = UserMessage(text=f"Analyze this game:\n\n{pgn}")
-        response = await chat.send_message(user_message)
-        
-        # Parse response - handle both string and object response
-        if hasattr(response, 'text'):
-            response_text = response.text.strip()
-        else:
-            response_text = str(response).strip()
-        
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        
-        analysis_data = json.loads(response_text)
-        
-        # Use Stockfish stats for accuracy (prefer over GPT estimates)
-        blunders = sf_stats.get("blunders", analysis_data.get("blunders", 0))
-        mistakes = sf_stats.get("mistakes", analysis_data.get("mistakes", 0))
-        inaccuracies = sf_stats.get("inaccuracies", analysis_data.get("inaccuracies", 0))
+        blunders = sf_stats.get("blunders", 0)
+        mistakes = sf_stats.get("mistakes", 0)
+        inaccuracies = sf_stats.get("inaccuracies", 0)
         best_moves = sf_stats.get("best_moves", 0) + sf_stats.get("excellent_moves", 0)
         accuracy = sf_stats.get("accuracy", 0)
         avg_cp_loss = sf_stats.get("avg_cp_loss", 0)
         
-        # Merge Stockfish move data with GPT commentary
-        commentary = analysis_data.get("move_by_move", [])
-        for sf_move in sf_moves:
-            move_num = sf_move.get("move_number")
-            # Find matching GPT commentary
-            for comm in commentary:
-                if comm.get("move_number") == move_num:
-                    comm["centipawn_loss"] = sf_move.get("cp_loss", 0)
-                    comm["evaluation"] = sf_move.get("evaluation", "neutral")
-                    comm["best_move"] = sf_move.get("best_move", "")
-                    comm["eval_before"] = sf_move.get("eval_before", 0)
-                    comm["eval_after"] = sf_move.get("eval_after", 0)
-                    break
+        # Summary text until the commentary phase replaces it
+        engine_data = engine_only_commentary(sf_result, user_color, rating)
+        now = datetime.now(timezone.utc).isoformat()
         
         # Create analysis document with REAL Stockfish accuracy
         analysis_doc = {
             "analysis_id": f"analysis_{game_id}",
             "game_id": game_id,
             "user_id": user_id,
-            "game_summary": analysis_data.get("game_summary", ""),
+            "game_summary": engine_data["game_summary"],
             "blunders": blunders,
             "mistakes": mistakes,
             "inaccuracies": inaccuracies,
@@ -596,63 +523,90 @@ RULES:
                 "inaccuracies": inaccuracies,
                 "best_moves": sf_stats.get("best_moves", 0),
                 "excellent_moves": sf_stats.get("excellent_moves", 0),
-                "avg_cp_loss": avg_cp_loss
+                "avg_cp_loss": avg_cp_loss,
+                "move_evaluations": sf_moves  # Read by the commentary phase
             },
-            "commentary": commentary,  # GPT commentary with Stockfish data merged
-            "move_by_move": commentary,  # Keep for backwards compatibility
-            "weaknesses": analysis_data.get("identified_weaknesses", []),
-            "identified_weaknesses": analysis_data.get("identified_weaknesses", []),
-            "strengths": analysis_data.get("identified_strengths", []),
-            "best_move_suggestions": analysis_data.get("best_move_suggestions", []),
-            "focus_this_week": analysis_data.get("focus_this_week", ""),
-            "voice_script_summary": analysis_data.get("voice_script", ""),
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "stockfish_failed": not sf_result.get("success"),
+            "commentary": [],  # Template commentary, set once motifs are known
+            "move_by_move": [],
+            "weaknesses": [],
+            "identified_weaknesses": [],
+            "strengths": [],
+            "best_move_suggestions": engine_data["best_move_suggestions"],
+            "focus_this_week": engine_data["focus_this_week"],
+            "voice_script_summary": "",
+            "commentary_status": "pending",
+            "commentary_attempts": 0,
+            "commentary_next_attempt_at": now,
+            "created_at": now,
             "auto_analyzed": True
         }
         
+        # Per-ply phases from the Stockfish replay (read by phase mastery and badges)
+        if game_record and sf_result.get("phase_labels") is not None:
+            phase_analysis = analyze_game_phases(
+                pgn, user_color, record=game_record, phase_labels=sf_result["phase_labels"]
+            )
+            if not phase_analysis.get("error"):
+                analysis_doc["phase_analysis"] = {
+                    key: phase_analysis.get(key)
+                    for key in ("phases", "final_phase", "phase_transitions", "total_moves", "ply_phases")
+                }
+        
+        # Tactical motif flags for every ply (read by badges, cards and Coach)
+        motif_scan = None
+        if game_record:
+            try:
+                motif_scan = scan_game_motifs(game_record["fens"], game_record["uci"], user_color)
+                analysis_doc["motif_scan"] = motif_scan
+            except Exception as motif_err:
+                logger.warning(f"Motif scan failed for game {game_id}: {motif_err}")
+        
+        # Template commentary for every move, available right away; the
+        # commentary phase replaces the critical moments with coaching
+        commentary = _with_engine_data(
+            build_local_commentary(sf_moves, user_color, rating, motif_scan=motif_scan), sf_moves
+        )
+        analysis_doc["commentary"] = commentary
+        analysis_doc["move_by_move"] = commentary  # Keep for backwards compatibility
+        local_by_number = {c["move_number"]: c for c in commentary}
+        
         # STEP 3: Extract critical moments for Coach Reflection
         critical_moments = []
-        for move_data in commentary:
-            eval_type = move_data.get("evaluation", "").lower()
-            if eval_type in ["blunder", "mistake"]:
-                # Find the FEN for this position from Stockfish moves
-                move_num = move_data.get("move_number")
-                fen = None
-                best_move = None
-                cp_loss = 0
-                for sf_move in sf_moves:
-                    if sf_move.get("move_number") == move_num:
-                        fen = sf_move.get("fen_before")
-                        best_move = sf_move.get("best_move")
-                        cp_loss = sf_move.get("cp_loss", 0)
-                        break
-                
-                if fen:
-                    critical_moments.append({
-                        "type": eval_type,
-                        "move_number": move_num,
-                        "fen": fen,
-                        "move_played": move_data.get("move"),
-                        "best_move": best_move or move_data.get("consider"),
-                        "explanation": move_data.get("lesson", move_data.get("thinking_pattern", "")),
-                        "eval_before": move_data.get("eval_before", 0),
-                        "eval_after": move_data.get("eval_after", 0),
-                        "cp_loss": cp_loss
-                    })
+        for sf_move in sf_moves:
+            eval_type = sf_move.get("evaluation", "")
+            if hasattr(eval_type, "value"):
+                eval_type = eval_type.value
+            if eval_type in ["blunder", "mistake"] and sf_move.get("fen_before"):
+                move_num = sf_move.get("move_number")
+                critical_moments.append({
+                    "type": eval_type,
+                    "move_number": move_num,
+                    "fen": sf_move.get("fen_before"),
+                    "move_played": sf_move.get("move"),
+                    "best_move": sf_move.get("best_move"),
+                    "explanation": local_by_number.get(move_num, {}).get("feedback", ""),
+                    "eval_before": sf_move.get("eval_before", 0),
+                    "eval_after": sf_move.get("eval_after", 0),
+                    "cp_loss": sf_move.get("cp_loss", 0),
+                    "motifs": motifs_for_move(motif_scan, move_num)
+                })
         
         # Sort by centipawn loss to find worst moment
         critical_moments.sort(key=lambda x: x.get("cp_loss", 0), reverse=True)
         analysis_doc["critical_moments"] = critical_moments[:3]  # Keep top 3 worst moments
         
         await db.game_analyses.insert_one(analysis_doc)
+        analysis_doc.pop("_id", None)
         
         # Mark game as analyzed
         await db.games.update_one(
             {"game_id": game_id},
             {"$set": {"is_analyzed": True}}
         )
+        await bump_user_generation(db, user_id)
         
-        # Update player profile
+        # Update player profile (habits follow with the commentary)
         await update_profile_after_analysis(
             db,
             user_id,
@@ -660,8 +614,7 @@ RULES:
             blunders,
             mistakes,
             best_moves,
-            analysis_data.get("identified_weaknesses", []),
-            analysis_data.get("identified_strengths", [])
+            []
         )
         
         # GAMIFICATION: Award XP for auto-analyzed game
@@ -691,17 +644,346 @@ RULES:
         except Exception as gam_err:
             logger.warning(f"Gamification error (non-critical): {gam_err}")
         
-        logger.info(f"Auto-analysis complete for game {game_id} - Stockfish accuracy: {accuracy}%")
+        logger.info(f"Auto-analysis engine phase complete for game {game_id} - Stockfish accuracy: {accuracy}%")
+        if schedule_commentary:
+            schedule_game_commentary(db, [analysis_doc])
         return analysis_doc
-        
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse AI response for game {game_id}: {e}")
-        return None
+    
     except Exception as e:
         logger.error(f"Auto-analysis error for game {game_id}: {e}")
         return None
 
 
+def _with_engine_data(commentary: List[Dict], sf_moves: List[Dict]) -> List[Dict]:
+    """Copy Stockfish's numbers onto commentary entries (engine is the source of truth)"""
+    sf_by_number = {m.get("move_number"): m for m in sf_moves}
+    for comm in commentary:
+        sf_move = sf_by_number.get(comm.get("move_number"))
+        if sf_move:
+            comm["centipawn_loss"] = sf_move.get("cp_loss", 0)
+            comm["evaluation"] = sf_move.get("evaluation", "neutral")
+            comm["best_move"] = sf_move.get("best_move", "")
+            comm["eval_before"] = sf_move.get("eval_before", 0)
+            comm["eval_after"] = sf_move.get("eval_after", 0)
+            comm["phase"] = sf_move.get("phase")
+    return commentary
+
+
+async def _player_context(db, user_id: str) -> Dict:
+    """Name, games analyzed and coach-memory callouts for the commentary prompt"""
+    from player_profile_service import get_or_create_profile
+    
+    user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0, "name": 1})
+    user_name = user_doc.get("name", "Player") if user_doc else "Player"
+    profile = await get_or_create_profile(db, user_id, user_name)
+    
+    memory_callouts = []
+    for w in profile.get("top_weaknesses", [])[:3]:
+        subcat = w.get("subcategory", "").replace("_", " ")
+        count = w.get("occurrence_count", 0)
+        if count >= 2:
+            memory_callouts.append(f"- {subcat}: seen {count} times before")
+    return {
+        "first_name": user_name.split()[0] if user_name else "friend",
+        "games_analyzed": profile.get("games_analyzed_count", 0),
+        "memory_section": "COACH MEMORY:\n" + "\n".join(memory_callouts) if memory_callouts else ""
+    }
+
+
+async def _game_digest(db, analysis: Dict) -> Dict:
+    """The game's PGN and colour plus the engine digest rebuilt from the stored analysis"""
+    from coach_prompt_service import build_move_digest
+    
+    game_id = analysis["game_id"]
+    game = await db.games.find_one({"game_id": game_id}, {"_id": 0, "pgn": 1, "user_color": 1})
+    if not game or not game.get("pgn"):
+        raise ValueError(f"Game {game_id} not found")
+    user_color = game.get("user_color", "white")
+    
+    sf_analysis = analysis.get("stockfish_analysis", {})
+    sf_moves = sf_analysis.get("move_evaluations", [])
+    digest = build_move_digest(
+        {"success": bool(sf_moves), "user_stats": sf_analysis, "moves": sf_moves}, user_color
+    )
+    return {"game_id": game_id, "pgn": game["pgn"], "user_color": user_color,
+            "digest": digest, "sf_moves": sf_moves}
+
+
+async def _save_commentary(db, analysis: Dict, analysis_data: Dict, sf_moves: List[Dict]) -> Dict:
+    """Merge one game's LLM commentary into its stored analysis and the player profile"""
+    from player_profile_service import update_profile_habits
+    from local_commentary_service import merge_commentary
+    
+    coached = analysis_data.get("commentary") or analysis_data.get("move_by_move", [])
+    commentary = _with_engine_data(merge_commentary(analysis.get("commentary", []), coached), sf_moves)
+    
+    # Coach explanations for the critical moments found by the engine
+    coached_by_number = {c.get("move_number"): c for c in coached}
+    critical_moments = analysis.get("critical_moments", [])
+    for moment in critical_moments:
+        comm = coached_by_number.get(moment.get("move_number"))
+        if comm and comm.get("feedback"):
+            moment["explanation"] = comm["feedback"]
+    
+    weaknesses = analysis_data.get("identified_weaknesses", [])
+    strengths = analysis_data.get("identified_strengths", [])
+    update = {
+        "commentary": commentary,
+        "move_by_move": commentary,  # Keep for backwards compatibility
+        "weaknesses": weaknesses,
+        "identified_weaknesses": weaknesses,
+        "strengths": strengths,
+        "critical_moments": critical_moments,
+        "voice_script_summary": analysis_data.get("voice_script", ""),
+        "commentary_status": "complete",
+        "commented_at": datetime.now(timezone.utc).isoformat()
+    }
+    summary = analysis_data.get("game_summary") or " ".join(
+        p for p in (analysis_data.get("summary_p1"), analysis_data.get("summary_p2")) if p
+    )
+    if summary:
+        update["game_summary"] = summary
+    if analysis_data.get("focus_this_week"):
+        update["focus_this_week"] = analysis_data["focus_this_week"]
+    if not analysis.get("best_move_suggestions"):
+        update["best_move_suggestions"] = analysis_data.get("best_move_suggestions", [])
+    
+    await db.game_analyses.update_one({"analysis_id": analysis["analysis_id"]}, {"$set": update})
+    # The game is complete from here on; a retry would count its habits twice
+    try:
+        await update_profile_habits(db, analysis["user_id"], weaknesses, strengths)
+        await bump_user_generation(db, analysis["user_id"])
+    except Exception as profile_err:
+        logger.warning(f"Profile habit update failed for game {analysis['game_id']} (non-critical): {profile_err}")
+    return update
+
+
+async def add_game_commentary(db, analysis: Dict) -> Dict:
+    """
+    Phase two of auto-analysis: coaching commentary for a saved engine analysis.
+    
+    Sends the LLM the compact digest of the top critical moments (no engine
+    work - the stored move evaluations are reused) and asks for coaching on
+    those plus the summary. Coached entries replace the template commentary
+    for their moves, and the identified habits go to the player profile.
+    Returns the fields written.
+    
+    Raises:
+        LLMUnavailableError / StructuredOutputError / others from the LLM call
+    """
+    from coach_prompt_service import GAME_COACH_SYSTEM_PROMPT, build_game_user_message
+    
+    game = await _game_digest(db, analysis)
+    player = await _player_context(db, analysis["user_id"])
+    
+    analysis_data = await call_llm_json(
+        GAME_COACH_SYSTEM_PROMPT,
+        build_game_user_message(
+            game["digest"], game["pgn"], player["first_name"], game["user_color"],
+            player["games_analyzed"], memory_section=player["memory_section"]
+        ),
+        schema=GameCommentaryOutput,
+        model=LLM_MODEL,
+        caller="auto_analysis"
+    )
+    return await _save_commentary(db, analysis, analysis_data, game["sf_moves"])
+
+
+async def add_games_commentary_batch(db, analyses: List[Dict]) -> Tuple[int, List[Dict]]:
+    """
+    Commentary phase for several analyses of ONE player in a single LLM request.
+    
+    The games' digests are packed into one message (the static system prompt
+    and player context are sent once instead of per game) and the response
+    is split back per game by game_id. Returns (games commented, analyses
+    that got no usable entry) - the latter for the caller to comment one by
+    one. A game whose save fails is recorded as a failed attempt here, never
+    handed back, so no game is commented twice.
+    
+    Raises:
+        LLMUnavailableError / StructuredOutputError / others from the LLM call,
+        always before any game is saved
+    """
+    from coach_prompt_service import GAME_COACH_BATCH_SYSTEM_PROMPT, build_batch_user_message
+    
+    games = {}
+    missing = []
+    for analysis in analyses:
+        try:
+            games[analysis["game_id"]] = (analysis, await _game_digest(db, analysis))
+        except ValueError:
+            missing.append(analysis)  # Fails on its own, with its own attempt count
+    if not games:
+        return 0, missing
+    
+    player = await _player_context(db, analyses[0]["user_id"])
+    batch_data = await call_llm_json(
+        GAME_COACH_BATCH_SYSTEM_PROMPT,
+        build_batch_user_message(
+            [game for _, game in games.values()], player["first_name"],
+            player["games_analyzed"], memory_section=player["memory_section"]
+        ),
+        schema=BatchCommentaryOutput,
+        model=LLM_MODEL,
+        caller="auto_analysis_batch",
+        timeout=LLM_BATCH_TIMEOUT_SECONDS
+    )
+    
+    commented = 0
+    by_game = {g.get("game_id"): g for g in batch_data.get("games", []) if g.get("game_id") in games}
+    for game_id, (analysis, game) in games.items():
+        analysis_data = by_game.get(game_id)
+        if not (analysis_data and (analysis_data.get("commentary") or analysis_data.get("move_by_move")
+                                   or analysis_data.get("summary_p1") or analysis_data.get("game_summary"))):
+            missing.append(analysis)
+            continue
+        try:
+            await _save_commentary(db, analysis, analysis_data, game["sf_moves"])
+            commented += 1
+        except Exception as e:
+            await _record_commentary_failure(db, analysis, e)
+    return commented, missing
+
+
+def _commentary_due_query(now: datetime) -> Dict:
+    """
+    Analyses whose commentary is due: pending, retryable, or stuck in processing.
+    
+    Covers auto-analyses and interactive analyses saved engine-only while the
+    LLM provider was down.
+    """
+    stale = (now - timedelta(seconds=COMMENTARY_CLAIM_TIMEOUT_SECONDS)).isoformat()
+    return {
+        "$or": [
+            {"commentary_status": {"$in": ["pending", "failed"]},
+             "commentary_attempts": {"$lt": COMMENTARY_MAX_ATTEMPTS},
+             "commentary_next_attempt_at": {"$lte": now.isoformat()}},
+            {"commentary_status": "processing", "commentary_claimed_at": {"$lt": stale}}
+        ]
+    }
+
+
+async def _record_commentary_failure(db, analysis: Dict, error: Exception):
+    """Count a failed attempt and schedule the retry with exponential backoff"""
+    attempts = analysis.get("commentary_attempts", 0) + 1
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=COMMENTARY_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    logger.warning(f"Commentary failed for game {analysis['game_id']} (attempt {attempts}): {error}")
+    await db.game_analyses.update_one(
+        {"analysis_id": analysis["analysis_id"]},
+        {"$set": {"commentary_status": "failed", "commentary_error": str(error)[:300],
+                  "commentary_next_attempt_at": retry_at.isoformat()},
+         "$inc": {"commentary_attempts": 1}}
+    )
+
+
+async def comment_analyses(db, analyses: List[Dict]) -> int:
+    """
+    Run the commentary phase for the analyses. Returns analyses commented.
+    
+    Each player's games are commented COMMENTARY_BATCH_SIZE at a time in one
+    LLM request; games the batch leaves out (or a batch whose response is
+    unusable) fall back to one request per game. Each chunk is claimed first
+    so the sweep and a scheduled task never comment the same game twice, and
+    the claim is renewed before each fallback request so a long batch can't
+    let it go stale. A
+    failed call is retried later with exponential backoff; when the provider
+    is unavailable the attempt is not counted and the rest waits for the
+    next sweep.
+    """
+    by_user: Dict[str, List[Dict]] = {}
+    for analysis in analyses:
+        by_user.setdefault(analysis["user_id"], []).append(analysis)
+    chunks = [
+        user_analyses[i:i + COMMENTARY_BATCH_SIZE]
+        for user_analyses in by_user.values()
+        for i in range(0, len(user_analyses), COMMENTARY_BATCH_SIZE)
+    ]
+    
+    commented = 0
+    for chunk in chunks:
+        now = datetime.now(timezone.utc)
+        claimed = []
+        for analysis in chunk:
+            claim = await db.game_analyses.update_one(
+                {**_commentary_due_query(now), "analysis_id": analysis["analysis_id"]},
+                {"$set": {"commentary_status": "processing", "commentary_claimed_at": now.isoformat()}}
+            )
+            if claim.modified_count:
+                claimed.append(analysis)  # Others are already taken or no longer due
+        
+        done = set()
+        try:
+            singles = claimed
+            if len(claimed) > 1:
+                try:
+                    batched, singles = await add_games_commentary_batch(db, claimed)
+                    commented += batched
+                except LLMUnavailableError:
+                    raise
+                except Exception as e:
+                    # Raised before any game was saved, so all of them fall back
+                    logger.warning(f"Batched commentary failed for {len(claimed)} games, retrying one by one: {e}")
+                single_ids = {a["analysis_id"] for a in singles}
+                done.update(a["analysis_id"] for a in claimed if a["analysis_id"] not in single_ids)
+            
+            for analysis in singles:
+                # The batch may have used up much of the claim; renew it before another call
+                renewed = await db.game_analyses.update_one(
+                    {"analysis_id": analysis["analysis_id"], "commentary_status": "processing",
+                     "commentary_claimed_at": now.isoformat()},
+                    {"$set": {"commentary_claimed_at": datetime.now(timezone.utc).isoformat()}}
+                )
+                done.add(analysis["analysis_id"])
+                if not renewed.modified_count:
+                    continue  # Taken over by another worker
+                try:
+                    await add_game_commentary(db, analysis)
+                    commented += 1
+                except LLMUnavailableError:
+                    done.discard(analysis["analysis_id"])
+                    raise
+                except Exception as e:
+                    await _record_commentary_failure(db, analysis, e)
+        except LLMUnavailableError as e:
+            retry_at = now + timedelta(seconds=COMMENTARY_RETRY_BASE_SECONDS)
+            for analysis in claimed:
+                if analysis["analysis_id"] not in done:
+                    await db.game_analyses.update_one(
+                        {"analysis_id": analysis["analysis_id"]},
+                        {"$set": {"commentary_status": "pending", "commentary_next_attempt_at": retry_at.isoformat()}}
+                    )
+            logger.warning(f"Commentary deferred, LLM unavailable: {e}")
+            break
+    return commented
+
+
+def schedule_game_commentary(db, analyses: List[Dict]) -> Optional[asyncio.Task]:
+    """Enqueue the commentary phase for freshly saved engine analyses (non-blocking)"""
+    if not analyses:
+        return None
+    task = asyncio.create_task(comment_analyses(db, analyses))
+    # Keep a reference so the task is not garbage-collected mid-run
+    _commentary_tasks.add(task)
+    task.add_done_callback(_commentary_tasks.discard)
+    return task
+
+
+async def process_commentary_queue(db, limit: int = COMMENTARY_SWEEP_LIMIT) -> int:
+    """
+    Background sweep: comment analyses whose commentary never ran
+    (restart or provider outage), failed fewer than COMMENTARY_MAX_ATTEMPTS times and is due
+    again, or was left in "processing" by a dead worker.
+    """
+    analyses = await db.game_analyses.find(
+        _commentary_due_query(datetime.now(timezone.utc)),
+        {"_id": 0, "analysis_id": 1, "game_id": 1, "user_id": 1, "commentary_attempts": 1, "commentary": 1,
+         "critical_moments": 1, "best_move_suggestions": 1, "stockfish_analysis": 1}
+    ).sort("commentary_next_attempt_at", 1).limit(limit).to_list(limit)
+    if not analyses:
+        return 0
+    return await comment_analyses(db, analyses)
+
+
 # ==================== BACKGROUND SYNC JOB ====================
 
 def extract_pgn_from_chesscom_game(game: Dict, username: str) -> Optional[str]:
@@ -754,6 +1036,8 @@ async def sync_user_games(db, user_id: str, user_doc: Dict) -> int:
     Returns number of games analyzed.
     """
     import uuid
+    from game_import_service import compute_game_fingerprint, find_existing_fingerprints, insert_game_if_new
+    from game_record_service import save_game_records
     
     chesscom_username = user_doc.get("chesscom_username")
     lichess_username = user_doc.get("lichess_username")
@@ -803,35 +1087,40 @@ async def sync_user_games(db, user_id: str, user_doc: Dict) -> int:
     
     analyzed_count = 0
     imported_count = 0
+    awaiting_commentary = []
+    
+    # Resolve PGN, URL and fingerprint up front so dedupe is one $in query
+    for item in games_to_analyze:
+        game_data = item["game"]
+        if item["platform"] == "chess.com":
+            item["url"] = game_data.get("url", "")
+            item["pgn"] = extract_pgn_from_chesscom_game(game_data, item["username"])
+        else:
+            item["url"] = f"https://lichess.org/{game_data.get('id', '')}"
+            item["pgn"] = extract_pgn_from_lichess_game(game_data, item["username"])
+        item["fingerprint"] = compute_game_fingerprint(item["pgn"], item["url"]) if item["pgn"] else None
+    
+    existing_fingerprints = await find_existing_fingerprints(
+        db, user_id, (item["fingerprint"] for item in games_to_analyze)
+    )
     
     for item in games_to_analyze:
         try:
             game_data = item["game"]
             platform = item["platform"]
             username = item["username"]
-            
-            # Generate unique identifier based on game URL
-            if platform == "chess.com":
-                game_url = game_data.get("url", "")
-                pgn = extract_pgn_from_chesscom_game(game_data, username)
-            else:
-                game_id = game_data.get("id", "")
-                game_url = f"https://lichess.org/{game_id}"
-                pgn = extract_pgn_from_lichess_game(game_data, username)
+            game_url = item["url"]
+            pgn = item["pgn"]
+            fingerprint = item["fingerprint"]
             
             if not pgn:
                 logger.warning(f"No PGN found for game from {platform}")
                 continue
             
-            # Check if already imported by URL or PGN
-            existing = await db.games.find_one({
-                "$or": [
-                    {"url": game_url, "user_id": user_id},
-                    {"pgn": pgn, "user_id": user_id}
-                ]
-            })
-            if existing:
+            # Skip games already imported (or repeated within this sync)
+            if fingerprint in existing_fingerprints:
                 continue
+            existing_fingerprints.add(fingerprint)
             
             # Determine user's color
             user_color = determine_user_color(game_data, platform, username)
@@ -844,6 +1133,7 @@ async def sync_user_games(db, user_id: str, user_doc: Dict) -> int:
                 "username": username,
                 "pgn": pgn,
                 "url": game_url,
+                "fingerprint": fingerprint,
                 "user_color": user_color,
                 "imported_at": datetime.now(timezone.utc).isoformat(),
                 "auto_synced": True  # Mark as auto-synced
@@ -857,15 +1147,23 @@ async def sync_user_games(db, user_id: str, user_doc: Dict) -> int:
                 game_doc["time_control"] = game_data.get("speed", "")
                 game_doc["result"] = game_data.get("status", "")
             
-            await db.games.insert_one(game_doc)
+            if not await insert_game_if_new(db, game_doc):
+                continue
+            imported_count += 1
+            await save_game_records(db, [game_doc])
             logger.info(f"Auto-synced game {game_doc['game_id']} for user {user_id} from {platform}")
             
             # Auto-analyze the game with AI
             try:
-                analysis_result = await auto_analyze_game(db, user_id, game_doc)
+                analysis_result = await auto_analyze_game(db, user_id, game_doc, schedule_commentary=False)
                 if analysis_result:
                     logger.info(f"Auto-analyzed game {game_doc['game_id']} successfully")
                     analyzed_count += 1
+                    # Commentary goes out in batches while the engine works on the next games
+                    awaiting_commentary.append(analysis_result)
+                    if len(awaiting_commentary) >= COMMENTARY_BATCH_SIZE:
+                        schedule_game_commentary(db, awaiting_commentary)
+                        awaiting_commentary = []
                 else:
                     logger.warning(f"Auto-analysis skipped for game {game_doc['game_id']}")
             except Exception as analysis_error:
@@ -875,11 +1173,15 @@ async def sync_user_games(db, user_id: str, user_doc: Dict) -> int:
         except Exception as e:
             logger.error(f"Error auto-syncing game for {user_id}: {e}")
     
+    schedule_game_commentary(db, awaiting_commentary)
+    
     # Update last sync timestamp
     await db.users.update_one(
         {"user_id": user_id},
         {"$set": {"last_game_sync": datetime.now(timezone.utc).isoformat()}}
     )
+    if imported_count > 0:
+        await bump_user_generation(db, user_id)
     
     # Send notifications if games were synced
     if analyzed_count > 0:
@@ -958,6 +1260,8 @@ async def run_background_sync(db):
         ]
     }).to_list(1000)
     
+    from rating_service import refresh_rating_snapshot, get_linked_usernames
+    
     total_analyzed = 0
     
     for user_doc in users:
@@ -966,6 +1270,13 @@ async def run_background_sync(db):
             total_analyzed += count
         except Exception as e:
             logger.error(f"Error syncing games for user {user_doc['user_id']}: {e}")
+        
+        # Keep the rating snapshot fresh so page views never call the platforms
+        try:
+            chess_com_username, lichess_username = get_linked_usernames(user_doc)
+            await refresh_rating_snapshot(db, user_doc["user_id"], chess_com_username, lichess_username)
+        except Exception as e:
+            logger.warning(f"Error refreshing ratings for user {user_doc['user_id']}: {e}")
     
     logger.info(f"Background sync complete: {total_analyzed} games analyzed for {len(users)} users")
     return total_analyzed
@@ -0,0 +1,216 @@
+"""
+LLM Metrics Service - Latency, tokens and cost of every LLM / TTS call
+
+Every call made through llm_service is wrapped in track_llm_call(), which
+records one document per call:
+- kind ("chat" | "tts"), caller tag, provider, model
+- latency, prompt/completion tokens (or TTS characters), estimated cost
+- retry count and outcome ("ok" | "invalid_output" | "unavailable" | "error" | "cancelled")
+
+Records are buffered in-process and written in batches to the `llm_metrics`
+collection (TTL index on created_at, see init_db.py). summarize_llm_metrics()
+builds the per-caller report served by /api/internal/llm-metrics.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional
+
+from config import (
+    LLM_METRICS_FLUSH_BATCH,
+    LLM_METRICS_BUFFER_MAX,
+    LLM_PRICING_PER_1M_TOKENS,
+    TTS_PRICING_PER_1M_CHARS
+)
+
+logger = logging.getLogger(__name__)
+
+_buffer: deque = deque(maxlen=LLM_METRICS_BUFFER_MAX)
+_db = None
+_flush_task: Optional[asyncio.Task] = None
+
+
+def configure_llm_metrics(db) -> None:
+    """Set the database the metrics buffer is flushed to (called at startup)"""
+    global _db
+    _db = db
+
+
+def estimate_cost(kind: str, model: str, prompt_tokens: int = 0,
+                  completion_tokens: int = 0, characters: int = 0) -> float:
+    """USD cost of one call from the config price tables (0 for unknown models)"""
+    if kind == "tts":
+        return characters * TTS_PRICING_PER_1M_CHARS.get(model, 0) / 1_000_000
+    input_price, output_price = LLM_PRICING_PER_1M_TOKENS.get(model, (0, 0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class LLMCallTracker:
+    """Mutable record for one call; filled in by llm_service while the call runs"""
+
+    def __init__(self, kind: str, caller: str, model: str, provider: str, retries: int = 0):
+        self.kind = kind
+        self.caller = caller
+        self.model = model
+        self.provider = provider
+        self.retries = retries
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_estimated = False
+        self.characters = 0
+
+    def set_tokens(self, prompt_tokens: int, completion_tokens: int, estimated: bool = False) -> None:
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+        self.tokens_estimated = estimated
+
+    def to_doc(self, latency_ms: float) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "caller": self.caller,
+            "provider": self.provider,
+            "model": self.model,
+            "latency_ms": round(latency_ms, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "characters": self.characters,
+            "cost_usd": round(estimate_cost(
+                self.kind, self.model, self.prompt_tokens, self.completion_tokens, self.characters
+            ), 6),
+            "retries": self.retries,
+            "outcome": self.outcome,
+            "error": self.error,
+            "created_at": datetime.now(timezone.utc)
+        }
+
+
+@contextmanager
+def track_llm_call(kind: str, caller: str, model: str, provider: str, retries: int = 0):
+    """
+    Time a call and record it when the block exits, whether it succeeded or not.
+
+    Usage:
+        with track_llm_call("chat", "puzzle_generation", model, provider) as call:
+            text, usage = await ...
+            call.set_tokens(usage["prompt_tokens"], usage["completion_tokens"])
+    """
+    tracker = LLMCallTracker(kind, caller, model, provider, retries)
+    start = time.perf_counter()
+    try:
+        yield tracker
+    except asyncio.CancelledError:
+        tracker.outcome = "cancelled"
+        raise
+    except Exception as e:
+        if tracker.outcome == "ok":
+            tracker.outcome = "error"
+        tracker.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        record_llm_call(tracker.to_doc((time.perf_counter() - start) * 1000))
+
+
+def record_llm_call(doc: Dict[str, Any]) -> None:
+    """Buffer one call record; schedules a flush once a batch is full"""
+    global _flush_task
+    _buffer.append(doc)
+    logger.info(
+        f"LLM {doc['kind']} [{doc['caller']}] {doc['model']} {doc['latency_ms']:.0f}ms "
+        f"tokens={doc['total_tokens']} cost=${doc['cost_usd']:.5f} outcome={doc['outcome']}"
+    )
+
+    if _db is None or len(_buffer) < LLM_METRICS_FLUSH_BATCH:
+        return
+    if _flush_task is not None and not _flush_task.done():
+        return
+    try:
+        _flush_task = asyncio.get_running_loop().create_task(flush_llm_metrics())
+    except RuntimeError:
+        pass  # No running loop (scripts, worker threads) - flushed later
+
+
+async def flush_llm_metrics() -> int:
+    """Write buffered records to MongoDB. Returns the number written."""
+    if _db is None or not _buffer:
+        return 0
+    batch = list(_buffer)
+    _buffer.clear()
+    try:
+        await _db.llm_metrics.insert_many(batch, ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} LLM metrics records: {e}")
+        return 0
+    return len(batch)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_llm_calls(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Per-caller report from call records.
+
+    Returns:
+        {
+            "callers": [{caller, kind, calls, errors, error_rate, retries,
+                         latency_p50_ms, latency_p95_ms, latency_max_ms,
+                         total_tokens, cost_usd}, ...]  (most expensive first),
+            "totals": {calls, errors, total_tokens, cost_usd}
+        }
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        groups.setdefault(doc.get("caller", "unspecified"), []).append(doc)
+
+    callers = []
+    for caller, calls in groups.items():
+        latencies = sorted(c.get("latency_ms", 0) for c in calls)
+        errors = sum(1 for c in calls if c.get("outcome") != "ok")
+        callers.append({
+            "caller": caller,
+            "kind": calls[0].get("kind", "chat"),
+            "calls": len(calls),
+            "errors": errors,
+            "error_rate": round(errors / len(calls), 3),
+            "retries": sum(c.get("retries", 0) for c in calls),
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_max_ms": latencies[-1],
+            "total_tokens": sum(c.get("total_tokens", 0) for c in calls),
+            "cost_usd": round(sum(c.get("cost_usd", 0) for c in calls), 4)
+        })
+    callers.sort(key=lambda c: c["cost_usd"], reverse=True)
+
+    return {
+        "callers": callers,
+        "totals": {
+            "calls": sum(c["calls"] for c in callers),
+            "errors": sum(c["errors"] for c in callers),
+            "total_tokens": sum(c["total_tokens"] for c in callers),
+            "cost_usd": round(sum(c["cost_usd"] for c in callers), 4)
+        }
+    }
+
+
+async def summarize_llm_metrics(db, hours: int = 24) -> Dict[str, Any]:
+    """Per-caller latency / token / cost / failure report for the last `hours`"""
+    await flush_llm_metrics()
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    projection = {"_id": 0, "caller": 1, "kind": 1, "latency_ms": 1, "total_tokens": 1,
+                  "cost_usd": 1, "outcome": 1, "retries": 1}
+    docs = await db.llm_metrics.find({"created_at": {"$gte": since}}, projection).to_list(None)
+    report = summarize_llm_calls(docs)
+    report["window_hours"] = hours
+    return report
@@ -9,20 +9,67 @@ AUTOMATIC DETECTION:
 - Emergent environment: Has EMERGENT_LLM_KEY, no OPENAI_API_KEY
 - Production environment: Has OPENAI_API_KEY
 
-Manual override: Set LLM_PROVIDER_MODE="emergent" or "openai"
+Manual override: Set LLM_PROVIDER_MODE="emergent", "openai" or "fake"
+("fake" is a local in-process provider for tests and offline runs)
+
+PROVIDER GATEWAY:
+Every call goes through one gateway: a per-caller and a global concurrency
+limit, a per-attempt timeout, jittered retries on 429/5xx/timeouts and a
+circuit breaker. When the provider is down, callers get LLMUnavailableError
+quickly and can degrade (e.g. engine-only analysis) instead of piling up.
+
+METRICS:
+Every call is timed and recorded (tokens, cost, outcome) under a caller tag
+via llm_metrics_service; pass caller="..." to attribute spend.
+
+STRUCTURED OUTPUT:
+call_llm_json() asks the provider for a JSON object (OpenAI JSON mode),
+repairs common defects locally (code fences, trailing commas, truncated
+output) and validates the result against a Pydantic model. A malformed
+response is fixed in-process instead of costing another LLM round trip.
 """
 
 import os
+import re
+import json
+import time
+import random
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
+
+from llm_metrics_service import track_llm_call, LLMCallTracker
+from config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_CALLER_CONCURRENCY,
+    LLM_DEFAULT_CALLER_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_TIMEOUT_SECONDS,
+    TTS_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
+try:
+    import tiktoken
+    _TOKEN_ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # Optional: fall back to a character-based estimate
+    _TOKEN_ENCODING = None
+
 # Determine which provider to use based on available keys
 def _detect_provider_mode():
     """Auto-detect which LLM provider to use based on environment"""
     # Check for manual override first
     manual_mode = os.environ.get("LLM_PROVIDER_MODE", "").lower()
-    if manual_mode in ["emergent", "openai"]:
+    if manual_mode in ["emergent", "openai", "fake"]:
         return manual_mode
     
     # Auto-detect based on which keys are available
@@ -50,22 +97,35 @@ def _get_openai_client():
     global _openai_client
     if _openai_client is None:
         from openai import AsyncOpenAI
-        _openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
+        # Retries and timeouts are owned by the gateway below
+        _openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""), max_retries=0)
     return _openai_client
 
 
-async def _call_openai(system_message: str, user_message: str, model: str = "gpt-4o-mini") -> str:
-    """Direct OpenAI API call"""
+async def _call_openai(system_message: str, user_message: str, model: str = "gpt-4o-mini",
+                       json_mode: bool = False) -> Tuple[str, Optional[Dict[str, int]]]:
+    """Direct OpenAI API call - returns (text, token usage)"""
     client = _get_openai_client()
+    kwargs = {}
+    if json_mode:
+        # JSON mode guarantees syntactically valid JSON (the prompt must mention JSON)
+        kwargs["response_format"] = {"type": "json_object"}
     response = await client.chat.completions.create(
         model=model,
         messages=[
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_message}
         ],
-        temperature=0.7
+        temperature=0.7,
+        **kwargs
     )
-    return response.choices[0].message.content
+    usage = None
+    if response.usage is not None:
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens
+        }
+    return response.choices[0].message.content, usage
 
 
 async def _openai_tts(text: str, voice: str = "onyx", model: str = "tts-1") -> bytes:
@@ -113,8 +173,249 @@ async def _emergent_tts(text: str, voice: str = "onyx", model: str = "tts-1") ->
     return base64.b64decode(audio_base64)
 
 
+# ==================== FAKE PROVIDER ====================
+class FakeProviderError(Exception):
+    """HTTP-style provider failure raised by FakeLLMProvider"""
+    
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"fake provider error {status_code}")
+        self.status_code = status_code
+
+
+class FakeLLMProvider:
+    """
+    Local in-process provider (LLM_PROVIDER_MODE="fake").
+    
+    Args:
+        reply: Response text, or fn(system_message, user_message) -> text
+        latency: Seconds each call takes
+        failures: Exceptions raised by successive calls before replying
+    """
+    
+    def __init__(self, reply=None, latency: float = 0.0, failures: Optional[List[Exception]] = None):
+        self.reply = reply if reply is not None else '{"commentary": []}'
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def _run(self):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.failures:
+                raise self.failures.pop(0)
+        finally:
+            self.in_flight -= 1
+    
+    async def chat(self, system_message: str, user_message: str, model: str,
+                   json_mode: bool = False) -> Tuple[str, Dict[str, int]]:
+        await self._run()
+        text = self.reply(system_message, user_message) if callable(self.reply) else self.reply
+        return text, {
+            "prompt_tokens": estimate_tokens(system_message) + estimate_tokens(user_message),
+            "completion_tokens": estimate_tokens(text)
+        }
+    
+    async def tts(self, text: str, voice: str, model: str) -> bytes:
+        await self._run()
+        return b"ID3" + text[:32].encode("utf-8")
+
+
+_fake_provider = FakeLLMProvider()
+
+
+def use_fake_provider(provider: Optional[FakeLLMProvider] = None) -> FakeLLMProvider:
+    """Route all calls to a local fake provider (tests / offline runs)"""
+    global LLM_PROVIDER_MODE, _fake_provider
+    _fake_provider = provider or FakeLLMProvider()
+    LLM_PROVIDER_MODE = "fake"
+    return _fake_provider
+
+
+# ==================== PROVIDER GATEWAY ====================
+class LLMUnavailableError(RuntimeError):
+    """Provider is down: circuit open, queue saturated, or retries exhausted"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    closed -> open after `failure_threshold` provider failures in a row.
+    After `reset_seconds` one probe call is let through (half-open): success
+    closes the circuit, failure re-opens it for another `reset_seconds`.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now (claims the probe when half-open)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            # One probe per reset window; everyone else keeps failing fast
+            self._opened_at = self._clock()
+            return True
+        return False
+    
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.error(f"LLM circuit opened after {self._failures} consecutive failures")
+            self._opened_at = self._clock()
+
+
+_breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+
+# Semaphores belong to the event loop they were created on
+_slot_loop = None
+_global_slot: Optional[asyncio.Semaphore] = None
+_caller_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _slots(caller: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    """(per-caller, global) concurrency limits for the running loop"""
+    global _slot_loop, _global_slot, _caller_slots
+    loop = asyncio.get_running_loop()
+    if loop is not _slot_loop:
+        _slot_loop = loop
+        _global_slot = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _caller_slots = {}
+    if caller not in _caller_slots:
+        _caller_slots[caller] = asyncio.Semaphore(
+            LLM_CALLER_CONCURRENCY.get(caller, LLM_DEFAULT_CALLER_CONCURRENCY)
+        )
+    return _caller_slots[caller], _global_slot
+
+
+@asynccontextmanager
+async def _acquire(slot: asyncio.Semaphore, deadline: float):
+    """Hold a slot, waiting at most until `deadline` (loop time)"""
+    remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+    try:
+        await asyncio.wait_for(slot.acquire(), remaining)
+    except asyncio.TimeoutError:
+        raise LLMUnavailableError(f"LLM queue saturated (waited {LLM_QUEUE_TIMEOUT_SECONDS}s)")
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, 429 and 5xx are worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(error).__name__ in {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+
+def _retry_delay(retry: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** retry))
+
+
+async def _gateway(kind: str, caller: str, model: str, timeout: float, attempt_fn):
+    """
+    Run `attempt_fn(call)` under the concurrency limits, timeout, retry and
+    circuit-breaker policy, recording one metrics entry for the whole call.
+    
+    Raises:
+        LLMUnavailableError: circuit open, queue saturated, or retries exhausted
+        Other provider errors (e.g. 400/401) unchanged - they are not retried
+    """
+    with track_llm_call(kind, caller, model, LLM_PROVIDER_MODE) as call:
+        if not _breaker.allow():
+            call.outcome = "unavailable"
+            raise LLMUnavailableError(f"LLM provider '{LLM_PROVIDER_MODE}' circuit open")
+        
+        caller_slot, global_slot = _slots(caller)
+        deadline = asyncio.get_running_loop().time() + LLM_QUEUE_TIMEOUT_SECONDS
+        try:
+            async with _acquire(caller_slot, deadline), _acquire(global_slot, deadline):
+                while True:
+                    try:
+                        result = await asyncio.wait_for(attempt_fn(call), timeout)
+                    except Exception as e:
+                        if not _is_retryable(e):
+                            _breaker.record_success()  # Provider answered; the request was bad
+                            raise
+                        _breaker.record_failure()
+                        if call.retries >= LLM_MAX_RETRIES or not _breaker.allow():
+                            raise LLMUnavailableError(
+                                f"LLM provider '{LLM_PROVIDER_MODE}' unavailable after "
+                                f"{call.retries + 1} attempts: {type(e).__name__}: {e}"
+                            ) from e
+                        call.retries += 1
+                        await asyncio.sleep(_retry_delay(call.retries))
+                    else:
+                        _breaker.record_success()
+                        return result
+        except LLMUnavailableError:
+            call.outcome = "unavailable"
+            raise
+
+
+def get_gateway_status() -> Dict[str, Any]:
+    """Circuit state and configured limits (for health checks)"""
+    return {
+        "provider": LLM_PROVIDER_MODE,
+        "circuit": _breaker.state,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout_seconds": LLM_TIMEOUT_SECONDS
+    }
+
+
 # ==================== PUBLIC API ====================
-async def call_llm(system_message: str, user_message: str, model: str = "gpt-4o-mini") -> str:
+async def _chat(system_message: str, user_message: str, model: str, call: LLMCallTracker,
+                json_mode: bool = False) -> str:
+    """Provider call that fills in the tracker's token counts"""
+    if LLM_PROVIDER_MODE == "fake":
+        text, usage = await _fake_provider.chat(system_message, user_message, model, json_mode=json_mode)
+    elif LLM_PROVIDER_MODE == "emergent":
+        text, usage = await _call_emergent(system_message, user_message, model), None
+    else:
+        text, usage = await _call_openai(system_message, user_message, model, json_mode=json_mode)
+    
+    if usage:
+        call.set_tokens(usage["prompt_tokens"], usage["completion_tokens"])
+    else:
+        # Provider didn't report usage
+        call.set_tokens(estimate_tokens(system_message) + estimate_tokens(user_message),
+                        estimate_tokens(str(text)), estimated=True)
+    return text
+
+
+async def call_llm(system_message: str, user_message: str, model: str = "gpt-4o-mini",
+                   caller: str = "unspecified") -> str:
     """
     Call LLM with automatic provider selection.
     
@@ -122,17 +423,19 @@ async def call_llm(system_message: str, user_message: str, model: str = "gpt-4o-
         system_message: System prompt
         user_message: User prompt
         model: Model name (default: gpt-4o-mini)
+        caller: Tag for metrics (e.g. "ask_about_move")
     
     Returns:
         LLM response text
     """
-    if LLM_PROVIDER_MODE == "emergent":
-        return await _call_emergent(system_message, user_message, model)
-    else:
-        return await _call_openai(system_message, user_message, model)
+    return await _gateway(
+        "chat", caller, model, LLM_TIMEOUT_SECONDS,
+        lambda call: _chat(system_message, user_message, model, call)
+    )
 
 
-async def call_tts(text: str, voice: str = "onyx", model: str = "tts-1") -> bytes:
+async def call_tts(text: str, voice: str = "onyx", model: str = "tts-1",
+                   caller: str = "unspecified") -> bytes:
     """
     Generate speech audio with automatic provider selection.
     
@@ -140,16 +443,283 @@ async def call_tts(text: str, voice: str = "onyx", model: str = "tts-1") -> byte
         text: Text to convert to speech
         voice: Voice name (default: onyx)
         model: TTS model (default: tts-1)
+        caller: Tag for metrics (e.g. "tts_move_explanation")
     
     Returns:
         Audio bytes (MP3 format)
     """
-    if LLM_PROVIDER_MODE == "emergent":
-        return await _emergent_tts(text, voice, model)
-    else:
+    async def attempt(call: LLMCallTracker) -> bytes:
+        call.characters = len(text[:4000])
+        if LLM_PROVIDER_MODE == "fake":
+            return await _fake_provider.tts(text, voice, model)
+        if LLM_PROVIDER_MODE == "emergent":
+            return await _emergent_tts(text, voice, model)
         return await _openai_tts(text, voice, model)
+    
+    return await _gateway("tts", caller, model, TTS_TIMEOUT_SECONDS, attempt)
 
 
 def get_provider_mode() -> str:
     """Get current LLM provider mode"""
     return LLM_PROVIDER_MODE
+
+
+def estimate_tokens(text: str) -> int:
+    """Prompt token count (exact with tiktoken installed, else ~4 chars per token)"""
+    if not text:
+        return 0
+    if _TOKEN_ENCODING is not None:
+        return len(_TOKEN_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+# ==================== STRUCTURED OUTPUT ====================
+class StructuredOutputError(ValueError):
+    """LLM response could not be turned into the expected JSON structure"""
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _extract_json_text(text: str) -> str:
+    """Strip code fences and leading prose, returning text from the first { or [
+
+    Fences are only stripped when they wrap the document, i.e. open before
+    any bracket, so backticks inside JSON string values are left alone.
+    """
+    text = (text or "").strip()
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        brackets = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        if text.startswith("```") or not brackets or fenced.start() < min(brackets):
+            text = fenced.group(1).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise StructuredOutputError("No JSON object in LLM response")
+    return text[min(starts):]
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    """Finish a cut-off document: drop a dangling separator and close open containers"""
+    text = "".join(out).rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Repair the JSON defects LLMs commonly produce, in one pass.
+    
+    Handles code fences and surrounding prose, trailing commas, raw
+    newlines inside strings, Python literals (True/False/None) and output
+    truncated mid-document. A truncated document is cut back to the last
+    complete value and its open containers are closed.
+    
+    Returns:
+        JSON text (not guaranteed valid if the input is beyond repair)
+    """
+    text = _extract_json_text(text)
+    out: List[str] = []
+    stack: List[str] = []
+    # Last point where the document could be cut and closed cleanly
+    safe = (0, [])
+    in_string = escaped = False
+    i, n = 0, len(text)
+    
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+                out.append(ch)
+            elif ch == "\\":
+                escaped = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch >= " ":
+                out.append(ch)
+            i += 1
+            continue
+        
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+            safe = (len(out), list(stack))
+        elif ch in "}]":
+            while stack and _CLOSERS[stack[-1]] != ch:
+                # Mismatched closer: close the inner container first
+                out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(ch)
+            safe = (len(out), list(stack))
+            if not stack:
+                break  # Ignore anything after the top-level value
+        elif ch == ",":
+            safe = (len(out), list(stack))
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    
+    if not stack:
+        return "".join(out)
+    
+    # Truncated: try closing where we stopped, else fall back to the last safe cut
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    candidate = _close(out, stack)
+    try:
+        json.loads(candidate)
+        return candidate
+    except json.JSONDecodeError:
+        cut, cut_stack = safe
+        return _close(out[:cut], cut_stack)
+
+
+def parse_json_response(text: str) -> Any:
+    """
+    Parse an LLM response as JSON, repairing it locally when needed.
+    
+    Raises:
+        StructuredOutputError: if the response holds no recoverable JSON
+    """
+    try:
+        return json.loads((text or "").strip())
+    except json.JSONDecodeError:
+        pass
+    raw = _extract_json_text(text)
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+    try:
+        data = json.loads(repair_json(raw))
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Unrepairable JSON in LLM response: {e}") from e
+    logger.info("Repaired malformed JSON in LLM response")
+    return data
+
+
+def parse_structured(text: str, schema: Optional[Type[BaseModel]] = None) -> Dict:
+    """
+    Parse and validate an LLM response against a Pydantic model.
+    
+    Returns:
+        Plain dict (only keys the response provided, plus validated fields)
+    
+    Raises:
+        StructuredOutputError: on unrepairable JSON or a schema mismatch
+    """
+    data = parse_json_response(text)
+    if schema is None:
+        return data
+    try:
+        return schema.model_validate(data).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        raise StructuredOutputError(f"LLM response does not match {schema.__name__}: {e}") from e
+
+
+async def call_llm_json(
+    system_message: str,
+    user_message: str,
+    schema: Optional[Type[BaseModel]] = None,
+    model: str = "gpt-4o-mini",
+    caller: str = "unspecified",
+    timeout: Optional[float] = None
+) -> Dict:
+    """
+    Call LLM for a JSON object and return it parsed and validated.
+    
+    Uses JSON mode where the provider supports it; the local repair parser
+    covers providers without it. `timeout` overrides LLM_TIMEOUT_SECONDS per
+    attempt (multi-game batches need longer).
+    
+    Raises:
+        StructuredOutputError: if the response can't be parsed or validated
+    """
+    async def attempt(call: LLMCallTracker) -> Dict:
+        response = await _chat(system_message, user_message, model, call, json_mode=True)
+        try:
+            return parse_structured(response, schema)
+        except StructuredOutputError:
+            call.outcome = "invalid_output"
+            raise
+    
+    return await _gateway("chat", caller, model, timeout or LLM_TIMEOUT_SECONDS, attempt)
+
+
+class LLMOutput(BaseModel):
+    """
+    Base for LLM response schemas.
+    
+    Unknown keys are kept, null list fields are treated as missing, and
+    non-object entries in list-of-object fields are dropped rather than
+    failing the whole response.
+    """
+    model_config = ConfigDict(extra="allow")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _tolerate_llm_quirks(cls, data):
+        if not isinstance(data, dict):
+            return data
+        cleaned = dict(data)
+        for name, field in cls.model_fields.items():
+            if name not in cleaned:
+                continue
+            value = cleaned[name]
+            if value is None and not field.is_required():
+                del cleaned[name]
+            elif isinstance(value, list) and getattr(field.annotation, "__origin__", None) is list:
+                cleaned[name] = [v for v in value if isinstance(v, dict)]
+        return cleaned
+
+
+class GameCommentaryOutput(LLMOutput):
+    """Game analysis commentary (analyze-game and auto-analysis prompts)"""
+    commentary: List[Dict[str, Any]] = []
+    move_by_move: List[Dict[str, Any]] = []
+    identified_weaknesses: List[Dict[str, Any]] = []
+    identified_patterns: List[Dict[str, Any]] = []
+    identified_strengths: List[Dict[str, Any]] = []
+    best_move_suggestions: List[Dict[str, Any]] = []
+
+
+class BatchGameCommentary(GameCommentaryOutput):
+    """One game's commentary inside a multi-game response"""
+    game_id: str = ""
+
+
+class BatchCommentaryOutput(LLMOutput):
+    """Multi-game commentary (batched auto-analysis prompt), split per game by game_id"""
+    games: List[BatchGameCommentary] = []
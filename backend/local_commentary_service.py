@@ -0,0 +1,170 @@
+"""
+Local Commentary Service - Deterministic per-move commentary without the LLM
+
+Builds commentary entries (same shape as the LLM's "commentary" items) for
+every user move from pieces the backend already computes:
+- badge_service explanation templates (opening / positional / endgame / focus)
+- position_analyzer motif and move-difference explanations for errors
+- phase_theory_service rating-adaptive rules
+
+Game analysis sends only the top critical moments to the LLM (see
+coach_prompt_service.select_critical_moves); every other move is covered
+here, and all moves are when the provider is unavailable.
+"""
+
+import logging
+from typing import Dict, Any, List, Optional, Iterable
+
+from config import DEFAULT_RATING, DIGEST_PV_LENGTH
+from badge_service import (
+    _generate_opening_explanation,
+    _generate_positional_explanation,
+    _generate_endgame_explanation,
+    _generate_focus_explanation,
+    _generate_tactical_explanation
+)
+from phase_theory_service import get_phase_theory
+from position_analyzer import motifs_for_move
+
+logger = logging.getLogger(__name__)
+
+ERROR_EVALUATIONS = ("blunder", "mistake")
+
+# Variants are picked by move number so a game doesn't read the same line every move
+GOOD_MOVE_FEEDBACK = {
+    "brilliant": ["An exceptional find - this was a difficult move to see, and it works."],
+    "great": ["Strong move - better than the obvious options here.",
+              "Well played. You found the move that keeps the pressure on."],
+    "best": ["Best move. This is exactly what the position needed.",
+             "Solid - this is the move a strong player would choose.",
+             "Well played. Nothing better was available."],
+    "excellent": ["Excellent - very close to the best move.",
+                  "Good choice. It keeps your position healthy."],
+    "good": ["Good, solid move.",
+             "A reasonable move. It keeps the game under control."]
+}
+
+# Errors with no threat or motif to name: the engine only says the move lost ground
+ERROR_FEEDBACK = {
+    "blunder": ["This move gives away a lot. {best} kept your position together.",
+                "A costly slip - {best} was the move here. Take a moment to check what changed after your move."],
+    "mistake": ["This lets your advantage slip. {best} was stronger.",
+                "Not the best here - {best} kept more of your position's value."]
+}
+
+# cp from the user's side above which a position counts as winning
+WINNING_EVAL_CP = 200
+
+
+def _label(value) -> str:
+    """Enum or string classification as a plain string"""
+    return getattr(value, "value", value) or ""
+
+
+def _rule(phase: Optional[str], rating: int) -> Optional[str]:
+    """The phase's one-thing-to-remember for this rating"""
+    if phase not in ("opening", "middlegame", "endgame"):
+        return None
+    return get_phase_theory(phase, rating=rating).get("one_thing_to_remember") or None
+
+
+def _error_feedback(move: Dict[str, Any], evaluation: str, user_color: str,
+                    rating: int, motifs: Optional[Dict] = None) -> str:
+    """Template explanation for an inaccuracy, mistake or blunder"""
+    phase = move.get("phase")
+    cp_loss = move.get("cp_loss", 0)
+
+    if evaluation in ERROR_EVALUATIONS:
+        if motifs:
+            return _generate_tactical_explanation(move, True, cp_loss, rating, motifs=motifs)
+        if move.get("threat"):
+            return _generate_focus_explanation(move, cp_loss, rating)
+        variants = ERROR_FEEDBACK[evaluation]
+        best = move.get("best_move")
+        if not best or best == move.get("move"):
+            return "This move lost ground. Take a moment to check what changed after it."
+        return variants[(move.get("move_number") or 0) % len(variants)].format(best=best)
+
+    # Routine inaccuracies
+    if phase == "opening":
+        return _generate_opening_explanation(move, evaluation, rating)
+    if phase == "endgame":
+        sign = 1 if user_color == "white" else -1
+        was_winning = sign * (move.get("eval_before") or 0) >= WINNING_EVAL_CP
+        still_winning = sign * (move.get("eval_after") or 0) >= WINNING_EVAL_CP
+        return _generate_endgame_explanation(move, was_winning, still_winning, rating)
+    return _generate_positional_explanation(move, cp_loss, rating)
+
+
+def local_move_commentary(move: Dict[str, Any], user_color: str, rating: int = DEFAULT_RATING,
+                          motifs: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Commentary entry for one engine-analyzed move.
+
+    Args:
+        move: A stockfish_service move dict (evaluation, best_move, threat, phase, ...)
+        user_color: "white" or "black"
+        rating: Player rating for the template register
+        motifs: Stored motif flags for the move (position_analyzer.motifs_for_move)
+    """
+    evaluation = _label(move.get("evaluation")) or "good"
+    entry = {
+        "move_number": move.get("move_number"),
+        "move": move.get("move"),
+        "evaluation": evaluation,
+        "intent": "",
+        "feedback": "",
+        "consider": None,
+        "memory_note": None,
+        "details": {"thinking_pattern": "solid_thinking", "threat_line": None, "rule": None},
+        "source": "template"
+    }
+
+    if evaluation in GOOD_MOVE_FEEDBACK:
+        variants = GOOD_MOVE_FEEDBACK[evaluation]
+        feedback = variants[(move.get("move_number") or 0) % len(variants)]
+        if move.get("only_move"):
+            feedback += " It was the only move that held the position."
+        entry["feedback"] = feedback
+        return entry
+
+    best = move.get("best_move")
+    entry["feedback"] = _error_feedback(move, evaluation, user_color, rating, motifs)
+    entry["consider"] = f"{best} was the better choice." if best and best != move.get("move") else None
+    entry["details"] = {
+        "thinking_pattern": "pattern_blindness" if move.get("threat") else None,
+        "threat_line": " ".join((move.get("pv_after_played") or [])[:DIGEST_PV_LENGTH]) or None,
+        "rule": _rule(move.get("phase"), rating)
+    }
+    return entry
+
+
+def build_local_commentary(
+    moves: List[Dict[str, Any]],
+    user_color: str,
+    rating: int = DEFAULT_RATING,
+    motif_scan: Optional[Dict] = None,
+    skip: Iterable[int] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Template commentary for every user move except the `skip` move numbers
+    (those the LLM comments on). One bad move never drops the rest.
+    """
+    skip = set(skip)
+    commentary = []
+    for move in moves:
+        if move.get("move_number") in skip:
+            continue
+        try:
+            motifs = motifs_for_move(motif_scan, move.get("move_number")) if motif_scan else None
+            commentary.append(local_move_commentary(move, user_color, rating, motifs or None))
+        except Exception as e:
+            logger.warning(f"Local commentary failed for move {move.get('move_number')}: {e}")
+    return commentary
+
+
+def merge_commentary(local: List[Dict[str, Any]], coached: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Template entries with the LLM's entries taking their moves, in move order"""
+    by_move = {c.get("move_number"): c for c in local}
+    by_move.update({c.get("move_number"): c for c in coached})
+    return sorted(by_move.values(), key=lambda c: c.get("move_number") or 0)
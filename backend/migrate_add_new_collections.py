@@ -42,7 +42,11 @@ async def migrate():
         "puzzle_attempts",
         "analysis_queue", 
         "notifications",
-        "reflection_results"
+        "reflection_results",
+        "rating_snapshots",
+        "rating_history",
+        "data_generations",
+        "game_records"
     ]
     
     print("Creating new collections...")
@@ -97,6 +101,47 @@ async def migrate():
     except Exception as e:
         print(f"  ⚠️  reflection_results indexes: {e}")
     
+    # Game fingerprint index (dedupe without comparing PGN strings)
+    try:
+        from game_import_service import backfill_game_fingerprints
+        await db.games.create_index(
+            [("user_id", 1), ("fingerprint", 1)],
+            unique=True,
+            partialFilterExpression={"fingerprint": {"$type": "string"}}
+        )
+        backfilled = await backfill_game_fingerprints(db)
+        print(f"  ✅ games fingerprint index ({backfilled} games backfilled)")
+    except Exception as e:
+        print(f"  ⚠️  games fingerprint index: {e}")
+    
+    # Rating snapshot + history indexes
+    try:
+        await db.rating_snapshots.create_index("user_id", unique=True)
+        await db.rating_history.create_index(
+            [("user_id", 1), ("platform", 1), ("category", 1), ("date", 1)],
+            unique=True
+        )
+        print("  ✅ rating_snapshots / rating_history indexes")
+    except Exception as e:
+        print(f"  ⚠️  rating indexes: {e}")
+    
+    # Per-user data generation (response cache invalidation)
+    try:
+        await db.data_generations.create_index("user_id", unique=True)
+        print("  ✅ data_generations indexes")
+    except Exception as e:
+        print(f"  ⚠️  data_generations index: {e}")
+    
+    # Canonical parsed game records (parse each PGN once)
+    try:
+        from game_record_service import backfill_game_records
+        await db.game_records.create_index("game_id", unique=True)
+        await db.game_records.create_index("user_id")
+        backfilled = await backfill_game_records(db)
+        print(f"  ✅ game_records indexes ({backfilled} games backfilled)")
+    except Exception as e:
+        print(f"  ⚠️  game_records indexes: {e}")
+    
     # ==================== VERIFY ====================
     
     print("\n" + "=" * 60)
@@ -10,14 +10,25 @@ Core Concepts:
 3. Spaced repetition schedules reviews: correct = longer interval, wrong = see it sooner
 4. Mastery = 3 consecutive correct answers
 5. User focuses on ONE habit at a time until all cards for that habit are mastered
+6. New cards are enriched in the background (refutation, continuation, "why"
+   question), so viewing and training a card is a plain read
 """
 
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from bson import ObjectId
 import uuid
 
+from config import (
+    CARD_ENRICHMENT_CONCURRENCY, CARD_ENRICHMENT_MAX_ATTEMPTS, CARD_ENRICHMENT_SWEEP_LIMIT,
+    CARD_ENRICHMENT_CLAIM_TIMEOUT_SECONDS, CARD_ACCEPT_MARGIN_CP
+)
+from position_analyzer import motifs_for_move, describe_motifs
+from pdr_service import get_refutation, get_best_continuation, refutation_from_line
+from response_cache_service import bump_user_generation
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -80,6 +91,15 @@ HABIT_DEFINITIONS = {
 # Default habit for unclassified mistakes
 DEFAULT_HABIT = "tactical_oversight"
 
+# Stored motif (analysis motif_scan) -> habit, checked in this order
+MOTIF_HABITS = [
+    ("back_rank", "back_rank_weakness"),
+    ("fork", "fork_blindness"),
+    ("pin", "pin_blindness"),
+    ("hanging", "hanging_pieces"),
+    ("missed_capture", "hanging_pieces")
+]
+
 # =============================================================================
 # SPACED REPETITION ALGORITHM (SM-2 variant)
 # =============================================================================
@@ -141,7 +161,13 @@ def calculate_next_review(card: Dict, correct: bool) -> Dict:
 def classify_mistake_habit(move_data: Dict, commentary: str = "") -> str:
     """
     Classify a mistake into a habit category based on move data and commentary.
+    Stored tactical motifs win over text matching.
     """
+    motifs = move_data.get("motifs") or {}
+    for motif, habit_key in MOTIF_HABITS:
+        if motif in motifs:
+            return habit_key
+    
     # Combine all text for pattern matching
     text_to_search = (
         (commentary or "") + " " +
@@ -178,6 +204,27 @@ def get_habit_display_name(habit_key: str) -> str:
 # CARD EXTRACTION
 # =============================================================================
 
+def acceptable_moves(move: Dict, user_color: str) -> List[str]:
+    """
+    Moves that solve a card: the engine's best move plus the stored MultiPV
+    alternatives within CARD_ACCEPT_MARGIN_CP of it (for the side to move).
+    """
+    best = move.get("best_move", "")
+    accepted = [best] if best else []
+    lines = move.get("alternatives") or []
+    if not lines:
+        return accepted
+    sign = 1 if user_color == "white" else -1
+    top = lines[0].get("eval")
+    for line in lines:
+        san, cp = line.get("move"), line.get("eval")
+        if not san or san in accepted or san == move.get("move") or top is None or cp is None:
+            continue
+        if sign * (top - cp) <= CARD_ACCEPT_MARGIN_CP:
+            accepted.append(san)
+    return accepted
+
+
 async def extract_mistake_cards_from_analysis(
     db, 
     user_id: str, 
@@ -199,6 +246,9 @@ async def extract_mistake_cards_from_analysis(
     commentary = analysis.get("commentary", [])
     commentary_by_move = {c.get("move_number"): c for c in commentary}
     
+    # Precomputed per-ply tactical motifs (absent on older analyses)
+    motif_scan = analysis.get("motif_scan")
+    
     # Get phase data if available
     phase_analysis = analysis.get("phase_analysis", {})
     phases = phase_analysis.get("phases", [])
@@ -237,15 +287,19 @@ async def extract_mistake_cards_from_analysis(
         # Get commentary for this move
         move_commentary = commentary_by_move.get(move_number, {})
         
-        # Determine phase for this move
-        move_phase = "middlegame"  # Default
-        for phase in phases:
-            if phase.get("start_move", 0) <= move_number <= phase.get("end_move", 999):
-                move_phase = phase.get("phase", "middlegame")
-                break
+        # Determine phase for this move (labelled during the Stockfish replay)
+        move_phase = move.get("phase") or "middlegame"
+        if not move.get("phase"):
+            for phase in phases:
+                if phase.get("start_move", 0) <= move_number <= phase.get("end_move", 999):
+                    move_phase = phase.get("phase", "middlegame")
+                    break
+        
+        motifs = motifs_for_move(motif_scan, move_number)
         
         # Build context for habit classification
         move_context = {
+            "motifs": motifs,
             "cp_loss": cp_loss,
             "evaluation": eval_type,
             "phase": move_phase,
@@ -263,6 +317,8 @@ async def extract_mistake_cards_from_analysis(
         explanation_parts = []
         if move_commentary.get("feedback"):
             explanation_parts.append(move_commentary["feedback"])
+        elif motifs:
+            explanation_parts.append(describe_motifs(motifs, move.get("move", "")))
         if move.get("threat"):
             explanation_parts.append(f"The threat was {move['threat']}.")
         if move.get("pv_after_played"):
@@ -278,10 +334,12 @@ async def extract_mistake_cards_from_analysis(
             "fen": fen,
             "correct_move": move.get("best_move", ""),
             "correct_move_uci": move.get("best_move_uci", ""),
+            "acceptable_moves": acceptable_moves(move, user_color),
             "user_move": move.get("move", ""),
             "user_move_uci": move.get("move_uci", ""),
             "move_number": move_number,
             "habit_tag": habit_tag,
+            "motifs": motifs,
             "phase": move_phase,
             "cp_loss": cp_loss,
             "evaluation": eval_type,
@@ -303,7 +361,10 @@ async def extract_mistake_cards_from_analysis(
             "is_mastered": False,
             
             "created_at": datetime.now(timezone.utc).isoformat(),
-            "last_reviewed": None
+            "last_reviewed": None,
+            
+            # Reflect data (refutation, continuation, why question) is filled in by enrich_mistake_card
+            "enrichment_status": "pending"
         }
         
         # Check if card already exists for this position in this game
@@ -321,10 +382,134 @@ async def extract_mistake_cards_from_analysis(
     # Update user's habit progress
     if cards_created:
         await update_user_habit_progress(db, user_id)
+        schedule_card_enrichment(db, cards_created)
     
     return cards_created
 
 
+# =============================================================================
+# CARD ENRICHMENT
+# =============================================================================
+
+_enrichment_slots = asyncio.Semaphore(CARD_ENRICHMENT_CONCURRENCY)
+_enrichment_tasks: Set[asyncio.Task] = set()
+
+
+async def enrich_mistake_card(db, card: Dict) -> Dict:
+    """
+    Precompute the Reflect data for a card: the opponent's refutation (move,
+    line, threat square), the best continuation and the "why" question.
+    Lines stored from the game analysis are used when present; the pooled
+    engine only runs for cards without them.
+    
+    Without a refutation (engine unavailable, no threat line) the partial
+    data is saved but the card stays "failed", so the sweep retries it.
+    """
+    fen = card["fen"]
+    user_move = card.get("user_move_uci") or card.get("user_move", "")
+    correct_move = card.get("correct_move", "")
+    
+    refutation = refutation_from_line(fen, user_move, card.get("threat_line", []))
+    if refutation is None:
+        refutation = await asyncio.to_thread(get_refutation, fen, user_move)
+    
+    # better_line is the analysis PV after the best move (starts with the reply)
+    better_line = card.get("better_line", [])
+    if better_line:
+        continuation = [correct_move] + better_line[:3]
+    else:
+        continuation = await asyncio.to_thread(get_best_continuation, fen, correct_move)
+    
+    update = {
+        "refutation": refutation,
+        "threat_square": refutation["threat_square"] if refutation else None,
+        "best_continuation": continuation or [],
+    }
+    update["why_question"] = await generate_why_question(db, {**card, **update})
+    
+    if refutation is None:
+        update["enrichment_status"] = "failed"
+        update["enrichment_error"] = "No refutation available"
+        await db.mistake_cards.update_one(
+            {"card_id": card["card_id"]}, {"$set": update, "$inc": {"enrichment_attempts": 1}}
+        )
+        return {**card, **update}
+    
+    update["enrichment_status"] = "done"
+    update["enriched_at"] = datetime.now(timezone.utc).isoformat()
+    
+    await db.mistake_cards.update_one({"card_id": card["card_id"]}, {"$set": update})
+    return {**card, **update}
+
+
+def _enrichment_due_query(now: datetime) -> Dict:
+    """Cards that still need enrichment: never run, retryable, or stuck in processing"""
+    stale = (now - timedelta(seconds=CARD_ENRICHMENT_CLAIM_TIMEOUT_SECONDS)).isoformat()
+    return {"$or": [
+        {"enrichment_status": {"$exists": False}},
+        {"enrichment_status": "pending"},
+        {"enrichment_status": "failed", "enrichment_attempts": {"$lt": CARD_ENRICHMENT_MAX_ATTEMPTS}},
+        {"enrichment_status": "processing", "enrichment_claimed_at": {"$lt": stale}}
+    ]}
+
+
+async def enrich_cards(db, cards: List[Dict]) -> int:
+    """
+    Enrich cards in turn; failures are marked for the background sweep. Returns cards enriched.
+    
+    Each card is claimed first so the sweep and a scheduled task never
+    enrich the same card at once.
+    """
+    enriched = 0
+    for card in cards:
+        async with _enrichment_slots:
+            now = datetime.now(timezone.utc)
+            claim = await db.mistake_cards.update_one(
+                {**_enrichment_due_query(now), "card_id": card["card_id"]},
+                {"$set": {"enrichment_status": "processing", "enrichment_claimed_at": now.isoformat()}}
+            )
+            if not claim.modified_count:
+                continue  # Already taken or done
+            try:
+                result = await enrich_mistake_card(db, card)
+                if result["enrichment_status"] == "done":
+                    enriched += 1
+            except Exception as e:
+                logger.warning(f"Card enrichment failed for {card.get('card_id')}: {e}")
+                await db.mistake_cards.update_one(
+                    {"card_id": card["card_id"]},
+                    {"$set": {"enrichment_status": "failed", "enrichment_error": str(e)},
+                     "$inc": {"enrichment_attempts": 1}}
+                )
+    return enriched
+
+
+def schedule_card_enrichment(db, cards: List[Dict]) -> Optional[asyncio.Task]:
+    """Enqueue background enrichment for newly created cards (non-blocking)"""
+    if not cards:
+        return None
+    task = asyncio.create_task(enrich_cards(db, cards))
+    # Keep a reference so the task is not garbage-collected mid-run
+    _enrichment_tasks.add(task)
+    task.add_done_callback(_enrichment_tasks.discard)
+    return task
+
+
+async def enrich_pending_cards(db, limit: int = CARD_ENRICHMENT_SWEEP_LIMIT) -> int:
+    """
+    Background sweep: enrich cards whose job never ran (restart, older cards),
+    failed fewer than CARD_ENRICHMENT_MAX_ATTEMPTS times, or was left in
+    "processing" by a dead worker.
+    """
+    cards = await db.mistake_cards.find(
+        _enrichment_due_query(datetime.now(timezone.utc)),
+        {"_id": 0}
+    ).limit(limit).to_list(limit)
+    if not cards:
+        return 0
+    return await enrich_cards(db, cards)
+
+
 # =============================================================================
 # CARD RETRIEVAL
 # =============================================================================
@@ -466,6 +651,7 @@ async def record_card_attempt(db, card_id: str, user_id: str, correct: bool) ->
         {"card_id": card_id},
         {"$set": update_data}
     )
+    await bump_user_generation(db, user_id)
     
     # Update habit progress if card was mastered
     if schedule_update.get("is_mastered") and not card.get("is_mastered"):
@@ -579,6 +765,7 @@ async def update_user_habit_progress(db, user_id: str) -> Dict:
         {"$set": progress},
         upsert=True
     )
+    await bump_user_generation(db, user_id)
     
     return progress
 
@@ -605,6 +792,7 @@ async def set_active_habit(db, user_id: str, habit_key: str) -> Dict:
         }},
         upsert=True
     )
+    await bump_user_generation(db, user_id)
     
     return await get_user_habit_progress(db, user_id)
 
@@ -817,6 +1005,17 @@ async def generate_why_question(db, card: Dict) -> Dict:
         elif "attack" in explanation.lower():
             correct_reason = "It creates a stronger counter-threat"
     
+    # Name the concrete punishment when the refutation is known (enriched cards)
+    refutation = card.get("refutation")
+    if refutation:
+        refutation_move = refutation.get("refutation_move") or ""
+        if refutation_move.endswith("#"):
+            correct_reason = f"It stops mate with {refutation_move}"
+        elif refutation.get("is_check"):
+            correct_reason = f"It stops the {refutation_move} check"
+        elif refutation.get("is_capture") and refutation.get("captured_piece"):
+            correct_reason = f"It stops {refutation_move} winning your {refutation['captured_piece']}"
+    
     # Select 2 plausible distractors (not the same as correct)
     distractors = [d for d in generic_distractors if d.lower() != correct_reason.lower()]
     selected_distractors = random.sample(distractors, min(2, len(distractors)))
@@ -836,6 +1035,8 @@ async def generate_why_question(db, card: Dict) -> Dict:
         "correct_explanation": correct_reason,
         "hint": f"Think about what {habit_tag.replace('_', ' ')} means in this position.",
         "threat_line": threat_line[:5] if threat_line else [],
-        "better_line": better_line[:5] if better_line else []
+        "better_line": better_line[:5] if better_line else [],
+        "refutation_move": refutation.get("refutation_move") if refutation else None,
+        "best_continuation": card.get("best_continuation", [])
     }
 
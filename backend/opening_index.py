@@ -0,0 +1,164 @@
+"""
+Opening Index - shared ECO opening classifier
+
+Built once per process from the ECO tables in data/:
+- eco_openings.json: ECO code -> opening name
+- eco_lines.json: ECO code -> SAN mainline(s), with an optional name for
+  lines the code's single name doesn't fit (e.g. 1.d4 Nf6 is filed under
+  A45 "Trompowsky Attack" but is only an "Indian Game")
+
+Every line is replayed once and its final position is stored in a
+zobrist-hash map. A game is classified by walking its positions and
+keeping the deepest one found in the map, so move-order transpositions
+land on the same opening and classification costs one dict lookup per ply.
+
+opening_service and chess_journey_service both classify through this
+index, so they report identical opening names.
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable
+
+import chess
+import chess.polyglot
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+ECO_NAMES_FILE = DATA_DIR / "eco_openings.json"
+ECO_LINES_FILE = DATA_DIR / "eco_lines.json"
+
+# Openings are decided early; later plies are never looked up
+MAX_CLASSIFY_PLIES = 30
+
+# Generic names by ECO volume, for codes missing from eco_openings.json
+ECO_VOLUME_NAMES = {
+    "A": "Flank Opening",
+    "B": "Semi-Open Game",
+    "C": "Open Game",
+    "D": "Closed Game",
+    "E": "Indian Defense"
+}
+
+_ECO_CODE_RE = re.compile(r'^[A-E]\d{2}$')
+
+
+def _zobrist(board: chess.Board) -> str:
+    # Same encoding as game_record_service.zobrist_key
+    return f"{chess.polyglot.zobrist_hash(board):016x}"
+
+
+class OpeningIndex:
+    """Position-hash map of named ECO positions"""
+
+    def __init__(self, eco_names: Dict[str, str], eco_lines: Iterable[List[str]]):
+        eco_lines = list(eco_lines)
+        self.eco_names = eco_names
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        line_names = [line[2] for line in eco_lines if len(line) > 2]
+        self.family_aliases = self._build_family_aliases(list(eco_names.values()) + line_names)
+        self.skipped_lines = 0
+
+        for eco, moves, *name in eco_lines:
+            self._add_line(eco, moves.split(), name[0] if name else None)
+
+    def _add_line(self, eco: str, san_moves: List[str], name: Optional[str] = None) -> None:
+        board = chess.Board()
+        try:
+            for san in san_moves:
+                board.push_san(san)
+        except ValueError as e:
+            logger.warning(f"Skipping illegal ECO line {eco} '{' '.join(san_moves)}': {e}")
+            self.skipped_lines += 1
+            return
+
+        key = _zobrist(board)
+        if key in self.positions:
+            # Same position reached by another line - first entry wins
+            return
+        self.positions[key] = self.describe(eco, ply=len(san_moves), name=name)
+
+    @staticmethod
+    def _build_family_aliases(names: Iterable[str]) -> Dict[str, str]:
+        """
+        Map short family prefixes to their full names, e.g. "Italian" ->
+        "Italian Game", "King's Indian" -> "King's Indian Defense", so
+        "Italian: Giuoco Piano" groups with "Italian Game".
+        """
+        full_names = {name for name in names if ":" not in name}
+        aliases = {}
+        for name in names:
+            prefix = name.split(":")[0].strip()
+            if prefix in full_names:
+                continue
+            candidates = sorted(n for n in full_names if n.startswith(prefix + " "))
+            if candidates:
+                aliases[prefix] = candidates[0]
+        return aliases
+
+    def describe(self, eco: str, ply: int = 0, name: Optional[str] = None) -> Dict[str, Any]:
+        """Name, family and variation for an ECO code (or a line's own name)"""
+        name = name or self.eco_names.get(eco) or ECO_VOLUME_NAMES.get(eco[:1], "Unknown Opening")
+        prefix, _, variation = name.partition(":")
+        prefix = prefix.strip()
+        return {
+            "eco": eco,
+            "name": name,
+            "family": self.family_aliases.get(prefix, prefix),
+            "variation": variation.strip(),
+            "ply": ply
+        }
+
+    def classify_hashes(self, zobrist: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Classify from per-ply position hashes (game record "zobrist" array,
+        index 0 = start position). Returns the deepest named position.
+        """
+        best = None
+        for key in zobrist[1:MAX_CLASSIFY_PLIES + 1]:
+            entry = self.positions.get(key)
+            if entry is not None:
+                best = entry
+        return best
+
+    def classify_moves(self, san_moves: List[str]) -> Optional[Dict[str, Any]]:
+        """Classify from a SAN move list (replays up to MAX_CLASSIFY_PLIES)"""
+        board = chess.Board()
+        hashes = [_zobrist(board)]
+        for san in san_moves[:MAX_CLASSIFY_PLIES]:
+            try:
+                board.push_san(san)
+            except ValueError:
+                break
+            hashes.append(_zobrist(board))
+        return self.classify_hashes(hashes)
+
+    def classify_eco(self, eco_code: str) -> Optional[Dict[str, Any]]:
+        """Describe a bare ECO code (e.g. from the PGN ECO header)"""
+        eco_code = (eco_code or "").strip().upper()
+        if not _ECO_CODE_RE.match(eco_code):
+            return None
+        return self.describe(eco_code)
+
+
+def _load_json(path: Path) -> Any:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load {path.name}: {e}")
+        return {}
+
+
+@lru_cache(maxsize=1)
+def get_opening_index() -> OpeningIndex:
+    """The process-wide opening index (built on first use)"""
+    names = {k: v for k, v in _load_json(ECO_NAMES_FILE).items() if not k.startswith("_")}
+    lines = _load_json(ECO_LINES_FILE).get("lines", [])
+    index = OpeningIndex(names, lines)
+    logger.info(f"Opening index loaded: {len(index.positions)} positions, {len(names)} ECO codes")
+    return index
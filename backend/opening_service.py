@@ -12,6 +12,9 @@ import chess
 import chess.pgn
 import io
 
+from game_record_service import get_game_records
+from opening_index import get_opening_index
+
 # =============================================================================
 # OPENING COACHING DATABASE - Specific advice for each opening
 # =============================================================================
@@ -209,70 +212,6 @@ OPENING_COACHING = {
     },
 }
 
-# Common opening classifications (simplified)
-OPENING_DATABASE = {
-    # e4 openings
-    "e4 e5": {
-        "name": "Open Game",
-        "variations": {
-            "e4 e5 Nf3 Nc6 Bb5": "Ruy Lopez",
-            "e4 e5 Nf3 Nc6 Bc4": "Italian Game",
-            "e4 e5 Nf3 Nc6 d4": "Scotch Game",
-            "e4 e5 Nf3 Nf6": "Petrov Defense",
-            "e4 e5 f4": "King's Gambit",
-            "e4 e5 Nc3": "Vienna Game",
-            "e4 e5 Bc4": "Bishop's Opening",
-        }
-    },
-    "e4 c5": {
-        "name": "Sicilian Defense",
-        "variations": {
-            "e4 c5 Nf3 d6": "Sicilian Najdorf/Dragon",
-            "e4 c5 Nf3 Nc6": "Sicilian Classical",
-            "e4 c5 Nf3 e6": "Sicilian Scheveningen/Kan",
-            "e4 c5 c3": "Sicilian Alapin",
-            "e4 c5 Nc3": "Sicilian Closed",
-        }
-    },
-    "e4 e6": {"name": "French Defense", "variations": {}},
-    "e4 c6": {"name": "Caro-Kann Defense", "variations": {}},
-    "e4 d5": {"name": "Scandinavian Defense", "variations": {}},
-    "e4 d6": {"name": "Pirc Defense", "variations": {}},
-    "e4 Nf6": {"name": "Alekhine Defense", "variations": {}},
-    "e4 g6": {"name": "Modern Defense", "variations": {}},
-    
-    # d4 openings
-    "d4 d5": {
-        "name": "Closed Game",
-        "variations": {
-            "d4 d5 c4": "Queen's Gambit",
-            "d4 d5 c4 e6": "Queen's Gambit Declined",
-            "d4 d5 c4 dxc4": "Queen's Gambit Accepted",
-            "d4 d5 c4 c6": "Slav Defense",
-            "d4 d5 Nf3": "Queen's Pawn Game",
-            "d4 d5 Bf4": "London System",
-        }
-    },
-    "d4 Nf6": {
-        "name": "Indian Defense",
-        "variations": {
-            "d4 Nf6 c4 g6": "King's Indian Defense",
-            "d4 Nf6 c4 e6": "Nimzo/Queen's Indian",
-            "d4 Nf6 c4 c5": "Benoni Defense",
-            "d4 Nf6 Nf3": "Indian Game",
-            "d4 Nf6 Bf4": "London System",
-        }
-    },
-    "d4 f5": {"name": "Dutch Defense", "variations": {}},
-    "d4 d6": {"name": "Old Indian Defense", "variations": {}},
-    
-    # Other openings
-    "c4": {"name": "English Opening", "variations": {}},
-    "Nf3": {"name": "Reti Opening", "variations": {}},
-    "g3": {"name": "King's Fianchetto", "variations": {}},
-    "b3": {"name": "Larsen's Opening", "variations": {}},
-}
-
 
 def parse_pgn_moves(pgn: str) -> List[str]:
     """Extract move list from PGN"""
@@ -291,52 +230,28 @@ def parse_pgn_moves(pgn: str) -> List[str]:
         return []
 
 
-def classify_opening(moves: List[str]) -> Dict[str, Any]:
-    """Classify the opening based on first moves"""
-    if not moves:
-        return {"name": "Unknown", "eco": "", "variation": ""}
-    
-    # Build move sequence for matching
-    move_seq = " ".join(moves[:10])
-    first_move = moves[0] if moves else ""
-    second_move = f"{moves[0]} {moves[1]}" if len(moves) > 1 else first_move
-    
-    # Try to match against database
-    best_match = {"name": "Unknown", "variation": "", "moves_matched": 0}
-    
-    for key, data in OPENING_DATABASE.items():
-        if move_seq.startswith(key) or second_move.startswith(key):
-            if len(key.split()) > best_match["moves_matched"]:
-                best_match = {
-                    "name": data["name"],
-                    "variation": "",
-                    "moves_matched": len(key.split())
-                }
-                
-                # Check for variations
-                for var_key, var_name in data.get("variations", {}).items():
-                    if move_seq.startswith(var_key):
-                        if len(var_key.split()) > best_match["moves_matched"]:
-                            best_match = {
-                                "name": var_name,
-                                "variation": data["name"],
-                                "moves_matched": len(var_key.split())
-                            }
-    
-    # Fallback classifications
-    if best_match["name"] == "Unknown":
-        if first_move == "e4":
-            best_match["name"] = "King's Pawn Opening"
-        elif first_move == "d4":
-            best_match["name"] = "Queen's Pawn Opening"
-        elif first_move == "c4":
-            best_match["name"] = "English Opening"
-        elif first_move == "Nf3":
-            best_match["name"] = "Reti Opening"
-        elif first_move in ["g3", "b3", "f4", "Nc3"]:
-            best_match["name"] = f"Irregular Opening ({first_move})"
-    
-    return best_match
+def classify_opening(moves: List[str], zobrist: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Classify the opening via the shared ECO opening index.
+    
+    Uses the game record's per-ply position hashes when given (no replay),
+    otherwise replays the SAN moves. Matching is by position, so
+    transposed move orders get the same opening.
+    """
+    if not moves and not zobrist:
+        return {"name": "Unknown", "eco": "", "variation": "", "moves_matched": 0}
+    
+    index = get_opening_index()
+    match = index.classify_hashes(zobrist) if zobrist else index.classify_moves(moves)
+    if match is None:
+        match = index.describe("A00")
+    
+    return {
+        "name": match["family"],
+        "eco": match["eco"],
+        "variation": match["variation"],
+        "moves_matched": match["ply"]
+    }
 
 
 def analyze_opening_mistakes(moves: List[str], analysis: Dict, user_color: str) -> List[Dict]:
@@ -379,7 +294,7 @@ async def analyze_opening_repertoire(db, user_id: str) -> Dict[str, Any]:
     # Get all user's games with analyses
     games = await db.games.find(
         {"user_id": user_id},
-        {"_id": 0, "game_id": 1, "pgn": 1, "user_color": 1, "result": 1, "white_player": 1, "black_player": 1}
+        {"_id": 0, "game_id": 1, "user_id": 1, "pgn": 1, "user_color": 1, "result": 1, "white_player": 1, "black_player": 1}
     ).to_list(200)
     
     analyses = {}
@@ -392,6 +307,9 @@ async def analyze_opening_repertoire(db, user_id: str) -> Dict[str, Any]:
             "message": "No games found. Import games to see your opening repertoire analysis."
         }
     
+    # Parsed move lists come from the stored game records (one $in query)
+    records = await get_game_records(db, games, fields=["san", "zobrist"])
+    
     # Analyze each game
     white_openings = defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0, "games": [], "mistakes": []})
     black_openings = defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0, "games": [], "mistakes": []})
@@ -405,11 +323,12 @@ async def analyze_opening_repertoire(db, user_id: str) -> Dict[str, Any]:
         result = game.get("result", "")
         game_id = game.get("game_id")
         
-        moves = parse_pgn_moves(pgn)
+        record = records.get(game_id)
+        moves = record["san"] if record else parse_pgn_moves(pgn)
         if not moves:
             continue
         
-        opening = classify_opening(moves)
+        opening = classify_opening(moves, record.get("zobrist") if record else None)
         opening_name = opening["name"]
         
         # Determine game outcome from user's perspective
@@ -5,22 +5,66 @@ Generates refutation moves and explanations for chess mistakes.
 Uses Stockfish for move analysis and LLM for human-readable explanations.
 """
 
+import asyncio
 import chess
 import logging
 from typing import Dict, Optional, List
 import os
 
 # Import centralized config
-from config import LLM_PROVIDER, LLM_MODEL, STOCKFISH_PATH
+from config import LLM_MODEL, STOCKFISH_PATH, STOCKFISH_PV_DEPTH
+
+# Pooled, cached engine layer shared with the game analysis
+from stockfish_service import evaluate_fen
+from llm_service import call_llm
 
 logger = logging.getLogger(__name__)
 
-# Try to import Stockfish
-try:
-    from stockfish import Stockfish
-    STOCKFISH_AVAILABLE = os.path.exists(STOCKFISH_PATH)
-except ImportError:
-    STOCKFISH_AVAILABLE = False
+STOCKFISH_AVAILABLE = os.path.exists(STOCKFISH_PATH)
+
+
+def _parse_move(board: chess.Board, move_text: str) -> Optional[chess.Move]:
+    """Parse a SAN or UCI move string, None if it is not legal here"""
+    try:
+        return board.parse_san(move_text)
+    except ValueError:
+        try:
+            move = chess.Move.from_uci(move_text)
+            return move if move in board.legal_moves else None
+        except ValueError:
+            return None
+
+
+def _refutation_details(board: chess.Board, refutation_move: chess.Move, line: List[str]) -> Dict:
+    """Refutation dict for a reply on the board after the user's move (board is not modified)"""
+    fen_after_user_move = board.fen()
+    refutation_san = board.san(refutation_move)
+    
+    # Determine threat square and capture info
+    is_capture = board.is_capture(refutation_move)
+    captured_piece = None
+    if is_capture:
+        captured = board.piece_at(refutation_move.to_square)
+        if captured:
+            piece_names = {1: "pawn", 2: "knight", 3: "bishop", 4: "rook", 5: "queen", 6: "king"}
+            captured_piece = piece_names.get(captured.piece_type, "piece")
+    
+    # Make the refutation move to get final position
+    after = board.copy(stack=False)
+    after.push(refutation_move)
+    
+    return {
+        "refutation_move": refutation_san,
+        "refutation_uci": refutation_move.uci(),
+        "threat_square": chess.square_name(refutation_move.to_square),
+        "from_square": chess.square_name(refutation_move.from_square),
+        "is_check": after.is_check(),
+        "is_capture": is_capture,
+        "captured_piece": captured_piece,
+        "fen_after_user_move": fen_after_user_move,
+        "fen_after_refutation": after.fen(),
+        "refutation_line": line
+    }
 
 
 def get_refutation(fen: str, user_move_san: str, depth: int = 15) -> Optional[Dict]:
@@ -36,73 +80,55 @@ def get_refutation(fen: str, user_move_san: str, depth: int = 15) -> Optional[Di
             "is_capture": True,
             "captured_piece": "pawn",
             "fen_after_user_move": "...",
-            "fen_after_refutation": "..."
+            "fen_after_refutation": "...",
+            "refutation_line": ["Qxf7+", "Ke7", ...]  # Engine PV from the refutation
         }
     """
     if not STOCKFISH_AVAILABLE:
         return None
     
     try:
-        stockfish = Stockfish(path=STOCKFISH_PATH, depth=depth)
-        stockfish.set_fen_position(fen)
-        
         # Make the user's move
         board = chess.Board(fen)
-        try:
-            user_move = board.parse_san(user_move_san)
-        except ValueError:
-            # Try UCI format
-            try:
-                user_move = chess.Move.from_uci(user_move_san)
-            except:
-                return None
-        
+        user_move = _parse_move(board, user_move_san)
+        if user_move is None:
+            return None
         board.push(user_move)
-        fen_after_user_move = board.fen()
-        
-        # Get opponent's best reply (the refutation)
-        stockfish.set_fen_position(fen_after_user_move)
-        best_reply = stockfish.get_best_move()
         
-        if not best_reply:
+        # Get opponent's best reply (the refutation) and its line from one search
+        result = evaluate_fen(board.fen(), depth=depth, multipv=1)
+        if not result["top_moves"]:
             return None
-        
-        # Parse the refutation move
-        refutation_move = chess.Move.from_uci(best_reply)
-        refutation_san = board.san(refutation_move)
-        
-        # Determine threat square and capture info
-        to_square = chess.square_name(refutation_move.to_square)
-        is_capture = board.is_capture(refutation_move)
-        captured_piece = None
-        if is_capture:
-            captured = board.piece_at(refutation_move.to_square)
-            if captured:
-                piece_names = {1: "pawn", 2: "knight", 3: "bishop", 4: "rook", 5: "queen", 6: "king"}
-                captured_piece = piece_names.get(captured.piece_type, "piece")
-        
-        # Make the refutation move to get final position
-        board.push(refutation_move)
-        is_check = board.is_check()
-        fen_after_refutation = board.fen()
-        
-        return {
-            "refutation_move": refutation_san,
-            "refutation_uci": best_reply,
-            "threat_square": to_square,
-            "from_square": chess.square_name(refutation_move.from_square),
-            "is_check": is_check,
-            "is_capture": is_capture,
-            "captured_piece": captured_piece,
-            "fen_after_user_move": fen_after_user_move,
-            "fen_after_refutation": fen_after_refutation
-        }
+        top = result["top_moves"][0]
+        return _refutation_details(board, chess.Move.from_uci(top["move_uci"]), top["pv"])
         
     except Exception as e:
         logger.error(f"Refutation analysis error: {e}")
         return None
 
 
+def refutation_from_line(fen: str, user_move: str, line: List[str]) -> Optional[Dict]:
+    """
+    Same result as get_refutation, read from a stored engine line instead of
+    a new search (e.g. an analysis' pv_after_played, which starts with the
+    opponent's reply). None if the line does not fit the position.
+    """
+    if not line:
+        return None
+    try:
+        board = chess.Board(fen)
+        played = _parse_move(board, user_move)
+        if played is None:
+            return None
+        board.push(played)
+        reply = _parse_move(board, line[0])
+        if reply is None:
+            return None
+        return _refutation_details(board, reply, list(line))
+    except ValueError:
+        return None
+
+
 async def generate_idea_chain_explanation(
     fen: str,
     user_move: str,
@@ -124,8 +150,6 @@ async def generate_idea_chain_explanation(
         }
     """
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
         refutation_move = refutation.get("refutation_move", "")
         is_check = refutation.get("is_check", False)
         is_capture = refutation.get("is_capture", False)
@@ -154,15 +178,7 @@ WHY_IT_WORKS: [Why the opponent's reply is strong]
 BETTER_PLAN: [What {best_move} achieves]
 RULE: [A simple rule to remember for next time]"""
 
-        import uuid
-        chat = LlmChat(
-            api_key=os.environ.get("EMERGENT_LLM_KEY", ""),
-            session_id=f"pdr_idea_{uuid.uuid4().hex[:8]}",
-            system_message=system_prompt
-        ).with_model(LLM_PROVIDER, LLM_MODEL)
-        
-        message = UserMessage(text=user_prompt)
-        response = await chat.send_message(message)
+        response = await call_llm(system_prompt, user_prompt, model=LLM_MODEL, caller="pdr_idea_explanation")
         
         # Parse response
         text = response.strip() if isinstance(response, str) else str(response)
@@ -276,8 +292,6 @@ async def generate_why_options(fen: str, best_move: str, user_move: str, refutat
     Returns one correct reason and two plausible but wrong reasons.
     """
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        import uuid
         import random
         
         refutation_move = refutation.get("refutation_move", "") if refutation else ""
@@ -299,14 +313,7 @@ CORRECT: [the actual reason this move is good]
 WRONG1: [sounds reasonable but not the key reason]
 WRONG2: [sounds reasonable but not the key reason]"""
 
-        chat = LlmChat(
-            api_key=os.environ.get("EMERGENT_LLM_KEY", ""),
-            session_id=f"pdr_why_{uuid.uuid4().hex[:8]}",
-            system_message=system_prompt
-        ).with_model(LLM_PROVIDER, LLM_MODEL)
-        
-        message = UserMessage(text=user_prompt)
-        response = await chat.send_message(message)
+        response = await call_llm(system_prompt, user_prompt, model=LLM_MODEL, caller="pdr_why_options")
         
         text = response.strip() if isinstance(response, str) else str(response)
         
@@ -339,7 +346,7 @@ WRONG2: [sounds reasonable but not the key reason]"""
         random.shuffle(options)
         
         # Also get the continuation line after best move for animation
-        best_line = get_best_continuation(fen, best_move)
+        best_line = await asyncio.to_thread(get_best_continuation, fen, best_move)
         
         return {
             "options": options,
@@ -363,38 +370,24 @@ WRONG2: [sounds reasonable but not the key reason]"""
 def get_best_continuation(fen: str, best_move: str, depth: int = 3) -> Optional[List[str]]:
     """
     Get the best continuation line after the best move (for animation).
-    Returns list of moves in SAN notation.
+    Returns list of moves in SAN notation: best_move plus up to `depth`
+    replies, read from the principal variation of a single search.
     """
     if not STOCKFISH_AVAILABLE:
         return None
     
     try:
-        stockfish = Stockfish(path=STOCKFISH_PATH, depth=12)
         board = chess.Board(fen)
         
         # Make the best move
-        try:
-            move = board.parse_san(best_move)
-        except:
-            try:
-                move = chess.Move.from_uci(best_move)
-            except:
-                return None
+        move = _parse_move(board, best_move)
+        if move is None:
+            return None
         
         board.push(move)
-        line = [best_move]
-        
-        # Get next few moves
-        for _ in range(depth):
-            stockfish.set_fen_position(board.fen())
-            next_move = stockfish.get_best_move()
-            if not next_move:
-                break
-            
-            uci_move = chess.Move.from_uci(next_move)
-            san = board.san(uci_move)
-            line.append(san)
-            board.push(uci_move)
+        result = evaluate_fen(board.fen(), depth=STOCKFISH_PV_DEPTH, multipv=1)
+        pv = result["top_moves"][0]["pv"] if result["top_moves"] else []
+        line = [best_move] + pv[:depth]
         
         return line if len(line) > 1 else None
         
@@ -17,7 +17,9 @@ import chess
 import chess.pgn
 import io
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from game_record_service import record_board_and_moves, get_record_header
 
 logger = logging.getLogger(__name__)
 
@@ -72,19 +74,23 @@ def detect_game_phase(board: chess.Board, move_number: int) -> str:
     Returns: "opening", "middlegame", or "endgame"
     """
     material = count_material(board)
-    
+    return _phase_from_material(
+        material["white_queens"], material["black_queens"], material["total_pieces"], move_number
+    )
+
+
+def _phase_from_material(white_queens: int, black_queens: int, total_pieces: int, move_number: int) -> str:
     # Opening: First 10-15 moves, most pieces still on board
-    if move_number <= 10 and material["total_pieces"] >= 12:
+    if move_number <= 10 and total_pieces >= 12:
         return "opening"
     
     # Endgame conditions:
     # - No queens, or
     # - Queen + at most one minor piece each, or
     # - Very few pieces (<=4 total excluding kings)
-    no_queens = material["white_queens"] == 0 and material["black_queens"] == 0
-    queens_only = (material["white_queens"] <= 1 and material["black_queens"] <= 1 and 
-                   material["total_pieces"] <= 4)
-    few_pieces = material["total_pieces"] <= 4
+    no_queens = white_queens == 0 and black_queens == 0
+    queens_only = white_queens <= 1 and black_queens <= 1 and total_pieces <= 4
+    few_pieces = total_pieces <= 4
     
     if no_queens or queens_only or few_pieces:
         return "endgame"
@@ -92,6 +98,77 @@ def detect_game_phase(board: chess.Board, move_number: int) -> str:
     return "middlegame"
 
 
+class MaterialTracker:
+    """
+    Piece counts kept up to date move by move, so phase detection during a
+    replay costs O(1) per ply instead of a count_material() per position.
+    
+    Call push(board, move) BEFORE board.push(move).
+    """
+    
+    def __init__(self, board: chess.Board):
+        self.queens = [
+            chess.popcount(board.queens & board.occupied_co[chess.BLACK]),
+            chess.popcount(board.queens & board.occupied_co[chess.WHITE])
+        ]
+        self.pieces = chess.popcount(
+            (board.knights | board.bishops | board.rooks | board.queens) & board.occupied
+        )
+        self.plies = 0
+    
+    def _remove(self, color: chess.Color, piece_type: int) -> None:
+        if piece_type == chess.QUEEN:
+            self.queens[color] -= 1
+        if piece_type not in (chess.PAWN, chess.KING):
+            self.pieces -= 1
+    
+    def _add(self, color: chess.Color, piece_type: int) -> None:
+        if piece_type == chess.QUEEN:
+            self.queens[color] += 1
+        self.pieces += 1
+    
+    def push(self, board: chess.Board, move: chess.Move) -> None:
+        if board.is_capture(move) and not board.is_en_passant(move):
+            self._remove(not board.turn, board.piece_type_at(move.to_square))
+        if move.promotion:
+            self._add(board.turn, move.promotion)
+        self.plies += 1
+    
+    @property
+    def move_number(self) -> int:
+        # Same counting as analyze_game_phases: bumps after each black move
+        return 1 + self.plies // 2
+    
+    def phase(self) -> str:
+        return _phase_from_material(
+            self.queens[chess.WHITE], self.queens[chess.BLACK], self.pieces, self.move_number
+        )
+
+
+# Compact per-ply encoding persisted as phase_analysis.ply_phases
+PHASE_CODES = {"opening": "o", "middlegame": "m", "endgame": "e"}
+PHASE_FROM_CODE = {v: k for k, v in PHASE_CODES.items()}
+
+
+def label_game_phases(board: chess.Board, mainline: List[chess.Move]) -> List[str]:
+    """
+    Phase after every ply in a single replay (board is advanced in place).
+    Callers already replaying the game (Stockfish pass) use MaterialTracker directly.
+    """
+    tracker = MaterialTracker(board)
+    labels = []
+    for move in mainline:
+        tracker.push(board, move)
+        board.push(move)
+        labels.append(tracker.phase())
+    return labels
+
+
+def encode_phase_labels(labels: List[str]) -> str:
+    """Per-ply labels as one character each: o(pening), m(iddlegame), e(ndgame)"""
+    return "".join(PHASE_CODES.get(label, "m") for label in labels)
+
+
 def detect_endgame_type(board: chess.Board) -> Dict[str, any]:
     """
     Detect the specific type of endgame for targeted advice.
@@ -734,7 +811,9 @@ def generate_strategic_lesson(phase: str, endgame_info: Dict, user_mistakes: Lis
     return lesson
 
 
-def analyze_game_phases(pgn_string: str, user_color: str = "white", rating: int = 1200) -> Dict[str, any]:
+def analyze_game_phases(pgn_string: str, user_color: str = "white", rating: int = 1200,
+                        record: Optional[Dict[str, Any]] = None,
+                        phase_labels: Optional[List[str]] = None) -> Dict[str, any]:
     """
     Analyze the entire game and provide phase-by-phase breakdown with theory.
     RATING-ADAPTIVE: All content adjusts to player's rating level.
@@ -743,41 +822,65 @@ def analyze_game_phases(pgn_string: str, user_color: str = "white", rating: int
         pgn_string: The PGN of the game
         user_color: "white" or "black"
         rating: Player's chess rating (800-2200+)
+        record: Canonical game record (game_record_service); skips PGN parsing
+        phase_labels: Per-ply phases already computed during the Stockfish
+            replay; with a record, the game is not replayed again
     
     Returns:
         Complete phase analysis with rating-adapted strategic lessons
     """
     try:
-        pgn_io = io.StringIO(pgn_string)
-        game = chess.pgn.read_game(pgn_io)
-        
-        if not game:
-            return {"error": "Could not parse PGN"}
+        if record and phase_labels is not None and len(phase_labels) == record.get("ply_count"):
+            fens = record["fens"]
+            board = chess.Board(fens[-1])
+            result = get_record_header(record, "Result", "*")
+        else:
+            if record:
+                board, mainline = record_board_and_moves(record)
+                result = get_record_header(record, "Result", "*")
+            else:
+                pgn_io = io.StringIO(pgn_string)
+                game = chess.pgn.read_game(pgn_io)
+                
+                if not game:
+                    return {"error": "Could not parse PGN"}
+                
+                board, mainline = game.board(), list(game.mainline_moves())
+                result = game.headers.get("Result", "*")
+            
+            # Single replay; FENs are only needed at phase transitions
+            fens = [board.fen()]
+            tracker = MaterialTracker(board)
+            phase_labels = []
+            previous = "opening"
+            for move in mainline:
+                tracker.push(board, move)
+                board.push(move)
+                phase = tracker.phase()
+                fens.append(board.fen() if phase != previous else None)
+                phase_labels.append(phase)
+                previous = phase
         
-        board = game.board()
         phases = []
         current_phase = "opening"
         phase_start_move = 1
-        phase_start_fen = board.fen()
+        phase_start_fen = fens[0]
         
         move_number = 1
         phase_transitions = []
         
-        for i, move in enumerate(game.mainline_moves()):
-            board.push(move)
+        for i, new_phase in enumerate(phase_labels):
             is_white_move = (i % 2 == 0)
             if not is_white_move:
                 move_number += 1
             
-            new_phase = detect_game_phase(board, move_number)
-            
             if new_phase != current_phase:
                 # Record the phase transition
-                transition_fen = board.fen()
+                transition_fen = fens[i + 1]
                 phases.append({
                     "phase": current_phase,
                     "start_move": phase_start_move,
-                    "end_move": move_number - 1 if new_phase != current_phase else move_number,
+                    "end_move": move_number - 1,
                     "duration_moves": (move_number - 1) - phase_start_move + 1,
                     "start_fen": phase_start_fen
                 })
@@ -809,7 +912,6 @@ def analyze_game_phases(pgn_string: str, user_color: str = "white", rating: int
         final_theory = get_phase_theory(current_phase, endgame_info, rating)
         
         # Generate RATING-ADAPTIVE strategic lesson
-        result = game.headers.get("Result", "*")
         lesson = generate_strategic_lesson(current_phase, endgame_info or {}, [], user_color, result, rating)
         
         # Generate a simple phase summary for display
@@ -823,6 +925,7 @@ def analyze_game_phases(pgn_string: str, user_color: str = "white", rating: int
             "theory": final_theory,
             "strategic_lesson": lesson,
             "total_moves": move_number,
+            "ply_phases": encode_phase_labels(phase_labels),
             "phase_summary": phase_summary,
             "rating_bracket": get_rating_bracket(rating)
         }
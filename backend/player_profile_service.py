@@ -14,6 +14,8 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import math
 
+from response_cache_service import bump_user_generation
+
 logger = logging.getLogger(__name__)
 
 # ==================== CONSTANTS & ENUMS ====================
@@ -425,6 +427,7 @@ async def update_weakness_tracking(
             "last_updated": current_time.isoformat()
         }}
     )
+    await bump_user_generation(db, user_id)
     
     return {"top_weaknesses": top_weaknesses[:3]}  # Return top 3 for immediate use
 
@@ -530,6 +533,7 @@ async def record_challenge_result(
         {"user_id": user_id},
         {"$set": update_data}
     )
+    await bump_user_generation(db, user_id)
     
     return {
         "success": success,
@@ -561,6 +565,67 @@ async def get_or_create_profile(db, user_id: str, user_name: str) -> Dict[str, A
     return new_profile
 
 
+def merge_strengths(
+    strengths: List[Dict[str, Any]],
+    identified_strengths: Optional[List[Dict[str, str]]]
+) -> List[Dict[str, Any]]:
+    """
+    Add newly identified strengths to the profile's list (top 5 by evidence).
+    Subcategories that read like weaknesses are filtered out.
+    """
+    # Negative keywords that indicate a weakness, not a strength
+    NEGATIVE_KEYWORDS = [
+        'blunder', 'miss', 'poor', 'weak', 'bad', 'not_', 'ignore', 'fail',
+        'neglect', 'losing', 'lost', 'dropped', 'hung', 'mistake', 'error',
+        'oversight', 'blind', 'inaccur', 'premature', 'early', 'late', 'slow',
+        'passive', 'cramped', 'trapped', 'fork_miss', 'pin_miss', 'skewer_miss',
+        'back_rank', 'one_move', 'hope_chess', 'time_trouble', 'tunnel_vision'
+    ]
+    
+    def is_valid_strength(subcategory: str) -> bool:
+        """Check if a subcategory represents a genuine strength, not a weakness."""
+        subcat_lower = subcategory.lower()
+        for neg in NEGATIVE_KEYWORDS:
+            if neg in subcat_lower:
+                return False
+        return True
+    
+    if identified_strengths:
+        for strength in identified_strengths:
+            subcategory = strength.get("subcategory", "general")
+            
+            # Skip if this looks like a weakness, not a strength
+            if not is_valid_strength(subcategory):
+                logger.warning(f"Filtered out invalid strength: {subcategory}")
+                continue
+            
+            strength_key = normalize_weakness_key(
+                strength.get("category", "tactical"),
+                subcategory
+            )
+            
+            # Check if strength already exists
+            found = False
+            for s in strengths:
+                if normalize_weakness_key(s["category"], s["subcategory"]) == strength_key:
+                    s["evidence_count"] = s.get("evidence_count", 1) + 1
+                    found = True
+                    break
+            
+            if not found:
+                strengths.append({
+                    "category": strength.get("category"),
+                    "subcategory": subcategory,
+                    "evidence_count": 1
+                })
+        
+        # Sort and keep top 5 strengths
+        strengths.sort(key=lambda x: x.get("evidence_count", 0), reverse=True)
+        strengths = strengths[:5]
+    
+    return strengths
+
+
 async def update_profile_after_analysis(
     db,
     user_id: str,
@@ -632,57 +697,8 @@ async def update_profile_after_analysis(
     # Update weaknesses
     await update_weakness_tracking(db, user_id, identified_weaknesses, current_time)
     
-    # Negative keywords that indicate a weakness, not a strength
-    NEGATIVE_KEYWORDS = [
-        'blunder', 'miss', 'poor', 'weak', 'bad', 'not_', 'ignore', 'fail',
-        'neglect', 'losing', 'lost', 'dropped', 'hung', 'mistake', 'error',
-        'oversight', 'blind', 'inaccur', 'premature', 'early', 'late', 'slow',
-        'passive', 'cramped', 'trapped', 'fork_miss', 'pin_miss', 'skewer_miss',
-        'back_rank', 'one_move', 'hope_chess', 'time_trouble', 'tunnel_vision'
-    ]
-    
-    def is_valid_strength(subcategory: str) -> bool:
-        """Check if a subcategory represents a genuine strength, not a weakness."""
-        subcat_lower = subcategory.lower()
-        for neg in NEGATIVE_KEYWORDS:
-            if neg in subcat_lower:
-                return False
-        return True
-    
     # Update strengths if provided (with validation)
-    strengths = profile.get("strengths", [])
-    if identified_strengths:
-        for strength in identified_strengths:
-            subcategory = strength.get("subcategory", "general")
-            
-            # Skip if this looks like a weakness, not a strength
-            if not is_valid_strength(subcategory):
-                logger.warning(f"Filtered out invalid strength: {subcategory}")
-                continue
-            
-            strength_key = normalize_weakness_key(
-                strength.get("category", "tactical"),
-                subcategory
-            )
-            
-            # Check if strength already exists
-            found = False
-            for s in strengths:
-                if normalize_weakness_key(s["category"], s["subcategory"]) == strength_key:
-                    s["evidence_count"] = s.get("evidence_count", 1) + 1
-                    found = True
-                    break
-            
-            if not found:
-                strengths.append({
-                    "category": strength.get("category"),
-                    "subcategory": subcategory,
-                    "evidence_count": 1
-                })
-        
-        # Sort and keep top 5 strengths
-        strengths.sort(key=lambda x: x.get("evidence_count", 0), reverse=True)
-        strengths = strengths[:5]
+    strengths = merge_strengths(profile.get("strengths", []), identified_strengths)
     
     # Build update document
     update_data = {
@@ -705,6 +721,7 @@ async def update_profile_after_analysis(
         {"user_id": user_id},
         {"$set": update_data}
     )
+    await bump_user_generation(db, user_id)
     
     # Get updated profile
     updated_profile = await db.player_profiles.find_one(
@@ -715,6 +732,39 @@ async def update_profile_after_analysis(
     return updated_profile
 
 
+async def update_profile_habits(
+    db,
+    user_id: str,
+    identified_weaknesses: List[Dict[str, str]],
+    identified_strengths: Optional[List[Dict[str, str]]] = None
+) -> None:
+    """
+    Apply the weaknesses and strengths from a game's coaching commentary.
+    Used when commentary arrives after the game was counted by
+    update_profile_after_analysis (two-phase auto-analysis).
+    """
+    current_time = datetime.now(timezone.utc)
+    
+    profile = await db.player_profiles.find_one(
+        {"user_id": user_id},
+        {"_id": 0, "strengths": 1}
+    )
+    if not profile:
+        return
+    
+    await update_weakness_tracking(db, user_id, identified_weaknesses, current_time)
+    
+    if identified_strengths:
+        await db.player_profiles.update_one(
+            {"user_id": user_id},
+            {"$set": {
+                "strengths": merge_strengths(profile.get("strengths", []), identified_strengths),
+                "last_updated": current_time.isoformat()
+            }}
+        )
+        await bump_user_generation(db, user_id)
+
+
 def calculate_improvement_trend(
     recent: List[Dict],
     historical: List[Dict]
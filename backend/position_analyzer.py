@@ -11,11 +11,15 @@ Patterns detected:
 - Discovered attacks
 - Back rank weaknesses
 - Overloaded pieces
+
+Detectors work on python-chess bitboard masks (occupied_co, attackers_mask,
+attacks_mask, pin_mask). scan_fens() runs them over a whole sequence of
+positions for per-ply motif flags.
 """
 
 import chess
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -132,23 +136,24 @@ def analyze_position_tactics(fen: str, user_color: str = "white") -> Dict:
     }
 
 
+def _pieces_worth_forking(board: chess.Board, color: chess.Color) -> int:
+    """Mask of knights, bishops, rooks and queens (value >= 3) of a color"""
+    return board.occupied_co[color] & (board.knights | board.bishops | board.rooks | board.queens)
+
+
 def find_hanging_pieces(board: chess.Board, color: chess.Color) -> List[Dict]:
     """Find pieces that are attacked but not defended."""
     hanging = []
     
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == color:
-            attackers = board.attackers(not color, square)
-            defenders = board.attackers(color, square)
-            
-            if attackers and not defenders:
-                # Piece is attacked but has no defenders
-                hanging.append({
-                    "square": square,
-                    "piece": piece.piece_type,
-                    "attackers": len(attackers)
-                })
+    for square in chess.scan_forward(board.occupied_co[color]):
+        attackers = board.attackers_mask(not color, square)
+        if attackers and not board.is_attacked_by(color, square):
+            # Piece is attacked but has no defenders
+            hanging.append({
+                "square": square,
+                "piece": board.piece_type_at(square),
+                "attackers": chess.popcount(attackers)
+            })
     
     # Sort by piece value (most valuable first)
     hanging.sort(key=lambda x: PIECE_VALUES[x["piece"]], reverse=True)
@@ -159,16 +164,12 @@ def find_loose_pieces(board: chess.Board, color: chess.Color) -> List[Dict]:
     """Find pieces that have no defenders (even if not attacked)."""
     loose = []
     
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == color and piece.piece_type != chess.KING:
-            defenders = board.attackers(color, square)
-            
-            if not defenders:
-                loose.append({
-                    "square": square,
-                    "piece": piece.piece_type
-                })
+    for square in chess.scan_forward(board.occupied_co[color] & ~board.kings):
+        if not board.is_attacked_by(color, square):
+            loose.append({
+                "square": square,
+                "piece": board.piece_type_at(square)
+            })
     
     return loose
 
@@ -176,114 +177,345 @@ def find_loose_pieces(board: chess.Board, color: chess.Color) -> List[Dict]:
 def find_forks(board: chess.Board, attacking_color: chess.Color) -> List[Dict]:
     """Find pieces that are forking (attacking) multiple valuable pieces."""
     forks = []
-    target_color = not attacking_color
-    
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == attacking_color:
-            # Get all squares this piece attacks
-            attacks = list(board.attacks(square))
-            
-            # Find valuable pieces being attacked
-            valuable_targets = []
-            for target_sq in attacks:
-                target_piece = board.piece_at(target_sq)
-                if target_piece and target_piece.color == target_color:
-                    if PIECE_VALUES[target_piece.piece_type] >= 3:  # Knight or higher
-                        valuable_targets.append({
-                            "square": target_sq,
-                            "piece": target_piece.piece_type
-                        })
-            
-            # If attacking 2+ valuable pieces, it's a fork
-            if len(valuable_targets) >= 2:
-                forks.append({
-                    "attacker_square": square,
-                    "attacker_piece": piece.piece_type,
-                    "targets": valuable_targets
-                })
+    targets_mask = _pieces_worth_forking(board, not attacking_color)
+    if chess.popcount(targets_mask) < 2:
+        return forks
+    
+    for square in chess.scan_forward(board.occupied_co[attacking_color]):
+        attacked = board.attacks_mask(square) & targets_mask
+        
+        # If attacking 2+ valuable pieces, it's a fork
+        if attacked & (attacked - 1):
+            forks.append({
+                "attacker_square": square,
+                "attacker_piece": board.piece_type_at(square),
+                "targets": [
+                    {"square": target_sq, "piece": board.piece_type_at(target_sq)}
+                    for target_sq in chess.scan_forward(attacked)
+                ]
+            })
     
     return forks
 
 
 def find_pins(board: chess.Board, pinned_color: chess.Color) -> List[Dict]:
-    """Find pinned pieces (can't move without exposing a more valuable piece)."""
+    """Find pieces absolutely pinned to their king (uses board.pin_mask)."""
     pins = []
     king_square = board.king(pinned_color)
     
     if king_square is None:
         return pins
     
-    # Check all sliding pieces (bishops, rooks, queens) of opponent
-    opponent_color = not pinned_color
-    
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == opponent_color:
-            if piece.piece_type in [chess.BISHOP, chess.ROOK, chess.QUEEN]:
-                # Check if there's a pin along the line to the king
-                pin_info = _check_pin_along_line(board, square, king_square, pinned_color)
-                if pin_info:
-                    pins.append(pin_info)
+    snipers = board.occupied_co[not pinned_color] & (board.bishops | board.rooks | board.queens)
+    
+    for square in chess.scan_forward(board.occupied_co[pinned_color] & ~board.kings):
+        pin_ray = board.pin_mask(pinned_color, square)
+        if pin_ray == chess.BB_ALL:
+            continue
+        
+        attacker_sq = _find_pinner(board, pin_ray & snipers, square, king_square)
+        if attacker_sq is None:
+            continue
+        pins.append({
+            "pinned_square": square,
+            "pinned_piece": board.piece_type_at(square),
+            "behind_piece": chess.KING,  # King is behind
+            "attacker_square": attacker_sq,
+            "attacker_piece": board.piece_type_at(attacker_sq)
+        })
     
+    pins.sort(key=lambda p: p["attacker_square"])
     return pins
 
 
-def _check_pin_along_line(board: chess.Board, attacker_sq: int, king_sq: int, pinned_color: chess.Color) -> Optional[Dict]:
-    """Check if there's a pin between attacker and king."""
-    attacker = board.piece_at(attacker_sq)
-    if not attacker:
-        return None
-    
-    # Get the ray from attacker to king
-    try:
-        ray = chess.ray(attacker_sq, king_sq)
-    except:
-        return None
+def _find_pinner(board: chess.Board, candidates: int, pinned_sq: int, king_sq: int) -> Optional[int]:
+    """The slider on the pin ray beyond the pinned piece with a clear line to it"""
+    for sq in chess.scan_forward(candidates):
+        if chess.between(king_sq, sq) & chess.BB_SQUARES[pinned_sq] and \
+                not chess.between(pinned_sq, sq) & board.occupied:
+            return sq
+    return None
+
+
+# ==================== BATCH MOTIF SCANNING ====================
+
+def scan_motifs(board: chess.Board, user_color: chess.Color) -> Dict[str, List[str]]:
+    """
+    Compact motif flags for one position, from the user's point of view.
+    
+    Returns square names per motif:
+        hanging: user pieces attacked and undefended
+        opponent_hanging: opponent pieces attacked and undefended
+        fork_threats: opponent pieces attacking 2+ user pieces worth >= 3
+        pins: user pieces pinned to their king
+        loose: undefended user pieces (excluding king)
+    """
+    opponent = not user_color
+    return {
+        "hanging": [chess.square_name(h["square"]) for h in find_hanging_pieces(board, user_color)],
+        "opponent_hanging": [chess.square_name(h["square"]) for h in find_hanging_pieces(board, opponent)],
+        "fork_threats": [chess.square_name(f["attacker_square"]) for f in find_forks(board, opponent)],
+        "pins": [chess.square_name(p["pinned_square"]) for p in find_pins(board, user_color)],
+        "loose": [chess.square_name(l["square"]) for l in find_loose_pieces(board, user_color)]
+    }
+
+
+def scan_fens(fens: Iterable[str], user_color: str = "white") -> List[Optional[Dict[str, List[str]]]]:
+    """
+    Batch motif scan over a sequence of FENs (e.g. every position of a game).
     
-    if not ray:
+    A single Board is reused across positions; invalid FENs yield None.
+    """
+    color = chess.WHITE if user_color.lower() == "white" else chess.BLACK
+    board = chess.Board()
+    results = []
+    for fen in fens:
+        try:
+            board.set_fen(fen)
+        except ValueError:
+            results.append(None)
+            continue
+        results.append(scan_motifs(board, color))
+    return results
+
+
+def analyze_fens_tactics(fens: Iterable[str], user_color: str = "white") -> List[Dict]:
+    """Batch version of analyze_position_tactics (full explanations per FEN)"""
+    return [analyze_position_tactics(fen, user_color) for fen in fens]
+
+
+# ==================== WHOLE-GAME MOTIF SCAN ====================
+
+MOTIF_SCAN_VERSION = 2  # 2: hanging counts pieces worth >= 3 only; counts are motifs a move created
+
+# Per-ply motif bits, always from the user's point of view
+MOTIF_HANGING = 1          # a user piece worth >= 3 is attacked and undefended
+MOTIF_FORK = 2             # an opponent piece attacks 2+ user pieces worth >= 3
+MOTIF_PIN = 4              # a user piece is pinned to its king
+MOTIF_BACK_RANK = 8        # user king is boxed in on its back rank with a heavy piece hitting it
+MOTIF_MISSED_CAPTURE = 16  # the user's move skipped a capture winning >= 2 points
+
+MOTIF_NAMES = {
+    MOTIF_HANGING: "hanging",
+    MOTIF_FORK: "fork",
+    MOTIF_PIN: "pin",
+    MOTIF_BACK_RANK: "back_rank",
+    MOTIF_MISSED_CAPTURE: "missed_capture"
+}
+
+MISSED_CAPTURE_MIN_GAIN = 2
+
+
+def find_back_rank_weakness(board: chess.Board, color: chess.Color) -> List[int]:
+    """
+    Opponent rooks/queens that can land on the back rank of a boxed-in king.
+
+    The king must be on its back rank with every escape square off that rank
+    blocked by its own pieces or attacked. Returns the squares of opponent
+    heavy pieces attacking a back-rank square defended only by the king.
+    """
+    king_sq = board.king(color)
+    back_rank = chess.BB_RANK_1 if color == chess.WHITE else chess.BB_RANK_8
+    if king_sq is None or not chess.BB_SQUARES[king_sq] & back_rank:
+        return []
+
+    opponent = not color
+    for sq in chess.scan_forward(chess.BB_KING_ATTACKS[king_sq] & ~back_rank):
+        if not board.occupied_co[color] & chess.BB_SQUARES[sq] and not board.is_attacked_by(opponent, sq):
+            return []  # king has luft
+
+    heavy = board.occupied_co[opponent] & (board.rooks | board.queens)
+    defenders = board.occupied_co[color] & ~board.kings
+    attackers = []
+    for sq in chess.scan_forward(heavy):
+        for target in chess.scan_forward(board.attacks_mask(sq) & back_rank & ~board.occupied_co[color]):
+            if not board.attackers_mask(color, target) & defenders:
+                attackers.append(sq)
+                break
+    return attackers
+
+
+def _capture_gain(board: chess.Board, move: chess.Move) -> int:
+    """Material won by a capture: full value if undefended, else the trade difference"""
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+    else:
+        victim = board.piece_type_at(move.to_square)
+        if victim is None:
+            return 0
+    value = PIECE_VALUES[victim]
+    if not board.is_attacked_by(not board.turn, move.to_square):
+        return value
+    return value - PIECE_VALUES[board.piece_type_at(move.from_square)]
+
+
+def find_missed_capture(board: chess.Board, played: chess.Move) -> Optional[chess.Move]:
+    """
+    The best winning capture the side to move skipped, if the played move
+    gained less. Returns None when no capture wins MISSED_CAPTURE_MIN_GAIN.
+    """
+    best, best_gain = None, MISSED_CAPTURE_MIN_GAIN - 1
+    for move in board.generate_legal_captures():
+        gain = _capture_gain(board, move)
+        if gain > best_gain:
+            best, best_gain = move, gain
+    if best is None or best == played:
         return None
-    
-    # Check if attacker can actually move along this ray
-    if attacker.piece_type == chess.BISHOP:
-        # Bishops move diagonally
-        if chess.square_file(attacker_sq) == chess.square_file(king_sq) or \
-           chess.square_rank(attacker_sq) == chess.square_rank(king_sq):
-            return None
-    elif attacker.piece_type == chess.ROOK:
-        # Rooks move in straight lines
-        if chess.square_file(attacker_sq) != chess.square_file(king_sq) and \
-           chess.square_rank(attacker_sq) != chess.square_rank(king_sq):
-            return None
-    
-    # Find pieces between attacker and king
-    pieces_between = []
-    try:
-        between_squares = chess.SquareSet(chess.between(attacker_sq, king_sq))
-    except Exception:
+    if board.is_capture(played) and _capture_gain(board, played) >= best_gain:
         return None
-    
-    for sq in between_squares:
-        piece = board.piece_at(sq)
-        if piece:
-            pieces_between.append({
-                "square": sq,
-                "piece": piece.piece_type,
-                "color": piece.color
-            })
-    
-    # If exactly one piece between, and it's the pinned color, it's a pin
-    if len(pieces_between) == 1 and pieces_between[0]["color"] == pinned_color:
-        pinned = pieces_between[0]
-        return {
-            "pinned_square": pinned["square"],
-            "pinned_piece": pinned["piece"],
-            "behind_piece": chess.KING,  # King is behind
-            "attacker_square": attacker_sq,
-            "attacker_piece": attacker.piece_type
+    return best
+
+
+def is_piece_sacrifice(board: chess.Board, move: chess.Move) -> bool:
+    """
+    True if the move (not yet played on board) offers a knight or bigger:
+    it lands where a cheaper enemy piece attacks it, or attacked and
+    undefended, having captured less than its own value.
+    """
+    mover = board.turn
+    value = PIECE_VALUES[move.promotion or board.piece_type_at(move.from_square)]
+    if value < 3:
+        return False
+    captured = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    if captured is not None and PIECE_VALUES[captured] >= value:
+        return False
+
+    after = board.copy(stack=False)
+    after.push(move)
+    attackers = after.attackers_mask(not mover, move.to_square)
+    if not attackers:
+        return False
+    if not after.is_attacked_by(mover, move.to_square):
+        return True
+    return any(0 < PIECE_VALUES[after.piece_type_at(sq)] < value for sq in chess.scan_forward(attackers))
+
+
+def scan_game_motifs(fens: List[str], uci_moves: List[str], user_color: str = "white") -> Dict:
+    """
+    Walk every ply of a game once and record compact motif flags.
+
+    Args:
+        fens: Per-ply FENs from the game record (index 0 = start position)
+        uci_moves: Moves in UCI, one per ply
+        user_color: "white" or "black"
+
+    Returns:
+        {
+            "version": MOTIF_SCAN_VERSION,
+            "user_color": "white",
+            "start_ply": 0,            # board.ply() of fens[0]
+            "flags": [0, 5, ...],      # bitmask per ply, for the position after it
+            "details": [{"i": 3, "hanging": ["d5"], ...}],  # flagged plies only
+            "counts": {"hanging": 2, ...}  # motifs created by the user's own moves
         }
-    
-    return None
+
+    Flags describe the position, so a pin or weak back rank stays flagged
+    for as long as it lasts; motifs_for_move reports only what a move created.
+    """
+    color = chess.WHITE if user_color.lower() == "white" else chess.BLACK
+    board = chess.Board()
+    scan = {
+        "version": MOTIF_SCAN_VERSION,
+        "user_color": user_color.lower(),
+        "start_ply": 0,
+        "flags": [],
+        "details": [],
+        "counts": {name: 0 for name in MOTIF_NAMES.values()}
+    }
+    if not fens:
+        return scan
+
+    board.set_fen(fens[0])
+    scan["start_ply"] = board.ply()
+
+    for i, uci in enumerate(uci_moves[:len(fens) - 1]):
+        user_move = board.turn == color
+        missed = None
+        if user_move:
+            try:
+                missed = find_missed_capture(board, chess.Move.from_uci(uci))
+            except ValueError:
+                missed = None
+
+        board.set_fen(fens[i + 1])
+        opponent = not color
+        detail = {}
+        # Loose pawns are too common to count as a tactical motif
+        hanging = [h for h in find_hanging_pieces(board, color) if PIECE_VALUES[h["piece"]] >= 3]
+        if hanging:
+            detail["hanging"] = [chess.square_name(h["square"]) for h in hanging]
+        forks = find_forks(board, opponent)
+        if forks:
+            detail["fork"] = [chess.square_name(f["attacker_square"]) for f in forks]
+        pins = find_pins(board, color)
+        if pins:
+            detail["pin"] = [chess.square_name(p["pinned_square"]) for p in pins]
+        back_rank = find_back_rank_weakness(board, color)
+        if back_rank:
+            detail["back_rank"] = [chess.square_name(sq) for sq in back_rank]
+        if missed is not None:
+            detail["missed_capture"] = [missed.uci()]
+
+        flags = 0
+        for bit, name in MOTIF_NAMES.items():
+            if name in detail:
+                flags |= bit
+        created = flags & ~(scan["flags"][-1] if scan["flags"] else 0)
+        if user_move:
+            for bit, name in MOTIF_NAMES.items():
+                if created & bit:
+                    scan["counts"][name] += 1
+        scan["flags"].append(flags)
+        if detail:
+            scan["details"].append({"i": i, **detail})
+
+    return scan
+
+
+def motif_index(scan: Dict, move_number: int, color: str) -> int:
+    """Index into scan["flags"] for a move given by full-move number and color"""
+    ply_before = 2 * (move_number - 1) + (0 if color == "white" else 1)
+    return ply_before - scan.get("start_ply", 0)
+
+
+def motifs_for_move(scan: Optional[Dict], move_number: int, color: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Stored motifs the move created ({} when it created none or the analysis
+    has no scan). Motifs already on the board before the move (a pin that
+    lasts several plies) belong to the move that created them, not to every
+    move played while they last. Color defaults to the scanned user's color.
+    """
+    if not scan or not move_number:
+        return {}
+    i = motif_index(scan, move_number, color or scan.get("user_color", "white"))
+    flags = scan.get("flags", [])
+    if not 0 <= i < len(flags):
+        return {}
+    created = flags[i] & ~(flags[i - 1] if i > 0 else 0)
+    if not created:
+        return {}
+    names = {name for bit, name in MOTIF_NAMES.items() if created & bit}
+    for detail in scan.get("details", []):
+        if detail.get("i") == i:
+            return {k: v for k, v in detail.items() if k in names}
+    return {}
+
+
+def describe_motifs(motifs: Dict[str, List[str]], move_san: str = "") -> str:
+    """One-line explanation of stored motifs for a user's move"""
+    after = f"After {move_san}, " if move_san else ""
+    if "missed_capture" in motifs:
+        target = motifs["missed_capture"][0][2:4]
+        return f"There was a winning capture on {target} available - always check captures first."
+    if "back_rank" in motifs:
+        return f"{after}your king was stuck on the back rank with a heavy piece ready to strike."
+    if "fork" in motifs:
+        return f"{after}your opponent could fork your pieces from {motifs['fork'][0]}."
+    if "hanging" in motifs:
+        return f"{after}your piece on {motifs['hanging'][0]} was left undefended and under attack."
+    if "pin" in motifs:
+        return f"{after}your piece on {motifs['pin'][0]} was pinned to your king."
+    return ""
 
 
 def _generate_summary(patterns: List[Dict]) -> str:
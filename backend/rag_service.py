@@ -127,16 +127,8 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
 
 # ==================== PGN PARSING & CHUNKING ====================
 
-def parse_pgn_to_chunks(pgn: str, game_id: str, user_color: str) -> List[Dict[str, Any]]:
-    """
-    Parse PGN and extract meaningful chunks for embedding:
-    - Opening phase (first 10 moves)
-    - Critical moments (captures, checks, piece trades)
-    - Endgame phase (last 15 moves)
-    - Overall game summary
-    """
-    chunks = []
-    
+def _scrape_pgn_moves_and_headers(pgn: str):
+    """Fallback text scrape for games without a stored record"""
     # Extract moves from PGN
     moves_match = re.search(r'\n\n(.+)$', pgn, re.DOTALL)
     if not moves_match:
@@ -162,6 +154,33 @@ def parse_pgn_to_chunks(pgn: str, game_id: str, user_color: str) -> List[Dict[st
             if match:
                 headers[match.group(1).lower()] = match.group(2)
     
+    return moves, headers
+
+
+def parse_pgn_to_chunks(pgn: str, game_id: str, user_color: str,
+                        record: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Parse PGN and extract meaningful chunks for embedding:
+    - Opening phase (first 10 moves)
+    - Critical moments (captures, checks, piece trades)
+    - Endgame phase (last 15 moves)
+    - Overall game summary
+    
+    When the canonical game record is available its SAN list and headers
+    are used directly instead of scraping the PGN text.
+    """
+    chunks = []
+    
+    if record:
+        san = record.get("san", [])
+        moves = [
+            (str(i // 2 + 1), san[i], san[i + 1] if i + 1 < len(san) else "")
+            for i in range(0, len(san), 2)
+        ]
+        headers = {key.lower(): value for key, value in record.get("headers", {}).items()}
+    else:
+        moves, headers = _scrape_pgn_moves_and_headers(pgn)
+    
     opening = headers.get('opening', headers.get('eco', 'Unknown opening'))
     result = headers.get('result', '*')
     white = headers.get('white', 'White')
@@ -471,10 +490,14 @@ async def build_simple_context(db, user_id: str) -> str:
 
 async def create_game_embeddings(db, game: Dict[str, Any], user_id: str) -> int:
     """Create and store embeddings for a game"""
+    from game_record_service import get_game_record
+    
+    record = await get_game_record(db, game) if game.get('game_id') else None
     chunks = parse_pgn_to_chunks(
         game.get('pgn', ''),
         game.get('game_id', ''),
-        game.get('user_color', 'white')
+        game.get('user_color', 'white'),
+        record=record
     )
     
     created_count = 0
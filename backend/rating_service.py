@@ -5,8 +5,10 @@ This module provides:
 1. Rating trajectory prediction based on performance metrics
 2. Time management analysis from game clock data
 3. Fast thinking/calculation training with personalized puzzles
+4. Platform rating snapshots and rating history
 """
 
+import asyncio
 import logging
 import re
 import random
@@ -15,6 +17,12 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import math
 
+import numpy as np
+
+from config import RATING_SNAPSHOT_MAX_AGE_SECONDS
+from game_record_service import build_game_record
+from response_cache_service import bump_user_generation
+
 logger = logging.getLogger(__name__)
 
 # ==================== RATING PREDICTION ====================
@@ -307,6 +315,23 @@ def parse_clock_times_from_pgn(pgn: str) -> List[Dict[str, Any]]:
     return moves_with_time
 
 
+def parse_clock_times_from_record(record: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Clock times from a canonical game record (same shape as
+    parse_clock_times_from_pgn). Plies without a clock are skipped.
+    """
+    moves_with_time = []
+    for ply, clock in enumerate(record.get("clocks", [])):
+        if clock is None:
+            continue
+        moves_with_time.append({
+            "move_number": ply // 2 + 1,
+            "is_white": ply % 2 == 0,
+            "clock_remaining": int(clock)
+        })
+    return moves_with_time
+
+
 def extract_time_control_seconds(time_control: str) -> int:
     """
     Parse time control string to get initial time in seconds.
@@ -330,56 +355,59 @@ def extract_time_control_seconds(time_control: str) -> int:
         return 0
 
 
+# Remaining clock below this counts as time trouble
+TIME_TROUBLE_SECONDS = 60
+
+
+def user_clock_arrays(record: Dict[str, Any], user_color: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (move_numbers, think_seconds, remaining_seconds) for the user's plies
+    that have clock data, from a game record's clock arrays. Instant moves
+    (premoves, 0 s think time) are kept.
+    """
+    think = np.array(record.get("think") or [], dtype=float)  # None -> nan
+    remaining = np.array(record.get("clocks") or [], dtype=float)
+    if not think.size or think.size != remaining.size:
+        empty = np.empty(0)
+        return empty, empty, empty
+    
+    # Ply 0 is white's move unless the game starts with black to move
+    black_first = " b " in (record.get("start_fen") or "")
+    first = int((user_color == "black") != black_first)
+    think, remaining = think[first::2], remaining[first::2]
+    move_numbers = np.arange(think.size) + 1 + int(black_first and user_color == "white")
+    
+    valid = ~np.isnan(think)  # Only plies without clock data are dropped
+    return move_numbers[valid], think[valid], remaining[valid]
+
+
 def analyze_time_usage(games: List[Dict], user_id: str) -> Dict[str, Any]:
     """
     Analyze time usage patterns across recent games.
-    Uses actual clock data from PGN annotations.
+    Uses the per-ply clock and think-time arrays of each game's record.
     
     Note: Clock data is only available in games where the platform 
     records move times (typically rapid/classical with clock enabled).
+    Games without an attached "record" have one built from their PGN.
     """
-    all_time_data = []
+    move_chunks, think_chunks, remaining_chunks = [], [], []
     games_with_time = 0
     games_checked = 0
-    time_control_info = []
     
     for game in games[-30:]:  # Check last 30 games
         games_checked += 1
-        pgn = game.get('pgn', '')
-        user_color = game.get('user_color', 'white')
-        time_control = game.get('time_control', '')
-        
-        clock_times = parse_clock_times_from_pgn(pgn)
-        if not clock_times:
+        record = game.get('record') or build_game_record(game.get('pgn', ''))
+        if not record or not any(c is not None for c in record.get('clocks') or []):
             continue
         
         games_with_time += 1
-        
-        # Track time control for context
-        if time_control:
-            initial_time = extract_time_control_seconds(time_control)
-            if initial_time > 0:
-                time_control_info.append(initial_time)
-        
-        # Filter to user's moves only
-        user_moves = [t for t in clock_times if (t['is_white'] and user_color == 'white') or 
-                                                  (not t['is_white'] and user_color == 'black')]
-        
-        if len(user_moves) < 2:
-            continue
-        
-        # Calculate time spent per move
-        for i in range(1, len(user_moves)):
-            time_spent = user_moves[i-1]['clock_remaining'] - user_moves[i]['clock_remaining']
-            if time_spent > 0:
-                all_time_data.append({
-                    "move_number": user_moves[i]['move_number'],
-                    "time_spent": time_spent,
-                    "clock_remaining": user_moves[i]['clock_remaining'],
-                    "game_phase": get_game_phase(user_moves[i]['move_number'])
-                })
-    
-    if not all_time_data:
+        move_numbers, think, remaining = user_clock_arrays(record, game.get('user_color', 'white'))
+        move_chunks.append(move_numbers)
+        think_chunks.append(think)
+        remaining_chunks.append(remaining)
+    
+    think = np.concatenate(think_chunks) if think_chunks else np.empty(0)
+    if not think.size:
         return {
             "has_data": False,
             "games_checked": games_checked,
@@ -387,26 +415,32 @@ def analyze_time_usage(games: List[Dict], user_id: str) -> Dict[str, Any]:
             "message": f"Checked {games_checked} recent games but found no clock data. Clock annotations are only available in timed games (rapid/classical) where the platform records move times. Try playing more rapid games on Chess.com or Lichess with the clock visible."
         }
     
-    # Analyze by game phase
-    phases = {"opening": [], "middlegame": [], "endgame": []}
-    for td in all_time_data:
-        phases[td['game_phase']].append(td['time_spent'])
+    move_numbers = np.concatenate(move_chunks)
+    remaining = np.concatenate(remaining_chunks)
+    
+    # Analyze by game phase (same move windows as get_game_phase)
+    phase_masks = {
+        "opening": move_numbers <= 10,
+        "middlegame": (move_numbers > 10) & (move_numbers <= 30),
+        "endgame": move_numbers > 30
+    }
     
     phase_averages = {}
-    for phase, times in phases.items():
-        if times:
+    for phase, mask in phase_masks.items():
+        times = think[mask]
+        if times.size:
             phase_averages[phase] = {
-                "avg_time": round(sum(times) / len(times), 1),
-                "max_time": max(times),
-                "move_count": len(times)
+                "avg_time": round(float(times.mean()), 1),
+                "max_time": float(times.max()),
+                "move_count": int(times.size)
             }
     
     # Detect time trouble patterns
-    time_trouble_moves = [td for td in all_time_data if td['clock_remaining'] < 60]
+    time_trouble_count = int(np.count_nonzero(remaining < TIME_TROUBLE_SECONDS))
     
     # Calculate overall stats
-    total_time = sum(td['time_spent'] for td in all_time_data)
-    opening_time = sum(phases.get('opening', []))
+    total_time = float(think.sum())
+    opening_time = float(think[phase_masks["opening"]].sum())
     
     opening_percentage = (opening_time / total_time * 100) if total_time > 0 else 0
     
@@ -420,10 +454,10 @@ def analyze_time_usage(games: List[Dict], user_id: str) -> Dict[str, Any]:
             "category": "opening_time"
         })
     
-    if len(time_trouble_moves) > 5:
+    if time_trouble_count > 5:
         insights.append({
             "type": "critical",
-            "message": f"You reached time trouble (<1 min) in {len(time_trouble_moves)} positions. Practice faster decision-making.",
+            "message": f"You reached time trouble (<1 min) in {time_trouble_count} positions. Practice faster decision-making.",
             "category": "time_trouble"
         })
     
@@ -437,12 +471,12 @@ def analyze_time_usage(games: List[Dict], user_id: str) -> Dict[str, Any]:
     return {
         "has_data": True,
         "games_analyzed": games_with_time,
-        "total_moves_analyzed": len(all_time_data),
+        "total_moves_analyzed": int(think.size),
         "phase_breakdown": phase_averages,
-        "time_trouble_count": len(time_trouble_moves),
+        "time_trouble_count": time_trouble_count,
         "opening_time_percentage": round(opening_percentage, 1),
         "insights": insights,
-        "recommendations": generate_time_recommendations(phase_averages, opening_percentage, len(time_trouble_moves))
+        "recommendations": generate_time_recommendations(phase_averages, opening_percentage, time_trouble_count)
     }
 
 def get_game_phase(move_number: int) -> str:
@@ -668,3 +702,169 @@ async def fetch_platform_ratings(chess_com_username: str = None, lichess_usernam
             logger.error(f"Failed to fetch Lichess ratings: {e}")
     
     return ratings
+
+
+# ==================== RATING SNAPSHOT STORE ====================
+# Platform ratings are refreshed by the background sync and read from MongoDB.
+# Page views never wait on Chess.com/Lichess unless no snapshot exists yet;
+# stale snapshots are served immediately and refreshed in the background.
+
+# Order in which a "primary" rating is chosen for display and trajectory
+PRIMARY_RATING_ORDER = [
+    ("chess_com", "rapid"), ("lichess", "rapid"),
+    ("chess_com", "blitz"), ("lichess", "blitz"),
+    ("lichess", "classical"),
+    ("chess_com", "bullet"), ("lichess", "bullet"),
+]
+
+# User ids with a background refresh in flight (per process)
+_refreshing_users = set()
+# Background refresh tasks, referenced so they are not garbage-collected mid-run
+_refresh_tasks = set()
+
+
+def get_linked_usernames(user_doc: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Get (chess_com, lichess) usernames, accepting both field spellings"""
+    user_doc = user_doc or {}
+    chess_com = user_doc.get("chess_com_username") or user_doc.get("chesscom_username")
+    return chess_com, user_doc.get("lichess_username")
+
+
+def select_primary_rating(ratings: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+    """Pick the (platform, category, rating) used as the player's headline rating"""
+    for platform, category in PRIMARY_RATING_ORDER:
+        value = (ratings.get(platform) or {}).get(category)
+        if value:
+            return platform, category, value
+    return None
+
+
+async def refresh_rating_snapshot(db, user_id: str, chess_com_username: str = None,
+                                  lichess_username: str = None) -> Dict[str, Any]:
+    """
+    Fetch live ratings, store them as the user's snapshot and append to the history.
+    
+    Platforms are merged into the previous snapshot one by one: a platform
+    that fails to answer (down or slow) keeps its stored ratings, as long as
+    the linked account is unchanged. If no platform answers, the previous
+    snapshot is kept as-is.
+    """
+    fetched = await fetch_platform_ratings(chess_com_username, lichess_username)
+    now = datetime.now(timezone.utc)
+    existing = await db.rating_snapshots.find_one({"user_id": user_id}, {"_id": 0}) or {}
+    
+    if not fetched:
+        return existing.get("ratings", {})
+    
+    ratings = {}
+    for platform, username in (("chess_com", chess_com_username), ("lichess", lichess_username)):
+        if not username:
+            continue
+        if platform in fetched:
+            ratings[platform] = fetched[platform]
+        elif existing.get(f"{platform}_username") == username and platform in existing.get("ratings", {}):
+            ratings[platform] = existing["ratings"][platform]  # Stale until the next refresh
+    
+    await db.rating_snapshots.update_one(
+        {"user_id": user_id},
+        {"$set": {
+            "ratings": ratings,
+            "chess_com_username": chess_com_username,
+            "lichess_username": lichess_username,
+            "fetched_at": now.isoformat()
+        }},
+        upsert=True
+    )
+    
+    # One history point per platform/category/day; later fetches overwrite it
+    today = now.strftime("%Y-%m-%d")
+    for platform, categories in fetched.items():
+        for category, rating in (categories or {}).items():
+            if not rating:
+                continue
+            await db.rating_history.update_one(
+                {"user_id": user_id, "platform": platform, "category": category, "date": today},
+                {"$set": {"rating": rating, "recorded_at": now.isoformat()}},
+                upsert=True
+            )
+    await bump_user_generation(db, user_id)
+    
+    return ratings
+
+
+async def _refresh_in_background(db, user_id: str, chess_com_username: str, lichess_username: str):
+    try:
+        await refresh_rating_snapshot(db, user_id, chess_com_username, lichess_username)
+    except Exception as e:
+        logger.warning(f"Background rating refresh failed for {user_id}: {e}")
+    finally:
+        _refreshing_users.discard(user_id)
+
+
+async def get_cached_platform_ratings(db, user_doc: Dict, max_age_seconds: int = None) -> Dict[str, Any]:
+    """
+    Stale-while-revalidate read of a user's platform ratings.
+    
+    - Fresh snapshot: returned as-is
+    - Stale snapshot (older than max age) or linked accounts changed:
+      returned as-is, refresh scheduled in the background
+    - No snapshot yet: fetched live once and stored
+    """
+    if max_age_seconds is None:
+        max_age_seconds = RATING_SNAPSHOT_MAX_AGE_SECONDS
+    
+    user_id = user_doc["user_id"]
+    chess_com_username, lichess_username = get_linked_usernames(user_doc)
+    if not chess_com_username and not lichess_username:
+        return {}
+    
+    snapshot = await db.rating_snapshots.find_one({"user_id": user_id}, {"_id": 0})
+    if not snapshot:
+        return await refresh_rating_snapshot(db, user_id, chess_com_username, lichess_username)
+    
+    fetched_at = datetime.fromisoformat(snapshot["fetched_at"].replace("Z", "+00:00"))
+    age_seconds = (datetime.now(timezone.utc) - fetched_at).total_seconds()
+    accounts_changed = (
+        snapshot.get("chess_com_username") != chess_com_username
+        or snapshot.get("lichess_username") != lichess_username
+    )
+    
+    if (age_seconds > max_age_seconds or accounts_changed) and user_id not in _refreshing_users:
+        _refreshing_users.add(user_id)
+        task = asyncio.create_task(_refresh_in_background(db, user_id, chess_com_username, lichess_username))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+    
+    return snapshot.get("ratings", {})
+
+
+def summarize_rating_history(current: int, history: List[Dict[str, Any]], days: int = 30) -> Dict[str, int]:
+    """
+    Current, peak and change over the last `days` for one platform rating.
+    
+    `history` is get_rating_history output (oldest first); the current
+    rating counts even if today's point isn't stored yet.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    recent = [h["rating"] for h in history if h["date"] >= since] or [current]
+    return {
+        "current": current,
+        "peak": max([h["rating"] for h in history] + [current]),
+        "change": current - recent[0]
+    }
+
+
+async def get_rating_history(db, user_id: str, platform: str = None, category: str = None,
+                             days: int = 365) -> List[Dict[str, Any]]:
+    """Get stored rating points (oldest first), optionally for one platform/category"""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    query = {"user_id": user_id, "date": {"$gte": since}}
+    if platform:
+        query["platform"] = platform
+    if category:
+        query["category"] = category
+    
+    return await db.rating_history.find(
+        query,
+        {"_id": 0, "platform": 1, "category": 1, "date": 1, "rating": 1}
+    ).sort("date", 1).to_list(days * 8)
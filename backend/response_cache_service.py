@@ -0,0 +1,127 @@
+"""
+Response Cache Service
+
+Per-user caching for read-heavy dashboard endpoints (/journey, /progress/v2,
+/badges, /coach/today, ...). Their inputs only change when new data lands,
+so every user has a data generation counter that writers bump:
+- new or re-run analyses, imported games
+- reflections, mistake card creation/attempts, habit progress
+- player profile and preference changes
+
+A cached body is valid while the generation it was built at is current.
+The ETag is derived from the generation, so browsers revalidating with
+If-None-Match get a 304 without the handler doing any work.
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every cached response after a response-format change
+RESPONSE_CACHE_VERSION = 1
+RESPONSE_CACHE_MAX_ENTRIES = 5000
+
+# (user_id, endpoint, variant) -> {"generation", "etag", "body"}
+_cache: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+async def get_user_generation(db, user_id: str) -> int:
+    """Current data generation for a user (0 if nothing was ever bumped)"""
+    doc = await db.data_generations.find_one({"user_id": user_id}, {"_id": 0, "generation": 1})
+    return (doc or {}).get("generation", 0)
+
+
+async def bump_user_generation(db, user_id: str) -> int:
+    """
+    Mark a user's dashboard inputs as changed.
+
+    Call after writing analyses, games, reflections, cards or profile data.
+    """
+    doc = await db.data_generations.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"generation": 1}},
+        projection={"_id": 0, "generation": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["generation"]
+
+
+def _make_etag(user_id: str, endpoint: str, variant: str, generation: int) -> str:
+    raw = f"{RESPONSE_CACHE_VERSION}|{user_id}|{endpoint}|{variant}|{generation}"
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+async def cached_user_response(
+    db,
+    request: Request,
+    user_id: str,
+    endpoint: str,
+    build: Callable[[], Awaitable[Any]],
+    variant: str = ""
+) -> Response:
+    """
+    Serve a per-user endpoint from cache, or build and cache it.
+
+    Args:
+        endpoint: Cache namespace, usually the route path
+        build: Coroutine function producing the (JSON-serializable) response
+        variant: Extra key for inputs not covered by the generation,
+                 e.g. the current date for "today" views
+    """
+    generation = await get_user_generation(db, user_id)
+    etag = _make_etag(user_id, endpoint, variant, generation)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request, etag):
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    key = (user_id, endpoint, variant)
+    entry = _cache.get(key)
+    if entry and entry["generation"] == generation:
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+    _stats["misses"] += 1
+    result = await build()
+    if isinstance(result, Response):
+        # Handler produced its own response (e.g. an error payload) - don't cache
+        return result
+
+    response = JSONResponse(content=jsonable_encoder(result), headers=headers)
+    _cache[key] = {"generation": generation, "etag": etag, "body": response.body}
+    _cache.move_to_end(key)
+    while len(_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+    return response
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/304 counters for this process"""
+    served = _stats["hits"] + _stats["misses"] + _stats["not_modified"]
+    return {
+        **_stats,
+        "hit_rate": round((_stats["hits"] + _stats["not_modified"]) / served, 4) if served else 0.0,
+        "size": len(_cache)
+    }
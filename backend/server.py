@@ -1,11 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, BackgroundTasks, Header
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
 import asyncio
+import json
+import hmac
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
@@ -18,11 +22,14 @@ import io
 # Import centralized config
 from config import (
     LLM_PROVIDER, LLM_MODEL, TTS_MODEL, TTS_VOICE,
-    STOCKFISH_DEPTH, STOCKFISH_MAX_RETRIES,
+    STOCKFISH_DEPTH, STOCKFISH_MAX_RETRIES, STOCKFISH_QUICK_DEPTH,
+    BATCH_EVAL_MAX_FENS, BATCH_EVAL_MAX_DEPTH, BATCH_EVAL_MAX_MULTIPV,
+    ANALYSIS_STREAM_KEEPALIVE_SECONDS,
     SESSION_EXPIRY_DAYS, COOKIE_MAX_AGE_SECONDS,
     PLAY_SESSION_LOOKBACK_HOURS, DEFAULT_RATING,
     BACKGROUND_SYNC_INTERVAL_SECONDS, FIRST_SYNC_MONTHS,
-    DAILY_SYNC_MAX_GAMES, SYNC_INTERVAL_HOURS
+    DAILY_SYNC_MAX_GAMES, SYNC_INTERVAL_HOURS,
+    COMMENTARY_QUEUE_INTERVAL_SECONDS, COMMENTARY_RETRY_BASE_SECONDS
 )
 
 # Import RAG service
@@ -49,19 +56,29 @@ from player_profile_service import (
     CoachingTone
 )
 
+# Import LLM call metrics (latency / tokens / cost per caller)
+from llm_metrics_service import configure_llm_metrics, flush_llm_metrics, summarize_llm_metrics
+
+# Import compact game-analysis prompt builder
+from coach_prompt_service import (
+    GAME_COACH_SYSTEM_PROMPT, build_move_digest, build_game_user_message, engine_only_commentary
+)
+from local_commentary_service import build_local_commentary, merge_commentary
+
 # Import Coach Quality Score system (internal only)
 from cqs_service import (
     calculate_cqs,
     get_stricter_prompt_constraints,
     should_accept_after_regenerations,
-    log_cqs_result,
-    MAX_REGENERATIONS
+    generate_best_candidate,
+    first_round_candidates
 )
 
 # Import Journey Dashboard service
 from journey_service import (
     generate_journey_dashboard_data,
     run_background_sync,
+    process_commentary_queue,
     fetch_recent_chesscom_games,
     fetch_recent_lichess_games,
     select_games_for_analysis
@@ -75,16 +92,25 @@ from rating_service import (
     analyze_time_usage,
     generate_training_session,
     generate_calculation_analysis,
-    fetch_platform_ratings
+    get_cached_platform_ratings,
+    get_rating_history,
+    get_linked_usernames,
+    select_primary_rating,
+    summarize_rating_history
 )
 
 # Import Stockfish engine service
 from stockfish_service import (
     analyze_game_with_stockfish,
     get_position_evaluation,
-    get_best_moves_for_position
+    get_best_moves_for_position,
+    stream_fen_evaluations,
+    shutdown_engine_pool
 )
 
+# Import whole-game tactical motif scan (stored with each analysis)
+from position_analyzer import scan_game_motifs
+
 # Import Phase Theory service for strategic coaching
 from phase_theory_service import (
     analyze_game_phases,
@@ -107,12 +133,40 @@ from mistake_card_service import (
     get_training_stats,
     get_card_by_id,
     generate_why_question,
+    enrich_pending_cards,
     HABIT_DEFINITIONS
 )
 
 # Import Chess Journey service for comprehensive progress tracking
 from chess_journey_service import get_chess_journey
 
+# Import Session Cache service for cached/signed authentication
+from session_cache_service import (
+    session_cache,
+    is_signed_session_token,
+    create_signed_session_token,
+    verify_signed_session_token,
+    get_session_token_format
+)
+
+# Import Response Cache service for per-user dashboard caching
+from response_cache_service import (
+    cached_user_response,
+    bump_user_generation,
+    get_response_cache_stats
+)
+
+# Import Game Import service for fingerprint-based dedupe
+from game_import_service import (
+    compute_game_fingerprint,
+    filter_new_games,
+    insert_games_unordered,
+    aiter_pgn_texts,
+    pgn_text_to_game_data
+)
+from game_record_service import save_game_records, get_game_record, get_game_records
+from opening_index import get_opening_index
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -124,8 +178,12 @@ db = client[os.environ['DB_NAME']]
 # LLM Key
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 
-# Global variable to track the background task
+# Shared secret for internal ops endpoints (disabled when unset)
+METRICS_API_KEY = os.environ.get('METRICS_API_KEY', '')
+
+# Global variables to track the background tasks
 _background_sync_task = None
+_commentary_queue_task = None
 
 # Configure logging (moved up so lifespan can use logger)
 logging.basicConfig(
@@ -136,7 +194,10 @@ logger = logging.getLogger(__name__)
 
 # ==================== LLM SERVICE ====================
 # Import the abstraction layer that handles Emergent vs OpenAI
-from llm_service import call_llm, call_tts, get_provider_mode
+from llm_service import (
+    call_llm, call_llm_json, call_tts, get_provider_mode, estimate_tokens, get_gateway_status,
+    LLMOutput, GameCommentaryOutput, LLMUnavailableError
+)
 
 logger.info(f"Using LLM provider: {get_provider_mode()}")
 
@@ -154,9 +215,34 @@ async def background_sync_loop():
         except Exception as e:
             logger.error(f"Background sync error: {e}")
         
+        try:
+            enriched = await enrich_pending_cards(db)
+            if enriched:
+                logger.info(f"Enriched {enriched} pending mistake cards")
+        except Exception as e:
+            logger.error(f"Card enrichment sweep error: {e}")
+        
+        await flush_llm_metrics()
+        
         # Wait for next sync interval (6 hours by default)
         await asyncio.sleep(BACKGROUND_SYNC_INTERVAL_SECONDS)
 
+async def commentary_queue_loop():
+    """
+    Periodic sweep of the auto-analysis commentary queue: games whose engine
+    analysis is saved but whose coaching commentary is pending or due a retry.
+    Runs every COMMENTARY_QUEUE_INTERVAL_SECONDS.
+    """
+    while True:
+        try:
+            commented = await process_commentary_queue(db)
+            if commented:
+                logger.info(f"Added commentary to {commented} auto-analyzed games")
+        except Exception as e:
+            logger.error(f"Commentary queue error: {e}")
+        
+        await asyncio.sleep(COMMENTARY_QUEUE_INTERVAL_SECONDS)
+
 # Lifespan context manager (replaces deprecated on_event)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -164,23 +250,39 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for FastAPI.
     Handles startup and shutdown events.
     """
-    global _background_sync_task
+    global _background_sync_task, _commentary_queue_task
     
     # === STARTUP ===
+    # Build the shared ECO opening index once, before the first request
+    get_opening_index()
+    
+    # Record LLM / TTS call metrics to MongoDB
+    configure_llm_metrics(db)
+    
     # Start the background sync loop
     _background_sync_task = asyncio.create_task(background_sync_loop())
     logger.info("Background sync scheduler started")
     
+    # Retry queue for auto-analysis commentary
+    _commentary_queue_task = asyncio.create_task(commentary_queue_loop())
+    
     yield  # App runs here
     
     # === SHUTDOWN ===
-    # Cancel background task
-    if _background_sync_task:
-        _background_sync_task.cancel()
-        try:
-            await _background_sync_task
-        except asyncio.CancelledError:
-            pass
+    # Cancel background tasks
+    for task in (_background_sync_task, _commentary_queue_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    # Write out buffered LLM metrics
+    await flush_llm_metrics()
+    
+    # Stop pooled Stockfish engines
+    shutdown_engine_pool()
     
     # Close MongoDB connection
     client.close()
@@ -203,6 +305,7 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     chess_com_username: Optional[str] = None
     lichess_username: Optional[str] = None
+    tier: Optional[str] = None  # Billing tier; controls LLM spend (see CQS_FIRST_ROUND_CANDIDATES)
 
 class UserSession(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -224,6 +327,7 @@ class Game(BaseModel):
     date_played: Optional[str] = None
     opening: Optional[str] = None
     user_color: str  # "white" or "black"
+    fingerprint: Optional[str] = None  # Normalized dedupe key (see game_import_service)
     imported_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_analyzed: bool = False
 
@@ -290,31 +394,90 @@ async def get_current_user(request: Request) -> User:
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    session_doc = await db.user_sessions.find_one(
-        {"session_token": session_token},
-        {"_id": 0}
-    )
+    # Fast path: recently authenticated in this process
+    cached_user = session_cache.get(session_token)
+    if cached_user:
+        return User(**cached_user)
     
-    if not session_doc:
-        raise HTTPException(status_code=401, detail="Invalid session")
+    if is_signed_session_token(session_token):
+        # Stateless token: signature + expiry checked locally, only the user is loaded
+        claims = verify_signed_session_token(session_token)
+        if not claims:
+            raise HTTPException(status_code=401, detail="Invalid session")
+        
+        user_doc = await db.users.find_one({"user_id": claims["uid"]}, {"_id": 0})
+        if not user_doc:
+            raise HTTPException(status_code=401, detail="User not found")
+        if user_doc.get("session_epoch", 0) != claims.get("ep", 0):
+            raise HTTPException(status_code=401, detail="Session revoked")
+        
+        expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+    else:
+        session_doc = await db.user_sessions.find_one(
+            {"session_token": session_token},
+            {"_id": 0}
+        )
+        
+        if not session_doc:
+            raise HTTPException(status_code=401, detail="Invalid session")
+        
+        expires_at = session_doc["expires_at"]
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at < datetime.now(timezone.utc):
+            raise HTTPException(status_code=401, detail="Session expired")
+        
+        user_doc = await db.users.find_one(
+            {"user_id": session_doc["user_id"]},
+            {"_id": 0}
+        )
+        
+        if not user_doc:
+            raise HTTPException(status_code=401, detail="User not found")
     
-    expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        raise HTTPException(status_code=401, detail="Session expired")
+    session_cache.put(session_token, user_doc, expires_at)
+    return User(**user_doc)
+
+
+async def revoke_user_sessions(user_id: str) -> int:
+    """
+    Revoke every session of a user (opaque and signed).
     
-    user_doc = await db.users.find_one(
-        {"user_id": session_doc["user_id"]},
-        {"_id": 0}
+    Returns the new session epoch that signed tokens must carry.
+    """
+    await db.user_sessions.delete_many({"user_id": user_id})
+    updated = await db.users.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"session_epoch": 1}},
+        projection={"_id": 0, "session_epoch": 1},
+        return_document=ReturnDocument.AFTER
     )
+    session_cache.invalidate_user(user_id)
+    return (updated or {}).get("session_epoch", 0)
+
+
+async def open_user_session(user_id: str, session_token: str, expires_at: datetime, **extra) -> str:
+    """
+    Replace a user's sessions with a new one.
     
-    if not user_doc:
-        raise HTTPException(status_code=401, detail="User not found")
+    Returns the token to hand to the client: the given opaque token, or a
+    signed stateless token when SESSION_TOKEN_FORMAT is "signed".
+    """
+    session_epoch = await revoke_user_sessions(user_id)
+    if get_session_token_format() == "signed":
+        session_token = create_signed_session_token(user_id, expires_at, session_epoch)
     
-    return User(**user_doc)
+    session_doc = {
+        "user_id": user_id,
+        "session_token": session_token,
+        "expires_at": expires_at.isoformat(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **extra
+    }
+    await db.user_sessions.insert_one(session_doc)
+    return session_token
 
 # ==================== AUTH ROUTES ====================
 
@@ -427,15 +590,10 @@ async def google_callback(code: str, response: Response):
             await db.users.insert_one(user_doc)
         
         # Clear old sessions and create new one
-        await db.user_sessions.delete_many({"user_id": user_id})
-        
-        session_doc = {
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": (datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.user_sessions.insert_one(session_doc)
+        session_token = await open_user_session(
+            user_id, session_token,
+            datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)
+        )
         
         # Set session cookie
         response.set_cookie(
@@ -514,15 +672,10 @@ async def create_session(request: Request, response: Response):
         }
         await db.users.insert_one(user_doc)
     
-    await db.user_sessions.delete_many({"user_id": user_id})
-    
-    session_doc = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.user_sessions.insert_one(session_doc)
+    session_token = await open_user_session(
+        user_id, session_token,
+        datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)
+    )
     
     response.set_cookie(
         key="session_token",
@@ -546,8 +699,18 @@ async def get_me(user: User = Depends(get_current_user)):
 async def logout(request: Request, response: Response):
     """Logout and clear session"""
     session_token = request.cookies.get("session_token")
+    if not session_token:
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            session_token = auth_header.split(" ")[1]
+    
     if session_token:
+        claims = verify_signed_session_token(session_token)
+        if claims:
+            # Stateless tokens can only be revoked by bumping the user's epoch
+            await revoke_user_sessions(claims["uid"])
         await db.user_sessions.delete_many({"session_token": session_token})
+        session_cache.invalidate_token(session_token)
     
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out successfully"}
@@ -615,16 +778,11 @@ async def mobile_google_auth(request: MobileAuthRequest):
             await db.users.insert_one(user_doc)
         
         # Create session
-        await db.user_sessions.delete_many({"user_id": user_id})
-        
-        session_doc = {
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "is_mobile": True
-        }
-        await db.user_sessions.insert_one(session_doc)
+        session_token = await open_user_session(
+            user_id, session_token,
+            datetime.now(timezone.utc) + timedelta(days=30),
+            is_mobile=True
+        )
         
         user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
         
@@ -682,16 +840,11 @@ async def demo_login(request: DemoLoginRequest):
         await db.users.insert_one(user_doc)
     
     # Create session
-    await db.user_sessions.delete_many({"user_id": user_id})
-    
-    session_doc = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "is_demo": True
-    }
-    await db.user_sessions.insert_one(session_doc)
+    session_token = await open_user_session(
+        user_id, session_token,
+        datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS),
+        is_demo=True
+    )
     
     user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     
@@ -733,68 +886,12 @@ async def connect_platform(req: ConnectPlatformRequest, user: User = Depends(get
     else:
         raise HTTPException(status_code=400, detail="Invalid platform")
     
+    session_cache.invalidate_user(user.user_id)
+    await bump_user_generation(db, user.user_id)
     return {"message": f"Connected {platform} account: {username}"}
 
 # ==================== GAME IMPORT ROUTES ====================
 
-def parse_pgn_games(pgn_text: str, platform: str, user_username: str) -> List[Dict]:
-    """Parse PGN text and extract games"""
-    games = []
-    current_game = {}
-    moves = []
-    in_moves = False
-    
-    for line in pgn_text.split('\n'):
-        line = line.strip()
-        if not line:
-            if current_game and moves:
-                current_game['pgn_moves'] = ' '.join(moves)
-                games.append(current_game)
-                current_game = {}
-                moves = []
-                in_moves = False
-            continue
-        
-        if line.startswith('['):
-            match = re.match(r'\[(\w+)\s+"(.*)"\]', line)
-            if match:
-                key, value = match.groups()
-                current_game[key.lower()] = value
-                in_moves = False
-        else:
-            in_moves = True
-            moves.append(line)
-    
-    if current_game and moves:
-        current_game['pgn_moves'] = ' '.join(moves)
-        games.append(current_game)
-    
-    parsed_games = []
-    for g in games:
-        white = g.get('white', 'Unknown')
-        black = g.get('black', 'Unknown')
-        user_color = 'white' if white.lower() == user_username.lower() else 'black'
-        
-        full_pgn = ""
-        for key, value in g.items():
-            if key != 'pgn_moves':
-                full_pgn += f'[{key.capitalize()} "{value}"]\n'
-        full_pgn += f'\n{g.get("pgn_moves", "")}'
-        
-        parsed_games.append({
-            'platform': platform,
-            'pgn': full_pgn,
-            'white_player': white,
-            'black_player': black,
-            'result': g.get('result', '*'),
-            'time_control': g.get('timecontrol', g.get('event', '')),
-            'date_played': g.get('date', g.get('utcdate', '')),
-            'opening': g.get('opening', g.get('eco', '')),
-            'user_color': user_color
-        })
-    
-    return parsed_games
-
 @api_router.post("/import-games")
 async def import_games(req: ImportGamesRequest, user: User = Depends(get_current_user)):
     """Import games from Chess.com or Lichess"""
@@ -817,60 +914,58 @@ async def import_games(req: ImportGamesRequest, user: User = Depends(get_current
             for archive_url in recent_archives:
                 try:
                     pgn_url = archive_url + "/pgn"
-                    pgn_resp = await client_http.get(pgn_url)
-                    if pgn_resp.status_code == 200:
-                        parsed = parse_pgn_games(pgn_resp.text, "chess.com", username)
-                        games_to_import.extend(parsed[:20])
+                    async with client_http.stream("GET", pgn_url) as pgn_resp:
+                        if pgn_resp.status_code == 200:
+                            archive_games = 0
+                            async for game_pgn in aiter_pgn_texts(pgn_resp):
+                                games_to_import.append(pgn_text_to_game_data(game_pgn, "chess.com", username))
+                                archive_games += 1
+                                if archive_games >= 20:
+                                    break
                 except Exception as e:
                     logger.error(f"Error fetching archive: {e}")
                     continue
     
     elif platform == "lichess":
         async with httpx.AsyncClient(timeout=30.0) as client_http:
-            resp = await client_http.get(
+            async with client_http.stream(
+                "GET",
                 f"https://lichess.org/api/games/user/{username}",
-                params={"max": 30, "pgnInJson": False},
+                params={"max": 30, "pgnInJson": False, "clocks": "true"},
                 headers={"Accept": "application/x-chess-pgn"}
-            )
-            if resp.status_code != 200:
-                raise HTTPException(status_code=400, detail="Could not fetch Lichess games")
-            
-            parsed = parse_pgn_games(resp.text, "lichess", username)
-            games_to_import.extend(parsed)
+            ) as resp:
+                if resp.status_code != 200:
+                    raise HTTPException(status_code=400, detail="Could not fetch Lichess games")
+                
+                async for game_pgn in aiter_pgn_texts(resp):
+                    games_to_import.append(pgn_text_to_game_data(game_pgn, "lichess", username))
     
     else:
         raise HTTPException(status_code=400, detail="Invalid platform")
     
-    imported_count = 0
+    candidate_docs = []
     for game_data in games_to_import[:30]:
-        existing = await db.games.find_one({
-            "user_id": user.user_id,
-            "pgn": game_data['pgn']
-        })
-        if existing:
-            continue
-        
         game = Game(
             user_id=user.user_id,
+            fingerprint=compute_game_fingerprint(game_data['pgn']),
             **game_data
         )
         doc = game.model_dump()
         doc['imported_at'] = doc['imported_at'].isoformat()
-        await db.games.insert_one(doc)
-        imported_count += 1
+        candidate_docs.append(doc)
+    
+    # One indexed $in lookup for the whole batch, then a single unordered insert
+    new_docs = await filter_new_games(db, user.user_id, candidate_docs)
+    imported_count = await insert_games_unordered(db, new_docs)
+    if imported_count > 0:
+        # Parse each PGN once here; analysis and stats read the stored record
+        await save_game_records(db, new_docs)
+        await bump_user_generation(db, user.user_id)
     
-    # GAMIFICATION: Award XP for importing games
+    # GAMIFICATION: Award XP for the whole batch at once
     if imported_count > 0:
         try:
-            for _ in range(imported_count):
-                await add_xp(user.user_id, "game_imported")
-                await increment_stat(user.user_id, "games_imported")
-            
-            # First game achievement
-            if imported_count >= 1:
-                await check_and_award_achievements(user.user_id, "games_imported", imported_count)
-            
-            await update_streak(user.user_id)
+            await record_games_imported(user.user_id, imported_count)
         except Exception as gam_err:
             logger.warning(f"Gamification update error (non-critical): {gam_err}")
     
@@ -1021,7 +1116,7 @@ async def get_all_best_moves(user: User = Depends(get_current_user)):
                         "game_id": analysis["game_id"],
                         "move_number": move_num,
                         "move": move_data.get("move", ""),
-                        "evaluation": "excellent" if cp_loss == 0 else "good",
+                        "evaluation": eval_type if eval_type in ("brilliant", "great") else ("excellent" if cp_loss == 0 else "good"),
                         "fen": move_data.get("fen_before", ""),
                         "feedback": f"Perfect move with {cp_loss} centipawn loss",
                         "intent": ""
@@ -1036,8 +1131,6 @@ async def get_all_best_moves(user: User = Depends(get_current_user)):
 @api_router.get("/games/{game_id}")
 async def get_game(game_id: str, user: User = Depends(get_current_user)):
     """Get a specific game with player names and termination reason"""
-    import re
-    
     game = await db.games.find_one(
         {"game_id": game_id, "user_id": user.user_id},
         {"_id": 0}
@@ -1117,10 +1210,24 @@ async def get_user_mistake_context(user_id: str) -> str:
     
     return "\n".join(context_parts)
 
-@api_router.post("/analyze-game")
-async def analyze_game(req: AnalyzeGameRequest, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
-    """Analyze a game with Stockfish engine + AI coaching using PlayerProfile + RAG"""
-    import json
+def _no_progress(event: str, data: Dict[str, Any]) -> None:
+    pass
+
+async def run_game_analysis(req: AnalyzeGameRequest, user: User, background_tasks: BackgroundTasks,
+                            progress=None) -> Dict[str, Any]:
+    """
+    Analyze a game with Stockfish engine + AI coaching using PlayerProfile + RAG.
+    
+    progress(event, data) is called as each stage finishes ("move" per ply,
+    "engine_complete", "commentary_attempt", "commentary_unavailable",
+    "commentary", "summary"). It may be called from the Stockfish worker
+    thread, so it must be thread-safe.
+    
+    If the LLM provider is down the analysis is still saved with engine-only
+    commentary and commentary_status "pending", so the commentary queue
+    coaches it once the provider is back.
+    """
+    emit = progress or _no_progress
     
     game = await db.games.find_one(
         {"game_id": req.game_id, "user_id": user.user_id},
@@ -1149,15 +1256,21 @@ async def analyze_game(req: AnalyzeGameRequest, background_tasks: BackgroundTask
     logger.info(f"Running Stockfish analysis for game {req.game_id}")
     user_color = game.get('user_color', 'white')
     
+    game_record = await get_game_record(db, game)
+    
     stockfish_result = None
     max_stockfish_retries = STOCKFISH_MAX_RETRIES
     
     for attempt in range(max_stockfish_retries):
         try:
-            stockfish_result = analyze_game_with_stockfish(
+            # Runs in a worker thread so the event loop (and progress streams) stay live
+            stockfish_result = await asyncio.to_thread(
+                analyze_game_with_stockfish,
                 game['pgn'], 
                 user_color=user_color,
-                depth=STOCKFISH_DEPTH  # Good balance of speed and accuracy
+                depth=STOCKFISH_DEPTH,  # Good balance of speed and accuracy
+                record=game_record,
+                on_move=(lambda m: emit("move", m)) if progress else None
             )
             
             if stockfish_result and stockfish_result.get("success"):
@@ -1177,61 +1290,23 @@ async def analyze_game(req: AnalyzeGameRequest, background_tasks: BackgroundTask
             stockfish_result = None
         
         if attempt < max_stockfish_retries - 1:
-            import asyncio
             await asyncio.sleep(1)  # Brief pause before retry
     
     if not stockfish_result or not stockfish_result.get("success"):
         logger.error(f"Stockfish analysis failed after {max_stockfish_retries} attempts for game {req.game_id}")
     
-    # Extract Stockfish evaluations for GPT context
-    stockfish_context = ""
+    emit("engine_complete", {
+        "success": bool(stockfish_result and stockfish_result.get("success")),
+        "user_stats": stockfish_result.get("user_stats", {}) if stockfish_result else {},
+        "game_stats": stockfish_result.get("game_stats", {}) if stockfish_result else {}
+    })
+    
+    # Compact digest of the critical moments for the LLM (instead of the raw PGN)
     stockfish_move_data = []
+    digest = build_move_digest(stockfish_result, user_color)
     if stockfish_result and stockfish_result.get("success"):
         user_stats = stockfish_result.get("user_stats", {})
         moves = stockfish_result.get("moves", [])
-        
-        # Build context for GPT
-        stockfish_context = f"""
-=== STOCKFISH ENGINE ANALYSIS (DEPTH 18) ===
-Player: {user_color}
-Accuracy: {user_stats.get('accuracy', 0)}%
-Blunders: {user_stats.get('blunders', 0)}
-Mistakes: {user_stats.get('mistakes', 0)}  
-Inaccuracies: {user_stats.get('inaccuracies', 0)}
-Best Moves: {user_stats.get('best_moves', 0)}
-Excellent Moves: {user_stats.get('excellent_moves', 0)}
-Average CP Loss: {user_stats.get('avg_cp_loss', 0)}
-
-=== MOVE-BY-MOVE ENGINE EVALUATION ===
-"""
-        # Include significant moves (blunders, mistakes, inaccuracies)
-        significant_moves = [m for m in moves if m.get('evaluation') in ['blunder', 'mistake', 'inaccuracy']]
-        for m in significant_moves[:10]:  # Limit to top 10 bad moves
-            eval_type = m.get('evaluation', 'unknown')
-            # Handle both string and enum types
-            if hasattr(eval_type, 'value'):
-                eval_type = eval_type.value
-            
-            stockfish_context += f"""
-Move {m.get('move_number')}: {m.get('move')} ({eval_type.upper()})
-- CP Loss: {m.get('cp_loss', 0)} centipawns
-- Best was: {m.get('best_move')}
-- Eval before: {m.get('eval_before', 0)/100:.1f} → after: {m.get('eval_after', 0)/100:.1f}"""
-            
-            # Add PV lines for mistakes (these explain WHY it's bad)
-            if eval_type.lower() in ['inaccuracy', 'mistake', 'blunder']:
-                threat = m.get('threat')
-                pv_played = m.get('pv_after_played', [])
-                pv_best = m.get('pv_after_best', [])
-                
-                if threat:
-                    stockfish_context += f"\n- OPPONENT'S THREAT: {threat}"
-                if pv_played:
-                    stockfish_context += f"\n- LINE AFTER YOUR MOVE: {' '.join(pv_played)}"
-                if pv_best:
-                    stockfish_context += f"\n- LINE AFTER BEST MOVE: {m.get('best_move')} {' '.join(pv_best)}"
-            
-            stockfish_context += "\n"
         stockfish_move_data = moves
         logger.info(f"Stockfish: {user_stats.get('blunders', 0)} blunders, {user_stats.get('mistakes', 0)} mistakes, {user_stats.get('accuracy', 0)}% accuracy")
     
@@ -1274,207 +1349,67 @@ Move {m.get('move_number')}: {m.get('move')} ({eval_type.upper()})
     else:
         improvement_note = "STATUS: Student is steady. Gentle push to improve."
     
-    system_prompt = f"""You are an experienced chess coach with a warm, calm teaching style.
-
-Your approach:
-- Patient, principle-driven, supportive
-- Focus on thinking habits, not moves
-- Simple English, short sentences
-- Sound like a mentor, not a commentator
-- Use Indian warmth sparingly (max once in summary, e.g., "Well done" not "Beta" repeatedly)
-
-IMPORTANT: I have already analyzed this game with Stockfish (world's best chess engine).
-The engine data below is ACCURATE - trust it completely for move evaluations.
-
-=== HOW TO EXPLAIN MISTAKES ===
-For INACCURACIES/MISTAKES/BLUNDERS, Stockfish provides:
-- OPPONENT'S THREAT: The move that punishes your mistake
-- LINE AFTER YOUR MOVE: What happens next (shows the problem)
-- LINE AFTER BEST MOVE: What would have happened with the better choice
-
-YOUR JOB: Turn these concrete lines into human coaching:
-1. Explain what THREAT you missed (use the exact threat move from data)
-2. Show WHY it hurts (use the line to explain consequences)
-3. Compare to the better move (what you avoid by playing correctly)
-
-Example transformation:
-ENGINE DATA: Move 7: Qxb4 (INACCURACY), THREAT: Bb5+, LINE: Bb5+ Kf7 Ng5+
-YOUR EXPLANATION: "You grabbed the pawn with Qxb4, but White has Bb5+ check. After Kf7 forced, Ng5+ comes with another attack. Your king gets stuck in the center - that's the real cost of taking that pawn."
-
-DO NOT make up chess analysis. ONLY use the lines provided.
-If no line is provided, give a general principle explanation.
-
-{stockfish_context}
-
-{first_name} played as {game['user_color']} in this game.
-Games analyzed together: {games_analyzed}
-
-{memory_section}
-
-{improvement_note}
-
-=== COACHING RULES ===
-
-1. MEMORY REFERENCE (builds trust)
-   - If current mistake matches a known weakness, mention it briefly
-   - Example: "We've seen this pattern before."
-   - Keep it to 1 sentence, non-judgmental
-
-2. HABIT-FIRST EXPLANATIONS  
-   - Explain "what thinking habit caused this" not "what move was wrong"
-   - One thinking error per mistake
-   - Advice must apply to future games
-
-3. COACH TONE
-   - Warm but professional
-   - Use Indian warmth sparingly (max once in summary)
-   - Avoid: "Great job!", "Amazing!", "Brilliant!"
-   - Prefer: "Good", "Solid", "Well played", "This needs work"
-
-4. CRITICAL: CONSISTENCY RULE
-   - If move is "good" or "solid" → NO negative thinking_pattern
-   - If move is "good" or "solid" → thinking_pattern must be "solid_thinking" or null
-   - Negative patterns ONLY for mistakes/blunders/inaccuracies
-
-5. CONCEPTUAL GUIDANCE (no engine moves)
-   - ❌ "Better: Play d5 earlier"
-   - ✅ "Consider: Challenge the center with a pawn break"
-   - ✅ "Think about: Developing before attacking"
-   - Keep suggestions conceptual, applicable to any game
-
-=== OUTPUT FORMAT (STRICT JSON) ===
-{{
-    "commentary": [
-        {{
-            "move_number": 5,
-            "move": "h6",
-            "evaluation": "inaccuracy",
-            "intent": "What you were thinking (1 short sentence)",
-            "feedback": "Coach feedback using CONCRETE lines from Stockfish data - mention the threat move and what happens (2-3 sentences)",
-            "consider": "The better move and WHY it's better (use the PV line to explain)",
-            "memory_note": "Brief memory reference if this matches past weakness (null otherwise)",
-            "details": {{
-                "thinking_pattern": "ONLY for mistakes: rushing, tunnel_vision, hope_chess, etc. For good moves: solid_thinking or null",
-                "threat_line": "The EXACT threat from Stockfish (e.g., 'exd5 Qxd5 Nc3')",
-                "rule": "A principle for future games"
-            }}
-        }}
-    ],
-    "blunders": 0,
-    "mistakes": 0, 
-    "inaccuracies": 0,
-    "best_moves": 0,
-    "summary_p1": "2 sentences: Overall game assessment - what went well, where discipline showed.",
-    "summary_p2": "2 sentences: The one habit to focus on + instruction for next game.",
-    "improvement_note": "One sentence about progress trend (null if no data)",
-    "identified_weaknesses": [
-        {{
-            "category": "tactical",
-            "subcategory": "pin_blindness",
-            "habit_description": "What thinking pattern caused this",
-            "practice_tip": "What to practice"
-        }}
-    ],
-    "identified_strengths": [
-        {{
-            "category": "tactical", 
-            "subcategory": "good_development",
-            "description": "What they did well"
-        }}
-    ],
-    "best_move_suggestions": [
-        {{
-            "move_number": 15,
-            "best_move": "Nf3",
-            "reason": "Controls the center and prepares castling"
-        }}
-    ],
-    "focus_this_week": "The ONE habit to work on",
-    "voice_script": "30-second calm spoken summary"
-}}
-
-=== STRICT RULES ===
-1. NO engine language: no "stockfish", no centipawns, no "+0.5"
-2. NO flashy commentary: no "Amazing!", "Brilliant!", "What a blunder!"
-3. ONE lesson per mistake only
-4. "Good/solid" moves NEVER get negative thinking_pattern
-5. For MISTAKES: "consider" must reference the BETTER MOVE from Stockfish data and explain WHY using the PV line
-6. For GOOD moves: "consider" should be null
-7. Keep everything focused - coaches explain using actual moves, not vague principles
-8. Memory references are factual, never shaming
-9. STRENGTHS must be POSITIVE patterns only (e.g., "good_development", "solid_defense", "active_pieces")
-   NEVER list weaknesses as strengths. If no clear strength, leave empty array.
-10. For key blunders/mistakes, the "feedback" MUST mention:
-    - The THREAT move opponent has (from OPPONENT'S THREAT in data)
-    - What happens after (from LINE AFTER YOUR MOVE)
-    Example: "After Qxb4, White has Bb5+ check. After Kf7, Ng5+ continues the attack."
-
-Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
-"""
+    # Static prefix (cacheable by the provider); everything per-game goes in the user message
+    system_prompt = GAME_COACH_SYSTEM_PROMPT
+    user_message = build_game_user_message(
+        digest, game['pgn'], first_name, game['user_color'], games_analyzed,
+        memory_section=memory_section, improvement_note=improvement_note
+    )
+    logger.info(
+        f"Prompt tokens for {req.game_id}: raw PGN {estimate_tokens(game['pgn'])} -> "
+        f"user message {estimate_tokens(user_message)}, cached system prefix {estimate_tokens(system_prompt)}"
+    )
 
     try:
-        # CQS: Track regeneration attempts
-        cqs_scores = []
-        best_analysis_data = None
-        best_cqs_result = None
         has_memory = len(memory_callouts) > 0
         
-        for attempt in range(MAX_REGENERATIONS + 1):
+        async def generate_commentary(attempt: int):
             # Build prompt with stricter constraints on regeneration
             current_prompt = system_prompt
             if attempt > 0:
-                stricter_rules = get_stricter_prompt_constraints(attempt)
-                current_prompt = system_prompt + "\n" + stricter_rules
+                current_prompt = system_prompt + "\n" + get_stricter_prompt_constraints(attempt)
                 logger.info(f"CQS: Regenerating analysis for {req.game_id}, attempt {attempt + 1}")
-            
-            # Use OpenAI directly
-            response = await call_llm(
+            # Malformed JSON is repaired locally; only unrecoverable output costs an attempt
+            return await call_llm_json(
                 system_message=current_prompt,
-                user_message=f"Please analyze this game:\n\n{game['pgn']}",
-                model="gpt-4o-mini"
+                user_message=user_message,
+                schema=GameCommentaryOutput,
+                model="gpt-4o-mini",
+                caller="analysis_commentary"
             )
         
-            response_clean = response.strip()
-            if response_clean.startswith("```json"):
-                response_clean = response_clean[7:]
-            if response_clean.startswith("```"):
-                response_clean = response_clean[3:]
-            if response_clean.endswith("```"):
-                response_clean = response_clean[:-3:]
-            
-            try:
-                analysis_data = json.loads(response_clean)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parse error on attempt {attempt + 1}: {e}")
-                continue
-            
-            # CQS: Evaluate quality
-            cqs_result = calculate_cqs(
-                analysis_data,
-                has_memory=has_memory,
-                memory_callouts=memory_callouts
+        # CQS: Candidates are scored locally and the best one is kept. Higher tiers
+        # request several up front so a low score doesn't cost another round trip.
+        commentary_status = "complete"
+        try:
+            analysis_data, cqs_result, cqs_scores = await generate_best_candidate(
+                generate_commentary,
+                lambda data: calculate_cqs(data, has_memory=has_memory, memory_callouts=memory_callouts),
+                req.game_id,
+                first_round=first_round_candidates(user.tier),
+                on_attempt=lambda n: emit("commentary_attempt", {"attempt": n}),
+                stop_on=(LLMUnavailableError,)
             )
-            cqs_scores.append(cqs_result["total_score"])
-            
-            # Log the result (internal only)
-            log_cqs_result(req.game_id, cqs_result, attempt + 1, not cqs_result["should_regenerate"])
-            
-            # Keep track of best result
-            if best_analysis_data is None or cqs_result["total_score"] > best_cqs_result["total_score"]:
-                best_analysis_data = analysis_data
-                best_cqs_result = cqs_result
-            
-            # Check if we should accept
-            if not cqs_result["should_regenerate"]:
-                break
-            
-            # If this is the last attempt, we'll use the best one
-            if attempt >= MAX_REGENERATIONS:
-                break
+        except LLMUnavailableError as e:
+            # Provider down: finish with engine-only results instead of failing the analysis
+            logger.warning(f"LLM unavailable for {req.game_id}, saving engine-only analysis: {e}")
+            analysis_data = engine_only_commentary(
+                stockfish_result, user_color, profile.get("current_rating") or DEFAULT_RATING
+            )
+            cqs_result, cqs_scores = None, []
+            commentary_status = "pending"
+            emit("commentary_unavailable", {"reason": "provider_unavailable"})
         
-        # Use the best analysis data
-        analysis_data = best_analysis_data
-        cqs_result = best_cqs_result
+        # The LLM only saw the critical moments; every other move gets template commentary
+        if commentary_status == "complete":
+            coached = analysis_data.get("commentary", [])
+            analysis_data["commentary"] = merge_commentary(
+                build_local_commentary(
+                    stockfish_move_data, user_color, profile.get("current_rating") or DEFAULT_RATING,
+                    skip={c.get("move_number") for c in coached}
+                ),
+                coached
+            )
         
         # Validate explanations against contract
         validated_commentary = []
@@ -1490,6 +1425,7 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
                     if len(explanation.get("one_repeatable_rule", "")) < 10:
                         explanation["one_repeatable_rule"] = "Always scan the whole board before moving"
             validated_commentary.append(item)
+        emit("commentary", {"commentary": validated_commentary})
         
         # Map weaknesses to predefined categories with full details
         categorized_weaknesses = []
@@ -1583,6 +1519,14 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
         analysis_doc['summary_p1'] = analysis_data.get("summary_p1", "")
         analysis_doc['summary_p2'] = analysis_data.get("summary_p2", "")
         analysis_doc['improvement_note'] = analysis_data.get("improvement_note", "")
+        emit("summary", {
+            "summary_p1": analysis_doc['summary_p1'],
+            "summary_p2": analysis_doc['summary_p2'],
+            "focus_this_week": focus_week,
+            "improvement_note": analysis_doc['improvement_note'],
+            "strengths": analysis_doc['strengths'],
+            "weaknesses": categorized_weaknesses
+        })
         
         # Mark if Stockfish analysis failed - user can retry
         analysis_doc['stockfish_failed'] = analysis_incomplete
@@ -1619,6 +1563,17 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
                 "move_evaluations": stockfish_move_data
             }
         
+        # ============ TACTICAL MOTIF SCAN ============
+        # One pass over every ply with the bitboard detectors; badges, mistake
+        # cards and the Coach page read these flags instead of recomputing
+        if game_record:
+            try:
+                analysis_doc['motif_scan'] = scan_game_motifs(
+                    game_record["fens"], game_record["uci"], user_color
+                )
+            except Exception as motif_err:
+                logger.warning(f"Motif scan failed (non-critical): {motif_err}")
+        
         # ============ PHASE-AWARE STRATEGIC COACHING ============
         # Analyze game phases and provide rating-adaptive strategic lessons
         try:
@@ -1634,7 +1589,12 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
                 user_rating = player_profile.get("current_rating", DEFAULT_RATING)
             
             # Analyze game phases with rating-adaptive content
-            phase_analysis = analyze_game_phases(game['pgn'], user_color, user_rating)
+            # Phases were labelled during the Stockfish replay - no second replay
+            sf_phase_labels = stockfish_result.get("phase_labels") if stockfish_result else None
+            phase_analysis = analyze_game_phases(
+                game['pgn'], user_color, user_rating,
+                record=game_record, phase_labels=sf_phase_labels
+            )
             
             if phase_analysis and not phase_analysis.get("error"):
                 analysis_doc['phase_analysis'] = {
@@ -1643,7 +1603,8 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
                     "endgame_info": phase_analysis.get("endgame_info"),
                     "phase_summary": phase_analysis.get("phase_summary", ""),
                     "total_moves": phase_analysis.get("total_moves", 0),
-                    "phase_transitions": phase_analysis.get("phase_transitions", [])
+                    "phase_transitions": phase_analysis.get("phase_transitions", []),
+                    "ply_phases": phase_analysis.get("ply_phases", "")
                 }
                 
                 # Strategic lesson - rating-adaptive
@@ -1674,13 +1635,19 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
             logger.warning(f"Phase analysis failed (non-critical): {phase_err}")
         
         # CQS: Store internal metadata (NEVER exposed to users)
-        analysis_doc['_cqs_internal'] = {
-            "score": cqs_result["total_score"],
-            "breakdown": cqs_result["breakdown"],
-            "quality_level": cqs_result["quality_level"],
-            "regeneration_attempts": len(cqs_scores),
-            "all_scores": cqs_scores
-        }
+        if cqs_result:
+            analysis_doc['_cqs_internal'] = {
+                "score": cqs_result["total_score"],
+                "breakdown": cqs_result["breakdown"],
+                "quality_level": cqs_result["quality_level"],
+                "regeneration_attempts": len(cqs_scores),
+                "all_scores": cqs_scores
+            }
+        analysis_doc['commentary_status'] = commentary_status
+        if commentary_status == "pending":
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=COMMENTARY_RETRY_BASE_SECONDS)
+            analysis_doc['commentary_attempts'] = 0
+            analysis_doc['commentary_next_attempt_at'] = retry_at.isoformat()
         
         await db.game_analyses.insert_one(analysis_doc)
         
@@ -1688,6 +1655,7 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
             {"game_id": req.game_id},
             {"$set": {"is_analyzed": True}}
         )
+        await bump_user_generation(db, user.user_id)
         
         # Remove _id before returning
         analysis_doc.pop('_id', None)
@@ -1760,6 +1728,59 @@ Evaluations: "blunder", "mistake", "inaccuracy", "good", "solid", "neutral"
         logger.error(f"Analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@api_router.post("/analyze-game")
+async def analyze_game(req: AnalyzeGameRequest, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
+    """Analyze a game with Stockfish engine + AI coaching using PlayerProfile + RAG"""
+    return await run_game_analysis(req, user, background_tasks)
+
+@api_router.post("/analyze-game/stream")
+async def analyze_game_stream(req: AnalyzeGameRequest, user: User = Depends(get_current_user)):
+    """
+    Same analysis as /analyze-game, streamed as server-sent events.
+    
+    Events: "move" per ply as Stockfish evaluates it, "engine_complete",
+    "commentary_attempt", "commentary", "summary", then "complete" with the
+    stored analysis document (or "error"). The analysis runs in its own task,
+    so it is still saved if the client disconnects mid-stream.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def progress(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+    
+    async def run():
+        # Post-analysis jobs run here rather than after the response, which
+        # may already be gone by the time the analysis finishes
+        tasks = BackgroundTasks()
+        try:
+            doc = await run_game_analysis(req, user, tasks, progress=progress)
+            progress("complete", doc)
+        except HTTPException as e:
+            progress("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Streamed analysis error: {e}")
+            progress("error", {"status": 500, "detail": f"Analysis failed: {str(e)}"})
+        await tasks()
+    
+    analysis_task = asyncio.create_task(run())
+    
+    async def event_stream():
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=ANALYSIS_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if analysis_task.done() and events.empty():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            if event in ("complete", "error"):
+                return
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_router.get("/analysis/{game_id}")
 async def get_analysis(game_id: str, user: User = Depends(get_current_user)):
     """Get analysis for a specific game"""
@@ -1845,7 +1866,7 @@ async def generate_speech(req: TTSRequest, user: User = Depends(get_current_user
     text = req.text[:4000]
     
     try:
-        audio_bytes = await call_tts(text=text, voice=req.voice)
+        audio_bytes = await call_tts(text=text, voice=req.voice, caller="tts_generate")
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
         
         return {
@@ -1854,6 +1875,8 @@ async def generate_speech(req: TTSRequest, user: User = Depends(get_current_user
             "voice": req.voice
         }
         
+    except LLMUnavailableError:
+        raise HTTPException(status_code=503, detail="Voice generation is temporarily unavailable")
     except Exception as e:
         logger.error(f"TTS generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Voice generation failed: {str(e)}")
@@ -1894,7 +1917,7 @@ async def generate_analysis_voice(game_id: str, user: User = Depends(get_current
         raise HTTPException(status_code=400, detail="No summary available for voice generation")
     
     try:
-        audio_bytes = await call_tts(text=voice_script[:4000], voice="onyx")
+        audio_bytes = await call_tts(text=voice_script[:4000], voice="onyx", caller="tts_analysis_summary")
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
         
         # Cache the audio in the database
@@ -1910,6 +1933,8 @@ async def generate_analysis_voice(game_id: str, user: User = Depends(get_current
             "cached": False
         }
         
+    except LLMUnavailableError:
+        raise HTTPException(status_code=503, detail="Voice generation is temporarily unavailable")
     except Exception as e:
         logger.error(f"TTS analysis voice error: {e}")
         raise HTTPException(status_code=500, detail=f"Voice generation failed: {str(e)}")
@@ -1965,7 +1990,7 @@ async def generate_move_voice(req: MoveVoiceRequest, user: User = Depends(get_cu
         raise HTTPException(status_code=400, detail="No explanation available for this move")
     
     try:
-        audio_bytes = await call_tts(text=voice_script[:4000], voice="onyx")
+        audio_bytes = await call_tts(text=voice_script[:4000], voice="onyx", caller="tts_move_explanation")
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
         
         return {
@@ -1975,6 +2000,8 @@ async def generate_move_voice(req: MoveVoiceRequest, user: User = Depends(get_cu
             "move_number": move_num
         }
         
+    except LLMUnavailableError:
+        raise HTTPException(status_code=503, detail="Voice generation is temporarily unavailable")
     except Exception as e:
         logger.error(f"TTS move voice error: {e}")
         raise HTTPException(status_code=500, detail=f"Voice generation failed: {str(e)}")
@@ -1982,31 +2009,32 @@ async def generate_move_voice(req: MoveVoiceRequest, user: User = Depends(get_cu
 # ==================== JOURNEY DASHBOARD ROUTES ====================
 
 @api_router.get("/journey")
-async def get_journey_dashboard(user: User = Depends(get_current_user)):
+async def get_journey_dashboard(request: Request, user: User = Depends(get_current_user)):
     """
     Get Journey Dashboard data - proves learning over time.
     
     This is the primary surface where coaching results appear.
     No manual analysis required - games are analyzed automatically.
     """
-    # Get player profile
-    profile = await db.player_profiles.find_one(
-        {"user_id": user.user_id},
-        {"_id": 0}
-    )
-    
-    if not profile:
-        # Create profile if doesn't exist
-        profile = await get_or_create_profile(db, user.user_id, user.name)
-    
-    # Generate dashboard data
-    dashboard = await generate_journey_dashboard_data(db, user.user_id, profile)
+    async def build():
+        # Get player profile
+        profile = await db.player_profiles.find_one(
+            {"user_id": user.user_id},
+            {"_id": 0}
+        )
+        
+        if not profile:
+            # Create profile if doesn't exist
+            profile = await get_or_create_profile(db, user.user_id, user.name)
+        
+        # Generate dashboard data
+        return await generate_journey_dashboard_data(db, user.user_id, profile)
     
-    return dashboard
+    return await cached_user_response(db, request, user.user_id, "journey", build)
 
 
 @api_router.get("/journey/comprehensive")
-async def get_comprehensive_journey(user: User = Depends(get_current_user)):
+async def get_comprehensive_journey(request: Request, user: User = Depends(get_current_user)):
     """
     Get comprehensive chess journey data.
     
@@ -2018,8 +2046,10 @@ async def get_comprehensive_journey(user: User = Depends(get_current_user)):
     - Opening repertoire with win rates
     - Weekly summary and insights
     """
-    journey = await get_chess_journey(db, user.user_id)
-    return journey
+    async def build():
+        return await get_chess_journey(db, user.user_id)
+    
+    return await cached_user_response(db, request, user.user_id, "journey/comprehensive", build)
 
 
 @api_router.get("/journey/weekly-assessment")
@@ -2124,6 +2154,8 @@ async def link_chess_account(req: LinkAccountRequest, user: User = Depends(get_c
             "last_game_sync": None  # Trigger initial sync
         }}
     )
+    session_cache.invalidate_user(user.user_id)
+    await bump_user_generation(db, user.user_id)
     
     return {
         "message": "Account linked successfully! We'll import your games from the last 3 months and auto-analyze up to 3 games per day.",
@@ -2283,6 +2315,7 @@ async def track_reflection(result: ReflectionResult, user: User = Depends(get_cu
     }
     
     await db.reflection_results.insert_one(reflection_doc)
+    await bump_user_generation(db, user.user_id)
     
     # Update user's reflection stats
     await db.users.update_one(
@@ -2348,10 +2381,48 @@ async def send_all_weekly_summaries(user: User = Depends(get_current_user)):
     return result
 
 
+@api_router.get("/admin/auth-cache-stats")
+async def get_auth_cache_stats(x_metrics_key: str = Header(default="")):
+    """
+    Session cache hit-rate metrics for this process.
+    
+    Internal only - requires the X-Metrics-Key header to match METRICS_API_KEY.
+    """
+    if not METRICS_API_KEY or not hmac.compare_digest(x_metrics_key, METRICS_API_KEY):
+        raise HTTPException(status_code=404, detail="Not found")
+    return session_cache.stats()
+
+
+@api_router.get("/admin/response-cache-stats")
+async def get_response_cache_stats_endpoint(x_metrics_key: str = Header(default="")):
+    """
+    Dashboard response cache metrics for this process.
+    
+    Internal only - requires the X-Metrics-Key header to match METRICS_API_KEY.
+    """
+    if not METRICS_API_KEY or not hmac.compare_digest(x_metrics_key, METRICS_API_KEY):
+        raise HTTPException(status_code=404, detail="Not found")
+    return get_response_cache_stats()
+
+
 @api_router.get("/coach/today")
-async def get_coach_today(user: User = Depends(get_current_user)):
+async def get_coach_today(request: Request, user: User = Depends(get_current_user)):
+    """
+    Get today's coaching focus (cached per user until new data lands).
+    
+    Keyed by date as well, since due cards and "today" wording roll over daily.
     """
-    Get today's coaching focus - structured as:
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return await cached_user_response(
+        db, request, user.user_id, "coach/today",
+        lambda: build_coach_today(user),
+        variant=today
+    )
+
+
+async def build_coach_today(user: User):
+    """
+    Build today's coaching focus - structured as:
     0. Reflection Moment (critical position from recent game)
     1. Correct This (ONE dominant habit)
     2. Keep Doing This (ONE strength/improvement)
@@ -2617,7 +2688,8 @@ async def get_coach_today(user: User = Depends(get_current_user)):
             "stockfish_analysis.move_evaluations": {"$exists": True, "$not": {"$size": 0}}
         },
         {"_id": 0, "game_id": 1, "blunders": 1, "mistakes": 1, "accuracy": 1, 
-         "commentary": 1, "identified_weaknesses": 1, "stockfish_analysis": 1}
+         "commentary": 1, "identified_weaknesses": 1, "stockfish_analysis": 1,
+         "motif_scan.counts": 1}
     ).sort("created_at", -1).limit(5).to_list(5)
     
     # Find the first one that has actual analysis data
@@ -2656,7 +2728,6 @@ async def get_coach_today(user: User = Depends(get_current_user)):
             opponent = "Opponent"
             
             if most_recent_game.get("pgn"):
-                import re
                 pgn = most_recent_game["pgn"]
                 white_match = re.search(r'\[White "([^"]+)"\]', pgn)
                 black_match = re.search(r'\[Black "([^"]+)"\]', pgn)
@@ -2727,6 +2798,13 @@ async def get_coach_today(user: User = Depends(get_current_user)):
                 else:
                     comment = f"{blunders} blunders. Rough game — let's review."
             
+            # Precomputed tactical motifs on the user's moves (stored at analysis time)
+            motif_counts = {
+                k: v for k, v in (last_analysis.get("motif_scan") or {}).get("counts", {}).items() if v
+            }
+            if blunders and motif_counts.get("hanging") and not repeated_habit:
+                comment += " Watch for pieces left undefended."
+            
             last_game = {
                 "opponent": opponent,
                 "result": "Won" if won else ("Lost" if lost else "Draw"),
@@ -2739,6 +2817,7 @@ async def get_coach_today(user: User = Depends(get_current_user)):
                 },
                 "comment": comment,
                 "repeated_habit": repeated_habit,
+                "tactical_motifs": motif_counts,
                 "game_id": most_recent_game.get("game_id"),
                 "external_url": most_recent_game.get("url"),
                 "has_full_analysis": True
@@ -2755,7 +2834,6 @@ async def get_coach_today(user: User = Depends(get_current_user)):
         ).to_list(100)
         
         if games_with_openings and len(games_with_openings) >= 3:
-            import re
             from collections import defaultdict
             
             # Load ECO openings for name lookup
@@ -3048,7 +3126,8 @@ async def get_why_question_for_card(card_id: str, user: User = Depends(get_curre
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    why_data = await generate_why_question(db, card)
+    # Precomputed when the card was created; older cards are generated on the fly
+    why_data = card.get("why_question") or await generate_why_question(db, card)
     return why_data
 
 
@@ -3090,27 +3169,19 @@ async def get_progress_metrics(user: User = Depends(get_current_user)):
     """
     user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
     
-    # Fetch rating data
+    # Rating data from the stored snapshot (refreshed by background sync)
     rating_data = {"current": None, "change": 0, "peak": None, "habit_correlation": None}
     
-    # Check both field naming conventions
-    chess_com_user = user_doc.get("chesscom_username") or user_doc.get("chess_com_username")
-    lichess_user = user_doc.get("lichess_username")
-    
-    if chess_com_user or lichess_user:
-        try:
-            ratings = await fetch_platform_ratings(chess_com_user, lichess_user)
-            if ratings:
-                # Get rating from chess_com or lichess
-                platform_data = ratings.get("chess_com") or ratings.get("lichess") or {}
-                for category in ["rapid", "blitz", "bullet"]:
-                    rating_val = platform_data.get(category)
-                    if rating_val:
-                        rating_data["current"] = rating_val
-                        rating_data["peak"] = rating_val  # We don't have historical peak easily
-                        break
-        except Exception as e:
-            logger.warning(f"Failed to fetch ratings: {e}")
+    try:
+        ratings = await get_cached_platform_ratings(db, user_doc)
+        primary = select_primary_rating(ratings)
+        if primary:
+            platform, category, rating_val = primary
+            history = await get_rating_history(db, user.user_id, platform, category)
+            # Change over the last 30 days of stored history
+            rating_data.update(summarize_rating_history(rating_val, history, days=30))
+    except Exception as e:
+        logger.warning(f"Failed to load ratings: {e}")
     
     # Get recent analyses for accuracy and blunders
     recent_analyses = await db.game_analyses.find(
@@ -3257,7 +3328,7 @@ async def get_progress_metrics(user: User = Depends(get_current_user)):
 
 
 @api_router.get("/progress/v2")
-async def get_progress_v2(user: User = Depends(get_current_user)):
+async def get_progress_v2(request: Request, user: User = Depends(get_current_user)):
     """
     NEW Progress Page - Chess DNA Badges + Coach Assessment
     
@@ -3271,20 +3342,22 @@ async def get_progress_v2(user: User = Depends(get_current_user)):
     """
     from coach_assessment_service import generate_full_progress_data
     
+    async def build():
+        return await generate_full_progress_data(db, user.user_id)
+    
     try:
-        progress_data = await generate_full_progress_data(db, user.user_id)
-        return progress_data
+        return await cached_user_response(db, request, user.user_id, "progress/v2", build)
     except Exception as e:
         logger.error(f"Progress v2 error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate progress data")
 
 
 @api_router.get("/badges")
-async def get_chess_badges(user: User = Depends(get_current_user)):
+async def get_chess_badges(request: Request, user: User = Depends(get_current_user)):
     """Get just the badge scores for quick display"""
     from badge_service import calculate_all_badges, get_badge_history, calculate_badge_trends
     
-    try:
+    async def build():
         badges = await calculate_all_badges(db, user.user_id)
         history = await get_badge_history(db, user.user_id)
         trends = calculate_badge_trends(badges, history)
@@ -3294,6 +3367,9 @@ async def get_chess_badges(user: User = Depends(get_current_user)):
             badges["badges"][key]["trend"] = trends.get(key, "stable")
         
         return badges
+    
+    try:
+        return await cached_user_response(db, request, user.user_id, "badges", build)
     except Exception as e:
         logger.error(f"Badges error: {e}")
         raise HTTPException(status_code=500, detail="Failed to calculate badges")
@@ -3408,6 +3484,8 @@ async def update_coaching_preferences(
         {"user_id": user.user_id},
         {"$set": update_data}
     )
+    session_cache.invalidate_user(user.user_id)
+    await bump_user_generation(db, user.user_id)
     
     return {"message": "Preferences updated", "updated": update_data}
 
@@ -3487,6 +3565,7 @@ async def update_email_notification_settings(
             }
         }}
     )
+    session_cache.invalidate_user(user.user_id)
     
     return {
         "message": "Email notification settings updated",
@@ -3693,11 +3772,12 @@ async def get_dashboard_stats(user: User = Depends(get_current_user)):
     
     return response
 
+class TrainingRecommendationsOutput(LLMOutput):
+    recommendations: List[Dict[str, Any]]
+
 @api_router.get("/training-recommendations")
 async def get_training_recommendations(user: User = Depends(get_current_user)):
     """Get AI-generated training recommendations based on weaknesses"""
-    import json
-    
     patterns = await db.mistake_patterns.find(
         {"user_id": user.user_id},
         {"_id": 0}
@@ -3729,22 +3809,14 @@ Be specific and actionable. Respond in JSON format:
 }"""
     
     try:
-        response = await call_llm(
+        return await call_llm_json(
             system_message=system_message,
             user_message=f"Create training recommendations for a player with these weakness patterns:\n{patterns_text}",
-            model="gpt-4o-mini"
+            schema=TrainingRecommendationsOutput,
+            model="gpt-4o-mini",
+            caller="training_recommendations"
         )
         
-        response_clean = response.strip()
-        if response_clean.startswith("```json"):
-            response_clean = response_clean[7:]
-        if response_clean.startswith("```"):
-            response_clean = response_clean[3:]
-        if response_clean.endswith("```"):
-            response_clean = response_clean[:-3]
-        
-        return json.loads(response_clean)
-        
     except Exception as e:
         logger.error(f"Recommendation error: {e}")
         return {
@@ -3767,28 +3839,19 @@ async def get_rating_trajectory(user: User = Depends(get_current_user)):
     """
     # Get user data
     user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
-    chess_com_username = user_doc.get("chess_com_username")
-    lichess_username = user_doc.get("lichess_username")
+    chess_com_username, lichess_username = get_linked_usernames(user_doc)
     
-    # Fetch platform ratings
-    platform_ratings = await fetch_platform_ratings(chess_com_username, lichess_username)
+    # Platform ratings from the stored snapshot (stale-while-revalidate)
+    platform_ratings = await get_cached_platform_ratings(db, user_doc)
     
     # Get current best rating
     current_rating = DEFAULT_RATING  # Default
     rating_source = "estimated"
     
-    if platform_ratings.get('chess_com', {}).get('rapid'):
-        current_rating = platform_ratings['chess_com']['rapid']
-        rating_source = "chess_com_rapid"
-    elif platform_ratings.get('lichess', {}).get('rapid'):
-        current_rating = platform_ratings['lichess']['rapid']
-        rating_source = "lichess_rapid"
-    elif platform_ratings.get('chess_com', {}).get('blitz'):
-        current_rating = platform_ratings['chess_com']['blitz']
-        rating_source = "chess_com_blitz"
-    elif platform_ratings.get('lichess', {}).get('blitz'):
-        current_rating = platform_ratings['lichess']['blitz']
-        rating_source = "lichess_blitz"
+    primary = select_primary_rating(platform_ratings)
+    if primary:
+        platform, category, current_rating = primary
+        rating_source = f"{platform}_{category}"
     
     # Get game analyses for improvement velocity
     analyses = await db.game_analyses.find(
@@ -3834,7 +3897,7 @@ async def get_time_management_analysis(user: User = Depends(get_current_user)):
     # Get recent games with PGN
     games = await db.games.find(
         {"user_id": user.user_id},
-        {"_id": 0, "pgn": 1, "user_color": 1, "time_control": 1, "result": 1}
+        {"_id": 0, "game_id": 1, "user_id": 1, "pgn": 1, "user_color": 1, "time_control": 1, "result": 1}
     ).sort("imported_at", -1).to_list(30)
     
     if not games:
@@ -3843,6 +3906,11 @@ async def get_time_management_analysis(user: User = Depends(get_current_user)):
             "message": "Import some games first to analyze your time management."
         }
     
+    # Per-ply clock / think-time arrays stored with each game's record
+    records = await get_game_records(db, games, fields=["clocks", "think", "start_fen"])
+    for game in games:
+        game["record"] = records.get(game.get("game_id"))
+    
     # Analyze time usage
     analysis = analyze_time_usage(games, user.user_id)
     
@@ -3947,7 +4015,7 @@ async def analyze_position(req: PositionAnalysisRequest, user: User = Depends(ge
     Returns evaluation and best moves.
     """
     try:
-        result = get_position_evaluation(req.fen, depth=req.depth)
+        result = await asyncio.to_thread(get_position_evaluation, req.fen, depth=req.depth)
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("error", "Analysis failed"))
         return result
@@ -3962,7 +4030,7 @@ async def get_best_moves(req: PositionAnalysisRequest, num_moves: int = 3, user:
     Useful for showing alternatives.
     """
     try:
-        result = get_best_moves_for_position(req.fen, num_moves=num_moves, depth=req.depth)
+        result = await asyncio.to_thread(get_best_moves_for_position, req.fen, num_moves=num_moves, depth=req.depth)
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("error", "Analysis failed"))
         return result
@@ -3970,6 +4038,41 @@ async def get_best_moves(req: PositionAnalysisRequest, num_moves: int = 3, user:
         logger.error(f"Best moves analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchPositionAnalysisRequest(BaseModel):
+    fens: List[str] = Field(..., min_length=1, max_length=BATCH_EVAL_MAX_FENS)
+    depth: int = Field(STOCKFISH_QUICK_DEPTH, ge=1, le=BATCH_EVAL_MAX_DEPTH)
+    multipv: int = Field(1, ge=1, le=BATCH_EVAL_MAX_MULTIPV)
+    format: str = "ndjson"  # "ndjson" or "sse"
+
+@api_router.post("/analyze-positions")
+async def analyze_positions(req: BatchPositionAnalysisRequest, user: User = Depends(get_current_user)):
+    """
+    Analyze many positions in one call.
+    Duplicate positions are searched once, cached ones come back first and the
+    rest run on the shared engine pool. Each result streams as soon as it is
+    ready (match by "index"), followed by a summary with "done": true.
+    """
+    if req.format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    
+    async def ndjson_stream():
+        async for item in stream_fen_evaluations(req.fens, depth=req.depth, multipv=req.multipv):
+            yield json.dumps(item) + "\n"
+    
+    async def sse_stream():
+        async for item in stream_fen_evaluations(req.fens, depth=req.depth, multipv=req.multipv):
+            event = "done" if item.get("done") else "result"
+            yield f"event: {event}\ndata: {json.dumps(item)}\n\n"
+    
+    if req.format == "sse":
+        body, media_type = sse_stream(), "text/event-stream"
+    else:
+        body, media_type = ndjson_stream(), "application/x-ndjson"
+    
+    # X-Accel-Buffering stops nginx from holding results until the batch ends
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ==================== BASIC ROUTES ====================
 
 @api_router.get("/")
@@ -3978,7 +4081,19 @@ async def root():
 
 @api_router.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "llm": get_gateway_status()}
+
+@api_router.get("/internal/llm-metrics")
+async def llm_metrics_report(hours: int = 24, x_metrics_key: str = Header(default="")):
+    """
+    Per-caller LLM / TTS report: calls, failures, retries, latency p50/p95,
+    tokens and estimated cost over the last `hours`.
+    
+    Internal only - requires the X-Metrics-Key header to match METRICS_API_KEY.
+    """
+    if not METRICS_API_KEY or not hmac.compare_digest(x_metrics_key, METRICS_API_KEY):
+        raise HTTPException(status_code=404, detail="Not found")
+    return await summarize_llm_metrics(db, hours=max(1, min(hours, 24 * 30)))
 
 
 # ==================== ASK ABOUT MOVE (Interactive Analysis) ====================
@@ -4043,7 +4158,7 @@ async def ask_about_move(game_id: str, req: AskAboutMoveRequest, user: User = De
         
         if board_before and req.played_move:
             # Get Stockfish analysis for position BEFORE the move
-            before_eval = get_position_evaluation(req.fen_before, depth=18)
+            before_eval = await asyncio.to_thread(get_position_evaluation, req.fen_before, depth=18)
             if before_eval.get("success"):
                 eval_before = before_eval.get("evaluation", 0)
                 if isinstance(eval_before, dict):
@@ -4058,7 +4173,7 @@ async def ask_about_move(game_id: str, req: AskAboutMoveRequest, user: User = De
                 best_line_for_user = before_eval.get("pv", [])[:5]
         
         # Get Stockfish analysis for the CURRENT position (after the move)
-        position_eval = get_position_evaluation(req.fen, depth=18)
+        position_eval = await asyncio.to_thread(get_position_evaluation, req.fen, depth=18)
         if not position_eval.get("success"):
             raise HTTPException(status_code=500, detail="Failed to analyze position")
         
@@ -4104,7 +4219,7 @@ async def ask_about_move(game_id: str, req: AskAboutMoveRequest, user: User = De
                 alt_board.push(alt_move)
                 
                 # Analyze position after alternative move
-                alt_eval = get_position_evaluation(alt_board.fen(), depth=18)
+                alt_eval = await asyncio.to_thread(get_position_evaluation, alt_board.fen(), depth=18)
                 if alt_eval.get("success"):
                     alternative_analysis = {
                         "move": req.alternative_move,
@@ -4233,7 +4348,8 @@ Answer naturally like a supportive chess mentor."""
             answer = await call_llm(
                 system_message="You are an experienced chess coach helping a student understand positions.",
                 user_message=prompt,
-                model="gpt-4o-mini"
+                model="gpt-4o-mini",
+                caller="ask_about_move"
             )
             answer = answer.strip()
         except Exception as e:
@@ -4274,11 +4390,15 @@ class GeneratePuzzleRequest(BaseModel):
     category: str = "tactical"
     subcategory: str = "general"
 
+class GeneratedPuzzleOutput(LLMOutput):
+    fen: str
+    solution_san: str
+    player_color: str = "white"
+    solution: List[Dict[str, Any]] = []
+
 @api_router.post("/generate-puzzle")
 async def generate_puzzle(req: GeneratePuzzleRequest, user: User = Depends(get_current_user)):
     """Generate a puzzle based on user's weakness pattern from PlayerProfile"""
-    import json
-    
     # Get player profile for context
     profile = await db.player_profiles.find_one(
         {"user_id": user.user_id},
@@ -4345,22 +4465,14 @@ Respond in JSON format ONLY:
 Make sure the FEN is valid and the solution is correct for that position."""
 
     try:
-        response = await call_llm(
+        puzzle = await call_llm_json(
             system_message=system_prompt,
             user_message=f"Generate a {target_category} puzzle focusing on {target_subcategory.replace('_', ' ')}",
-            model="gpt-4o-mini"
+            schema=GeneratedPuzzleOutput,
+            model="gpt-4o-mini",
+            caller="puzzle_generation"
         )
         
-        response_clean = response.strip()
-        if response_clean.startswith("```json"):
-            response_clean = response_clean[7:]
-        if response_clean.startswith("```"):
-            response_clean = response_clean[3:]
-        if response_clean.endswith("```"):
-            response_clean = response_clean[:-3]
-        
-        puzzle = json.loads(response_clean)
-        
         # Store puzzle with target weakness for feedback loop
         puzzle_doc = {
             "puzzle_id": f"puzzle_{uuid.uuid4().hex[:12]}",
@@ -4411,9 +4523,9 @@ from gamification_service import (
     add_xp,
     update_streak,
     increment_stat,
+    record_games_imported,
     update_best_accuracy,
     get_user_achievements,
-    check_and_award_achievements,
     claim_daily_reward,
     get_leaderboard,
     LEVELS,
@@ -4467,13 +4579,15 @@ async def get_xp_rewards():
 from opening_service import analyze_opening_repertoire
 
 @api_router.get("/openings/repertoire")
-async def get_opening_repertoire(user: User = Depends(get_current_user)):
+async def get_opening_repertoire(request: Request, user: User = Depends(get_current_user)):
     """
     Analyze user's opening repertoire from all their games.
     Returns detailed stats, problem areas, and personalized coaching.
     """
-    result = await analyze_opening_repertoire(db, user.user_id)
-    return result
+    async def build():
+        return await analyze_opening_repertoire(db, user.user_id)
+    
+    return await cached_user_response(db, request, user.user_id, "openings/repertoire", build)
 
 # ==================== NOTIFICATIONS ROUTES ====================
 
@@ -0,0 +1,196 @@
+"""
+Session Cache Service
+
+Removes the per-request user_sessions + users lookups from authentication:
+1. Short-TTL in-process cache of authenticated users keyed by session token
+2. Optional signed (HMAC) stateless session tokens that skip the session lookup
+3. Invalidation by token (logout) or by user (login, profile/preference updates)
+4. Hit-rate metrics
+
+Signed tokens carry the user's session_epoch. Revoking sessions bumps the
+epoch on the user document, so a logged-out signed token is rejected by any
+process as soon as its cache entry expires.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Set
+
+from config import SESSION_CACHE_TTL_SECONDS, SESSION_CACHE_MAX_ENTRIES, SESSION_TOKEN_FORMAT
+
+logger = logging.getLogger(__name__)
+
+SIGNED_TOKEN_PREFIX = "st1."
+SESSION_SIGNING_SECRET = os.environ.get("SESSION_SIGNING_SECRET", "")
+
+
+class SessionCache:
+    """TTL + LRU cache of user documents keyed by session token"""
+
+    def __init__(self, ttl_seconds: int = SESSION_CACHE_TTL_SECONDS, max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, session_token: str) -> Optional[Dict[str, Any]]:
+        """Return the cached user doc, or None on miss/expiry"""
+        entry = self._entries.get(session_token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        if now >= entry["cache_expires"] or datetime.now(timezone.utc) >= entry["session_expires"]:
+            self._remove(session_token)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(session_token)
+        self.hits += 1
+        return entry["user_doc"]
+
+    def put(self, session_token: str, user_doc: Dict[str, Any], session_expires: datetime) -> None:
+        """Cache a user doc for a token until TTL or session expiry, whichever is first"""
+        if self.ttl_seconds <= 0:
+            return
+
+        self._remove(session_token)
+        self._entries[session_token] = {
+            "user_doc": user_doc,
+            "session_expires": session_expires,
+            "cache_expires": time.monotonic() + self.ttl_seconds
+        }
+        self._tokens_by_user.setdefault(user_doc["user_id"], set()).add(session_token)
+
+        while len(self._entries) > self.max_entries:
+            oldest_token = next(iter(self._entries))
+            self._remove(oldest_token)
+            self.evictions += 1
+
+    def invalidate_token(self, session_token: str) -> None:
+        """Drop a single session (logout)"""
+        if session_token in self._entries:
+            self._remove(session_token)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached session of a user (login, profile or preference change)"""
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "token_format": get_session_token_format()
+        }
+
+    def _remove(self, session_token: str) -> None:
+        entry = self._entries.pop(session_token, None)
+        if entry is None:
+            return
+        user_id = entry["user_doc"].get("user_id")
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(session_token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+# Process-wide cache used by get_current_user
+session_cache = SessionCache()
+
+
+# ==================== SIGNED SESSION TOKENS ====================
+
+def get_session_token_format() -> str:
+    """Active token format; signed mode needs a signing secret"""
+    if SESSION_TOKEN_FORMAT == "signed" and SESSION_SIGNING_SECRET:
+        return "signed"
+    return "opaque"
+
+
+if SESSION_TOKEN_FORMAT == "signed" and not SESSION_SIGNING_SECRET:
+    logger.warning("SESSION_TOKEN_FORMAT is 'signed' but SESSION_SIGNING_SECRET is not set - using opaque tokens")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(payload_b64: str) -> str:
+    digest = hmac.new(SESSION_SIGNING_SECRET.encode("utf-8"), payload_b64.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def is_signed_session_token(session_token: str) -> bool:
+    return session_token.startswith(SIGNED_TOKEN_PREFIX)
+
+
+def create_signed_session_token(user_id: str, expires_at: datetime, session_epoch: int = 0) -> str:
+    """Create a stateless token: st1.<payload>.<hmac-sha256>"""
+    payload = {
+        "uid": user_id,
+        "exp": int(expires_at.timestamp()),
+        "ep": session_epoch,
+        "n": os.urandom(6).hex()
+    }
+    payload_b64 = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{SIGNED_TOKEN_PREFIX}{payload_b64}.{_signature(payload_b64)}"
+
+
+def verify_signed_session_token(session_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify signature and expiry of a signed token.
+
+    Returns the claims (uid, exp, ep) or None if the token is forged,
+    malformed, expired, or signed tokens are not enabled.
+    """
+    if not SESSION_SIGNING_SECRET or not is_signed_session_token(session_token):
+        return None
+
+    try:
+        payload_b64, signature = session_token[len(SIGNED_TOKEN_PREFIX):].split(".", 1)
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(signature, _signature(payload_b64)):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload_b64))
+    except (ValueError, TypeError):
+        return None
+
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
@@ -8,20 +8,34 @@ Features:
 - Position evaluation (centipawn scores)
 - Best move suggestions
 - Move classification (blunder, mistake, inaccuracy, good, excellent)
-- Full game analysis with move-by-move evaluation
+- Full game analysis with move-by-move evaluation (MultiPV: alternatives,
+  only moves, great and brilliant moves)
+- Pooled engines and cached batch evaluation of many positions
 """
 
+import asyncio
 import chess
 import chess.pgn
 import chess.engine
 import io
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
 from dataclasses import dataclass
 from enum import Enum
 
 # Import centralized config
-from config import STOCKFISH_PATH, STOCKFISH_DEPTH, CP_THRESHOLDS as CONFIG_CP_THRESHOLDS
+from config import (
+    STOCKFISH_PATH, STOCKFISH_DEPTH, STOCKFISH_PV_LENGTH, CP_THRESHOLDS as CONFIG_CP_THRESHOLDS,
+    STOCKFISH_POOL_SIZE, STOCKFISH_POOL_TIMEOUT, STOCKFISH_EVAL_CACHE_SIZE,
+    MULTIPV_LINES, ONLY_MOVE_GAP_CP, BRILLIANT_MAX_EVAL_BEFORE, BRILLIANT_MIN_EVAL_AFTER
+)
+from game_record_service import record_board_and_moves
+from position_analyzer import is_piece_sacrifice
+from phase_theory_service import MaterialTracker
 
 logger = logging.getLogger(__name__)
 
@@ -62,7 +76,7 @@ class MoveEvaluation:
     eval_before: int        # Centipawn evaluation before the move (from white's perspective)
     eval_after: int         # Centipawn evaluation after the move
     cp_loss: int            # Centipawn loss (always positive, 0 = best move)
-    classification: str     # blunder, mistake, inaccuracy, good, excellent, best
+    classification: str     # blunder, mistake, inaccuracy, good, excellent, best, great, brilliant
     best_move_san: str      # What Stockfish recommended
     best_move_uci: str
     is_mate_before: bool    # Was there a forced mate before this move?
@@ -73,6 +87,9 @@ class MoveEvaluation:
     pv_after_played: List[str] = None    # What happens after the move you played
     pv_after_best: List[str] = None      # What would happen after the best move
     threat_after_played: str = None       # The immediate threat you face after your move
+    phase: str = None                     # Game phase after the move (opening/middlegame/endgame)
+    only_move: bool = False               # Played the only move that held (MultiPV gap)
+    alternatives: List[Dict[str, Any]] = None  # Top MultiPV lines before the move
 
 @dataclass
 class GameAnalysis:
@@ -265,7 +282,111 @@ def calculate_accuracy(cp_losses: List[int]) -> float:
     return round(weighted_score / total_weight * 100, 1)
 
 
-def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", depth: int = DEFAULT_DEPTH) -> Dict[str, Any]:
+def _score_fields(score: chess.engine.Score) -> Dict[str, Any]:
+    """White-POV score as {centipawns, mate_in, is_mate}; mates map to +/-(10000 - 10 * moves)"""
+    if score.is_mate():
+        mate_in = score.mate()
+        cp_value = 10000 - abs(mate_in) * 10
+        # mate() is 0 for both sides of a finished mate; score() keeps the sign
+        winning = score.score(mate_score=100000) > 0
+        return {"centipawns": cp_value if winning else -cp_value, "mate_in": mate_in, "is_mate": True}
+    return {"centipawns": score.score(), "mate_in": None, "is_mate": False}
+
+
+def _search_lines(engine: StockfishEngine, board: chess.Board, depth: int,
+                  multipv: int) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    One MultiPV search of a position.
+    
+    Returns:
+        (evaluation, lines) - the white-POV evaluation of the position and up
+        to multipv lines of {move, pv_san, cp, mate_in}, best first. Finished
+        games (mate/stalemate) give an evaluation and no lines.
+    """
+    if not engine.engine:
+        raise RuntimeError("Engine not started")
+    
+    infos = engine.engine.analyse(board, chess.engine.Limit(depth=depth), multipv=multipv)
+    lines = []
+    for info in infos:
+        pv = info.get("pv") or []
+        if not pv:
+            continue
+        fields = _score_fields(info["score"].white())
+        line_board = board.copy(stack=False)
+        pv_san = []
+        for move in pv[:STOCKFISH_PV_LENGTH]:
+            pv_san.append(line_board.san(move))
+            line_board.push(move)
+        lines.append({"move": pv[0], "pv_san": pv_san, "cp": fields["centipawns"], "mate_in": fields["mate_in"]})
+    return _score_fields(infos[0]["score"].white()), lines
+
+
+def classify_special_move(classification: str, lines: List[Dict[str, Any]], move: chess.Move,
+                          is_white_move: bool, eval_before: int, eval_after: int,
+                          sacrifice: bool = False, recapture: bool = False) -> Tuple[str, bool]:
+    """
+    Upgrade a best/excellent move to GREAT or BRILLIANT using the MultiPV lines.
+    
+    - only move: the played move is the top line and the second line is at
+      least ONLY_MOVE_GAP_CP worse for the mover
+    - BRILLIANT: a piece sacrifice (position_analyzer.is_piece_sacrifice)
+      played when not already winning big, that keeps the game level or better
+    - GREAT: the only move, unless it simply recaptures
+    
+    Returns:
+        (classification, only_move)
+    """
+    sign = 1 if is_white_move else -1
+    only_move = (
+        len(lines) > 1 and lines[0]["move"] == move and
+        sign * (lines[0]["cp"] - lines[1]["cp"]) >= ONLY_MOVE_GAP_CP
+    )
+    if classification not in (MoveClassification.BEST, MoveClassification.EXCELLENT):
+        return classification, only_move
+    # Converting a forced mate is expected, not remarkable
+    if lines and lines[0]["mate_in"] is not None and sign * lines[0]["mate_in"] > 0:
+        return classification, only_move
+    
+    if sacrifice and sign * eval_before <= BRILLIANT_MAX_EVAL_BEFORE and sign * eval_after >= BRILLIANT_MIN_EVAL_AFTER:
+        return MoveClassification.BRILLIANT, only_move
+    if only_move and not recapture:
+        return MoveClassification.GREAT, only_move
+    return classification, only_move
+
+
+def _move_dict(m: MoveEvaluation) -> Dict[str, Any]:
+    """Serialized user move as stored in stockfish_analysis.move_evaluations"""
+    return {
+        "move_number": m.move_number,
+        "move": m.move_san,
+        "move_uci": m.move_uci,
+        "fen_before": m.fen_before,
+        "evaluation": m.classification,
+        "cp_loss": m.cp_loss,
+        "eval_before": m.eval_before,
+        "eval_after": m.eval_after,
+        "best_move": m.best_move_san,
+        "best_move_uci": m.best_move_uci,
+        "is_best": m.cp_loss <= CP_THRESHOLDS["excellent"],
+        "mate_info": {
+            "before": m.mate_in_before,
+            "after": m.mate_in_after
+        } if m.is_mate_before or m.is_mate_after else None,
+        # PV data for explaining WHY moves are good/bad
+        "pv_after_played": m.pv_after_played,   # Line showing the problem
+        "pv_after_best": m.pv_after_best,       # Line showing better continuation  
+        "threat": m.threat_after_played,        # Immediate threat opponent has
+        "phase": m.phase,
+        "only_move": m.only_move,
+        # Top engine lines from the position before the move (MultiPV)
+        "alternatives": m.alternatives or []
+    }
+
+
+def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", depth: int = DEFAULT_DEPTH,
+                                record: Optional[Dict[str, Any]] = None,
+                                on_move: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
     """
     Analyze a complete game using Stockfish.
     
@@ -273,18 +394,25 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
         pgn_string: The game in PGN format
         user_color: Which color the user played ("white" or "black")
         depth: Analysis depth (higher = more accurate but slower)
+        record: Canonical game record (game_record_service); skips PGN parsing
+        on_move: Called after every ply with its evaluation (for streaming
+            progress); user moves also carry the full move_evaluations entry
     
     Returns:
         Complete analysis with move-by-move evaluations
     """
     try:
-        # Parse PGN
-        pgn_io = io.StringIO(pgn_string)
-        game = chess.pgn.read_game(pgn_io)
-        
-        if not game:
-            logger.error("Failed to parse PGN")
-            return {"error": "Failed to parse PGN"}
+        if record:
+            start_board, mainline = record_board_and_moves(record)
+        else:
+            # Parse PGN
+            pgn_io = io.StringIO(pgn_string)
+            game = chess.pgn.read_game(pgn_io)
+            
+            if not game:
+                logger.error("Failed to parse PGN")
+                return {"error": "Failed to parse PGN"}
+            start_board, mainline = game.board(), list(game.mainline_moves())
         
         moves_analysis = []
         white_cp_losses = []
@@ -295,33 +423,44 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
         inaccuracies = 0
         best_moves = 0
         excellent_moves = 0
+        great_moves = 0
+        brilliant_moves = 0
+        
+        # Per-ply phase labels are tracked in this same replay
+        phase_tracker = MaterialTracker(start_board)
+        phase_labels = []
         
         with StockfishEngine() as engine:
-            board = game.board()
-            prev_eval = 0
-            prev_mate = None
+            board = start_board
             
-            # Get initial evaluation
-            prev_eval, prev_mate = engine.evaluate_position(board, depth)
+            # One MultiPV search per position: its top line is the evaluation
+            # after the previous ply, and the best move / alternatives for this one
+            evaluation, lines = _search_lines(engine, board, depth, MULTIPV_LINES)
+            prev_eval, prev_mate = evaluation["centipawns"], evaluation["mate_in"]
             
             move_number = 0
-            for node in game.mainline():
-                move = node.move
+            for move in mainline:
                 move_number += 1
                 
                 is_white_move = board.turn == chess.WHITE
                 player = "white" if is_white_move else "black"
                 
-                # Get best move before making the actual move
-                best_move, best_eval, best_mate = engine.get_best_move(board, depth)
+                # Best move comes from the search of the position before the move
+                best_move = lines[0]["move"] if lines else move
                 best_move_san = board.san(best_move)
                 
                 # Make the actual move
                 move_san = board.san(move)
+                fen_before = board.fen()
+                sacrifice = is_piece_sacrifice(board, move)
+                recapture = bool(board.move_stack) and board.peek().to_square == move.to_square
+                phase_tracker.push(board, move)
                 board.push(move)
+                phase_labels.append(phase_tracker.phase())
                 
-                # Evaluate position after the move
-                current_eval, current_mate = engine.evaluate_position(board, depth)
+                # Search the position after the move
+                evaluation, next_lines = _search_lines(engine, board, depth, MULTIPV_LINES)
+                current_eval, current_mate = evaluation["centipawns"], evaluation["mate_in"]
                 
                 # Calculate centipawn loss
                 # For white: loss = prev_eval - current_eval (if white moved)
@@ -335,14 +474,18 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
                     if cp_loss > 0:
                         black_cp_losses.append(cp_loss)
                 
-                # Check for missed mate
-                missed_mate = prev_mate is not None and (
+                # Check for missed mate (delivering it is not missing it)
+                missed_mate = prev_mate is not None and not board.is_checkmate() and (
                     (is_white_move and prev_mate > 0 and (current_mate is None or current_mate <= 0)) or
                     (not is_white_move and prev_mate < 0 and (current_mate is None or current_mate >= 0))
                 )
                 
-                # Classify the move
+                # Classify the move, then look for great/brilliant moves in the MultiPV lines
                 classification = engine.classify_move(cp_loss, missed_mate)
+                classification, only_move = classify_special_move(
+                    classification, lines, move, is_white_move, prev_eval, current_eval,
+                    sacrifice=sacrifice, recapture=recapture
+                )
                 
                 # Count classifications
                 if classification == MoveClassification.BLUNDER:
@@ -355,14 +498,15 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
                     best_moves += 1
                 elif classification == MoveClassification.EXCELLENT:
                     excellent_moves += 1
+                elif classification == MoveClassification.GREAT:
+                    great_moves += 1
+                elif classification == MoveClassification.BRILLIANT:
+                    brilliant_moves += 1
                 
                 # Only include analysis for the user's moves
                 if (user_color == "white" and is_white_move) or (user_color == "black" and not is_white_move):
-                    # Get FEN before this move (need to undo and redo)
-                    board.pop()
-                    fen_before = board.fen()
-                    
-                    # For mistakes/inaccuracies/blunders, get PV lines to explain WHY
+                    # For mistakes/inaccuracies/blunders, PV lines explain WHY.
+                    # Both come from the MultiPV searches already made.
                     pv_after_played = []
                     pv_after_best = []
                     threat_after_played = None
@@ -370,20 +514,14 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
                     is_bad_move = classification in [MoveClassification.INACCURACY, MoveClassification.MISTAKE, MoveClassification.BLUNDER]
                     
                     if is_bad_move:
-                        # Get PV after the best move (what SHOULD have happened)
-                        best_board = board.copy()
-                        best_board.push(best_move)
-                        pv_after_best = engine.get_principal_variation(best_board, depth=12, pv_length=4)
-                        
-                        # Get PV after the played move (shows the PROBLEM)
-                        played_board = board.copy()
-                        played_board.push(move)
-                        pv_after_played = engine.get_principal_variation(played_board, depth=12, pv_length=4)
+                        # Line after the best move (what SHOULD have happened)
+                        if lines:
+                            pv_after_best = lines[0]["pv_san"][1:5]
                         
-                        # Get the immediate threat after the played move
-                        threat_after_played = engine.get_threat(played_board, depth=12)
-                    
-                    board.push(move)
+                        # Line after the played move (shows the PROBLEM); its first move is the threat
+                        if next_lines:
+                            pv_after_played = next_lines[0]["pv_san"][:4]
+                            threat_after_played = pv_after_played[0]
                     
                     move_eval = MoveEvaluation(
                         move_number=(move_number + 1) // 2,
@@ -403,13 +541,43 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
                         mate_in_after=current_mate,
                         pv_after_played=pv_after_played,
                         pv_after_best=pv_after_best,
-                        threat_after_played=threat_after_played
+                        threat_after_played=threat_after_played,
+                        phase=phase_labels[-1],
+                        only_move=only_move,
+                        alternatives=[
+                            {
+                                "move": line["pv_san"][0],
+                                "move_uci": line["move"].uci(),
+                                "eval": line["cp"],
+                                "mate_in": line["mate_in"],
+                                "pv": line["pv_san"]
+                            }
+                            for line in lines
+                        ]
                     )
                     moves_analysis.append(move_eval)
                 
+                if on_move:
+                    progress = {
+                        "ply": move_number,
+                        "total_plies": len(mainline),
+                        "move_number": (move_number + 1) // 2,
+                        "player": player,
+                        "move": move_san,
+                        "eval": current_eval,
+                        "mate_in": current_mate,
+                        "evaluation": classification,
+                        "cp_loss": cp_loss,
+                        "is_user_move": player == user_color
+                    }
+                    if player == user_color:
+                        progress.update(_move_dict(moves_analysis[-1]))
+                    on_move(progress)
+                
                 # Update previous evaluation for next iteration
                 prev_eval = current_eval
                 prev_mate = current_mate
+                lines = next_lines
         
         # Calculate accuracies
         accuracy_white = calculate_accuracy(white_cp_losses)
@@ -420,7 +588,10 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
         user_blunders = sum(1 for m in user_moves if m.classification == MoveClassification.BLUNDER)
         user_mistakes = sum(1 for m in user_moves if m.classification == MoveClassification.MISTAKE)
         user_inaccuracies = sum(1 for m in user_moves if m.classification == MoveClassification.INACCURACY)
-        user_best_moves = sum(1 for m in user_moves if m.classification == MoveClassification.BEST)
+        user_brilliant = sum(1 for m in user_moves if m.classification == MoveClassification.BRILLIANT)
+        user_great = sum(1 for m in user_moves if m.classification == MoveClassification.GREAT)
+        # Great and brilliant moves are engine-best moves too
+        user_best_moves = sum(1 for m in user_moves if m.classification == MoveClassification.BEST) + user_brilliant + user_great
         user_excellent = sum(1 for m in user_moves if m.classification == MoveClassification.EXCELLENT)
         
         user_cp_losses = white_cp_losses if user_color == "white" else black_cp_losses
@@ -428,36 +599,17 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
         
         return {
             "success": True,
-            "moves": [
-                {
-                    "move_number": m.move_number,
-                    "move": m.move_san,
-                    "move_uci": m.move_uci,
-                    "fen_before": m.fen_before,
-                    "evaluation": m.classification,
-                    "cp_loss": m.cp_loss,
-                    "eval_before": m.eval_before,
-                    "eval_after": m.eval_after,
-                    "best_move": m.best_move_san,
-                    "best_move_uci": m.best_move_uci,
-                    "is_best": m.cp_loss <= CP_THRESHOLDS["excellent"],
-                    "mate_info": {
-                        "before": m.mate_in_before,
-                        "after": m.mate_in_after
-                    } if m.is_mate_before or m.is_mate_after else None,
-                    # PV data for explaining WHY moves are good/bad
-                    "pv_after_played": m.pv_after_played,   # Line showing the problem
-                    "pv_after_best": m.pv_after_best,       # Line showing better continuation  
-                    "threat": m.threat_after_played         # Immediate threat opponent has
-                }
-                for m in moves_analysis
-            ],
+            "moves": [_move_dict(m) for m in moves_analysis],
+            "phase_labels": phase_labels,
             "user_stats": {
                 "blunders": user_blunders,
                 "mistakes": user_mistakes,
                 "inaccuracies": user_inaccuracies,
                 "best_moves": user_best_moves,
                 "excellent_moves": user_excellent,
+                "great_moves": user_great,
+                "brilliant_moves": user_brilliant,
+                "only_moves_found": sum(1 for m in user_moves if m.only_move),
                 "accuracy": user_accuracy,
                 "avg_cp_loss": round(sum(user_cp_losses) / len(user_cp_losses), 1) if user_cp_losses else 0
             },
@@ -468,6 +620,8 @@ def analyze_game_with_stockfish(pgn_string: str, user_color: str = "white", dept
                 "inaccuracies": inaccuracies,
                 "best_moves": best_moves,
                 "excellent_moves": excellent_moves,
+                "great_moves": great_moves,
+                "brilliant_moves": brilliant_moves,
                 "accuracy_white": accuracy_white,
                 "accuracy_black": accuracy_black
             }
@@ -490,26 +644,15 @@ def get_position_evaluation(fen: str, depth: int = DEFAULT_DEPTH) -> Dict[str, A
         Evaluation and best move for the position
     """
     try:
-        board = chess.Board(fen)
-        
-        with StockfishEngine() as engine:
-            eval_score, mate_in = engine.evaluate_position(board, depth)
-            best_move, _, _ = engine.get_best_move(board, depth)
-            
-            return {
-                "success": True,
-                "fen": fen,
-                "evaluation": {
-                    "centipawns": eval_score,
-                    "mate_in": mate_in,
-                    "is_mate": mate_in is not None
-                },
-                "best_move": {
-                    "san": board.san(best_move),
-                    "uci": best_move.uci()
-                },
-                "turn": "white" if board.turn == chess.WHITE else "black"
-            }
+        result = evaluate_fen(fen, depth=depth, multipv=1)
+        return {
+            "success": True,
+            "fen": fen,
+            "evaluation": result["evaluation"],
+            "best_move": result["best_move"],
+            "pv": result["top_moves"][0]["pv"] if result["top_moves"] else [],
+            "turn": result["turn"]
+        }
     except Exception as e:
         logger.error(f"Position evaluation failed: {e}")
         return {"success": False, "error": str(e)}
@@ -528,41 +671,275 @@ def get_best_moves_for_position(fen: str, num_moves: int = 3, depth: int = DEFAU
         Top moves with evaluations
     """
     try:
-        board = chess.Board(fen)
-        
-        with StockfishEngine() as engine:
-            # Use multipv to get multiple lines
-            engine.engine.configure({"MultiPV": num_moves})
-            
-            info = engine.engine.analyse(
-                board, 
-                chess.engine.Limit(depth=depth),
-                multipv=num_moves
-            )
-            
-            moves = []
-            for line in info:
-                if "pv" in line and len(line["pv"]) > 0:
-                    move = line["pv"][0]
-                    score = line["score"].white()
-                    
-                    moves.append({
-                        "move_san": board.san(move),
-                        "move_uci": move.uci(),
-                        "evaluation": score.score() if not score.is_mate() else None,
-                        "mate_in": score.mate() if score.is_mate() else None
-                    })
-            
-            return {
-                "success": True,
-                "fen": fen,
-                "top_moves": moves
-            }
+        result = evaluate_fen(fen, depth=depth, multipv=num_moves)
+        return {
+            "success": True,
+            "fen": fen,
+            "top_moves": result["top_moves"]
+        }
     except Exception as e:
         logger.error(f"Multi-move analysis failed: {e}")
         return {"success": False, "error": str(e)}
 
 
+# ==================== ENGINE POOL & BATCH EVALUATION ====================
+
+class EnginePool:
+    """
+    Fixed set of long-lived Stockfish processes shared across requests.
+    
+    Engines start on first checkout and serve one caller at a time. An engine
+    that fails with an engine error is stopped and restarted on its next
+    checkout, since a crashed or timed-out UCI session cannot be reused.
+    """
+    
+    def __init__(self, size: int = STOCKFISH_POOL_SIZE, path: str = STOCKFISH_PATH):
+        self.size = max(1, size)
+        self.path = path
+        self._idle: "queue.LifoQueue[StockfishEngine]" = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(StockfishEngine(path))
+        self.checkouts = 0
+        self.restarts = 0
+    
+    @contextmanager
+    def engine(self, timeout: float = STOCKFISH_POOL_TIMEOUT):
+        """Check out an engine for the duration of the with-block"""
+        try:
+            engine = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No Stockfish engine free after {timeout}s")
+        
+        try:
+            if engine.engine is None:
+                engine.start()
+            self.checkouts += 1
+            yield engine
+        except (chess.engine.EngineError, TimeoutError):
+            self._discard(engine)
+            raise
+        finally:
+            self._idle.put(engine)
+    
+    def _discard(self, engine: StockfishEngine):
+        """Drop a broken engine process so the next checkout starts a fresh one"""
+        try:
+            engine.stop()
+        except Exception as e:
+            logger.warning(f"Stopping failed Stockfish engine: {e}")
+        engine.engine = None
+        self.restarts += 1
+    
+    def close(self):
+        """Stop every idle engine (engines restart lazily if used again)"""
+        for engine in list(self._idle.queue):
+            try:
+                engine.stop()
+            except Exception as e:
+                logger.warning(f"Stopping Stockfish engine: {e}")
+                engine.engine = None
+
+
+class PositionEvalCache:
+    """LRU cache of engine results keyed by (position, depth, multipv)"""
+    
+    def __init__(self, max_entries: int = STOCKFISH_EVAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(board: chess.Board, depth: int, multipv: int) -> Tuple[str, int, int]:
+        """EPD drops the move counters, so transpositions share an entry"""
+        return board.epd(), depth, multipv
+    
+    def get(self, key: Tuple[str, int, int]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key: Tuple[str, int, int], result: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+_engine_pool: Optional[EnginePool] = None
+_engine_pool_lock = threading.Lock()
+_eval_cache = PositionEvalCache()
+
+
+def get_engine_pool() -> EnginePool:
+    """Process-wide engine pool, created on first use"""
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = EnginePool()
+        return _engine_pool
+
+
+def get_eval_cache() -> PositionEvalCache:
+    """Process-wide position evaluation cache"""
+    return _eval_cache
+
+
+def shutdown_engine_pool():
+    """Stop pooled engines (called on application shutdown)"""
+    with _engine_pool_lock:
+        if _engine_pool is not None:
+            _engine_pool.close()
+
+
+def _parse_position(fen: str) -> chess.Board:
+    """Parse a FEN and reject positions Stockfish cannot search (e.g. missing kings)"""
+    board = chess.Board(fen)
+    if not board.is_valid():
+        raise ValueError(f"Illegal position: {board.status()!r}")
+    return board
+
+
+def _analyse_board(engine: StockfishEngine, board: chess.Board, depth: int, multipv: int) -> Dict[str, Any]:
+    """One MultiPV search giving the evaluation, best move and top lines"""
+    evaluation, lines = _search_lines(engine, board, depth, multipv)
+    top_moves = [
+        {
+            "move_san": line["pv_san"][0],
+            "move_uci": line["move"].uci(),
+            "evaluation": line["cp"] if line["mate_in"] is None else None,
+            "mate_in": line["mate_in"],
+            "pv": line["pv_san"]
+        }
+        for line in lines
+    ]
+    best = top_moves[0] if top_moves else None
+    return {
+        "evaluation": evaluation,
+        "best_move": {"san": best["move_san"], "uci": best["move_uci"]} if best else None,
+        "top_moves": top_moves,
+        "turn": "white" if board.turn == chess.WHITE else "black",
+        "depth": depth
+    }
+
+
+def _evaluate_uncached(board: chess.Board, depth: int, multipv: int) -> Dict[str, Any]:
+    """Search a position on a pooled engine and cache the result"""
+    with get_engine_pool().engine() as engine:
+        result = _analyse_board(engine, board, depth, multipv)
+    _eval_cache.put(PositionEvalCache.key(board, depth, multipv), result)
+    return result
+
+
+def evaluate_fen(fen: str, depth: int = DEFAULT_DEPTH, multipv: int = 1) -> Dict[str, Any]:
+    """
+    Evaluate one position on the engine pool, serving repeats from the cache.
+    
+    Returns:
+        Dict with evaluation, best_move, top_moves (multipv lines), turn, depth
+        and cached. Raises ValueError for invalid FENs.
+    """
+    board = _parse_position(fen)
+    cached = _eval_cache.get(PositionEvalCache.key(board, depth, multipv))
+    if cached is not None:
+        return {**cached, "cached": True}
+    return {**_evaluate_uncached(board, depth, multipv), "cached": False}
+
+
+async def stream_fen_evaluations(
+    fens: List[str],
+    depth: int = QUICK_DEPTH,
+    multipv: int = 1
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Evaluate many positions, yielding one result per input FEN as it is ready.
+    
+    Invalid FENs and cached positions are yielded first. Duplicate positions
+    (same EPD, any move counters) are searched once and the result is yielded
+    for every index that asked for it. Remaining positions run concurrently,
+    at most one per pooled engine, and are yielded in completion order, so
+    callers should match results by "index". The final item is a summary
+    with "done": True.
+    """
+    pending: Dict[Tuple[str, int, int], List[Tuple[int, str]]] = {}
+    boards: Dict[Tuple[str, int, int], chess.Board] = {}
+    seen = set()
+    summary = {"done": True, "positions": len(fens), "unique": 0,
+               "cache_hits": 0, "evaluated": 0, "errors": 0}
+    
+    for index, fen in enumerate(fens):
+        try:
+            board = _parse_position(fen)
+        except ValueError as e:
+            summary["errors"] += 1
+            yield {"index": index, "fen": fen, "success": False, "error": str(e)}
+            continue
+        
+        key = PositionEvalCache.key(board, depth, multipv)
+        seen.add(key)
+        if key in pending:
+            pending[key].append((index, fen))
+            continue
+        
+        cached = _eval_cache.get(key)
+        if cached is not None:
+            summary["cache_hits"] += 1
+            yield {"index": index, "fen": fen, "success": True, **cached, "cached": True}
+            continue
+        
+        boards[key] = board
+        pending[key] = [(index, fen)]
+    
+    summary["unique"] = len(seen)
+    
+    if pending:
+        slots = asyncio.Semaphore(get_engine_pool().size)
+        
+        async def run(key):
+            async with slots:
+                try:
+                    return key, await asyncio.to_thread(_evaluate_uncached, boards[key], depth, multipv), None
+                except Exception as e:
+                    logger.error(f"Batch evaluation failed for {key[0]}: {e}")
+                    return key, None, str(e)
+        
+        tasks = [asyncio.ensure_future(run(key)) for key in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, result, error = await next_done
+                for index, fen in pending[key]:
+                    if error:
+                        summary["errors"] += 1
+                        yield {"index": index, "fen": fen, "success": False, "error": error}
+                    else:
+                        summary["evaluated"] += 1
+                        yield {"index": index, "fen": fen, "success": True, **result, "cached": False}
+        finally:
+            # Client went away: stop waiting (in-flight searches still fill the cache)
+            for task in tasks:
+                task.cancel()
+    
+    yield summary
+
+
 # Quick test function
 if __name__ == "__main__":
     # Test with a simple position
@@ -0,0 +1,197 @@
+"""
+Batch Position Evaluation Tests
+
+Tests for:
+1. Position cache keys ignore move counters (transpositions share an entry)
+2. LRU eviction in the position evaluation cache
+3. Batch stream serves cached positions without touching an engine
+4. Duplicate positions are searched once and answered for every index
+5. Invalid FENs get per-index errors and a final summary
+6. Only-move / great / brilliant classification from MultiPV lines
+7. Per-ply progress callback of the game analysis (needs Stockfish)
+8. PDR refutation / continuation from one pooled PV search (needs Stockfish)
+"""
+
+import asyncio
+import os
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+def collect(fens, depth=4, multipv=1):
+    from stockfish_service import stream_fen_evaluations
+
+    async def run():
+        return [item async for item in stream_fen_evaluations(fens, depth=depth, multipv=multipv)]
+    return asyncio.run(run())
+
+
+FAKE_RESULT = {
+    "evaluation": {"centipawns": 30, "mate_in": None, "is_mate": False},
+    "best_move": {"san": "e5", "uci": "e7e5"},
+    "top_moves": [],
+    "turn": "black",
+    "depth": 4
+}
+
+
+class TestPositionEvalCache:
+    """Tests for the (position, depth, multipv) cache"""
+
+    def test_key_ignores_move_counters(self):
+        """Same position at different move numbers maps to one key"""
+        import chess
+        from stockfish_service import PositionEvalCache
+
+        a = chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+        b = chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 3 12")
+        assert PositionEvalCache.key(a, 12, 1) == PositionEvalCache.key(b, 12, 1)
+        assert PositionEvalCache.key(a, 12, 1) != PositionEvalCache.key(a, 12, 3)
+        print("✓ Move counters ignored, multipv kept")
+
+    def test_lru_eviction(self):
+        """Oldest untouched entry is evicted first"""
+        from stockfish_service import PositionEvalCache
+
+        cache = PositionEvalCache(max_entries=2)
+        cache.put(("a", 1, 1), {"n": 1})
+        cache.put(("b", 1, 1), {"n": 2})
+        assert cache.get(("a", 1, 1)) == {"n": 1}
+        cache.put(("c", 1, 1), {"n": 3})
+        assert cache.get(("b", 1, 1)) is None
+        assert cache.stats()["hits"] == 1
+        print("✓ LRU eviction")
+
+
+class TestBatchStream:
+    """Tests for stream_fen_evaluations"""
+
+    def test_cached_and_duplicate_positions(self):
+        """Cached positions and their duplicates are served without an engine"""
+        import chess
+        from stockfish_service import get_eval_cache, PositionEvalCache
+
+        board = chess.Board()
+        board.push_san("e4")
+        get_eval_cache().put(PositionEvalCache.key(board, 4, 1), FAKE_RESULT)
+        transposed = board.fen().replace(" 0 1", " 0 7")
+
+        items = collect([board.fen(), transposed, "not a fen"])
+        results = {item["index"]: item for item in items if "index" in item}
+        assert results[0]["cached"] and results[1]["cached"]
+        assert results[1]["fen"] == transposed
+        assert results[0]["best_move"]["uci"] == "e7e5"
+        assert results[2]["success"] is False
+
+        summary = items[-1]
+        assert summary["done"] and summary["positions"] == 3
+        assert summary["unique"] == 1 and summary["errors"] == 1
+        print(f"✓ Summary: {summary}")
+
+    def test_duplicates_share_one_search(self):
+        """Uncached duplicates get the same outcome for every index"""
+        import chess
+
+        board = chess.Board("4k3/8/8/8/8/8/4P3/4K3 w - - 0 1")
+        fens = [board.fen(), board.fen().replace(" 0 1", " 5 40"), board.fen()]
+        items = collect(fens, depth=3)
+        results = [item for item in items if "index" in item]
+        assert sorted(r["index"] for r in results) == [0, 1, 2]
+        # Either all evaluated (engine present) or all failed (no engine) - never mixed
+        assert len({r["success"] for r in results}) == 1
+        assert items[-1]["unique"] == 1
+        print(f"✓ One search for {len(fens)} requests (success={results[0]['success']})")
+
+    def test_illegal_position_rejected(self):
+        """Positions Stockfish cannot search are rejected before reaching an engine"""
+        items = collect(["8/8/8/8/8/8/8/8 w - - 0 1"])
+        assert items[0]["success"] is False
+        assert "Illegal position" in items[0]["error"]
+        print("✓ Kingless position rejected")
+
+
+class TestSpecialMoves:
+    """Tests for classify_special_move"""
+
+    @staticmethod
+    def lines(*moves_and_cp):
+        import chess
+        return [{"move": chess.Move.from_uci(u), "cp": cp, "mate_in": None, "pv_san": []}
+                for u, cp in moves_and_cp]
+
+    def test_only_move_is_great(self):
+        """Top line far ahead of the second one -> GREAT and only_move"""
+        import chess
+        from stockfish_service import classify_special_move, MoveClassification
+
+        lines = self.lines(("e2e4", 40), ("d2d4", -200))
+        result = classify_special_move(MoveClassification.BEST, lines, chess.Move.from_uci("e2e4"), True, 40, 40)
+        assert result == (MoveClassification.GREAT, True)
+
+        # Same gap from black's side (scores are white POV)
+        lines = self.lines(("e7e5", -40), ("d7d5", 200))
+        result = classify_special_move(MoveClassification.BEST, lines, chess.Move.from_uci("e7e5"), False, -40, -40)
+        assert result == (MoveClassification.GREAT, True)
+
+        # A recapture is not great even when forced
+        result = classify_special_move(MoveClassification.BEST, lines, chess.Move.from_uci("e7e5"), False, -40, -40,
+                                       recapture=True)
+        assert result == (MoveClassification.BEST, True)
+        print("✓ Only move -> great")
+
+    def test_brilliant_sacrifice(self):
+        """A sound sacrifice is brilliant unless already winning big"""
+        import chess
+        from stockfish_service import classify_special_move, MoveClassification
+
+        move = chess.Move.from_uci("c4f7")
+        lines = self.lines(("c4f7", 120), ("b1c3", 100))
+        assert classify_special_move(MoveClassification.BEST, lines, move, True, 100, 120,
+                                     sacrifice=True)[0] == MoveClassification.BRILLIANT
+        assert classify_special_move(MoveClassification.BEST, lines, move, True, 900, 900,
+                                     sacrifice=True)[0] == MoveClassification.BEST
+        # Mistakes are never upgraded
+        assert classify_special_move(MoveClassification.MISTAKE, lines, move, True, 100, -60,
+                                     sacrifice=True)[0] == MoveClassification.MISTAKE
+        print("✓ Sacrifice -> brilliant")
+
+
+@pytest.mark.skipif(not os.path.exists("/usr/games/stockfish"), reason="Stockfish not installed")
+class TestWithEngine:
+    """Tests that need a Stockfish binary (progress hook, PDR lines)"""
+
+    def test_on_move_every_ply(self):
+        """One progress call per ply; user plies carry the stored move entry"""
+        from stockfish_service import analyze_game_with_stockfish
+
+        events = []
+        result = analyze_game_with_stockfish(
+            "1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7#", "black", depth=6, on_move=events.append
+        )
+        assert [e["ply"] for e in events] == list(range(1, 8))
+        user_events = [e for e in events if e["is_user_move"]]
+        assert [e["move"] for e in user_events] == [m["move"] for m in result["moves"]]
+        assert user_events[-1]["best_move"] == result["moves"][-1]["best_move"]
+        assert all(len(m["alternatives"]) <= 3 for m in result["moves"])
+        print(f"✓ {len(events)} progress events")
+
+
+    def test_pdr_lines_from_one_search(self):
+        """Refutation and continuation lines come from the pooled engine's PV"""
+        from pdr_service import get_refutation, get_best_continuation
+
+        fen = "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 1"
+        refutation = get_refutation(fen, "Nf6", depth=8)
+        assert refutation["refutation_move"] == "Qxf7#"
+        assert refutation["refutation_line"][0] == "Qxf7#"
+
+        line = get_best_continuation(fen, "g6")
+        assert line[0] == "g6" and 2 <= len(line) <= 4
+        print(f"✓ Refutation {refutation['refutation_move']}, continuation {line}")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
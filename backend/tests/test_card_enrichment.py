@@ -0,0 +1,164 @@
+"""
+Mistake Card Enrichment Tests
+
+Tests for:
+1. Refutation read from a stored analysis line (no engine)
+2. Lines that don't fit the position are rejected
+3. enrich_mistake_card stores refutation, continuation and why question
+4. The why question names the concrete refutation, mate before capture
+5. Cards without a refutation stay retryable
+6. Claimed cards are not enriched twice
+7. Stored engine alternatives close to the best move also solve a card
+"""
+
+import asyncio
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+pytest.importorskip("bson")
+
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 1"
+
+
+class UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class RecordingCollection:
+    """Collects $set updates by card_id; claims succeed unless the card is in `taken`"""
+
+    def __init__(self, taken=()):
+        self.updates = {}
+        self.taken = set(taken)
+
+    async def update_one(self, query, update):
+        if "$or" in query and query["card_id"] in self.taken:
+            return UpdateResult(0)
+        self.updates.setdefault(query["card_id"], {}).update(update.get("$set", {}))
+        return UpdateResult(1)
+
+
+class RecordingDb:
+    def __init__(self, taken=()):
+        self.mistake_cards = RecordingCollection(taken)
+
+
+def mate_card(**fields):
+    return {
+        "card_id": "card_test",
+        "fen": FEN,
+        "user_move": "Nf6",
+        "user_move_uci": "g8f6",
+        "correct_move": "g6",
+        "habit_tag": "king_safety",
+        "threat_line": ["Qxf7#"],
+        "better_line": ["Qf3", "Nf6", "Ne2", "Be7"],
+        "explanation": "",
+        **fields
+    }
+
+
+class TestRefutationFromLine:
+    """Tests for pdr_service.refutation_from_line"""
+
+    def test_stored_line(self):
+        """The first move of pv_after_played is the refutation"""
+        from pdr_service import refutation_from_line
+
+        refutation = refutation_from_line(FEN, "g8f6", ["Qxf7#"])
+        assert refutation["refutation_move"] == "Qxf7#"
+        assert refutation["threat_square"] == "f7"
+        assert refutation["is_capture"] and refutation["captured_piece"] == "pawn"
+        assert refutation["is_check"]
+        print("✓ Refutation from stored line")
+
+    def test_line_must_fit(self):
+        """Illegal or missing lines give None so the engine path is used"""
+        from pdr_service import refutation_from_line
+
+        assert refutation_from_line(FEN, "Nf6", ["Qxa7"]) is None
+        assert refutation_from_line(FEN, "Nf6", []) is None
+        assert refutation_from_line(FEN, "Ke2", ["Qxf7#"]) is None
+        print("✓ Mismatched lines rejected")
+
+
+class TestEnrichCard:
+    """Tests for enrich_mistake_card with lines stored on the card"""
+
+    def test_enrich_from_stored_lines(self):
+        """Enrichment is a pure computation when the card has analysis lines"""
+        from mistake_card_service import enrich_mistake_card
+
+        db = RecordingDb()
+        enriched = asyncio.run(enrich_mistake_card(db, mate_card()))
+
+        stored = db.mistake_cards.updates["card_test"]
+        assert stored["enrichment_status"] == "done"
+        assert stored["threat_square"] == "f7"
+        assert stored["best_continuation"] == ["g6", "Qf3", "Nf6", "Ne2"]
+        assert stored["why_question"]["refutation_move"] == "Qxf7#"
+        assert enriched["why_question"]["correct_explanation"] == "It stops mate with Qxf7#"
+        print(f"✓ Card enriched: {stored['why_question']['question']}")
+
+    def test_why_question_order(self):
+        """Mate outranks check, check outranks a capture"""
+        from mistake_card_service import generate_why_question
+
+        def reason(**refutation):
+            card = mate_card(refutation={"refutation_move": "Qxf7", **refutation})
+            return asyncio.run(generate_why_question(None, card))["correct_explanation"]
+
+        assert reason(is_check=True, is_capture=True, captured_piece="pawn") == "It stops the Qxf7 check"
+        assert reason(is_capture=True, captured_piece="pawn") == "It stops Qxf7 winning your pawn"
+        print("✓ Mate, then check, then capture")
+
+    def test_no_refutation_retryable(self, monkeypatch):
+        """No stored line and no engine: partial data saved, card left for the sweep"""
+        import mistake_card_service
+
+        monkeypatch.setattr(mistake_card_service, "get_refutation", lambda fen, move: None)
+        db = RecordingDb()
+        asyncio.run(mistake_card_service.enrich_mistake_card(db, mate_card(threat_line=[])))
+
+        stored = db.mistake_cards.updates["card_test"]
+        assert stored["enrichment_status"] == "failed"
+        assert stored["best_continuation"] and stored["why_question"]
+        print("✓ Card without refutation stays retryable")
+
+
+class TestEnrichCards:
+    """Tests for enrich_cards claims"""
+
+    def test_claimed_card_skipped(self):
+        """A card another worker claimed is not enriched again"""
+        from mistake_card_service import enrich_cards
+
+        db = RecordingDb(taken={"card_taken"})
+        cards = [mate_card(), mate_card(card_id="card_taken")]
+        assert asyncio.run(enrich_cards(db, cards)) == 1
+        assert "card_taken" not in db.mistake_cards.updates
+        assert db.mistake_cards.updates["card_test"]["enrichment_status"] == "done"
+        print("✓ Claimed card skipped")
+
+
+class TestAcceptableMoves:
+    """Tests for acceptable_moves from the stored MultiPV alternatives"""
+
+    def test_close_alternatives_accepted(self):
+        """Lines within the margin for the side to move count; the played move never does"""
+        from mistake_card_service import acceptable_moves
+
+        move = {"move": "Nf6", "best_move": "g6", "alternatives": [
+            {"move": "g6", "eval": -40}, {"move": "Qe7", "eval": -25}, {"move": "Qf6", "eval": 60}]}
+        assert acceptable_moves(move, "black") == ["g6", "Qe7"]
+        assert acceptable_moves(dict(move, move="Qe7"), "black") == ["g6"]
+        assert acceptable_moves({"best_move": "g6"}, "black") == ["g6"]
+        print("✓ Close alternatives accepted")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,99 @@
+"""
+Coach Prompt Digest Tests
+
+Tests for:
+1. Digest keeps only the worst moves, in game order
+2. Digest size does not grow with game length
+3. Fallback movetext drops headers and clock comments
+4. System prompt is a static, per-game-free prefix
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+PGN = """[Event "Live Chess"]
+[Site "Chess.com"]
+[TimeControl "600"]
+
+1. e4 {[%clk 0:09:58]} e5 {[%clk 0:09:55]} 2. Qh5 {[%clk 0:09:50]} Nc6 {[%clk 0:09:41]} 3. Bc4 {[%clk 0:09:30]} Nf6 {[%clk 0:09:20]} 4. Qxf7# {[%clk 0:09:10]} 1-0"""
+
+
+def fake_result(n_moves, bad_every=3):
+    moves = []
+    for i in range(1, n_moves + 1):
+        bad = i % bad_every == 0
+        moves.append({
+            "move_number": i,
+            "move": "Nf6",
+            "fen_before": "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 3 3",
+            "evaluation": "mistake" if bad else "good",
+            "cp_loss": i * 10 if bad else 5,
+            "eval_before": 40,
+            "eval_after": 40 + (i * 10 if bad else 5),
+            "best_move": "g6",
+            "threat": "Qxf7#" if bad else None,
+            "pv_after_played": ["Qxf7#", "Ke7", "Qxe5+", "Kf7", "Bd5+"] if bad else [],
+            "pv_after_best": ["Qf3", "Nf6"] if bad else []
+        })
+    return {"success": True, "user_stats": {"accuracy": 71.5, "mistakes": n_moves // bad_every}, "moves": moves}
+
+
+class TestMoveDigest:
+    """Tests for build_move_digest"""
+
+    def test_worst_moves_in_game_order(self):
+        """Only the top critical moves by loss are kept, listed by move number"""
+        from coach_prompt_service import build_move_digest
+        from config import DIGEST_MAX_CRITICAL_MOVES, DIGEST_PV_LENGTH
+
+        digest = build_move_digest(fake_result(60), "black")
+        refs = [line.split()[0] for line in digest.splitlines() if "MISTAKE" in line]
+        assert len(refs) == DIGEST_MAX_CRITICAL_MOVES
+        numbers = [int(r.split("...")[0]) for r in refs]
+        assert numbers == sorted(numbers) and numbers[0] == 60 - 3 * (DIGEST_MAX_CRITICAL_MOVES - 1)
+        # PV lines are clipped and the FEN keeps only placement and side to move
+        assert "LINE AFTER YOUR MOVE: " + " ".join(["Qxf7#", "Ke7", "Qxe5+", "Kf7", "Bd5+"][:DIGEST_PV_LENGTH]) in digest
+        assert "KQkq" not in digest
+        print(f"✓ Critical moves: {refs}")
+
+    def test_size_bounded(self):
+        """A long game costs about the same as a medium one"""
+        from coach_prompt_service import build_move_digest
+        from llm_service import estimate_tokens
+
+        medium = estimate_tokens(build_move_digest(fake_result(40), "white"))
+        long = estimate_tokens(build_move_digest(fake_result(120), "white"))
+        assert long <= medium * 1.1
+        assert build_move_digest({"success": False}, "white") == ""
+        print(f"✓ Digest tokens: 40 moves={medium}, 120 moves={long}")
+
+
+class TestUserMessage:
+    """Tests for build_game_user_message"""
+
+    def test_fallback_movetext(self):
+        """Without engine data the moves are sent without headers or clocks"""
+        from coach_prompt_service import build_game_user_message
+        from llm_service import estimate_tokens
+
+        message = build_game_user_message("", PGN, "Sam", "black", 4)
+        assert "1. e4 e5 2. Qh5 Nc6" in message
+        assert "%clk" not in message and "Chess.com" not in message
+        assert estimate_tokens(message) < estimate_tokens(PGN)
+        print("✓ Compact movetext fallback")
+
+    def test_static_system_prompt(self):
+        """The cached prefix holds no per-game placeholders"""
+        from coach_prompt_service import GAME_COACH_SYSTEM_PROMPT
+
+        assert "{first_name}" not in GAME_COACH_SYSTEM_PROMPT
+        assert "{{" not in GAME_COACH_SYSTEM_PROMPT
+        assert "OUTPUT FORMAT" in GAME_COACH_SYSTEM_PROMPT
+        print("✓ Static system prompt")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,342 @@
+"""
+Auto-Analysis Commentary Queue Tests
+
+Tests for:
+1. Coaching replaces the template commentary of the critical moments only,
+   using the stored engine analysis (no engine re-run); interactive analyses
+   saved engine-only are coached the same way
+2. Failed commentary is retried later with backoff, up to the attempt limit
+3. Provider outages defer the queue without counting an attempt
+4. Claims keep two workers off the same game; dead claims are picked up
+5. One player's games share one LLM request, split back per game; games
+   missing from the batch response fall back to their own request
+6. No game is commented twice: saved games never fall back, and claims
+   taken over during a long batch are left alone
+"""
+
+import asyncio
+import pytest
+import sys
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+pytest.importorskip("pymongo")
+
+
+def matches(doc, query):
+    """The subset of MongoDB query syntax used by the commentary queue"""
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$lte" and not (value is not None and value <= arg):
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+class UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs.sort(key=lambda d: d.get(key) or "", reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return self.docs[:n]
+
+
+class MemoryCollection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+
+    def find(self, query, projection=None):
+        return Cursor([dict(d) for d in self.docs if matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        found = [d for d in self.docs if matches(d, query)]
+        return dict(found[0]) if found else None
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for key, inc in update.get("$inc", {}).items():
+                    doc[key] = doc.get(key, 0) + inc
+                return UpdateResult(1)
+        return UpdateResult(0)
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        await self.update_one(query, update)
+        if not await self.find_one(query):
+            await self.insert_one({**query, **update.get("$inc", {})})
+        return await self.find_one(query)
+
+
+class MemoryDb:
+    def __init__(self, analyses):
+        self.game_analyses = MemoryCollection(analyses)
+        self.games = MemoryCollection([{"game_id": a["game_id"], "pgn": "1. e4 e5 2. Qh5 Nc6", "user_color": "white"}
+                                       for a in analyses])
+        self.users = MemoryCollection([{"user_id": "u_queue", "name": "Sam Lee"}])
+        self.player_profiles = MemoryCollection()
+        self.data_generations = MemoryCollection()
+
+
+def pending_analysis(n, **fields):
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "analysis_id": f"analysis_g{n}",
+        "game_id": f"g{n}",
+        "user_id": "u_queue",
+        "auto_analyzed": True,
+        "commentary_status": "pending",
+        "commentary_attempts": 0,
+        "commentary_next_attempt_at": now,
+        "best_move_suggestions": [],
+        "critical_moments": [{"move_number": 2, "type": "blunder", "best_move": "Nf3", "explanation": ""}],
+        "commentary": [{"move_number": 1, "move": "e4", "evaluation": "best", "source": "template"},
+                       {"move_number": 2, "move": "Qh5", "evaluation": "blunder", "source": "template"}],
+        "stockfish_analysis": {"move_evaluations": [
+            {"move_number": 2, "move": "Qh5", "evaluation": "blunder", "cp_loss": 250,
+             "best_move": "Nf3", "eval_before": 30, "eval_after": -220, "phase": "opening"}
+        ]},
+        **fields
+    }
+
+
+COMMENTARY = {
+    "summary_p1": "An early queen sortie gave away the initiative.",
+    "summary_p2": "Develop your knights first next game.",
+    "commentary": [{"move_number": 2, "move": "Qh5", "evaluation": "good", "feedback": "Develop before the queen"}],
+    "identified_weaknesses": [{"category": "opening_principles", "subcategory": "early_queen"}],
+    "identified_strengths": [{"category": "positional", "subcategory": "good_development"}],
+    "focus_this_week": "Develop knights first"
+}
+
+
+def run_queue(monkeypatch, db, llm):
+    import journey_service
+    import stockfish_service
+
+    def no_engine(*args, **kwargs):
+        raise AssertionError("engine must not run in the commentary phase")
+
+    monkeypatch.setattr(journey_service, "call_llm_json", llm)
+    monkeypatch.setattr(stockfish_service, "analyze_game_with_stockfish", no_engine)
+    return asyncio.run(journey_service.process_commentary_queue(db))
+
+
+class TestCommentaryPhase:
+    """Tests for add_game_commentary via the queue"""
+
+    def test_merge_with_stored_engine_data(self, monkeypatch):
+        """Engine evaluations win; coaching fills the critical moments; habits reach the profile"""
+        db = MemoryDb([pending_analysis(1)])
+
+        async def llm(*args, **kwargs):
+            return dict(COMMENTARY, commentary=[dict(m) for m in COMMENTARY["commentary"]])
+
+        assert run_queue(monkeypatch, db, llm) == 1
+        doc = db.game_analyses.docs[0]
+        assert doc["commentary_status"] == "complete"
+        template, coached = doc["commentary"]
+        assert template["source"] == "template"
+        assert coached["feedback"] == "Develop before the queen"
+        assert coached["evaluation"] == "blunder" and coached["centipawn_loss"] == 250
+        assert doc["critical_moments"][0]["explanation"] == "Develop before the queen"
+        assert doc["game_summary"] == COMMENTARY["summary_p1"] + " " + COMMENTARY["summary_p2"]
+
+        profile = db.player_profiles.docs[0]
+        assert profile["top_weaknesses"] and profile["strengths"][0]["subcategory"] == "good_development"
+        print("✓ Commentary merged without an engine run")
+
+    def test_interactive_engine_only_recommented(self, monkeypatch):
+        """An interactive analysis saved engine-only during an outage is coached later"""
+        analysis = pending_analysis(1)
+        analysis.pop("auto_analyzed")
+        db = MemoryDb([analysis])
+
+        async def llm(*args, **kwargs):
+            return dict(COMMENTARY, commentary=[dict(m) for m in COMMENTARY["commentary"]])
+
+        assert run_queue(monkeypatch, db, llm) == 1
+        assert db.game_analyses.docs[0]["commentary_status"] == "complete"
+        print("✓ Engine-only interactive analysis re-commented")
+
+
+class TestRetries:
+    """Tests for comment_analyses failure handling"""
+
+    def test_failure_backoff(self, monkeypatch):
+        """A bad response is counted and not retried until its backoff expires"""
+        from llm_service import StructuredOutputError
+
+        db = MemoryDb([pending_analysis(1)])
+        calls = []
+
+        async def bad_llm(*args, **kwargs):
+            calls.append(1)
+            raise StructuredOutputError("no json")
+
+        assert run_queue(monkeypatch, db, bad_llm) == 0
+        doc = db.game_analyses.docs[0]
+        assert doc["commentary_status"] == "failed" and doc["commentary_attempts"] == 1
+        assert doc["commentary_next_attempt_at"] > datetime.now(timezone.utc).isoformat()
+
+        run_queue(monkeypatch, db, bad_llm)
+        assert len(calls) == 1
+        print("✓ Failure recorded with backoff")
+
+    def test_provider_outage(self, monkeypatch):
+        """An outage leaves games pending, uncounted, and stops the batch"""
+        from llm_service import LLMUnavailableError
+
+        db = MemoryDb([pending_analysis(1), pending_analysis(2)])
+        calls = []
+
+        async def down(*args, **kwargs):
+            calls.append(1)
+            raise LLMUnavailableError("circuit open")
+
+        run_queue(monkeypatch, db, down)
+        assert len(calls) == 1
+        assert all(d["commentary_status"] == "pending" for d in db.game_analyses.docs)
+        assert all(d["commentary_attempts"] == 0 for d in db.game_analyses.docs)
+        print("✓ Outage deferred without burning attempts")
+
+
+class TestClaims:
+    """Tests for the processing claim"""
+
+    def test_claims(self, monkeypatch):
+        """A live claim is left alone; a dead one is taken over"""
+        now = datetime.now(timezone.utc)
+        live = pending_analysis(1, commentary_status="processing", commentary_claimed_at=now.isoformat())
+        dead = pending_analysis(2, commentary_status="processing",
+                                commentary_claimed_at=(now - timedelta(hours=1)).isoformat())
+        db = MemoryDb([live, dead])
+        commented = []
+
+        async def llm(system, user, **kwargs):
+            commented.append(user)
+            return dict(COMMENTARY, commentary=[])
+
+        assert run_queue(monkeypatch, db, llm) == 1
+        assert db.game_analyses.docs[0]["commentary_status"] == "processing"
+        assert db.game_analyses.docs[1]["commentary_status"] == "complete"
+        print("✓ Claims respected")
+
+
+class TestBatching:
+    """Tests for add_games_commentary_batch via the queue"""
+
+    def test_one_request_per_batch(self, monkeypatch):
+        """Three games, one request; each game gets its own entry back"""
+        db = MemoryDb([pending_analysis(n) for n in (1, 2, 3)])
+        calls = []
+
+        async def llm(system, user, **kwargs):
+            calls.append(kwargs["caller"])
+            assert all(f"=== GAME g{n} ===" in user for n in (1, 2, 3))
+            return {"games": [dict(COMMENTARY, game_id=f"g{n}",
+                                   commentary=[dict(COMMENTARY["commentary"][0], feedback=f"Game {n}")])
+                              for n in (3, 1, 2)]}
+
+        assert run_queue(monkeypatch, db, llm) == 3
+        assert calls == ["auto_analysis_batch"]
+        for n, doc in enumerate(db.game_analyses.docs, start=1):
+            assert doc["commentary_status"] == "complete"
+            assert doc["critical_moments"][0]["explanation"] == f"Game {n}"
+        print("✓ Three games commented in one request")
+
+    def test_missing_game_falls_back(self, monkeypatch):
+        """A game left out of the batch response is commented on its own"""
+        db = MemoryDb([pending_analysis(1), pending_analysis(2)])
+        calls = []
+
+        async def llm(system, user, **kwargs):
+            calls.append(kwargs["caller"])
+            if kwargs["caller"] == "auto_analysis_batch":
+                return {"games": [dict(COMMENTARY, game_id="g1"), {"game_id": "g9"}]}
+            assert "=== GAME" not in user
+            return dict(COMMENTARY)
+
+        assert run_queue(monkeypatch, db, llm) == 2
+        assert calls == ["auto_analysis_batch", "auto_analysis"]
+        assert all(d["commentary_status"] == "complete" for d in db.game_analyses.docs)
+        print("✓ Missing game retried alone")
+
+    def test_save_failure_not_recommented(self, monkeypatch):
+        """A save failing mid-batch counts an attempt for that game only; saved games keep one habit update"""
+        import journey_service
+        import player_profile_service
+
+        db = MemoryDb([pending_analysis(n) for n in (1, 2, 3)])
+        calls, habit_updates = [], []
+        save = journey_service._save_commentary
+
+        async def flaky_save(db, analysis, *args):
+            if analysis["game_id"] == "g2":
+                raise RuntimeError("write failed")
+            return await save(db, analysis, *args)
+
+        async def count_habits(db, user_id, weaknesses, strengths):
+            habit_updates.append(user_id)
+
+        async def llm(system, user, **kwargs):
+            calls.append(kwargs["caller"])
+            return {"games": [dict(COMMENTARY, game_id=f"g{n}") for n in (1, 2, 3)]}
+
+        monkeypatch.setattr(journey_service, "_save_commentary", flaky_save)
+        monkeypatch.setattr(player_profile_service, "update_profile_habits", count_habits)
+        assert run_queue(monkeypatch, db, llm) == 2
+        assert calls == ["auto_analysis_batch"]
+        assert len(habit_updates) == 2
+        statuses = [(d["commentary_status"], d["commentary_attempts"]) for d in db.game_analyses.docs]
+        assert statuses == [("complete", 0), ("failed", 1), ("complete", 0)]
+        print("✓ Saved games not commented twice")
+
+    def test_lost_claim_not_retried(self, monkeypatch):
+        """A fallback game whose claim another worker took over during the batch is skipped"""
+        db = MemoryDb([pending_analysis(1), pending_analysis(2)])
+        calls = []
+
+        async def slow_batch(system, user, **kwargs):
+            calls.append(kwargs["caller"])
+            # Meanwhile the sweep declared g2's claim dead and took it over
+            db.game_analyses.docs[1]["commentary_claimed_at"] = "taken-over"
+            return {"games": [dict(COMMENTARY, game_id="g1")]}
+
+        assert run_queue(monkeypatch, db, slow_batch) == 1
+        assert calls == ["auto_analysis_batch"]
+        assert db.game_analyses.docs[1]["commentary_status"] == "processing"
+        print("✓ Lost claim left to its new owner")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
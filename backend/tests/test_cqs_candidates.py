@@ -0,0 +1,103 @@
+"""
+CQS Candidate Generation Tests
+
+Tests for:
+1. First-round candidates run concurrently and the best score wins
+2. Serial regeneration only when no candidate is acceptable
+3. Failed candidates are skipped; all failing re-raises
+4. Candidate counts per user tier
+"""
+
+import asyncio
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+def fake_score(data):
+    accepted = data["score"] >= 80
+    return {
+        "total_score": data["score"],
+        "breakdown": {},
+        "quality_level": "accept" if accepted else "reject",
+        "should_regenerate": not accepted
+    }
+
+
+def run(generate, first_round):
+    from cqs_service import generate_best_candidate
+
+    attempts = []
+    result = asyncio.run(generate_best_candidate(
+        generate, fake_score, "game_test", first_round=first_round, on_attempt=attempts.append
+    ))
+    return result, attempts
+
+
+class TestCandidateGeneration:
+    """Tests for generate_best_candidate"""
+
+    def test_parallel_first_round(self):
+        """Both first-round candidates are in flight together; best one is kept"""
+        in_flight, peak = [0], [0]
+
+        async def generate(attempt):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return {"score": [82, 91, 95][attempt]}
+
+        (data, cqs, scores), attempts = run(generate, first_round=2)
+        assert peak[0] == 2
+        assert data["score"] == 91 and cqs["total_score"] == 91
+        assert scores == [82, 91] and attempts == [1, 2]
+        print("✓ Two concurrent candidates, best kept")
+
+    def test_serial_regeneration(self):
+        """Low scores trigger one more attempt at a time"""
+        async def generate(attempt):
+            return {"score": [50, 85, 99][attempt]}
+
+        (data, _, scores), attempts = run(generate, first_round=1)
+        assert data["score"] == 85
+        assert scores == [50, 85] and attempts == [1, 2]
+        print("✓ Serial regeneration stops at the first accepted candidate")
+
+    def test_failures(self):
+        """A failed candidate costs its slot; no candidate at all re-raises"""
+        from llm_service import StructuredOutputError
+
+        async def flaky(attempt):
+            if attempt == 0:
+                raise StructuredOutputError("bad json")
+            return {"score": 60}
+
+        (data, _, scores), _ = run(flaky, first_round=2)
+        assert data["score"] == 60 and len(scores) == 2
+
+        async def broken(attempt):
+            raise StructuredOutputError("bad json")
+
+        with pytest.raises(StructuredOutputError):
+            run(broken, first_round=2)
+        print("✓ Failures skipped, total failure raised")
+
+
+class TestTiers:
+    """Tests for first_round_candidates"""
+
+    def test_tier_counts(self):
+        from cqs_service import first_round_candidates
+
+        assert first_round_candidates(None) == 1
+        assert first_round_candidates("free") == 1
+        assert first_round_candidates("pro") == 2
+        assert first_round_candidates("unknown") == 1
+        print("✓ Tier candidate counts")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
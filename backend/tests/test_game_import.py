@@ -0,0 +1,154 @@
+"""
+Game Import Tests
+
+Tests for:
+1. Platform game id extraction (Chess.com Link header, Lichess Site header)
+2. Hash fingerprint fallback is stable across comments, clocks and header casing
+3. Different games produce different fingerprints
+4. Streaming PGN splitter keeps headers and comments exactly
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+CHESSCOM_PGN = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "alice"]
+[Black "bob"]
+[Result "1-0"]
+[Link "https://www.chess.com/game/live/98765432"]
+
+1. e4 {[%clk 0:09:58]} 1... e5 {[%clk 0:09:57]} 2. Nf3 Nc6 3. Bb5 1-0"""
+
+LICHESS_PGN = """[Event "Rated Rapid game"]
+[Site "https://lichess.org/AbCd1234"]
+[White "alice"]
+[Black "bob"]
+[Result "0-1"]
+
+1. d4 d5 2. c4 e6 0-1"""
+
+PLAIN_PGN = """[Event "Casual"]
+[White "alice"]
+[Black "bob"]
+[Date "2024.01.01"]
+[Result "1/2-1/2"]
+
+1. e4 e5 2. Nf3 Nc6 1/2-1/2"""
+
+
+class TestPlatformGameId:
+    """Tests for platform game id extraction"""
+
+    def test_chesscom_link_header(self):
+        """Chess.com games are identified by the Link header"""
+        from game_import_service import compute_game_fingerprint
+
+        assert compute_game_fingerprint(CHESSCOM_PGN) == "chess.com:live:98765432"
+        print("✓ Chess.com game id extracted from Link header")
+
+    def test_chesscom_url_argument(self):
+        """An explicit URL takes precedence over headers"""
+        from game_import_service import extract_platform_game_id
+
+        assert extract_platform_game_id("", "https://www.chess.com/game/daily/555") == "chess.com:daily:555"
+        print("✓ Chess.com game id extracted from URL")
+
+    def test_lichess_site_header(self):
+        """Lichess games are identified by the Site header"""
+        from game_import_service import compute_game_fingerprint
+
+        assert compute_game_fingerprint(LICHESS_PGN) == "lichess:AbCd1234"
+        print("✓ Lichess game id extracted from Site header")
+
+
+class TestHashFingerprint:
+    """Tests for the header + move list hash fallback"""
+
+    def test_hash_used_without_platform_id(self):
+        """Games without a platform id fall back to a hash"""
+        from game_import_service import compute_game_fingerprint
+
+        fingerprint = compute_game_fingerprint(PLAIN_PGN)
+        assert fingerprint.startswith("sha1:")
+        print(f"✓ Hash fingerprint: {fingerprint}")
+
+    def test_hash_ignores_comments_and_header_case(self):
+        """Clock comments, NAGs and re-capitalized tags do not change the hash"""
+        from game_import_service import compute_game_fingerprint
+
+        annotated = PLAIN_PGN.replace("[White ", "[WHITE ").replace(
+            "1. e4 e5", "1. e4 {[%clk 0:10:00]} 1... e5! $1 (1... c5 2. Nf3)"
+        )
+        assert compute_game_fingerprint(annotated) == compute_game_fingerprint(PLAIN_PGN)
+        print("✓ Fingerprint stable across annotations")
+
+    def test_different_moves_differ(self):
+        """Different move lists produce different fingerprints"""
+        from game_import_service import compute_game_fingerprint
+
+        other = PLAIN_PGN.replace("2. Nf3 Nc6", "2. Nc3 Nf6")
+        assert compute_game_fingerprint(other) != compute_game_fingerprint(PLAIN_PGN)
+        print("✓ Different games get different fingerprints")
+
+    def test_normalize_move_list(self):
+        """Move list normalization keeps only SAN tokens"""
+        from game_import_service import normalize_move_list
+
+        moves = normalize_move_list("1. e4 {[%clk 0:09:58]} 1... e5 2. Nf3?! (2. f4 exf4) Nc6 $2 1-0")
+        assert moves == ["e4", "e5", "Nf3", "Nc6"]
+        print(f"✓ Normalized moves: {moves}")
+
+
+class TestPgnStreaming:
+    """Tests for the streaming multi-game PGN reader"""
+
+    def test_splits_games_and_keeps_headers(self):
+        """Games are split and tag names keep their original case"""
+        from game_import_service import iter_pgn_texts
+
+        archive = "\n\n".join([CHESSCOM_PGN.replace("[Result", '[WhiteElo "1500"]\n[TimeControl "600"]\n[Result'),
+                                 LICHESS_PGN, PLAIN_PGN]) + "\n"
+        games = list(iter_pgn_texts(archive.splitlines()))
+        assert len(games) == 3
+        assert '[WhiteElo "1500"]' in games[0]
+        assert '[TimeControl "600"]' in games[0]
+        assert games[1] == LICHESS_PGN
+        print(f"✓ Split {len(games)} games with headers intact")
+
+    def test_blank_line_inside_comment(self):
+        """A blank line inside a {...} comment does not split the game"""
+        from game_import_service import iter_pgn_texts
+
+        pgn = '[White "alice"]\n[Black "bob"]\n\n1. e4 { a long\n\n[comment] } e5 2. Nf3 *'
+        games = list(iter_pgn_texts((pgn + "\n\n" + PLAIN_PGN).splitlines()))
+        assert len(games) == 2
+        assert "[comment]" in games[0]
+        print("✓ Comments with blank lines stay in one game")
+
+    def test_async_reader(self):
+        """aiter_pgn_texts consumes an httpx-style streamed response"""
+        import asyncio
+        from game_import_service import aiter_pgn_texts, pgn_text_to_game_data
+
+        class FakeStreamResponse:
+            async def aiter_lines(self):
+                for line in (LICHESS_PGN + "\n\n" + PLAIN_PGN).splitlines():
+                    yield line
+
+        async def collect():
+            return [text async for text in aiter_pgn_texts(FakeStreamResponse())]
+
+        games = asyncio.run(collect())
+        data = pgn_text_to_game_data(games[0], "lichess", "Bob")
+        assert len(games) == 2
+        assert data["user_color"] == "black"
+        assert data["result"] == "0-1"
+        print("✓ Streamed games parsed")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
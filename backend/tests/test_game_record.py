@@ -0,0 +1,181 @@
+"""
+Game Record Tests
+
+Tests for:
+1. Canonical record contents (SAN/UCI, headers, clocks, per-ply FEN/zobrist)
+2. Transposed move orders reach the same zobrist hash
+3. Record-based consumers match the PGN-based paths (phases, clocks, RAG chunks)
+4. Per-ply think times and the NumPy time-usage / time-badge reductions
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+CLOCK_PGN = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "alice"]
+[Black "bob"]
+[Result "1-0"]
+[TimeControl "600"]
+
+1. e4 {[%clk 0:09:58.4]} 1... e5 {[%clk 0:09:57]} 2. Nf3 {[%clk 0:09:50]} 2... Nc6 {[%clk 0:09:41]}
+3. Bb5 {[%clk 0:09:30]} 3... a6 {[%clk 0:09:20]} 4. Ba4 Nf6 5. O-O Be7 1-0"""
+
+
+class TestBuildGameRecord:
+    """Tests for build_game_record"""
+
+    def test_moves_and_headers(self):
+        """SAN/UCI lists and headers are captured as written"""
+        from game_record_service import build_game_record
+
+        record = build_game_record(CLOCK_PGN)
+        assert record["san"][:3] == ["e4", "e5", "Nf3"]
+        assert record["uci"][:3] == ["e2e4", "e7e5", "g1f3"]
+        assert record["headers"]["TimeControl"] == "600"
+        assert record["ply_count"] == 10
+        print(f"✓ Record has {record['ply_count']} plies")
+
+    def test_per_ply_positions(self):
+        """FEN and zobrist arrays include the start and final positions"""
+        from game_record_service import build_game_record
+
+        record = build_game_record(CLOCK_PGN)
+        assert len(record["fens"]) == record["ply_count"] + 1
+        assert len(record["zobrist"]) == record["ply_count"] + 1
+        assert record["fens"][0].startswith("rnbqkbnr/pppppppp")
+        print("✓ Per-ply FEN/zobrist arrays aligned")
+
+    def test_clocks(self):
+        """Clock comments become remaining seconds, None where missing"""
+        from game_record_service import build_game_record
+
+        record = build_game_record(CLOCK_PGN)
+        assert record["clocks"][0] == pytest.approx(598.4)
+        assert record["clocks"][5] == 560
+        assert record["clocks"][6] is None
+        print(f"✓ Clocks: {record['clocks']}")
+
+    def test_think_times(self):
+        """Think time per ply is the mover's clock delta (base time for the first move)"""
+        from game_record_service import build_game_record, think_times
+
+        record = build_game_record(CLOCK_PGN)
+        assert record["think"][:6] == [1.6, 3.0, 8.4, 16.0, 20.0, 21.0]
+        assert record["think"][6] is None
+        assert think_times([170, 175, 168], "180+2") == [12, 7, 4]
+        print(f"✓ Think times: {record['think']}")
+
+    def test_transposition_same_hash(self):
+        """Different move orders reaching one position share a zobrist hash"""
+        from game_record_service import build_game_record
+
+        a = build_game_record("1. Nf3 d5 2. d4 Nf6 *")
+        b = build_game_record("1. d4 Nf6 2. Nf3 d5 *")
+        assert a["zobrist"][-1] == b["zobrist"][-1]
+        print("✓ Transpositions share a zobrist hash")
+
+
+class TestRecordConsumers:
+    """Record-based paths agree with the PGN-based ones"""
+
+    def test_clock_times_match_regex_parser(self):
+        """parse_clock_times_from_record matches parse_clock_times_from_pgn on fully clocked games"""
+        from game_record_service import build_game_record
+        from rating_service import parse_clock_times_from_pgn, parse_clock_times_from_record
+
+        pgn = CLOCK_PGN.replace(" 4. Ba4 Nf6 5. O-O Be7", "")
+        assert parse_clock_times_from_record(build_game_record(pgn)) == parse_clock_times_from_pgn(pgn)
+        print("✓ Clock times match")
+
+    def test_phases_match(self):
+        """analyze_game_phases gives the same phases from a record"""
+        from game_record_service import build_game_record
+        from phase_theory_service import analyze_game_phases
+
+        from_pgn = analyze_game_phases(CLOCK_PGN, "white", 1200)
+        from_record = analyze_game_phases(CLOCK_PGN, "white", 1200, record=build_game_record(CLOCK_PGN))
+        assert from_pgn["phases"] == from_record["phases"]
+        assert from_pgn["strategic_lesson"] == from_record["strategic_lesson"]
+        print("✓ Phase analysis matches")
+
+    def test_rag_chunks_from_record(self):
+        """RAG chunks built from a record carry the same moves"""
+        pytest.importorskip("numpy")
+        from game_record_service import build_game_record
+        from rag_service import parse_pgn_to_chunks
+
+        chunks = parse_pgn_to_chunks("", "g1", "white", record=build_game_record(CLOCK_PGN))
+        opening = next(c for c in chunks if c["chunk_type"] == "opening")
+        assert "1.e4 e5" in opening["content"]
+        assert "5.O-O Be7" in opening["content"]
+        print("✓ RAG chunks built from record")
+
+
+class TestTimeUsage:
+    """Time management from stored clock arrays"""
+
+    def test_user_clock_arrays(self):
+        """Only the user's plies with a think time are returned"""
+        from game_record_service import build_game_record
+        from rating_service import user_clock_arrays
+
+        move_numbers, think, remaining = user_clock_arrays(build_game_record(CLOCK_PGN), "black")
+        assert move_numbers.tolist() == [1, 2, 3]
+        assert think.tolist() == [3.0, 16.0, 21.0]
+        assert remaining.tolist() == [597, 581, 560]
+        print("✓ Black's clock arrays")
+
+    def test_analyze_time_usage(self):
+        """Phase breakdown and time trouble come from the record arrays"""
+        from game_record_service import build_game_record
+        from rating_service import analyze_time_usage
+
+        pgn = CLOCK_PGN.replace("[%clk 0:09:20]", "[%clk 0:00:50]")
+        games = [{"user_color": "black", "record": build_game_record(pgn)}]
+        result = analyze_time_usage(games, "u1")
+        assert result["has_data"] is True
+        assert result["total_moves_analyzed"] == 3
+        assert result["phase_breakdown"]["opening"]["move_count"] == 3
+        assert result["time_trouble_count"] == 1
+        print(f"✓ Time usage: {result['phase_breakdown']}")
+
+    def test_time_badge_uses_clocks(self):
+        """Time badge counts time trouble and fast blunders from clock arrays"""
+        from game_record_service import build_game_record
+        from badge_service import calculate_time_badge
+
+        pgn = CLOCK_PGN.replace("[%clk 0:09:20]", "[%clk 0:00:50]")
+        analyses = [{"game_id": "g1", "stockfish_analysis": {"move_evaluations": [
+            {"move_number": 1, "evaluation": "blunder"}
+        ]}}]
+        games = [{"game_id": "g1", "user_color": "black"}]
+        badge = calculate_time_badge(analyses, games, {"g1": build_game_record(pgn)})
+        assert badge["metrics"]["time_trouble_games"] == 1
+        assert badge["metrics"]["fast_blunders"] == 1
+        assert badge["metrics"]["clocked_games"] == 1
+        print(f"✓ Time badge: {badge['metrics']}")
+
+    def test_instant_blunder_counted(self):
+        """A premove (0 s think time) is kept and counts as a fast blunder"""
+        from game_record_service import build_game_record
+        from rating_service import user_clock_arrays
+        from badge_service import calculate_time_badge
+
+        record = build_game_record(CLOCK_PGN.replace("[%clk 0:09:20]", "[%clk 0:09:41]"))
+        move_numbers, think, _ = user_clock_arrays(record, "black")
+        assert move_numbers.tolist() == [1, 2, 3] and think.tolist() == [3.0, 16.0, 0.0]
+
+        analyses = [{"game_id": "g1", "stockfish_analysis": {"move_evaluations": [
+            {"move_number": 3, "evaluation": "blunder"}
+        ]}}]
+        badge = calculate_time_badge(analyses, [{"game_id": "g1", "user_color": "black"}], {"g1": record})
+        assert badge["metrics"]["fast_blunders"] == 1
+        print("✓ Instant blunder counted")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,153 @@
+"""
+LLM Provider Gateway Tests
+
+Tests for:
+1. 429 / 5xx responses are retried; other errors are not
+2. Timeouts and exhausted retries raise LLMUnavailableError
+3. Circuit breaker opens after repeated failures and fails fast
+4. Per-caller concurrency limit is respected
+5. Engine-only commentary stands in when the provider is down
+"""
+
+import asyncio
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """Fake provider, fresh breaker, no backoff sleeps"""
+    import llm_service
+
+    monkeypatch.setattr(llm_service, "LLM_PROVIDER_MODE", llm_service.LLM_PROVIDER_MODE)
+    monkeypatch.setattr(llm_service, "_fake_provider", llm_service._fake_provider)
+    monkeypatch.setattr(llm_service, "_breaker", llm_service.CircuitBreaker(3, 30))
+    monkeypatch.setattr(llm_service, "_retry_delay", lambda retry: 0)
+    return llm_service
+
+
+class TestRetries:
+    """Tests for the retry policy"""
+
+    def test_rate_limit_retried(self, gateway):
+        """Two 429s then a reply succeeds, with both retries recorded"""
+        from llm_service import FakeLLMProvider, FakeProviderError, use_fake_provider, call_llm
+        from llm_metrics_service import _buffer
+
+        provider = use_fake_provider(FakeLLMProvider(
+            reply="ok", failures=[FakeProviderError(429), FakeProviderError(503)]
+        ))
+        assert asyncio.run(call_llm("sys", "user", caller="ask_about_move")) == "ok"
+        assert provider.calls == 3
+        assert _buffer[-1]["retries"] == 2 and _buffer[-1]["outcome"] == "ok"
+        print("✓ 429 / 503 retried")
+
+    def test_client_error_not_retried(self, gateway):
+        """A 400 is the request's fault: raised as-is after one attempt"""
+        from llm_service import FakeLLMProvider, FakeProviderError, use_fake_provider, call_llm
+
+        provider = use_fake_provider(FakeLLMProvider(failures=[FakeProviderError(400)]))
+        with pytest.raises(FakeProviderError):
+            asyncio.run(call_llm("sys", "user", caller="ask_about_move"))
+        assert provider.calls == 1
+        assert gateway._breaker.state == "closed"
+        print("✓ 400 not retried")
+
+    def test_timeout_unavailable(self, gateway, monkeypatch):
+        """Every attempt timing out ends in LLMUnavailableError"""
+        from llm_service import FakeLLMProvider, use_fake_provider, call_llm, LLMUnavailableError
+        from llm_metrics_service import _buffer
+
+        monkeypatch.setattr(gateway, "LLM_TIMEOUT_SECONDS", 0.01)
+        provider = use_fake_provider(FakeLLMProvider(latency=0.2))
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(call_llm("sys", "user", caller="ask_about_move"))
+        assert provider.calls == gateway.LLM_MAX_RETRIES + 1
+        assert _buffer[-1]["outcome"] == "unavailable"
+        print("✓ Timeouts exhaust retries")
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker and fail-fast behaviour"""
+
+    def test_opens_and_recovers(self):
+        """Opens at the threshold, lets one probe through after the reset window"""
+        from llm_service import CircuitBreaker
+
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+
+        now[0] = 11
+        assert breaker.allow()          # The probe
+        assert not breaker.allow()      # Everyone else still fails fast
+        breaker.record_success()
+        assert breaker.state == "closed"
+        print("✓ Breaker opens and recovers")
+
+    def test_fails_fast_when_open(self, gateway):
+        """Once open, calls never reach the provider"""
+        from llm_service import FakeLLMProvider, FakeProviderError, use_fake_provider, call_llm, LLMUnavailableError
+
+        provider = use_fake_provider(FakeLLMProvider(failures=[FakeProviderError(500)] * 10))
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(call_llm("sys", "user", caller="analysis_commentary"))
+        calls = provider.calls
+        assert gateway._breaker.state == "open"
+
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(call_llm("sys", "user", caller="analysis_commentary"))
+        assert provider.calls == calls
+        print(f"✓ Open circuit after {calls} calls, then fail-fast")
+
+
+class TestConcurrency:
+    """Tests for the per-caller limits"""
+
+    def test_caller_limit(self, gateway):
+        """No more than the caller's limit are in flight at once"""
+        from llm_service import FakeLLMProvider, use_fake_provider, call_llm
+        from config import LLM_CALLER_CONCURRENCY
+
+        provider = use_fake_provider(FakeLLMProvider(reply="ok", latency=0.02))
+
+        async def burst():
+            return await asyncio.gather(*[call_llm("sys", "user", caller="auto_analysis") for _ in range(6)])
+
+        assert asyncio.run(burst()) == ["ok"] * 6
+        assert provider.max_in_flight == LLM_CALLER_CONCURRENCY["auto_analysis"]
+        print(f"✓ Peak in flight: {provider.max_in_flight}")
+
+
+class TestEngineOnlyCommentary:
+    """Tests for engine_only_commentary"""
+
+    def test_shape(self):
+        """Engine facts fill the summary, suggestions and per-move commentary"""
+        from coach_prompt_service import engine_only_commentary
+
+        result = {
+            "user_stats": {"accuracy": 68.2, "blunders": 1, "mistakes": 1, "best_moves": 9},
+            "moves": [
+                {"move_number": 12, "move": "Qd2", "evaluation": "blunder", "cp_loss": 450, "best_move": "Nf3"},
+                {"move_number": 20, "move": "h3", "evaluation": "mistake", "cp_loss": 150, "best_move": "Rd1"},
+                {"move_number": 25, "move": "a4", "evaluation": "good", "cp_loss": 5, "best_move": "a4"}
+            ]
+        }
+        data = engine_only_commentary(result, "white")
+        assert data["blunders"] == 1
+        assert [c["source"] for c in data["commentary"]] == ["template"] * 3
+        assert [s["best_move"] for s in data["best_move_suggestions"]] == ["Nf3", "Rd1"]
+        assert "68.2%" in data["game_summary"] and "Nf3" in data["summary_p2"]
+        assert engine_only_commentary({"success": False}, "black")["best_move_suggestions"] == []
+        print("✓ Engine-only commentary")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
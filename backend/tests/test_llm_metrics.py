@@ -0,0 +1,93 @@
+"""
+LLM Metrics Tests
+
+Tests for:
+1. Every tracked call is recorded, including failures
+2. Token usage and cost come from the provider when reported
+3. Unparseable structured output is recorded as invalid_output
+4. Per-caller summary report (counts, error rate, latency percentiles, cost)
+"""
+
+import asyncio
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+def last_record():
+    import llm_metrics_service
+    return llm_metrics_service._buffer[-1]
+
+
+class TestTracking:
+    """Tests for track_llm_call"""
+
+    def test_records_success_and_failure(self):
+        """Calls are recorded on success and on error, with the caller tag"""
+        from llm_metrics_service import track_llm_call
+
+        with track_llm_call("tts", "tts_generate", "tts-1", "openai") as call:
+            call.characters = 2000
+        record = last_record()
+        assert record["outcome"] == "ok" and record["caller"] == "tts_generate"
+        assert record["cost_usd"] == pytest.approx(0.03)
+
+        with pytest.raises(TimeoutError):
+            with track_llm_call("chat", "puzzle_generation", "gpt-4o-mini", "openai"):
+                raise TimeoutError("provider timed out")
+        record = last_record()
+        assert record["outcome"] == "error" and "TimeoutError" in record["error"]
+        print("✓ Success and failure recorded")
+
+    def test_structured_call_usage_and_outcome(self, monkeypatch):
+        """Provider token usage is kept; unrepairable output is invalid_output"""
+        import llm_service
+        from llm_service import call_llm_json, StructuredOutputError
+
+        responses = iter(['{"recommendations": []}', "no json here"])
+
+        async def fake_openai(system_message, user_message, model, json_mode=False):
+            return next(responses), {"prompt_tokens": 1000, "completion_tokens": 200}
+
+        monkeypatch.setattr(llm_service, "LLM_PROVIDER_MODE", "openai")
+        monkeypatch.setattr(llm_service, "_call_openai", fake_openai)
+
+        asyncio.run(call_llm_json("sys", "user", caller="training_recommendations"))
+        record = last_record()
+        assert record["total_tokens"] == 1200 and not record["tokens_estimated"]
+        assert record["cost_usd"] == pytest.approx((1000 * 0.15 + 200 * 0.60) / 1_000_000)
+
+        with pytest.raises(StructuredOutputError):
+            asyncio.run(call_llm_json("sys", "user", caller="training_recommendations"))
+        assert last_record()["outcome"] == "invalid_output"
+        print("✓ Usage, cost and invalid output recorded")
+
+
+class TestSummary:
+    """Tests for summarize_llm_calls"""
+
+    def test_per_caller_report(self):
+        """Callers are grouped and sorted by spend"""
+        from llm_metrics_service import summarize_llm_calls
+
+        docs = [{"caller": "analysis_commentary", "kind": "chat", "latency_ms": ms,
+                 "total_tokens": 3000, "cost_usd": 0.001, "outcome": "ok", "retries": 0}
+                for ms in range(100, 2100, 100)]
+        docs[0]["outcome"] = "error"
+        docs.append({"caller": "ask_about_move", "kind": "chat", "latency_ms": 900,
+                     "total_tokens": 500, "cost_usd": 0.0002, "outcome": "ok", "retries": 1})
+
+        report = summarize_llm_calls(docs)
+        commentary, ask = report["callers"]
+        assert commentary["caller"] == "analysis_commentary"
+        assert commentary["calls"] == 20 and commentary["error_rate"] == 0.05
+        assert commentary["latency_p95_ms"] == 1900 and commentary["latency_max_ms"] == 2000
+        assert ask["retries"] == 1
+        assert report["totals"]["calls"] == 21 and report["totals"]["total_tokens"] == 60500
+        print(f"✓ Report totals: {report['totals']}")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
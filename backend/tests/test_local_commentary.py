@@ -0,0 +1,103 @@
+"""
+Local Commentary Tests
+
+Tests for:
+1. Good moves get short positive feedback, never a negative thinking pattern
+2. Errors get a template explanation, the better move and a phase rule;
+   errors with nothing to name get a neutral template
+3. Moves the LLM comments on are skipped; merging keeps move order
+4. Only the top critical moments are selected for the LLM
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+pytest.importorskip("numpy")
+
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 3 3"
+
+
+def move(n, san, evaluation, cp_loss=0, **fields):
+    return {"move_number": n, "move": san, "evaluation": evaluation, "cp_loss": cp_loss,
+            "best_move": fields.pop("best_move", san), "phase": fields.pop("phase", "opening"), **fields}
+
+
+class TestMoveCommentary:
+    """Tests for local_move_commentary"""
+
+    def test_good_move(self):
+        """Positive feedback, no suggestion, solid thinking"""
+        from local_commentary_service import local_move_commentary
+
+        entry = local_move_commentary(move(4, "Nf3", "best", only_move=True), "white")
+        assert entry["feedback"] and "only move" in entry["feedback"]
+        assert entry["consider"] is None
+        assert entry["details"]["thinking_pattern"] == "solid_thinking"
+        assert entry["source"] == "template"
+        print(f"✓ {entry['feedback']}")
+
+    def test_blunder_with_threat(self):
+        """The threat, the better move and a rule are all named"""
+        from local_commentary_service import local_move_commentary
+
+        blunder = move(3, "Nf6", "blunder", 900, best_move="g6", threat="Qxf7#",
+                       fen_before=FEN, pv_after_played=["Qxf7#"])
+        entry = local_move_commentary(blunder, "black")
+        assert "Qxf7#" in entry["feedback"] and "g6" in entry["feedback"]
+        assert entry["consider"] == "g6 was the better choice."
+        assert entry["details"]["threat_line"] == "Qxf7#"
+        assert entry["details"]["thinking_pattern"] == "pattern_blindness"
+        assert entry["details"]["rule"]
+        print(f"✓ {entry['feedback']}")
+
+    def test_mistake_without_threat(self):
+        """No threat or motif: a neutral template, not a missed tactic"""
+        from local_commentary_service import local_move_commentary
+
+        entry = local_move_commentary(move(12, "a3", "mistake", 150, best_move="Rd1", phase="middlegame"), "white")
+        assert "Rd1" in entry["feedback"] and "missed" not in entry["feedback"].lower()
+        assert entry["details"]["thinking_pattern"] is None
+        print(f"✓ {entry['feedback']}")
+
+    def test_endgame_inaccuracy(self):
+        """Endgame slips read the eval from the user's side"""
+        from local_commentary_service import local_move_commentary
+
+        slip = move(41, "Kd6", "inaccuracy", 60, best_move="Kc5", phase="endgame",
+                    eval_before=-450, eval_after=-390)
+        entry = local_move_commentary(slip, "black")
+        assert "Kc5" in entry["feedback"] and "cleaner" in entry["feedback"]
+        print(f"✓ {entry['feedback']}")
+
+
+class TestGameCommentary:
+    """Tests for build_local_commentary / merge_commentary / select_critical_moves"""
+
+    def test_skip_and_merge(self):
+        """The LLM's moves replace the templates; every move is covered once"""
+        from local_commentary_service import build_local_commentary, merge_commentary
+
+        moves = [move(1, "e4", "best"), move(2, "Qh5", "inaccuracy", 40, best_move="Nf3"), move(3, "Bc4", "good")]
+        local = build_local_commentary(moves, "white", skip={2})
+        assert [c["move_number"] for c in local] == [1, 3]
+
+        merged = merge_commentary(local, [{"move_number": 2, "feedback": "Coach"}])
+        assert [c["move_number"] for c in merged] == [1, 2, 3]
+        assert merged[1]["feedback"] == "Coach"
+        print("✓ Template and coached commentary merged")
+
+    def test_critical_selection(self):
+        """Worst moves by loss, limited, in game order"""
+        from coach_prompt_service import select_critical_moves
+
+        moves = [move(n, "a3", "mistake", cp) for n, cp in [(5, 120), (9, 400), (14, 150), (20, 300)]]
+        moves.append(move(22, "h3", "good"))
+        assert [m["move_number"] for m in select_critical_moves(moves, limit=3)] == [9, 14, 20]
+        print("✓ Top critical moments selected")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,109 @@
+"""
+Opening Index Tests
+
+Tests for:
+1. ECO line table loads without illegal lines
+2. Deepest named position wins (Ruy Lopez Morphy over plain Ruy Lopez)
+3. Transposed move orders classify identically
+4. opening_service and chess_journey_service report the same names
+5. Generic move orders keep a generic name, not their ECO code's system
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+class TestOpeningIndex:
+    """Tests for the shared ECO opening index"""
+
+    def test_loads_all_lines(self):
+        """Every line in eco_lines.json is legal and indexed"""
+        from opening_index import get_opening_index
+
+        index = get_opening_index()
+        assert index.skipped_lines == 0
+        assert len(index.positions) > 200
+        print(f"✓ {len(index.positions)} opening positions indexed")
+
+    def test_deepest_match(self):
+        """The deepest named position along the game is reported"""
+        from opening_index import get_opening_index
+
+        match = get_opening_index().classify_moves("e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 d3 b5".split())
+        assert match["eco"] == "C77"
+        assert match["family"] == "Ruy Lopez"
+        assert match["variation"] == "Morphy Defense"
+        print(f"✓ Classified as {match['name']}")
+
+    def test_transposition(self):
+        """Different move orders into the Semi-Slav get the same opening"""
+        from opening_index import get_opening_index
+
+        index = get_opening_index()
+        a = index.classify_moves("d4 d5 c4 c6 Nf3 Nf6 Nc3 e6".split())
+        b = index.classify_moves("Nf3 d5 d4 Nf6 c4 e6 Nc3 c6".split())
+        assert a["eco"] == b["eco"] == "D43"
+        print(f"✓ Transposition detected: {a['name']}")
+
+    def test_family_alias(self):
+        """Short family prefixes map to the full family name"""
+        from opening_index import get_opening_index
+
+        match = get_opening_index().classify_moves("e4 e5 Nf3 Nc6 Bc4 Bc5 c3".split())
+        assert match["name"] == "Italian: Giuoco Piano"
+        assert match["family"] == "Italian Game"
+        print("✓ 'Italian' grouped under 'Italian Game'")
+
+    @pytest.mark.parametrize("moves,name", [
+        ("d4 Nf6 e3", "Indian Game"),
+        ("d4 Nf6 Nc3", "Indian Game"),
+        ("d4 Nf6 Bg5", "Trompowsky Attack"),
+        ("d4 d5 Nf3 Nf6 c4", "Queen's Gambit"),
+        ("d4 d5 Nf3 e6", "Queen's Pawn Game"),
+        ("Nf3 d5 d4 Nf6", "Queen's Pawn Game"),
+        ("d4 d5 Bf4", "London System"),
+    ])
+    def test_line_names(self, moves, name):
+        """Lines filed under a system's ECO code are only named after it when they reach it"""
+        from opening_index import get_opening_index
+
+        assert get_opening_index().classify_moves(moves.split())["name"] == name
+        print(f"✓ {moves}: {name}")
+
+
+class TestSharedNames:
+    """Both services use the same opening names"""
+
+    def test_services_agree(self):
+        """classify_opening and the journey repertoire name the same opening"""
+        from game_record_service import build_game_record
+        from opening_service import classify_opening
+        from chess_journey_service import calculate_opening_repertoire
+
+        pgn = '[White "me"]\n[Black "you"]\n[Result "1-0"]\n\n1. d4 Nf6 2. c4 g6 3. Nc3 Bg7 4. e4 d6 5. Nf3 O-O 6. Be2 1-0'
+        record = build_game_record(pgn)
+        name = classify_opening(record["san"], record["zobrist"])["name"]
+
+        repertoire = calculate_opening_repertoire(
+            [{"pgn": pgn, "record": record, "user_color": "black", "result": "1-0"}], []
+        )
+        journey_names = [o["name"] for o in repertoire["as_black"]["openings"]]
+        assert journey_names == [name] == ["King's Indian Defense"]
+        print(f"✓ Both services report {name}")
+
+    def test_eco_header_fallback(self):
+        """Games without a record fall back to the ECO code with the same names"""
+        from chess_journey_service import calculate_opening_repertoire
+
+        repertoire = calculate_opening_repertoire(
+            [{"pgn": '[ECO "C54"]\n\n1. e4 e5', "user_color": "white", "result": "1-0"}], []
+        )
+        assert repertoire["as_white"]["openings"][0]["name"] == "Italian Game"
+        print("✓ ECO header fallback")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -371,5 +371,62 @@ class TestEndgameTypeDetection:
         print("✓ Material balance correctly detected as white_winning")
 
 
+class TestIncrementalPhaseLabels:
+    """Tests for per-ply phase labels from a single replay"""
+
+    def test_tracker_matches_detect_game_phase(self):
+        """MaterialTracker phases match detect_game_phase on every ply, incl. promotions"""
+        import chess
+        from phase_theory_service import MaterialTracker, detect_game_phase
+
+        board = chess.Board("4k3/1P6/8/8/8/8/6p1/4K2R w K - 0 1")
+        tracker = MaterialTracker(board)
+        for uci in ["b7b8q", "g2h1q", "b8b5", "h1h2"]:
+            move = chess.Move.from_uci(uci)
+            tracker.push(board, move)
+            board.push(move)
+            assert tracker.phase() == detect_game_phase(board, tracker.move_number)
+            assert tracker.pieces == len(board.piece_map()) - chess.popcount(board.pawns) - 2
+        print("✓ Incremental material tracking")
+
+    def test_labels_reuse_skips_replay(self):
+        """analyze_game_phases gives the same phases from precomputed labels"""
+        import chess
+        from game_record_service import build_game_record
+        from phase_theory_service import analyze_game_phases, label_game_phases
+
+        pgn = ("1. e4 e5 2. Nf3 Nc6 3. d4 exd4 4. Nxd4 Nxd4 5. Qxd4 Qf6 6. Qxf6 Nxf6 "
+               "7. Bd3 Bc5 8. Nc3 O-O 9. O-O d6 10. Bg5 Be6 11. Bxf6 gxf6 1/2-1/2")
+        record = build_game_record(pgn)
+        labels = label_game_phases(chess.Board(), [chess.Move.from_uci(u) for u in record["uci"]])
+
+        replayed = analyze_game_phases(pgn, "white", 1200)
+        reused = analyze_game_phases(pgn, "white", 1200, record=record, phase_labels=labels)
+        assert replayed["phases"] == reused["phases"]
+        assert replayed["phase_transitions"] == reused["phase_transitions"]
+        assert reused["ply_phases"] == "o" * 10 + "m" + "e" * 11
+        print(f"✓ Phases from labels: {reused['ply_phases']}")
+
+    def test_phase_mastery_uses_move_labels(self):
+        """calculate_phase_mastery counts moves by their stored phase"""
+        from chess_journey_service import calculate_phase_mastery
+
+        analysis = {
+            "phase_analysis": {"phases": [
+                {"phase": "opening", "start_move": 1, "end_move": 5},
+                {"phase": "endgame", "start_move": 6, "end_move": 30}
+            ]},
+            "stockfish_analysis": {"move_evaluations": [
+                # Labelled endgame although move 5 is inside the opening range
+                {"move_number": 5, "evaluation": "blunder", "phase": "endgame"},
+                {"move_number": 3, "evaluation": "best", "phase": "opening"}
+            ]}
+        }
+        mastery = calculate_phase_mastery([analysis])
+        assert mastery["endgame"]["blunders_per_game"] > 0
+        assert mastery["opening"]["blunders_per_game"] == 0
+        print("✓ Phase mastery from move labels")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
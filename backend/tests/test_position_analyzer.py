@@ -0,0 +1,186 @@
+"""
+Position Analyzer Tests
+
+Tests for:
+1. Hanging / loose piece detection
+2. Fork detection (knight fork of king and queen)
+3. Absolute pin detection via pin_mask
+4. Batch scan_fens over a sequence of positions
+5. Whole-game motif scan and piece sacrifice detection
+"""
+
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+class TestDetectors:
+    """Tests for the bitboard motif detectors"""
+
+    def test_hanging_and_loose(self):
+        """Attacked undefended pieces hang; undefended pieces are loose"""
+        import chess
+        from position_analyzer import find_hanging_pieces, find_loose_pieces
+
+        # Black queen on d5 attacked by the e4 pawn, nothing defends it
+        board = chess.Board("4k3/8/8/3q4/4P3/8/8/4K3 b - - 0 1")
+        hanging = find_hanging_pieces(board, chess.BLACK)
+        assert [h["square"] for h in hanging] == [chess.D5]
+        assert hanging[0]["piece"] == chess.QUEEN
+
+        loose = find_loose_pieces(board, chess.WHITE)
+        assert [l["square"] for l in loose] == [chess.E4]
+        print("✓ Hanging queen and loose pawn found")
+
+    def test_knight_fork(self):
+        """A knight hitting queen and rook is reported as a fork"""
+        import chess
+        from position_analyzer import find_forks
+
+        board = chess.Board("r3q2k/2N5/8/8/8/8/8/4K3 b - - 0 1")
+        forks = find_forks(board, chess.WHITE)
+        assert len(forks) == 1
+        assert forks[0]["attacker_square"] == chess.C7
+        assert {t["square"] for t in forks[0]["targets"]} == {chess.A8, chess.E8}
+        print("✓ Knight fork on c7")
+
+    def test_pin_to_king(self):
+        """A bishop pinning a knight to the king is found with its pinner"""
+        import chess
+        from position_analyzer import find_pins
+
+        board = chess.Board("4k3/8/2n5/1B6/8/8/8/4K3 b - - 0 1")
+        pins = find_pins(board, chess.BLACK)
+        assert pins == [{
+            "pinned_square": chess.C6,
+            "pinned_piece": chess.KNIGHT,
+            "behind_piece": chess.KING,
+            "attacker_square": chess.B5,
+            "attacker_piece": chess.BISHOP
+        }]
+
+        # A second piece on the line breaks the pin
+        board.set_piece_at(chess.D7, chess.Piece(chess.PAWN, chess.BLACK))
+        assert find_pins(board, chess.BLACK) == []
+        print("✓ Pin found and blocked pin ignored")
+
+
+class TestScanFens:
+    """Tests for the batch motif scan"""
+
+    def test_scan_game_positions(self):
+        """Every position is scanned; invalid FENs give None"""
+        import chess
+        from position_analyzer import scan_fens
+
+        board = chess.Board()
+        fens = [board.fen()]
+        for san in ["e4", "e5", "Nf3", "Nc6", "Bb5", "Nd4"]:
+            board.push_san(san)
+            fens.append(board.fen())
+
+        results = scan_fens(fens + ["not a fen"], "black")
+        assert len(results) == len(fens) + 1
+        assert results[-1] is None
+        assert results[0]["hanging"] == []
+        # After 2...Nc6 3.Bb5 the knight is attacked but defended
+        assert "c6" not in results[5]["hanging"]
+        print(f"✓ Scanned {len(fens)} positions")
+
+    def test_matches_single_position_detectors(self):
+        """scan_fens flags agree with the per-position detectors"""
+        import chess
+        from position_analyzer import scan_fens, find_hanging_pieces
+
+        fen = "4k3/8/8/3q4/4P3/8/8/4K3 w - - 0 1"
+        result = scan_fens([fen], "white")[0]
+        expected = [chess.square_name(h["square"])
+                    for h in find_hanging_pieces(chess.Board(fen), chess.BLACK)]
+        assert result["opponent_hanging"] == expected == ["d5"]
+        print("✓ Batch flags match detectors")
+
+
+GAME_PGN = "1. e4 e5 2. Nf3 Nc6 3. Bc4 Nd4 4. Nxe5 Qg5 5. Nxf7 Qxg2 6. Rf1 Qxe4+ 7. Be2 Nf3# 0-1"
+
+
+class TestGameMotifScan:
+    """Tests for the whole-game motif scan stored with analyses"""
+
+    def test_flags_per_ply(self):
+        """One flag per ply; details and counts line up with the flags"""
+        from game_record_service import build_game_record
+        from position_analyzer import scan_game_motifs, MOTIF_HANGING, MOTIF_PIN, MOTIF_MISSED_CAPTURE
+
+        record = build_game_record(GAME_PGN)
+        scan = scan_game_motifs(record["fens"], record["uci"], "white")
+        assert len(scan["flags"]) == record["ply_count"]
+        assert all(scan["flags"][d["i"]] for d in scan["details"])
+        # 6. Rf1 skipped Nxh8; the hanging h2/e4 pawns are not flagged
+        assert scan["flags"][10] == MOTIF_MISSED_CAPTURE
+        # 7. Be2 left the f7 knight hanging and walked into a pin
+        assert scan["flags"][12] == MOTIF_HANGING | MOTIF_PIN
+        assert scan["counts"]["missed_capture"] == 1 and scan["counts"]["pin"] == 1
+        print(f"✓ Flags: {scan['flags']}")
+
+    def test_motifs_for_move(self):
+        """Moves are looked up by full-move number and the user's color"""
+        from game_record_service import build_game_record
+        from position_analyzer import scan_game_motifs, motifs_for_move
+
+        record = build_game_record(GAME_PGN)
+        scan = scan_game_motifs(record["fens"], record["uci"], "white")
+        assert motifs_for_move(scan, 6) == {"missed_capture": ["f7h8"]}
+        assert motifs_for_move(scan, 7) == {"hanging": ["f7"], "pin": ["e2"]}
+        assert motifs_for_move(scan, 1) == {}
+        assert motifs_for_move(None, 6) == {}
+        print("✓ Move lookup")
+
+    def test_only_created_motifs(self):
+        """A pin that lasts is reported on the move that allowed it, not on every later move"""
+        from position_analyzer import motifs_for_move, MOTIF_PIN, MOTIF_HANGING
+
+        scan = {"user_color": "white", "start_ply": 0,
+                "flags": [MOTIF_PIN, MOTIF_PIN, MOTIF_PIN | MOTIF_HANGING, MOTIF_PIN],
+                "details": [{"i": 0, "pin": ["e2"]}, {"i": 1, "pin": ["e2"]},
+                            {"i": 2, "pin": ["e2"], "hanging": ["c3"]}, {"i": 3, "pin": ["e2"]}]}
+        assert motifs_for_move(scan, 1) == {"pin": ["e2"]}
+        assert motifs_for_move(scan, 2) == {"hanging": ["c3"]}
+        print("✓ Lasting motifs belong to the move that created them")
+
+    def test_back_rank(self):
+        """A boxed-in king facing a rook on the open back rank is flagged"""
+        import chess
+        from position_analyzer import find_back_rank_weakness
+
+        board = chess.Board("3r2k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1")
+        assert find_back_rank_weakness(board, chess.WHITE) == [chess.D8]
+        board.push_san("h3")
+        assert find_back_rank_weakness(board, chess.WHITE) == []
+        print("✓ Back-rank weakness and luft")
+
+    def test_piece_sacrifice(self):
+        """Bxf7+ into the king is a sacrifice; a protected developing move is not"""
+        import chess
+        from position_analyzer import is_piece_sacrifice
+
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+        assert is_piece_sacrifice(board, chess.Move.from_uci("c4f7"))
+        assert not is_piece_sacrifice(board, chess.Move.from_uci("b1c3"))
+        # Pawn moves never count, whatever they leave en prise
+        assert not is_piece_sacrifice(board, chess.Move.from_uci("d2d4"))
+        print("✓ Sacrifice detection")
+
+    def test_card_habit_from_motifs(self):
+        """Mistake cards take their habit from stored motifs before text patterns"""
+        pytest.importorskip("bson")
+        from mistake_card_service import classify_mistake_habit
+
+        assert classify_mistake_habit({"motifs": {"fork": ["c7"]}}, "you missed a pin") == "fork_blindness"
+        assert classify_mistake_habit({"motifs": {}}, "you missed a pin") == "pin_blindness"
+        print("✓ Motif-based habit tags")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
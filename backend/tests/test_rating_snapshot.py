@@ -0,0 +1,200 @@
+"""
+Rating Snapshot Tests
+
+Tests for:
+1. A platform that fails to answer keeps its stored ratings
+2. Stale snapshots are served at once and refreshed in the background
+3. Primary rating selection order
+4. Peak and change from the stored rating history
+5. Rating progression counts games apart from history points
+"""
+
+import asyncio
+import pytest
+import sys
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+pytest.importorskip("numpy")
+
+USER = {"user_id": "u_rating", "chess_com_username": "samlee", "lichess_username": "sam_lee"}
+STORED = {"chess_com": {"rapid": 1400, "blitz": 1300}, "lichess": {"rapid": 1650, "blitz": 1580}}
+
+
+class Collection:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+
+    def _match(self, doc, query):
+        return all(doc.get(k) == v for k, v in query.items())
+
+    async def find_one(self, query, projection=None):
+        found = [d for d in self.docs if self._match(d, query)]
+        return dict(found[0]) if found else None
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if self._match(doc, query):
+                doc.update(update["$set"])
+                return
+        if upsert:
+            self.docs.append({**query, **update["$set"]})
+
+
+class SnapshotDb:
+    def __init__(self, snapshot=None):
+        self.rating_snapshots = Collection([snapshot] if snapshot else [])
+        self.rating_history = Collection()
+
+
+def stored_snapshot(age_hours=1, **fields):
+    fetched_at = datetime.now(timezone.utc) - timedelta(hours=age_hours)
+    return {"user_id": USER["user_id"], "ratings": STORED, "chess_com_username": "samlee",
+            "lichess_username": "sam_lee", "fetched_at": fetched_at.isoformat(), **fields}
+
+
+@pytest.fixture
+def platforms(monkeypatch):
+    """Replace the network fetch; tests set the platforms' answer"""
+    import rating_service
+
+    answer = {}
+
+    async def fetch(chess_com_username=None, lichess_username=None):
+        return dict(answer)
+
+    async def no_bump(db, user_id):
+        return 1
+
+    monkeypatch.setattr(rating_service, "fetch_platform_ratings", fetch)
+    monkeypatch.setattr(rating_service, "bump_user_generation", no_bump)
+    return answer
+
+
+class TestRefresh:
+    """Tests for refresh_rating_snapshot"""
+
+    def test_failed_platform_keeps_stale_ratings(self, platforms):
+        """Only Lichess answers: Chess.com keeps its stored ratings, the primary stays put"""
+        from rating_service import refresh_rating_snapshot, select_primary_rating
+
+        platforms["lichess"] = {"rapid": 1660, "blitz": 1590, "bullet": None, "classical": None}
+        db = SnapshotDb(stored_snapshot())
+        ratings = asyncio.run(refresh_rating_snapshot(db, "u_rating", "samlee", "sam_lee"))
+
+        assert ratings["chess_com"] == STORED["chess_com"]
+        assert ratings["lichess"]["rapid"] == 1660
+        assert select_primary_rating(ratings) == ("chess_com", "rapid", 1400)
+        assert db.rating_snapshots.docs[0]["ratings"] == ratings
+        assert {h["platform"] for h in db.rating_history.docs} == {"lichess"}
+        print("✓ Chess.com outage kept its stored ratings")
+
+    def test_changed_account_not_kept(self, platforms):
+        """Stale ratings of a previously linked account are dropped"""
+        from rating_service import refresh_rating_snapshot
+
+        platforms["lichess"] = {"rapid": 1660}
+        db = SnapshotDb(stored_snapshot())
+        ratings = asyncio.run(refresh_rating_snapshot(db, "u_rating", "new_account", "sam_lee"))
+        assert "chess_com" not in ratings
+        print("✓ Old account's ratings dropped")
+
+    def test_total_outage_keeps_snapshot(self, platforms):
+        """No platform answers: the stored snapshot is returned untouched"""
+        from rating_service import refresh_rating_snapshot
+
+        snapshot = stored_snapshot()
+        db = SnapshotDb(snapshot)
+        assert asyncio.run(refresh_rating_snapshot(db, "u_rating", "samlee", "sam_lee")) == STORED
+        assert db.rating_snapshots.docs[0]["fetched_at"] == snapshot["fetched_at"]
+        print("✓ Outage kept the snapshot")
+
+
+class TestStaleWhileRevalidate:
+    """Tests for get_cached_platform_ratings"""
+
+    def test_stale_served_then_refreshed(self, platforms):
+        """A stale snapshot is returned at once; the refresh lands afterwards"""
+        import rating_service
+
+        platforms.update({"chess_com": {"rapid": 1420}, "lichess": {"rapid": 1670}})
+        db = SnapshotDb(stored_snapshot(age_hours=48))
+
+        async def read():
+            ratings = await rating_service.get_cached_platform_ratings(db, USER, max_age_seconds=3600)
+            assert len(rating_service._refresh_tasks) == 1
+            await asyncio.gather(*rating_service._refresh_tasks)
+            return ratings
+
+        assert asyncio.run(read()) == STORED
+        assert db.rating_snapshots.docs[0]["ratings"]["chess_com"] == {"rapid": 1420}
+        assert not rating_service._refresh_tasks and "u_rating" not in rating_service._refreshing_users
+        print("✓ Stale snapshot served, refreshed in the background")
+
+    def test_fresh_not_refreshed(self, platforms):
+        """A fresh snapshot schedules nothing"""
+        import rating_service
+
+        db = SnapshotDb(stored_snapshot(age_hours=0))
+        ratings = asyncio.run(rating_service.get_cached_platform_ratings(db, USER, max_age_seconds=3600))
+        assert ratings == STORED and not rating_service._refresh_tasks
+        print("✓ Fresh snapshot served as-is")
+
+
+class TestPrimaryRating:
+    """Tests for select_primary_rating and summarize_rating_history"""
+
+    def test_selection_order(self):
+        """Rapid before blitz, Chess.com before Lichess, empty values skipped"""
+        from rating_service import select_primary_rating
+
+        assert select_primary_rating(STORED) == ("chess_com", "rapid", 1400)
+        assert select_primary_rating({"chess_com": {"rapid": None, "blitz": 1300},
+                                      "lichess": {"rapid": 1650}}) == ("lichess", "rapid", 1650)
+        assert select_primary_rating({"lichess": {"bullet": 1200}}) == ("lichess", "bullet", 1200)
+        assert select_primary_rating({}) is None
+        print("✓ Primary rating order")
+
+    def test_peak_and_change(self):
+        """Peak over all history; change since the first point in the window"""
+        from rating_service import summarize_rating_history
+
+        today = datetime.now(timezone.utc)
+        day = lambda n: (today - timedelta(days=n)).strftime("%Y-%m-%d")
+        history = [{"date": day(90), "rating": 1500}, {"date": day(20), "rating": 1380},
+                   {"date": day(5), "rating": 1420}]
+
+        assert summarize_rating_history(1410, history, days=30) == {"current": 1410, "peak": 1500, "change": 30}
+        assert summarize_rating_history(1600, [], days=30) == {"current": 1600, "peak": 1600, "change": 0}
+        print("✓ Peak and change")
+
+
+class TestProgression:
+    """Tests for chess_journey_service.get_rating_progression"""
+
+    def test_games_counted_apart_from_history(self, monkeypatch):
+        """With the platform series, total_games still counts rated games"""
+        import rating_service
+        from chess_journey_service import get_rating_progression
+
+        today = datetime.now(timezone.utc)
+        points = [{"date": (today - timedelta(days=n)).strftime("%Y-%m-%d"), "rating": 1400 + n}
+                  for n in range(5)]
+
+        async def history(db, user_id, platform=None, category=None, days=365):
+            return points
+
+        monkeypatch.setattr(rating_service, "get_rating_history", history)
+        games = [{"game_id": "g1", "user_color": "white", "imported_at": today.isoformat(),
+                  "pgn": '[WhiteElo "1400"]\n[BlackElo "1390"]'}]
+        result = asyncio.run(get_rating_progression(SnapshotDb(stored_snapshot()), "u_rating", USER, games))
+
+        assert result["source"] == "platform_history"
+        assert result["total_games"] == 1 and result["history_points"] == 5
+        print("✓ Games and history points counted separately")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
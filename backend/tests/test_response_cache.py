@@ -0,0 +1,119 @@
+"""
+Response Cache Tests
+
+Tests for:
+1. First request builds the response and returns an ETag
+2. Repeat requests are served from cache without rebuilding
+3. If-None-Match with the current ETag returns 304
+4. Bumping the user's generation invalidates the cached body and ETag
+"""
+
+import asyncio
+import pytest
+import sys
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+
+class FakeGenerations:
+    """Minimal stand-in for the data_generations collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        generation = self.docs.get(query["user_id"])
+        return None if generation is None else {"generation": generation}
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        user_id = query["user_id"]
+        self.docs[user_id] = self.docs.get(user_id, 0) + update["$inc"]["generation"]
+        return {"generation": self.docs[user_id]}
+
+
+class FakeDb:
+    def __init__(self):
+        self.data_generations = FakeGenerations()
+
+
+def make_request(if_none_match=None):
+    from starlette.requests import Request
+
+    headers = []
+    if if_none_match:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+class TestCachedUserResponse:
+    """Tests for cached_user_response"""
+
+    def test_build_once_then_cache(self):
+        """The builder runs once per generation"""
+        from response_cache_service import cached_user_response
+
+        db = FakeDb()
+        calls = []
+
+        async def build():
+            calls.append(1)
+            return {"value": 42}
+
+        async def run():
+            first = await cached_user_response(db, make_request(), "u_cache_1", "journey", build)
+            second = await cached_user_response(db, make_request(), "u_cache_1", "journey", build)
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert len(calls) == 1
+        assert first.body == second.body
+        assert first.headers["etag"] == second.headers["etag"]
+        print(f"✓ Served from cache with ETag {first.headers['etag']}")
+
+    def test_if_none_match_returns_304(self):
+        """A matching If-None-Match short-circuits to 304"""
+        from response_cache_service import cached_user_response
+
+        db = FakeDb()
+
+        async def build():
+            return {"value": 1}
+
+        async def run():
+            first = await cached_user_response(db, make_request(), "u_cache_2", "badges", build)
+            return await cached_user_response(
+                db, make_request(first.headers["etag"]), "u_cache_2", "badges", build
+            )
+
+        response = asyncio.run(run())
+        assert response.status_code == 304
+        print("✓ 304 returned for matching ETag")
+
+    def test_bump_invalidates(self):
+        """Bumping the generation rebuilds and changes the ETag"""
+        from response_cache_service import cached_user_response, bump_user_generation
+
+        db = FakeDb()
+        values = iter([1, 2])
+
+        async def build():
+            return {"value": next(values)}
+
+        async def run():
+            first = await cached_user_response(db, make_request(), "u_cache_3", "progress", build)
+            await bump_user_generation(db, "u_cache_3")
+            second = await cached_user_response(
+                db, make_request(first.headers["etag"]), "u_cache_3", "progress", build
+            )
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert second.status_code == 200
+        assert first.headers["etag"] != second.headers["etag"]
+        assert b'"value":2' in second.body
+        print("✓ Generation bump invalidates cached response")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,117 @@
+"""
+Session Cache Tests
+
+Tests for:
+1. Cache hits/misses and hit-rate metrics
+2. Invalidation by token (logout) and by user (profile/preference updates)
+3. Session expiry is honoured even within the cache TTL
+4. Signed session tokens reject tampering
+"""
+
+import pytest
+import sys
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path for direct service testing
+sys.path.insert(0, '/app/backend')
+
+USER_DOC = {"user_id": "user_test123", "email": "test@demo.com", "name": "Test"}
+
+
+class TestSessionCache:
+    """Tests for the in-process session cache"""
+
+    def test_hit_after_put(self):
+        """A cached token is served without a miss"""
+        from session_cache_service import SessionCache
+
+        cache = SessionCache(ttl_seconds=60, max_entries=10)
+        assert cache.get("tok") is None
+        cache.put("tok", USER_DOC, datetime.now(timezone.utc) + timedelta(days=1))
+        assert cache.get("tok")["user_id"] == "user_test123"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        print(f"✓ Cache stats: {stats}")
+
+    def test_invalidate_token_and_user(self):
+        """Logout drops one token, profile updates drop all of a user's tokens"""
+        from session_cache_service import SessionCache
+
+        cache = SessionCache(ttl_seconds=60, max_entries=10)
+        expires = datetime.now(timezone.utc) + timedelta(days=1)
+        cache.put("tok_a", USER_DOC, expires)
+        cache.put("tok_b", USER_DOC, expires)
+
+        cache.invalidate_token("tok_a")
+        assert cache.get("tok_a") is None
+        assert cache.get("tok_b") is not None
+
+        cache.invalidate_user("user_test123")
+        assert cache.get("tok_b") is None
+        print("✓ Token and user invalidation work")
+
+    def test_expired_session_not_served(self):
+        """An expired session is a miss even inside the cache TTL"""
+        from session_cache_service import SessionCache
+
+        cache = SessionCache(ttl_seconds=60, max_entries=10)
+        cache.put("tok", USER_DOC, datetime.now(timezone.utc) - timedelta(seconds=1))
+        assert cache.get("tok") is None
+        print("✓ Expired sessions are not served from cache")
+
+    def test_lru_eviction(self):
+        """Oldest entries are evicted beyond max_entries"""
+        from session_cache_service import SessionCache
+
+        cache = SessionCache(ttl_seconds=60, max_entries=2)
+        expires = datetime.now(timezone.utc) + timedelta(days=1)
+        for token in ["t1", "t2", "t3"]:
+            cache.put(token, {**USER_DOC, "user_id": token}, expires)
+        assert cache.get("t1") is None
+        assert cache.get("t3") is not None
+        assert cache.stats()["evictions"] == 1
+        print("✓ LRU eviction works")
+
+
+class TestSignedSessionTokens:
+    """Tests for signed stateless tokens"""
+
+    @pytest.fixture(autouse=True)
+    def signing_secret(self, monkeypatch):
+        import session_cache_service
+        monkeypatch.setattr(session_cache_service, "SESSION_SIGNING_SECRET", "test-secret")
+
+    def test_roundtrip(self):
+        """A signed token verifies and carries its claims"""
+        from session_cache_service import create_signed_session_token, verify_signed_session_token
+
+        token = create_signed_session_token("user_test123", datetime.now(timezone.utc) + timedelta(days=1), 3)
+        claims = verify_signed_session_token(token)
+        assert claims["uid"] == "user_test123"
+        assert claims["ep"] == 3
+        print("✓ Signed token round trip")
+
+    def test_tampered_token_rejected(self):
+        """Changing the payload invalidates the signature"""
+        from session_cache_service import create_signed_session_token, verify_signed_session_token
+
+        token = create_signed_session_token("user_test123", datetime.now(timezone.utc) + timedelta(days=1))
+        prefix, rest = token[:4], token[4:]
+        payload, signature = rest.split(".")
+        tampered = f"{prefix}{payload[:-2]}AA.{signature}"
+        assert verify_signed_session_token(tampered) is None
+        print("✓ Tampered token rejected")
+
+    def test_expired_token_rejected(self):
+        """Expired signed tokens are rejected"""
+        from session_cache_service import create_signed_session_token, verify_signed_session_token
+
+        token = create_signed_session_token("user_test123", datetime.now(timezone.utc) - timedelta(seconds=5))
+        assert verify_signed_session_token(token) is None
+        print("✓ Expired token rejected")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
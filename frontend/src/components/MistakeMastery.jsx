@@ -113,7 +113,7 @@ const MistakeMastery = ({ token, onComplete }) => {
   const submitAnswer = async () => {
     if (!selectedMove || !currentCard || submitting) return;
     setSubmitting(true);
-    const isCorrect = selectedMove === currentCard.correct_move;
+    const isCorrect = (currentCard.acceptable_moves || [currentCard.correct_move]).includes(selectedMove);
     
     try {
       const res = await fetch(`${API}/training/attempt`, {